@@ -1,21 +1,33 @@
 import os
 
-from utils.REF2021_Outputs import get_cs_journal_article_metadata
-from utils.constants import DATASETS_DIR, PROCESSED_DIR, CS_JOURNALS_ISSN
+import pandas as pd
 
-def main():
+from utils.REF2021_Outputs import get_journal_article_metadata
+from utils.constants import DATASETS_DIR, PROCESSED_DIR, CS_JOURNALS_ISSN, CS_UOA
+from utils.issn import normalise_issn
+
+def main(uoas=(CS_UOA,)):
     """
     Pipeline to process journal ISSNs
+    :param uoas: Units of assessment whose journals are processed
     """
-    process_cs_journal_ISSN()
+    process_cs_journal_ISSN(uoas)
 
-def get_cs_journals_issn_df():
-    """
-    Filter the CS REF submissions for journal articles, and obtained the ISSNs as a pandas dataframe
-    :return: Dataframe of CS Journal ISSNs
-    """
-    cs_journal_article_metadata = get_cs_journal_article_metadata()
-    cs_journal_ISSN_df = cs_journal_article_metadata[["ISSN"]].drop_duplicates().dropna()
+def get_cs_journals_issn_df(uoas=(CS_UOA,)):
+    """
+    Filter the REF submissions of the units of assessment for journal articles, and obtained the ISSNs as a pandas
+    dataframe. A journal that articles were submitted to by several UoAs is listed once, so its metrics are only
+    requested once from the APIs
+    :param uoas: Units of assessment whose journals are included (CS by default)
+    :return: Dataframe of Journal ISSNs
+    """
+    journal_article_metadata = pd.concat(
+        [get_journal_article_metadata(uoa)[["ISSN"]] for uoa in uoas], ignore_index=True
+    )
+    # Canonical ISSN form (NNNN-NNNC), so the same journal written differently is listed once
+    journal_article_metadata["ISSN"] = normalise_issn(journal_article_metadata["ISSN"])
+
+    cs_journal_ISSN_df = journal_article_metadata[["ISSN"]].drop_duplicates().dropna()
     return cs_journal_ISSN_df
 
 def write_cs_journals_issn_df(cs_journal_ISSN_df):
@@ -28,11 +40,12 @@ def write_cs_journals_issn_df(cs_journal_ISSN_df):
 
     cs_journal_ISSN_df.to_csv(cs_journals_issn_df_path, index=False)
 
-def process_cs_journal_ISSN():
+def process_cs_journal_ISSN(uoas=(CS_UOA,)):
     """
-    Extract all the journal ISSNs of submissions made to the CS UoA
+    Extract all the journal ISSNs of submissions made to the units of assessment (CS by default)
+    :param uoas: Units of assessment whose journals are processed
     """
-    cs_journal_ISSN_df = get_cs_journals_issn_df()
+    cs_journal_ISSN_df = get_cs_journals_issn_df(uoas)
     write_cs_journals_issn_df(cs_journal_ISSN_df)
 
 if __name__ == "__main__":
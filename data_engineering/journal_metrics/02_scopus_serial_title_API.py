@@ -4,14 +4,25 @@ import pandas as pd
 from time import sleep
 from dotenv import load_dotenv
 
-from utils.constants import DATASETS_DIR, PROCESSED_DIR, CS_JOURNALS_ISSN, REFINED_DIR, CS_JOURNAL_METRICS
-
-def main():
+from utils.constants import DATASETS_DIR, PROCESSED_DIR, CS_JOURNALS_ISSN, REFINED_DIR, CS_JOURNAL_METRICS, \
+    CS_JOURNAL_METRICS_STORE
+from utils.instrumentation import span, increment_counter, log_instrumentation_summary
+from utils.journal_metrics_store import read_journal_metrics_store, write_journal_metrics_store, \
+    get_issns_to_fetch, upsert_journal_metrics, get_journal_metrics_df, get_utc_now, DEFAULT_TTL, SCOPUS_API_SOURCE, \
+    LEGACY_SOURCE
+
+# Returned by get_serial_metadata when the request fails (e.g. a network error, or 429 Too Many Requests), so the
+# journal is not recorded as fetched, and is fetched again on the next refresh
+FETCH_FAILED = "fetch_failed"
+
+def main(ttl=DEFAULT_TTL):
     """
     ETL Pipeline that:
         1. Gets the ISSN of all journals of the outputs submitted the CS UoA
-        2. For all journals, make API calls to retrieve their Scopus ID, SNIP, SJR, and Cite Score
-        3. Persist these journal metrics as a parquet file
+        2. For the journals missing from the journal metrics store, or fetched longer ago than the TTL, make API calls
+           to retrieve their Scopus ID, SNIP, SJR, and Cite Score
+        3. Upsert these journal metrics into the store, and persist the current journal metrics as a parquet file
+    :param ttl: Pandas Timedelta, the time after which fetched journal metrics are fetched again
     """
     # Securely retrieve API key:
     configure()
@@ -19,8 +30,9 @@ def main():
     global elsevier_api_key
     elsevier_api_key = os.getenv('elsevier_api_key')
 
-    cs_journal_metrics_df = process_journal_metrics()
-    write_cs_journal_metrics_df(cs_journal_metrics_df)
+    with span("refresh_journal_metrics", ttl=ttl):
+        refresh_journal_metrics(ttl)
+    log_instrumentation_summary()
 
 def configure():
     """"
@@ -43,7 +55,7 @@ def get_serial_metadata(issn): # Serial Title API
     """
     Make an API call to the Scopus Serial TItle API to retrieve journal metrics
     :param issn: The ISSN (unique identifier) of a journal
-    :return: JSON payload response containing journal metadata
+    :return: JSON payload response containing journal metadata, or FETCH_FAILED if the request failed
     """
     serial_title_metadata_base_url = f"https://api.elsevier.com/content/serial/title/issn/{issn}"
     serial_title_metadata_url_params = {
@@ -54,7 +66,8 @@ def get_serial_metadata(issn): # Serial Title API
     }
 
     try:
-        response = requests.get(serial_title_metadata_base_url, params=serial_title_metadata_url_params, timeout=10)
+        with span("api_request", api="Serial Title", issn=issn):
+            response = requests.get(serial_title_metadata_base_url, params=serial_title_metadata_url_params, timeout=10)
         response.raise_for_status()
 
         if response.status_code == 200:
@@ -64,9 +77,13 @@ def get_serial_metadata(issn): # Serial Title API
         else:
             print(f"Request failed with status code: {response.status_code}")
             print(response.text)  # Print the response text for debugging
+            increment_counter("api_errors", api="Serial Title")
+            return FETCH_FAILED
 
     except requests.exceptions.RequestException as e:
         print(f"Error fetching data: {e}")
+        increment_counter("api_errors", api="Serial Title")
+        return FETCH_FAILED
 
 def extract_journal_metrics(data):
     """
@@ -113,20 +130,35 @@ def extract_journal_metrics(data):
 def process_journal_metrics():
     """
     Obtain all CS journals, using their ISSNs create new columns for their journal metrics using the Serial Title API
+    The ISSNs are distinct across all units of assessment processed by 01_cs_journal_issn, so every journal is
+    requested once even if articles were submitted to it by several UoAs
     :return: A DataFrame each journal (identified by its ISSN) has fields for journal metrics:
              Scopus ID, SNIP, SJR, and Cite Score
     """
     cs_journal_ISSN_df = get_cs_journal_issns_df()
+    # Journals whose request failed are kept, with null journal metrics
+    return fetch_journal_metrics(cs_journal_ISSN_df['ISSN']).drop(columns=FETCH_FAILED)
 
+def fetch_journal_metrics(issns):
+    """
+    Make an API call for every ISSN to retrieve the journal metrics of the journal
+    :param issns: Iterable of the ISSNs of the journals
+    :return: A DataFrame each journal (identified by its ISSN) has fields for journal metrics:
+             Scopus ID, SNIP, SJR, and Cite Score, and a fetch_failed field: True if the request or the processing of
+             the response failed (its journal metrics are then null)
+    """
     journal_metrics = [] # List of each journal and its journal metrics
 
-    for issn in cs_journal_ISSN_df['ISSN']:
+    for issn in issns:
         try:
             journal_metrics_json_response = get_serial_metadata(issn)
+            if journal_metrics_json_response is FETCH_FAILED:
+                raise RuntimeError("Request to the Serial Title API failed")
 
             journal_metrics_metadata = extract_journal_metrics(journal_metrics_json_response)
             # In the extracted journal metrics hash-map, include the journal's ISSN
             journal_metrics_metadata['ISSN'] = issn
+            journal_metrics_metadata[FETCH_FAILED] = False
 
             journal_metrics.append(journal_metrics_metadata)
             sleep(0.01)
@@ -139,24 +171,88 @@ def process_journal_metrics():
                 'Scopus_ID': None,
                 'SNIP': None,
                 'SJR': None,
-                'Cite_Score': None
+                'Cite_Score': None,
+                FETCH_FAILED: True
             })
 
     # Convert the list containing the journal metrics to DataFrame
-    journal_metrics_df = pd.DataFrame(journal_metrics)
+    journal_metrics_df = pd.DataFrame(
+        journal_metrics, columns=['ISSN', 'Scopus_ID', 'SNIP', 'SJR', 'Cite_Score', FETCH_FAILED]
+    )
     # Ensure order of columns is fixed
-    journal_metrics_df = journal_metrics_df[['ISSN', 'Scopus_ID', 'SNIP', 'SJR', 'Cite_Score']]
+    journal_metrics_df = journal_metrics_df[['ISSN', 'Scopus_ID', 'SNIP', 'SJR', 'Cite_Score', FETCH_FAILED]]
+    journal_metrics_df[FETCH_FAILED] = journal_metrics_df[FETCH_FAILED].astype(bool)
 
     return journal_metrics_df
 
+def get_cs_journal_metrics_df_path():
+    """
+    Obtain the path of the file containing the current metrics of all CS journals
+    :return: Path of the CS journal metrics parquet file
+    """
+    return os.path.join(os.path.dirname(__file__), "..", "..", DATASETS_DIR, REFINED_DIR, CS_JOURNAL_METRICS)
+
+def get_journal_metrics_store_path():
+    """
+    Obtain the path of the journal metrics store
+    :return: Path of the journal metrics store's parquet file
+    """
+    return os.path.join(os.path.dirname(__file__), "..", "..", DATASETS_DIR, REFINED_DIR, CS_JOURNAL_METRICS_STORE)
+
+def load_journal_metrics_store():
+    """
+    Load the journal metrics store. The first time, the store is seeded with the CS journal metrics file (if it
+    exists), with the file's modification time as fetch time, so the journals are not all fetched again
+    :return: Store DataFrame
+    """
+    store_path = get_journal_metrics_store_path()
+    store_df = read_journal_metrics_store(store_path)
+
+    cs_journal_metrics_df_path = get_cs_journal_metrics_df_path()
+    if store_df.empty and os.path.exists(cs_journal_metrics_df_path):
+        cs_journal_metrics_df = pd.read_parquet(cs_journal_metrics_df_path, engine='fastparquet')
+        written_at = pd.Timestamp(os.path.getmtime(cs_journal_metrics_df_path), unit="s")
+        store_df = upsert_journal_metrics(store_df, cs_journal_metrics_df, LEGACY_SOURCE, fetched_at=written_at)
+
+    return store_df
+
+def refresh_journal_metrics(ttl=DEFAULT_TTL):
+    """
+    Incrementally refresh the journal metrics: only the journals missing from the store, or fetched longer ago than
+    the TTL, are requested from the API. Journals whose request failed are left out of the store. The store and the CS
+    journal metrics file are then written
+    :param ttl: Pandas Timedelta, the time after which fetched journal metrics are fetched again
+    :return: Store DataFrame
+    """
+    store_df = load_journal_metrics_store()
+
+    cs_journal_ISSN_df = get_cs_journal_issns_df()
+    issns_to_fetch = get_issns_to_fetch(store_df, cs_journal_ISSN_df['ISSN'], ttl)
+
+    fetched_at = get_utc_now()
+    journal_metrics_df = fetch_journal_metrics(issns_to_fetch)
+
+    # Journals whose request failed are not upserted: they are not recorded as fetched, so they are fetched again on
+    # the next refresh (rather than waiting for the TTL with null journal metrics)
+    is_failed = journal_metrics_df[FETCH_FAILED]
+    if is_failed.any():
+        print(f"Journals not fetched, to be fetched again on the next refresh: {is_failed.sum()}")
+    journal_metrics_df = journal_metrics_df[~is_failed].drop(columns=FETCH_FAILED)
+
+    store_df = upsert_journal_metrics(store_df, journal_metrics_df, SCOPUS_API_SOURCE, fetched_at=fetched_at)
+
+    write_journal_metrics_store(store_df, get_journal_metrics_store_path())
+    write_cs_journal_metrics_df(get_journal_metrics_df(store_df))
+
+    return store_df
+
 def write_cs_journal_metrics_df(cs_journal_metrics_df):
     """
     Write the dataframe containing all CS journals with their metrics as a parquet file
     :param cs_journal_metrics_df: DataFrame containing all CS journals with their metrics:
             ISSN, Scopus_ID, SNIP, SJR, Cite_Score
     """
-    cs_journal_metrics_df_path = os.path.join(os.path.dirname(__file__), "..", "..", DATASETS_DIR, REFINED_DIR,
-                                            CS_JOURNAL_METRICS)
+    cs_journal_metrics_df_path = get_cs_journal_metrics_df_path()
 
     cs_journal_metrics_df.to_parquet(cs_journal_metrics_df_path, engine='fastparquet')
 
@@ -2,6 +2,7 @@ import os
 import pandas as pd
 
 from utils.constants import DATASETS_DIR, PROCESSED_DIR, RAW_DIR, SOURCE_NORMALIZED_IMPACT_PER_PAPER, SNIP
+from utils.issn import stack_issn_columns, normalise_issn
 
 def main():
     """
@@ -36,16 +37,12 @@ def process_snip_df(raw_snip_df):
     # The Raw SNIP file has multiple columns, filter for the ISSNs and the SNIP
     processed_snip_df = processed_snip_df.filter(['Print ISSN', 'Electronic ISSN', 'SNIP'])
 
-    # Split the SNIP dataframe into two dataframes:
-    # 1. Contains the print ISSN with the SNIP value. Rename print ISSN column as ISSN.
-    print_issn = processed_snip_df[['SNIP', 'Print ISSN']].rename(columns={'Print ISSN': 'ISSN'})
-    # 2. Contains the electronic ISSN with the SNIP value. Rename electronic ISSN column as ISSN
-    electronic_issn = processed_snip_df[['SNIP', 'Electronic ISSN']].rename(columns={'Electronic ISSN': 'ISSN'})
+    # Stack the print ISSNs and the electronic ISSNs (each with the SNIP value) - this normalises it since now every row
+    # only has a single ISSN-SNIP pair, as opposed to having 2 ISSNs (print and electronic) with the SNIP value
+    processed_snip_df = stack_issn_columns(processed_snip_df, ['Print ISSN', 'Electronic ISSN'])
 
-    # Combine the two dataframes - this normalises it since now every row only has a single ISSN-SNIP pair
-    # As opposed to having 2 ISSNs (print and electronic) with the SNIP value
-    processed_snip_df = pd.concat([print_issn, electronic_issn], ignore_index=True)
-    processed_snip_df = processed_snip_df.dropna(subset=['ISSN'])
+    # Canonical ISSN form (NNNN-NNNC) shared with SJR and the REF metadata
+    processed_snip_df['ISSN'] = normalise_issn(processed_snip_df['ISSN'])
 
     return processed_snip_df
 
@@ -3,6 +3,7 @@ import pandas as pd
 
 from utils.constants import DATASETS_DIR, RAW_DIR, PROCESSED_DIR, SCIMAGO_JOURNAL_RANK, SJR
 from utils.dataframe import log_dataframe, delete_rows_by_values, log_null_values
+from utils.issn import get_issn_lengths, explode_issns, normalise_issn, is_valid_issn
 
 def main():
     """
@@ -50,30 +51,32 @@ def filter_sjr_columns(sjr_df):
     sjr_df = sjr_df[sjr_columns]
     return sjr_df
 
-def log_issn_lengths(sjr_df):
+def log_issn_lengths(sjr_df, issn_lengths=None):
     """
     Log the different ISSN lengths
     :param sjr_df: SJR dataframe
+    :param issn_lengths: Lengths of the ISSN fields if already computed, computed from sjr_df otherwise
     :return:  Noen
     """
-    issn_lengths = sjr_df['Issn'].astype(str).apply(len)
+    if issn_lengths is None:
+        issn_lengths = get_issn_lengths(sjr_df['Issn'])
     unique_issn_lengths = sorted(issn_lengths.unique())
 
     print(f"Possible Lengths of ISSNs in SJR dataframe={unique_issn_lengths}")
 
-def log_records_issn_len_not_eight(sjr_df):
+def log_records_issn_len_not_eight(sjr_df, issn_lengths=None):
     """
     Visualise all records where the ISSN length is not the expected value of eight
     :param sjr_df: Pandas SJR dataframe
+    :param issn_lengths: Lengths of the ISSN fields if already computed, computed from sjr_df otherwise
     :return: None
     """
     # Log records where the ISSN length is not eight i.e. ISSN length is 1 or 18
+    if issn_lengths is None:
+        issn_lengths = get_issn_lengths(sjr_df['Issn'])
 
-    # Create a temporary column to store the length of each Issn
-    sjr_df['Issn_length'] = sjr_df['Issn'].astype(str).apply(len)
-
-    # Filter DataFrame to include only rows where Issn_length is 1
-    single_char_issn = sjr_df[sjr_df['Issn_length'] == 1]
+    # Filter DataFrame to include only rows where the ISSN length is 1
+    single_char_issn = sjr_df[issn_lengths == 1]
     print("Logging records in DF where ISSN length is 1:")
     log_dataframe(single_char_issn)
     """
@@ -82,8 +85,8 @@ def log_records_issn_len_not_eight(sjr_df):
     These journal do not have an Issn => Drop records where Issn = "-"
     """
 
-    # Filter DataFrame to include only rows where Issn_length is 18
-    eighteen_char_issn = sjr_df[sjr_df['Issn_length'] == 18]
+    # Filter DataFrame to include only rows where the ISSN length is 18
+    eighteen_char_issn = sjr_df[issn_lengths == 18]
     print("Logging records in DF where ISSN length is 18:")
     log_dataframe(eighteen_char_issn)
     """
@@ -92,11 +95,6 @@ def log_records_issn_len_not_eight(sjr_df):
     ISSN length is 18, if the field contains 2 ISSN values => Normalise to 1NF
     """
 
-    # Drop temporary column
-    sjr_df.drop(
-        columns=['Issn_length'], inplace = True
-    )
-
 def handle_sjr_issn(sjr_df):
     """
     Transform the raw SJR DF so that it is ready to be joined with the REF submissions
@@ -123,24 +121,28 @@ def normalise_to_1nf(sjr_df):
     :param sjr_df: Non normalised SJR DF
     :return: SJR DF in the first normal form
     """
-    sjr_df = sjr_df.assign(
-        Issn=sjr_df['Issn'].str.split(', ')
-    ).explode('Issn')
+    sjr_df = explode_issns(sjr_df, 'Issn')
 
     return sjr_df
 
 def add_hyphen_issn(sjr_df):
     """
-    Update the ISSN values to include a hyphen in between
+    Update the ISSN values to include a hyphen in between (the canonical ISSN form shared with SNIP and the REF metadata)
     :param sjr_df: SJR DF where ISSN have no hyphens
     :return: SJR DF where ISSN have hyphens added
     """
-    sjr_df['Issn'] = sjr_df['Issn'].apply(
-        lambda issn_str: issn_str[:4] + '-' + issn_str[4:]
-    )
+    sjr_df = sjr_df.assign(Issn=normalise_issn(sjr_df['Issn']))
 
     return sjr_df
 
+def log_invalid_issns(sjr_df):
+    """
+    Log the number of ISSNs whose check digit does not match their other digits (or that are not ISSNs at all)
+    :param sjr_df: SJR DF with one ISSN per row
+    """
+    invalid_issn_count = (~is_valid_issn(sjr_df['Issn'])).sum()
+    print(f"Number of invalid ISSNs in SJR dataframe={invalid_issn_count}")
+
 def write_processed_sjr(sjr_df):
     """
     Write the SJR DF as a parquet file
@@ -160,11 +162,13 @@ def process_sjr_impact_factor():
     sjr_df = filter_sjr_columns(sjr_df)
     log_null_values(sjr_df) # Null counts: SJR = 2805, Rest = 0
 
-    log_issn_lengths(sjr_df)                       # Possible Lengths: 1, 8, 18
-    log_records_issn_len_not_eight(sjr_df)         # if 1, Issn = "-". If 18, Issn includes 2 comma separated ISSNs
+    issn_lengths = get_issn_lengths(sjr_df['Issn'])
+    log_issn_lengths(sjr_df, issn_lengths)                 # Possible Lengths: 1, 8, 18
+    log_records_issn_len_not_eight(sjr_df, issn_lengths)   # if 1, Issn = "-". If 18, Issn includes 2 comma separated ISSNs
 
     sjr_df = handle_sjr_issn(sjr_df)
     log_issn_lengths(sjr_df)                       # Possible lengths: 9. Example: 1542-4863
+    log_invalid_issns(sjr_df)
 
     # Write:
     write_processed_sjr(sjr_df)
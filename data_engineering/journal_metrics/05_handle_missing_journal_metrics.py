@@ -1,8 +1,22 @@
 import os
 import pandas as pd
 
-from utils.constants import DATASETS_DIR, PROCESSED_DIR, SNIP, CS_JOURNAL_METRICS, REFINED_DIR, SJR
-from utils.dataframe import split_df_on_null_field
+from utils.constants import DATASETS_DIR, PROCESSED_DIR, SNIP, CS_JOURNAL_METRICS, REFINED_DIR, SJR, ISSN_METRICS_INDEX, \
+    CS_JOURNAL_METRICS_STORE, CITESCORE
+from utils.backfill import backfill, get_reference_lookup
+from utils.instrumentation import span, log_instrumentation_summary
+from utils.issn import normalise_issn
+from utils.issn_index import ISSNMetricsIndex
+from utils.journal_metrics_store import read_journal_metrics_store, write_journal_metrics_store, \
+    upsert_journal_metrics, SCIMAGO_SOURCE, CWTS_SOURCE, CITESCORE_SOURCE
+
+# Backfill rules: (target column, reference source, key column), applied in order in a single pass
+# To fill in a metric from a new reference dataset, add its rule here and its lookup to get_journal_metrics_references
+JOURNAL_METRICS_BACKFILL_RULES = [
+    ('SJR', SCIMAGO_SOURCE, 'ISSN'),
+    ('SNIP', CWTS_SOURCE, 'ISSN'),
+    ('Cite_Score', CITESCORE_SOURCE, 'ISSN'),
+]
 
 def main():
     """
@@ -19,7 +33,8 @@ def main():
     Cite_Score    143
     """
 
-    journal_metrics_df_handled_missing_fields = handle_missing_journal_metrics(cs_journal_metrics_df)
+    with span("backfill_journal_metrics", rows_in=len(cs_journal_metrics_df)):
+        journal_metrics_df_handled_missing_fields, fill_sources_df = handle_missing_journal_metrics(cs_journal_metrics_df)
     log_null_cs_journal_metadata(journal_metrics_df_handled_missing_fields)
     """
     Total number of missing values: [After handling missing values]
@@ -32,10 +47,16 @@ def main():
 
     # Explicitly map each column to its correct data-type
     ensure_uniform_data_types(journal_metrics_df_handled_missing_fields)
+    # Record the filled in values, with their source, in the journal metrics store
+    record_filled_journal_metrics(journal_metrics_df_handled_missing_fields, fill_sources_df)
     # Override existing CS_JOURNAL_METRICS file
     write_journal_metrics_handled_missing_fields_df(journal_metrics_df_handled_missing_fields)
 
-    # Algorithm: Given df -> split into 2, null not null, handle null, rename cols (if needed to match), concat and write
+    # Where time went, and the number of nulls filled in from each reference source
+    log_instrumentation_summary()
+
+    # Algorithm: Given df -> apply every backfill rule (look up the ISSNs missing a metric in its reference source, and
+    # fill in the null metrics), and write
 
 
 def load_cs_journal_metrics_df():
@@ -68,6 +89,55 @@ def load_sjr_df():
     sjr_df = pd.read_parquet(processed_sjr_csv_path, engine='fastparquet')
     return sjr_df
 
+def load_citescore_df():
+    """
+    Load the processed CiteScore reference file (columns ISSN and Cite_Score), if it has been added to the processed
+    directory
+    :return: Pandas dataframe of the CiteScore-ISSN values, None if the file does not exist
+    """
+    citescore_df_path = os.path.join(os.path.dirname(__file__), "..", "..", DATASETS_DIR, PROCESSED_DIR, CITESCORE)
+    if not os.path.exists(citescore_df_path):
+        return None
+
+    citescore_df = pd.read_parquet(citescore_df_path, engine='fastparquet')
+    return citescore_df
+
+def get_issn_metrics_index_path():
+    """
+    Obtain the path of the ISSN metrics index's directory
+    :return: Path of the ISSN metrics index
+    """
+    return os.path.join(os.path.dirname(__file__), "..", "..", DATASETS_DIR, PROCESSED_DIR, ISSN_METRICS_INDEX)
+
+def is_issn_metrics_index_stale(index_path):
+    """
+    Check whether the ISSN metrics index has to be (re)built: it has not been built yet, or the processed SJR or SNIP
+    dataset was written after it
+    :param index_path: Path of the ISSN metrics index's directory
+    :return: True if the index must be built
+    """
+    index_keys_path = os.path.join(index_path, "keys.npy")
+    if not os.path.exists(index_keys_path):
+        return True
+
+    processed_dir = os.path.join(os.path.dirname(__file__), "..", "..", DATASETS_DIR, PROCESSED_DIR)
+    source_paths = [os.path.join(processed_dir, SJR), os.path.join(processed_dir, SNIP)]
+    return any(os.path.getmtime(source_path) > os.path.getmtime(index_keys_path) for source_path in source_paths)
+
+def load_issn_metrics_index():
+    """
+    Load the ISSN-keyed lookup index of journal metrics (memory-mapped). The index is built from the processed SJR and
+    SNIP datasets the first time, and again whenever one of them changes
+    :return: ISSNMetricsIndex
+    """
+    index_path = get_issn_metrics_index_path()
+
+    if is_issn_metrics_index_stale(index_path):
+        issn_metrics_index = ISSNMetricsIndex.build(load_sjr_df(), load_processed_snip_df())
+        issn_metrics_index.save(index_path)
+
+    return ISSNMetricsIndex.load(index_path)
+
 def log_null_cs_journal_metadata(loaded_cs_journal_metrics_df):
     """
     Log the number of missing values in the CS journal metrics DF
@@ -90,74 +160,36 @@ def log_null_cs_journal_metadata(loaded_cs_journal_metrics_df):
     print(cs_journal_metadata_df_with_scopus_id_null_snip.head().to_string())
     # In such records, SNIPList (and other fields like SJRList and citeScoreYearInfoList) either absent or set to null
 
-def handle_null_sjr(journal_metrics_df):
+def get_journal_metrics_references():
     """
-    Handle the missing SJE values - fill in using the SJR dataset
-    :param journal_metrics_df: Journal metrics dataframe containing missing SJR values
-    :return: Journal metrics dataframe with missing SJR handled
+    Obtain the lookup function of every reference source of the backfill rules
+    :return: Dictionary of reference source name to lookup function lookup(issns, metric)
     """
-    # Split into two dataframes, one with SJRs and another for journals missing SJRs
-    null_sjr_journal_metrics_df, not_null_sjr_journal_metrics_df = split_df_on_null_field(journal_metrics_df, 'SJR')
-
-    # Drop SJR from the null_sjr_df: [here SJR=null for all records, we try to obtain this by joining]
-    null_sjr_journal_metrics_df = null_sjr_journal_metrics_df.drop(columns=['SJR'])
-
-    # Load the processed SJR dataframe
-    sjr_df = load_sjr_df()
-
-    # Perform a merge using the null SJRs with the dataset containing the SJRs to override the null SJRs if ISSNs match
-    null_sjr_with_sjr_df_joined = pd.merge(
-        null_sjr_journal_metrics_df, sjr_df, left_on='ISSN', right_on='Issn', how='left'
-    )
-    # Drop additional fields that are not required [we're only interested in obtaining SJR]
-    null_sjr_with_sjr_df_joined = null_sjr_with_sjr_df_joined.drop(columns=['Rank', 'Title', 'Issn'])
-
-    # Ensure consistent column order
-    null_sjr_with_sjr_df_joined = null_sjr_with_sjr_df_joined[['ISSN', 'Scopus_ID', 'SNIP', 'SJR', 'Cite_Score']]
-
-    # Combine the journals who original has SJRs along with the now processed journals with missing SJRs
-    journal_metrics_handled_null_sjr_df = pd.concat([null_sjr_with_sjr_df_joined, not_null_sjr_journal_metrics_df])
-
-    return journal_metrics_handled_null_sjr_df
-
-def handle_null_snip(journal_metrics_df):
-    """
-    Handle the missing SNIP values - fill in using the SNIP dataset
-    :param journal_metrics_df: Journal metrics dataframe containing missing SNIP values
-    :return: Journal metrics dataframe with missing SNIP handled
-    """
-    # Split into two dataframes, one with SNIPs and another for journals missing SNIPs
-    null_snip_journal_metrics_df, not_null_snip_journal_metrics_df = split_df_on_null_field(journal_metrics_df, 'SNIP')
-
-    # Drop SNIP column from the null SNIP DF. SNIP values will be retrieved by performing join with SNIP DF
-    null_snip_journal_metrics_df = null_snip_journal_metrics_df.drop(columns=['SNIP'])
-
-    # Load the processed dataframe containing SNIP values
-    snip_df = load_processed_snip_df()
-
-    # Perform a merge using the null SNIPs with the dataset containing the SNIPs to override the null SNIPs if ISSNs match
-    null_snip_with_snip_df_joined = pd.merge(
-        null_snip_journal_metrics_df, snip_df, left_on='ISSN', right_on='ISSN', how='left'
-    )
-
-    # Ensure consistent column order
-    null_snip_with_snip_df_joined = null_snip_with_snip_df_joined[['ISSN', 'Scopus_ID', 'SNIP', 'SJR', 'Cite_Score']]
-
-    # Combine the journals who original has SNIPs along with the now processed journals with missing SNIPs
-    journal_metrics_handled_null_snip_df = pd.concat([null_snip_with_snip_df_joined, not_null_snip_journal_metrics_df])
-
-    return journal_metrics_handled_null_snip_df
-
-
-def handle_missing_journal_metrics(journal_metrics_df):
+    # SJR (SCImago) and SNIP (CWTS) are looked up in the ISSN metrics index
+    issn_metrics_index = load_issn_metrics_index()
+
+    citescore_df = load_citescore_df()
+    if citescore_df is None:
+        print(f"No {CITESCORE} reference file: Cite_Score is not filled in")
+        citescore_df = pd.DataFrame({'ISSN': [], 'Cite_Score': []})
+    citescore_df = citescore_df.assign(ISSN=normalise_issn(citescore_df['ISSN']))
+
+    return {
+        SCIMAGO_SOURCE: issn_metrics_index.lookup,
+        CWTS_SOURCE: issn_metrics_index.lookup,
+        CITESCORE_SOURCE: get_reference_lookup(citescore_df, 'ISSN'),
+    }
+
+def handle_missing_journal_metrics(journal_metrics_df, rules=JOURNAL_METRICS_BACKFILL_RULES):
     """
-    Handle missing values in the journal metrics
+    Handle missing values in the journal metrics: apply the backfill rules in a single pass, keeping the row order
     :param journal_metrics_df: Journal metrics dataframes with missing values
-    :return: Journal metrics dataframes with missing values handled
+    :param rules: List of (target column, reference source, key column) backfill rules
+    :return: Tuple of the journal metrics dataframes with missing values handled, and the dataframe of the reference
+    source each value was filled in from
     """
-    journal_metrics_df_handled_missing_fields = handle_null_sjr(journal_metrics_df)
-    journal_metrics_df_handled_missing_fields = handle_null_snip(journal_metrics_df_handled_missing_fields)
-    return journal_metrics_df_handled_missing_fields
+    references = get_journal_metrics_references()
+    return backfill(journal_metrics_df, rules, references)
 
 
 def ensure_uniform_data_types(journal_metrics_df_handled_missing_fields):
@@ -187,6 +219,28 @@ def ensure_uniform_data_types(journal_metrics_df_handled_missing_fields):
     return journal_metrics_df_handled_missing_fields
 
 
+def record_filled_journal_metrics(journal_metrics_df_handled_missing_fields, fill_sources_df):
+    """
+    Upsert the journal metrics filled in from the reference sources (e.g. SJR from SCImago, SNIP from CWTS) into the
+    journal metrics store, so the source of every value is known and the filled in values survive an incremental
+    refresh of the store. Nothing is recorded if the store has not been created by 02_scopus_serial_title_API.py
+    :param journal_metrics_df_handled_missing_fields: Journal metrics dataframe with missing values filled in
+    :param fill_sources_df: Dataframe of the reference source each value was filled in from (same index)
+    """
+    store_path = os.path.join(os.path.dirname(__file__), "..", "..", DATASETS_DIR, REFINED_DIR,
+                              CS_JOURNAL_METRICS_STORE)
+    if not os.path.exists(store_path):
+        return
+
+    store_df = read_journal_metrics_store(store_path)
+    for metric in fill_sources_df.columns:
+        for source in fill_sources_df[metric].dropna().unique():
+            is_filled = (fill_sources_df[metric] == source).to_numpy()
+            filled_journal_metrics_df = journal_metrics_df_handled_missing_fields.loc[is_filled, ['ISSN', metric]]
+            store_df = upsert_journal_metrics(store_df, filled_journal_metrics_df, source)
+
+    write_journal_metrics_store(store_df, store_path)
+
 def write_journal_metrics_handled_missing_fields_df(journal_metrics_df_handled_missing_fields):
     """
     Write the journal metrics dataframe with missing values filled in as a parquet file
@@ -18,6 +18,7 @@ from time import sleep
 from dotenv import load_dotenv
 
 from utils.constants import DATASETS_DIR, PROCESSED_DIR, CS_JOURNALS_ISSN, REFINED_DIR, CS_JOURNAL_METRICS
+from utils.instrumentation import span, increment_counter
 
 
 def main():
@@ -74,7 +75,8 @@ def get_journal_citation_metadata(scopus_publication_id): # FieldWeightedCitatio
     }
 
     try:
-        response = requests.get(citation_metadata_base_url, params=citation_metadata_url_params, timeout=10)
+        with span("api_request", api="SciVal Publication", scopus_id=scopus_publication_id):
+            response = requests.get(citation_metadata_base_url, params=citation_metadata_url_params, timeout=10)
         response.raise_for_status()
 
         if response.status_code == 200:
@@ -87,6 +89,7 @@ def get_journal_citation_metadata(scopus_publication_id): # FieldWeightedCitatio
 
     except requests.exceptions.RequestException as e:
         print(f"Error fetching data: {e}")
+        increment_counter("api_errors", api="SciVal Publication")
 
 
 def count_citation_metrics(scopus_id_df, citation_metric):
@@ -155,7 +158,8 @@ def get_journal_views_metadata(scopus_publication_id): # FieldWeightedViewsImpac
     }
 
     try:
-        response = requests.get(views_metadata_base_url, params=views_metadata_url_params, timeout=10)
+        with span("api_request", api="SciVal Publication", scopus_id=scopus_publication_id):
+            response = requests.get(views_metadata_base_url, params=views_metadata_url_params, timeout=10)
         response.raise_for_status()
 
         if response.status_code == 200:
@@ -168,6 +172,7 @@ def get_journal_views_metadata(scopus_publication_id): # FieldWeightedViewsImpac
 
     except requests.exceptions.RequestException as e:
         print(f"Error fetching data: {e}")
+        increment_counter("api_errors", api="SciVal Publication")
 
 
 def count_views_metrics(scopus_id_df):
@@ -4,11 +4,14 @@ import pandas as pd
 from time import sleep
 from dotenv import load_dotenv
 
-from utils.constants import DATASETS_DIR, PROCESSED_DIR, CS_OUTPUTS_METADATA, REFINED_DIR, CS_CITATION_METRICS
+from utils.REF2021_Outputs import get_outputs_metadata
+from utils.constants import DATASETS_DIR, REFINED_DIR, CS_CITATION_METRICS, CS_UOA
+from utils.instrumentation import span, increment_counter, log_instrumentation_summary
 
-def main():
+def main(uoas=(CS_UOA,)):
     """
     ETL pipeline to obtain and persist the citation counts of outputs submitted to the CS UoA
+    :param uoas: Units of assessment whose outputs' citation counts are obtained (CS by default)
     """
     # Securely retrieve API key:
     configure()
@@ -16,8 +19,13 @@ def main():
     global elsevier_api_key
     elsevier_api_key = os.getenv('elsevier_api_key')
 
-    cs_citation_metadata_df = process_citation_metadata()
-    write_cs_citation_metadata_df(cs_citation_metadata_df)
+    with span("fetch_citation_metrics", uoas=list(uoas)) as attributes:
+        cs_citation_metadata_df = process_citation_metadata(uoas)
+        attributes["rows_out"] = len(cs_citation_metadata_df)
+    with span("write_citation_metrics"):
+        write_cs_citation_metadata_df(cs_citation_metadata_df)
+
+    log_instrumentation_summary()
 
 
 def configure():
@@ -26,23 +34,14 @@ def configure():
     """
     load_dotenv()
 
-def get_cs_outputs_metadata():
-    """
-    Obtain a DataFrame of containing the metadata of CS outputs - needed for creating the CS DOI dataframe
-    :return: DataFrame containing outputs metadata of submissions to the CS UoA
-    """
-    processed_cs_outputs_metadata_path = os.path.join(os.path.dirname(__file__), "..", "..", DATASETS_DIR, PROCESSED_DIR,
-                                           CS_OUTPUTS_METADATA)
-
-    cs_outputs_metadata = pd.read_csv(processed_cs_outputs_metadata_path)
-    return cs_outputs_metadata
-
-def get_cs_doi_df():
+def get_cs_doi_df(uoas=(CS_UOA,)):
     """
-    Obtain Dataframe containing the DOIs of outputs submitted to the CS UoA
-    :return: Dataframe containing the DOIs of outputs submitted to the CS UoA
+    Obtain Dataframe containing the DOIs of outputs submitted to the units of assessment (CS by default).
+    An output submitted to several UoAs is listed once, so its citations are only requested once from the API
+    :param uoas: Units of assessment whose outputs are included
+    :return: Dataframe containing the DOIs of outputs submitted to the UoAs
     """
-    cs_outputs_df = get_cs_outputs_metadata()
+    cs_outputs_df = pd.concat([get_outputs_metadata(uoa)[["DOI"]] for uoa in uoas], ignore_index=True)
     cs_doi_df = cs_outputs_df[["DOI"]].drop_duplicates().dropna()
     return cs_doi_df
 
@@ -63,7 +62,8 @@ def get_citation_metadata(doi):
     }
 
     try:
-        response = requests.get(citation_metadata_base_url, params=citation_metadata_url_params, timeout=10)
+        with span("api_request", api="Citation Overview", doi=doi):
+            response = requests.get(citation_metadata_base_url, params=citation_metadata_url_params, timeout=10)
         response.raise_for_status()
 
         if response.status_code == 200:
@@ -76,6 +76,7 @@ def get_citation_metadata(doi):
 
     except requests.exceptions.RequestException as e:
         print(f"Error fetching data: {e}")
+        increment_counter("api_errors", api="Citation Overview")
 
 def extract_citation_metadata(data):
     """
@@ -136,12 +137,13 @@ def extract_citation_metadata(data):
         return None
 
 
-def process_citation_metadata():
+def process_citation_metadata(uoas=(CS_UOA,)):
     """
     Obtain the DOIs of CS outputs, and return a DataFrame with each output and its citation counts using the Citation API
+    :param uoas: Units of assessment whose outputs are included (CS by default)
     :return: DataFrame containing citation counts of outputs submitted to the CS UoA
     """
-    cs_doi_df = get_cs_doi_df()
+    cs_doi_df = get_cs_doi_df(uoas)
 
     def process_doi(doi):
         """
@@ -4,6 +4,7 @@ import pandas as pd
 from dotenv import load_dotenv
 
 from utils.constants import DATASETS_DIR, REFINED_DIR, CS_CITATION_METRICS, CS_OUTPUT_METRICS
+from utils.instrumentation import span, increment_counter, log_instrumentation_summary
 from utils.API import check_api_quota
 
 
@@ -19,10 +20,13 @@ def main():
     elsevier_api_key = os.getenv('elsevier_api_key')
 
     cs_scopus_id_df = get_cs_scopus_id_df()
-    cs_output_metrics_df = process_output_metrics(cs_scopus_id_df)
+    with span("fetch_output_metrics", rows_in=len(cs_scopus_id_df)):
+        cs_output_metrics_df = process_output_metrics(cs_scopus_id_df)
     write_cs_output_metrics_df(cs_output_metrics_df)
 
-    retry_process_output_metrics()
+    with span("retry_output_metrics"):
+        retry_process_output_metrics()
+    log_instrumentation_summary()
 
     check_api_quota(
         elsevier_api_key,
@@ -94,7 +98,8 @@ def get_output_metadata(scopus_id):
     }
 
     try:
-        response = requests.get(output_metadata_base_url, params=output_metadata_url_params, timeout=100)
+        with span("api_request", api="SciVal Publication", scopus_id=scopus_id):
+            response = requests.get(output_metadata_base_url, params=output_metadata_url_params, timeout=100)
         response.raise_for_status()
 
         if response.status_code == 200:
@@ -107,6 +112,7 @@ def get_output_metadata(scopus_id):
 
     except requests.exceptions.RequestException as e:
         print(f"Error fetching data: {e}")
+        increment_counter("api_errors", api="SciVal Publication")
 
 def extract_output_metadata(data):
     """
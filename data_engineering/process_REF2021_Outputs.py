@@ -1,12 +1,43 @@
 import os
+import time
+import openpyxl
 import pandas as pd
 
-from utils.constants import DATASETS_DIR, RAW_DIR, OUTPUTS_METADATA, PROCESSED_DIR, CS_OUTPUTS_METADATA
+from utils.constants import DATASETS_DIR, RAW_DIR, OUTPUTS_METADATA, PROCESSED_DIR, CS_OUTPUTS_METADATA, CS_UOA, \
+    OUTPUTS_METADATA_BY_UOA
 from utils.dataframe import log_dataframe
+from utils.partitions import write_uoa_partition, clear_uoa_partition, write_uoa_partition_part, read_uoa_partition
+from utils.instrumentation import span, observe, log_instrumentation_summary
+
+# Number of rows of the outputs workbook held in memory at a time when streaming it
+OUTPUTS_CHUNK_SIZE = 10000
+
+
+def main(uoas=(CS_UOA,), chunk_size=OUTPUTS_CHUNK_SIZE):
+    """
+    Split the REF2021 outputs metadata by unit of assessment, and check the citations of the CS outputs
+    :param uoas: Units of assessment to process. Each is written to its own partition (uoa=<number>), and the CS UoA
+    is also written to the CS outputs metadata file
+    :param chunk_size: Number of rows of the outputs workbook streamed at a time, None to load the whole workbook into
+    memory
+    """
+    with span("process_outputs", uoas=list(uoas)):
+        if chunk_size is None:
+            process_uoa_outputs(uoas)
+        else:
+            stream_uoa_outputs(uoas, chunk_size)
+
+    if CS_UOA in uoas:
+        cs_outputs_df = read_cs_outputs()
+        check_inapplicable_citations(cs_outputs_df)
+        count_null_citations(cs_outputs_df)
+        count_non_journal_article_citations(cs_outputs_df)
+
+    log_instrumentation_summary()
 
 
 def read_ref_outputs():
-    outputs_dataset_path = os.path.join(os.path.dirname(__file__), "..", DATASETS_DIR, RAW_DIR, OUTPUTS_METADATA)
+    outputs_dataset_path = get_ref_outputs_path()
 
     try:
         # Load the Excel file, skipping the first 4 lines -> 4th line will be used as the header
@@ -18,11 +49,75 @@ def read_ref_outputs():
     except Exception as e:
         print("An error occurred while reading the file:", str(e))
 
-def filter_cs_outputs(ref_outputs_df):
-    cs_outputs = ref_outputs_df[ref_outputs_df['Unit of assessment number'] == 11]
-    cs_outputs = cs_outputs.drop(columns=['Unit of assessment number', 'Unit of assessment name'])
+def get_ref_outputs_path():
+    """
+    Obtain the path of the REF2021 outputs metadata workbook (all UoAs)
+    :return: Path of the workbook
+    """
+    return os.path.join(os.path.dirname(__file__), "..", DATASETS_DIR, RAW_DIR, OUTPUTS_METADATA)
+
+def iter_ref_outputs_chunks(outputs_dataset_path, chunk_size=OUTPUTS_CHUNK_SIZE, header_row=5):
+    """
+    Stream the REF2021 outputs metadata workbook in chunks of rows, with openpyxl in read-only mode: rows are parsed
+    as they are iterated, so only one chunk is held in memory at a time (unlike pd.read_excel, which loads the workbook)
+    :param outputs_dataset_path: Path of the workbook
+    :param chunk_size: Number of rows per chunk
+    :param header_row: Row (1-based) holding the column names - the first 4 lines are skipped, as in read_ref_outputs
+    :return: Generator of DataFrames of at most chunk_size outputs, with the columns of the workbook
+    """
+    workbook = openpyxl.load_workbook(outputs_dataset_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(min_row=header_row, values_only=True)
+        header = next(rows)
+        # Read-only worksheets can report trailing columns without a name, keep the named columns
+        column_positions = [position for position, column in enumerate(header) if column is not None]
+        columns = [header[position] for position in column_positions]
+
+        chunk = []
+        for row in rows:
+            row = [row[position] if position < len(row) else None for position in column_positions]
+            if all(value is None for value in row):
+                continue # Skip empty rows
+            chunk.append(row)
+
+            if len(chunk) == chunk_size:
+                yield get_outputs_chunk_df(chunk, columns)
+                chunk = []
+
+        if chunk:
+            yield get_outputs_chunk_df(chunk, columns)
+    finally:
+        workbook.close()
+
+def get_outputs_chunk_df(chunk, columns):
+    """
+    Convert a chunk of rows of the outputs workbook to a DataFrame. Columns that are empty throughout the chunk are
+    stored as float NaNs (as they would be when reading the whole workbook), so the chunks of a partition combine
+    :param chunk: List of rows (lists of cell values)
+    :param columns: Column names
+    :return: DataFrame of the chunk
+    """
+    chunk_df = pd.DataFrame(chunk, columns=columns)
+
+    empty_columns = chunk_df.columns[chunk_df.isna().all().to_numpy()]
+    chunk_df[empty_columns] = chunk_df[empty_columns].astype(float)
+
+    return chunk_df
+
+def filter_uoa_outputs(ref_outputs_df, uoa):
+    """
+    Filter the REF2021 outputs for the outputs submitted to a unit of assessment
+    :param ref_outputs_df: DataFrame of the outputs submitted to all UoAs
+    :param uoa: Unit of assessment number, e.g. 11 for Computer Science and Informatics
+    :return: DataFrame of the outputs submitted to the UoA, without the UoA columns
+    """
+    uoa_outputs = ref_outputs_df[ref_outputs_df['Unit of assessment number'] == uoa]
+    uoa_outputs = uoa_outputs.drop(columns=['Unit of assessment number', 'Unit of assessment name'])
+
+    return uoa_outputs
 
-    return cs_outputs
+def filter_cs_outputs(ref_outputs_df):
+    return filter_uoa_outputs(ref_outputs_df, CS_UOA)
 
 def write_cs_outputs(cs_outputs):
     cs_outputs_path = os.path.join(os.path.dirname(__file__), "..", DATASETS_DIR, PROCESSED_DIR,
@@ -30,6 +125,17 @@ def write_cs_outputs(cs_outputs):
 
     cs_outputs.to_csv(cs_outputs_path, index=False)
 
+def write_uoa_outputs(uoa_outputs, uoa):
+    """
+    Persist the outputs submitted to a unit of assessment in its partition of the outputs metadata dataset
+    :param uoa_outputs: DataFrame of the outputs submitted to the UoA
+    :param uoa: Unit of assessment number
+    """
+    outputs_metadata_path = os.path.join(os.path.dirname(__file__), "..", DATASETS_DIR, PROCESSED_DIR,
+                                         OUTPUTS_METADATA_BY_UOA)
+
+    write_uoa_partition(uoa_outputs, outputs_metadata_path, uoa)
+
 def read_cs_outputs():
     cs_outputs_path = os.path.join(os.path.dirname(__file__), "..", DATASETS_DIR, PROCESSED_DIR,
                                    CS_OUTPUTS_METADATA)
@@ -64,9 +170,82 @@ def process_cs_outputs():
     log_dataframe(cs_outputs)
     write_cs_outputs(cs_outputs)
 
-process_cs_outputs()
+def process_uoa_outputs(uoas):
+    """
+    Read the REF2021 outputs metadata once, and write the outputs of every unit of assessment to its partition
+    :param uoas: Units of assessment to process
+    """
+    ref_outputs_df = read_ref_outputs()
 
-cs_outputs_df = read_cs_outputs()
-check_inapplicable_citations(cs_outputs_df)
-count_null_citations(cs_outputs_df)
-count_non_journal_article_citations(cs_outputs_df)
+    for uoa in uoas:
+        uoa_outputs = filter_uoa_outputs(ref_outputs_df, uoa)
+        print(f"Unit of assessment {uoa}: {uoa_outputs.shape[0]} outputs")
+        write_uoa_outputs(uoa_outputs, uoa)
+
+        if uoa == CS_UOA:
+            log_dataframe(uoa_outputs)
+            write_cs_outputs(uoa_outputs)
+
+def stream_uoa_outputs(uoas, chunk_size=OUTPUTS_CHUNK_SIZE, outputs_dataset_path=None, outputs_metadata_path=None):
+    """
+    Out-of-core version of process_uoa_outputs: stream the REF2021 outputs metadata workbook in chunks, keep the
+    outputs of the units of assessment as they go by, and write every chunk's outputs as a part of their UoA's
+    partition. Peak memory is bounded by the chunk size rather than the size of the workbook
+    :param uoas: Units of assessment to process
+    :param chunk_size: Number of rows of the workbook held in memory at a time
+    :param outputs_dataset_path: Path of the workbook (default: the raw REF2021 outputs metadata)
+    :param outputs_metadata_path: Path of the partitioned outputs metadata dataset (default: the processed dataset)
+    :return: Dictionary of statistics: rows processed, outputs per UoA, seconds elapsed, and rows per second
+    """
+    outputs_dataset_path = outputs_dataset_path or get_ref_outputs_path()
+    outputs_metadata_path = outputs_metadata_path or os.path.join(
+        os.path.dirname(__file__), "..", DATASETS_DIR, PROCESSED_DIR, OUTPUTS_METADATA_BY_UOA
+    )
+
+    # Remove the previous parts of the partitions, they are rewritten chunk by chunk
+    for uoa in uoas:
+        clear_uoa_partition(outputs_metadata_path, uoa)
+
+    uoa_output_counts = {uoa: 0 for uoa in uoas}
+    processed_rows = 0
+    start_time = time.perf_counter()
+
+    for part, chunk_df in enumerate(iter_ref_outputs_chunks(outputs_dataset_path, chunk_size)):
+        processed_rows += chunk_df.shape[0]
+
+        # The chunk was read while iterating, so the span times the filtering and writing of its outputs
+        with span("write_outputs_chunk", part=part, rows_in=chunk_df.shape[0]) as chunk_attributes:
+            uoa_chunk_df = chunk_df[chunk_df['Unit of assessment number'].isin(uoas)]
+            for uoa, uoa_outputs in uoa_chunk_df.groupby('Unit of assessment number'):
+                write_uoa_partition_part(filter_uoa_outputs(uoa_outputs, uoa), outputs_metadata_path, uoa, part)
+                uoa_output_counts[uoa] += uoa_outputs.shape[0]
+            chunk_attributes["rows_out"] = uoa_chunk_df.shape[0]
+
+        elapsed_time = time.perf_counter() - start_time
+        print(f"Processed {processed_rows} rows ({processed_rows / elapsed_time:.0f} rows/s)")
+        observe("outputs_rows_per_second", processed_rows / elapsed_time)
+
+    elapsed_time = time.perf_counter() - start_time
+    for uoa in uoas:
+        print(f"Unit of assessment {uoa}: {uoa_output_counts[uoa]} outputs")
+        if uoa_output_counts[uoa] == 0:
+            # No part was written, so the UoA has no partition (rather than an empty one)
+            print(f"Unit of assessment {uoa} has no outputs in the workbook, no partition was written")
+
+    # The CS outputs are also written to the CS outputs metadata file, read back from their partition (one UoA fits
+    # in memory)
+    if CS_UOA in uoas and uoa_output_counts[CS_UOA] > 0:
+        cs_outputs = read_uoa_partition(outputs_metadata_path, CS_UOA)
+        log_dataframe(cs_outputs)
+        write_cs_outputs(cs_outputs)
+
+    return {
+        "rows": processed_rows,
+        "uoa_outputs": uoa_output_counts,
+        "seconds": elapsed_time,
+        "rows_per_second": processed_rows / elapsed_time if elapsed_time > 0 else float("inf"),
+    }
+
+
+if __name__ == "__main__":
+    main()
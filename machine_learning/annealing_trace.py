@@ -0,0 +1,212 @@
+import os
+import argparse
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from scipy.special import logsumexp
+
+from utils.constants import FIGURES_DIR, CS_UOA
+
+# Phases of an annealing iteration, timed by the trace
+PHASES = ["distance", "eta", "gibbs", "centers", "is_satisfied"]
+
+
+class AnnealingTrace:
+    """
+    Profiling hook of DeterministicAnnealing, passed as its profiler argument. Every annealing iteration is recorded in
+    preallocated NumPy arrays (grown by doubling): the index and value of the temperature, the seconds spent in each
+    phase (distance_func, update_eta, update_gibbs, update_centers, labelling and _is_satisfied), the free energy, and
+    the number of data points whose label changed since the previous iteration
+    """
+    def __init__(self, capacity=1024, record_free_energy=True):
+        """
+        :param capacity: Number of iterations the arrays hold before they are grown
+        :param record_free_energy: Compute the free energy at every iteration (costs about one update_gibbs)
+        """
+        self.record_free_energy = record_free_energy
+        self.n_iter = 0
+        self.temperature_index = np.zeros(capacity, dtype=np.int32)
+        self.temperature = np.zeros(capacity)
+        self.phase_times = np.zeros((capacity, len(PHASES)))
+        self.free_energy = np.full(capacity, np.nan)
+        self.label_changes = np.zeros(capacity, dtype=np.int64)
+
+    def __len__(self):
+        return self.n_iter
+
+    def _grow(self):
+        """
+        Double the capacity of the arrays
+        """
+        for name in ["temperature_index", "temperature", "phase_times", "free_energy", "label_changes"]:
+            array = getattr(self, name)
+            grown_array = np.full((2 * array.shape[0],) + array.shape[1:], np.nan if name == "free_energy" else 0,
+                                  dtype=array.dtype)
+            grown_array[:array.shape[0]] = array
+            setattr(self, name, grown_array)
+
+    def on_iteration(self, t_index, temperature, phase_times, distance_matrix, eta, demands_prob, labels,
+                     previous_labels):
+        """
+        Record an annealing iteration, called by DeterministicAnnealing at the end of every iteration
+        :param t_index: Index of the temperature in the model's temperature ladder
+        :param temperature: Temperature of the iteration (before cooling)
+        :param phase_times: Seconds spent in each phase, in the order of PHASES
+        :param distance_matrix: Distances of the data points to the centers, shape (n_samples, n_clusters)
+        :param eta: Size constraint multipliers, shape (n_clusters,)
+        :param demands_prob: Weight of each data point, shape (n_samples, 1)
+        :param labels: Labels of the data points at this iteration
+        :param previous_labels: Labels at the previous iteration of the same temperature (None at the first one)
+        """
+        if self.n_iter == self.temperature.shape[0]:
+            self._grow()
+
+        i = self.n_iter
+        self.temperature_index[i] = t_index
+        self.temperature[i] = temperature
+        self.phase_times[i] = phase_times
+        self.label_changes[i] = len(labels) if previous_labels is None else np.count_nonzero(labels != previous_labels)
+
+        if self.record_free_energy:
+            # F = -T * sum_i p_i * log(sum_j eta_j * exp(-d_ij / T)), as in DeterministicAnnealing.free_energy
+            eta = np.maximum(np.asarray(eta, dtype=float), 1e-300)
+            log_partition = logsumexp(-distance_matrix / temperature, b=eta.reshape(1, -1), axis=1)
+            self.free_energy[i] = -temperature * np.sum(demands_prob.reshape(-1) * log_partition)
+
+        self.n_iter += 1
+
+    def get_phase_totals(self):
+        """
+        Cumulative seconds spent in each phase over all recorded iterations
+        :return: Pandas Series indexed by phase
+        """
+        return pd.Series(self.phase_times[:self.n_iter].sum(axis=0), index=PHASES)
+
+    def get_iterations_per_temperature(self):
+        """
+        Number of iterations run at each temperature of the ladder
+        :return: Pandas Series indexed by the temperature index (only the temperatures tried)
+        """
+        counts = np.bincount(self.temperature_index[:self.n_iter])
+        return pd.Series(counts, name="n_iter").rename_axis("temperature_index")[counts > 0]
+
+    def to_dataframe(self):
+        """
+        Obtain the trace as a DataFrame with one row per iteration
+        :return: DataFrame with columns temperature_index, temperature, <phase>_time, free_energy and label_changes
+        """
+        trace_df = pd.DataFrame({
+            "temperature_index": self.temperature_index[:self.n_iter],
+            "temperature": self.temperature[:self.n_iter],
+        })
+        for position, phase in enumerate(PHASES):
+            trace_df[f"{phase}_time"] = self.phase_times[:self.n_iter, position]
+        trace_df["free_energy"] = self.free_energy[:self.n_iter]
+        trace_df["label_changes"] = self.label_changes[:self.n_iter]
+        return trace_df
+
+    def save(self, path):
+        """
+        Persist the recorded iterations as a compressed NumPy archive
+        :param path: Path of the .npz file
+        """
+        np.savez_compressed(
+            path,
+            temperature_index=self.temperature_index[:self.n_iter],
+            temperature=self.temperature[:self.n_iter],
+            phase_times=self.phase_times[:self.n_iter],
+            free_energy=self.free_energy[:self.n_iter],
+            label_changes=self.label_changes[:self.n_iter]
+        )
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a trace persisted by save
+        :param path: Path of the .npz file
+        :return: AnnealingTrace
+        """
+        with np.load(path) as arrays:
+            trace = cls(capacity=max(len(arrays["temperature"]), 1))
+            for name in ["temperature_index", "temperature", "phase_times", "free_energy", "label_changes"]:
+                getattr(trace, name)[:len(arrays[name])] = arrays[name]
+            trace.n_iter = len(arrays["temperature"])
+        return trace
+
+
+def log_annealing_trace(trace):
+    """
+    Log where the time of an annealing run went, and how many iterations every temperature took
+    :param trace: AnnealingTrace of the run
+    """
+    phase_totals = trace.get_phase_totals()
+    total_time = phase_totals.sum()
+
+    print(f"Annealing iterations: {len(trace)}, time in the iteration phases: {total_time:.3f}s")
+    for phase, phase_time in phase_totals.items():
+        print(f"{phase}: {phase_time:.3f}s ({phase_time / total_time if total_time else 0:.1%})")
+    print()
+
+    trace_df = trace.to_dataframe()
+    temperature_summary = trace_df.groupby("temperature_index").agg(
+        start_temperature=("temperature", "first"),
+        n_iter=("temperature", "size"),
+        final_free_energy=("free_energy", "last"),
+        final_label_changes=("label_changes", "last")
+    )
+    print("Iterations per temperature:")
+    print(f"{temperature_summary.to_string()}\n")
+
+def plot_annealing_trace(trace, path):
+    """
+    Plot the free energy and label change trajectories of an annealing run, one line per temperature tried
+    :param trace: AnnealingTrace of the run
+    :param path: Path of the figure
+    """
+    trace_df = trace.to_dataframe()
+    figure, (free_energy_axis, label_changes_axis) = plt.subplots(2, 1, figsize=(10, 8), sharex=True)
+
+    for t_index, temperature_df in trace_df.groupby("temperature_index"):
+        label = f"T = {temperature_df['temperature'].iloc[0]:g}"
+        free_energy_axis.plot(temperature_df.index, temperature_df["free_energy"], label=label)
+        label_changes_axis.plot(temperature_df.index, temperature_df["label_changes"], label=label)
+
+    free_energy_axis.set_ylabel("Free energy")
+    free_energy_axis.legend()
+    label_changes_axis.set_ylabel("Label changes")
+    label_changes_axis.set_yscale("symlog")
+    label_changes_axis.set_xlabel("Annealing iteration")
+    figure.tight_layout()
+    figure.savefig(path)
+    plt.close(figure)
+
+def main():
+    """
+    CLI rendering the annealing trace of one fold of the University-Based Leave-One-Out Cross-Validation:
+    python -m machine_learning.annealing_trace <UKPRN> [--features ...] [--uoa 11]
+    """
+    # Imported here, as train_test_clustering_models imports this module
+    from machine_learning.train_test_clustering_models import profile_fold
+
+    parser = argparse.ArgumentParser(description="Render the deterministic annealing trace of one LOOCV fold")
+    parser.add_argument("ukprn", type=int, help="UKPRN of the university used as the fold's test set")
+    parser.add_argument("--features", nargs="+", default=["normalised_citations", "top_citation_percentile"],
+                        help="Features used to train the clustering model")
+    parser.add_argument("--uoa", type=int, default=CS_UOA, help="Unit of assessment")
+    parser.add_argument("--output", default=None, help="Path of the .npz file the trace is saved to")
+    args = parser.parse_args()
+
+    trace = profile_fold(args.features, args.ukprn, args.uoa)
+    log_annealing_trace(trace)
+
+    figure_path = os.path.join(os.path.dirname(__file__), "..", FIGURES_DIR, f"annealing_trace_{args.ukprn}.png")
+    plot_annealing_trace(trace, figure_path)
+    print(f"Trajectories plotted in {figure_path}")
+
+    if args.output:
+        trace.save(args.output)
+
+
+if __name__ == "__main__":
+    main()
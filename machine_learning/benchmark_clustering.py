@@ -0,0 +1,181 @@
+import time
+
+import numpy as np
+from scipy.spatial.distance import cdist
+from sklearn.preprocessing import StandardScaler
+
+from machine_learning.distance_backends import SquaredEuclideanDistance, EuclideanDistance, MahalanobisDistance
+from machine_learning.cs_output_results import get_cs_output_results, enhance_score_distribution
+from machine_learning.feature_engineering import get_cs_outputs_df
+from machine_learning.size_constrained_clustering import DeterministicAnnealing
+
+
+def main():
+    """
+    Benchmark the components of the size-constrained clustering on the features of all CS outputs
+    """
+    features = [
+        'normalised_citations', 'top_citation_percentile'
+    ]
+
+    X_scaled, distribution = get_benchmark_data(features)
+
+    benchmark_cluster_distribution_enforcement(X_scaled, distribution)
+    benchmark_distance_backends(X_scaled, distribution)
+    benchmark_restarts(X_scaled, distribution)
+    benchmark_seeding(X_scaled, distribution)
+
+def get_benchmark_data(features):
+    """
+    Obtain the scaled features of all CS outputs (missing values replaced with the median), and the distribution of
+    high- and low-scoring outputs across all universities - the data the cross-validation folds are trained on
+    :param features: List of features used to train the clustering models
+    :return:
+        1. X_scaled: Standardised feature array of all CS outputs
+        2. distribution: Distribution of high- and low-scoring outputs
+    """
+    cs_outputs_df = get_cs_outputs_df(features)
+    cs_output_results_enhanced_df = enhance_score_distribution(get_cs_output_results(), cs_outputs_df)
+
+    X = cs_outputs_df[features].fillna(cs_outputs_df[features].median()).values
+    X_scaled = StandardScaler().fit_transform(X)
+
+    high_scoring_output_count = cs_output_results_enhanced_df['high_scoring_outputs'].sum()
+    low_scoring_output_count = cs_output_results_enhanced_df['low_scoring_outputs'].sum()
+    total_output_count = high_scoring_output_count + low_scoring_output_count
+    distribution = [high_scoring_output_count / total_output_count, low_scoring_output_count / total_output_count]
+
+    return X_scaled, distribution
+
+def benchmark_cluster_distribution_enforcement(X, distribution, random_state=42):
+    """
+    Compare the greedy (one point at a time) and exact (size-constrained assignment) methods of enforcing the cluster
+    distribution on the same fitted model: time taken, and total distance of the data points to their cluster centers
+    :param X: Scaled feature array
+    :param distribution: Target distribution of data points across the clusters
+    :param random_state: Random seed
+    """
+    model = DeterministicAnnealing(
+        n_clusters=len(distribution), distribution=distribution, max_iters=3000, distance_func=cdist, np_seed=random_state
+    )
+    model.fit(X)
+    fitted_labels = model.labels_.copy()
+
+    print("Cluster distribution enforcement:")
+    print(f"Allocation before enforcement: {np.bincount(fitted_labels, minlength=len(distribution))}")
+    for method in ["greedy", "exact"]:
+        # Both methods start from the labels of the fitted model (the greedy method modifies them in place)
+        model.labels_ = fitted_labels.copy()
+
+        start_time = time.perf_counter()
+        labels, allocation = model.enforce_cluster_distribution(X, method=method)
+        elapsed_time = time.perf_counter() - start_time
+
+        moved_points = np.sum(labels != fitted_labels)
+        total_distance = np.linalg.norm(X - model.cluster_centers_[labels], axis=1).sum()
+        print(f"{method}: {elapsed_time:.4f}s, {moved_points} points moved, allocation={allocation}, "
+              f"total distance to centers={total_distance:.4f}")
+    print()
+
+def benchmark_distance_backends(X, distribution, random_state=42, repeats=1000):
+    """
+    Compare the distance backends of the deterministic annealing: time per call of the distance function (as called
+    in every annealing iteration, after the backend is prepared), and a full fit with each backend.
+    The squared Euclidean and Mahalanobis backends define different clusterings than the Euclidean distance, so the
+    inertia and iterations are reported alongside the fit time.
+    :param X: Scaled feature array
+    :param distribution: Target distribution of data points across the clusters
+    :param random_state: Random seed
+    :param repeats: Number of distance function calls timed per backend
+    """
+    backends = {
+        "cdist": cdist,
+        "euclidean": EuclideanDistance(),
+        "sqeuclidean": SquaredEuclideanDistance(),
+        "sqeuclidean (float32)": SquaredEuclideanDistance(dtype=np.float32),
+        "mahalanobis": MahalanobisDistance(),
+    }
+    centers = X[np.random.default_rng(random_state).choice(X.shape[0], len(distribution), replace=False)]
+
+    print("Distance backends:")
+    for name, distance_func in backends.items():
+        if hasattr(distance_func, "prepare"):
+            distance_func.prepare(X)
+        start_time = time.perf_counter()
+        for _ in range(repeats):
+            distance_func(X, centers)
+        call_time = (time.perf_counter() - start_time) / repeats
+
+        model = DeterministicAnnealing(
+            n_clusters=len(distribution), distribution=distribution, max_iters=3000, distance_func=distance_func,
+            np_seed=random_state
+        )
+        start_time = time.perf_counter()
+        model.fit(X)
+        fit_time = time.perf_counter() - start_time
+
+        print(f"{name}: {call_time * 1e6:.1f}us per distance call, fit in {fit_time:.2f}s ({model.n_iter_} iterations), "
+              f"allocation={np.bincount(model.labels_, minlength=len(distribution))}, inertia={model.inertia_:.4f}")
+    print()
+
+def benchmark_restarts(X, distribution, random_state=42, n_inits=(1, 2, 4, 8)):
+    """
+    Measure the wall-clock cost of running more seeded restarts of the deterministic annealing concurrently, and the
+    spread of the results across restarts, to decide how many restarts (n_init) are worth running
+    :param X: Scaled feature array
+    :param distribution: Target distribution of data points across the clusters
+    :param random_state: Random seed
+    :param n_inits: Numbers of restarts to benchmark
+    """
+    print("Restarts:")
+    for n_init in n_inits:
+        model = DeterministicAnnealing(
+            n_clusters=len(distribution), distribution=distribution, max_iters=3000, distance_func=cdist,
+            np_seed=random_state, n_init=n_init
+        )
+        start_time = time.perf_counter()
+        model.fit(X)
+        wall_time = time.perf_counter() - start_time
+
+        restart_inertias = model.restarts_["inertia"]
+        print(f"n_init={n_init}: {wall_time:.2f}s wall-clock ({np.sum(model.restarts_['fit_time']):.2f}s summed over "
+              f"restarts), inertia min={restart_inertias.min():.4f} max={restart_inertias.max():.4f} "
+              f"std={restart_inertias.std():.4f}, best restart={model.best_restart_}")
+    print()
+
+def benchmark_seeding(X, distribution, random_states=range(5), tol=1e-4):
+    """
+    Compare the seeding strategies of the initial cluster centers: the annealing iterations until the centers converge
+    (within tol), averaged over several random seeds, and the iterations saved compared to random seeding.
+    Without a tolerance, the size constraints are never satisfied on the CS outputs, so every fit runs max_iters
+    iterations whatever the seeding
+    :param X: Scaled feature array
+    :param distribution: Target distribution of data points across the clusters
+    :param random_states: Random seeds
+    :param tol: Convergence tolerance of the cluster centers
+    """
+    print(f"Seeding strategies (tol={tol}):")
+    random_seeding_iterations = None
+    for init in ["random", "k-means++", "pca", "quantile"]:
+        iterations = []
+        inertias = []
+        for random_state in random_states:
+            model = DeterministicAnnealing(
+                n_clusters=len(distribution), distribution=distribution, max_iters=3000, distance_func=cdist,
+                np_seed=random_state, tol=tol, init=init
+            )
+            model.fit(X)
+            iterations.append(model.n_iter_)
+            inertias.append(model.inertia_)
+
+        average_iterations = np.mean(iterations)
+        if random_seeding_iterations is None:
+            random_seeding_iterations = average_iterations
+        print(f"{init}: {average_iterations:.1f} iterations on average (min={np.min(iterations)}, "
+              f"max={np.max(iterations)}), {random_seeding_iterations - average_iterations:.1f} saved compared to "
+              f"random seeding, inertia={np.mean(inertias):.4f} (std={np.std(inertias):.4f})")
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Number of resamples drawn at a time: a chunk's index matrix is (BOOTSTRAP_CHUNK_SIZE, n_samples), and every chunk
+# has its own random generator, so the resamples do not depend on how the chunks are split across processes
+BOOTSTRAP_CHUNK_SIZE = 1000
+
+
+def get_bootstrap_positions(n_samples, n_resamples, seed_sequence):
+    """
+    Draw the positions of the samples of every resample, with replacement
+    :param n_samples: Number of samples (e.g. institutions)
+    :param n_resamples: Number of resamples
+    :param seed_sequence: NumPy SeedSequence of the random generator
+    :return: Index matrix of shape (n_resamples, n_samples)
+    """
+    return np.random.default_rng(seed_sequence).integers(0, n_samples, size=(n_resamples, n_samples))
+
+def bootstrap_chunk(statistics_func, arrays, n_resamples, seed_sequence):
+    """
+    Compute the statistics of a chunk of resamples. Every array is indexed by the same index matrix, so its samples are
+    resampled together (e.g. the predicted and actual percentages of an institution)
+    :param statistics_func: Function of the resampled arrays, of shape (n_resamples, n_samples, ...), returning a
+    hash-map of statistic name to array of n_resamples values (or of shape (n_resamples, ...))
+    :param arrays: List of NumPy arrays with the samples along the first axis
+    :param n_resamples: Number of resamples in the chunk
+    :param seed_sequence: NumPy SeedSequence of the chunk's random generator
+    :return: Hash-map of statistic name to the values of the chunk's resamples
+    """
+    positions = get_bootstrap_positions(len(arrays[0]), n_resamples, seed_sequence)
+    return statistics_func(*[array[positions] for array in arrays])
+
+def bootstrap(statistics_func, arrays, n_resamples=10000, random_state=42, n_jobs=1):
+    """
+    Bootstrap statistics: resample the samples with replacement n_resamples times, and compute the statistics of every
+    resample. The resamples are drawn as index matrices, in chunks of BOOTSTRAP_CHUNK_SIZE, computed in parallel
+    processes if n_jobs > 1 (statistics_func must then be defined at the top level of a module)
+    :param statistics_func: Function of the resampled arrays, see bootstrap_chunk
+    :param arrays: List of NumPy arrays with the samples along the first axis, all of the same length
+    :param n_resamples: Number of resamples (at least 1)
+    :param random_state: Random seed - the same seed gives the same resamples whatever n_jobs
+    :param n_jobs: Number of processes
+    :return: Hash-map of statistic name to the array of its n_resamples bootstrap values
+    """
+    if n_resamples < 1:
+        raise ValueError(f"The number of resamples must be at least 1, got {n_resamples}")
+
+    arrays = [np.asarray(array) for array in arrays]
+    assert all(len(array) == len(arrays[0]) for array in arrays)
+
+    chunk_sizes = [
+        min(BOOTSTRAP_CHUNK_SIZE, n_resamples - chunk_start) for chunk_start in range(0, n_resamples, BOOTSTRAP_CHUNK_SIZE)
+    ]
+    seed_sequences = np.random.SeedSequence(random_state).spawn(len(chunk_sizes))
+    chunk_args = [statistics_func] * len(chunk_sizes), [arrays] * len(chunk_sizes), chunk_sizes, seed_sequences
+
+    if n_jobs > 1 and len(chunk_sizes) > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            chunks = list(executor.map(bootstrap_chunk, *chunk_args))
+    else:
+        chunks = list(map(bootstrap_chunk, *chunk_args))
+
+    return {statistic: np.concatenate([chunk[statistic] for chunk in chunks]) for statistic in chunks[0]}
+
+def get_confidence_intervals(estimates, bootstrap_values, confidence=0.95):
+    """
+    Percentile bootstrap confidence intervals of statistics
+    :param estimates: Hash-map of statistic name to its value on the original samples
+    :param bootstrap_values: Hash-map of statistic name to the array of its bootstrap values (see bootstrap)
+    :param confidence: Confidence level of the intervals
+    :return: DataFrame indexed by statistic, with columns estimate, std (bootstrap standard error), ci_low and ci_high
+    """
+    alpha = (1 - confidence) / 2
+
+    rows = {}
+    for statistic, estimate in estimates.items():
+        values = bootstrap_values[statistic]
+        ci_low, ci_high = np.nanquantile(values, [alpha, 1 - alpha])
+        rows[statistic] = {"estimate": estimate, "std": np.nanstd(values, ddof=1), "ci_low": ci_low, "ci_high": ci_high}
+
+    return pd.DataFrame.from_dict(rows, orient="index").rename_axis("metric")
@@ -1,8 +1,10 @@
 import numpy as np
-from math import log2, sqrt
-from sklearn.metrics import silhouette_score, davies_bouldin_score, calinski_harabasz_score, r2_score
+from sklearn.metrics import silhouette_score, davies_bouldin_score, calinski_harabasz_score
+
+from machine_learning.bootstrap import bootstrap, get_confidence_intervals
 
 # Internal indices - No external information, evaluate
+CLUSTER_EVALUATION_METRICS = ["silhouette_score", "davies_bouldin_score", "calinski_harabasz_score", "inertia", "bcss"]
 
 def get_cluster_evaluation_metrics(model, training_feature_array, predicted_training_labels):
     """
@@ -23,43 +25,32 @@ def get_cluster_evaluation_metrics(model, training_feature_array, predicted_trai
 
     return evaluation_metrics
 
-def update_total_evaluation_metrics(total_evaluation_metrics, cluster_evaluation_metrics):
+def compute_cluster_evaluation_metrics(fold_metrics_summary):
     """
-    Update the hash-map storing the sum of all internal clustering indices of all runs so far by adding the values
-    of the internal indices from the current run.
+    Log the final internal cluster indices: the indices averaged over all folds, with the bootstrap confidence interval
+    of the average
 
-    :param total_evaluation_metrics: Hash-map containing the sum of all internal clustering indices of runs so far
-    :param cluster_evaluation_metrics: Hash-map containing the internal clustering indices of the current run (fold)
-    :return: Updated hash-map containing the sum of all internal clustering indices (with current run's indices added)
+    :param fold_metrics_summary: Summary of the metrics of all folds (runs), see FoldMetrics.summarise in fold_metrics.py
     """
-    total_evaluation_metrics["total_silhouette_score"] += cluster_evaluation_metrics["silhouette_score"]
-    total_evaluation_metrics["total_davies_bouldin_score"] += cluster_evaluation_metrics["davies_bouldin_score"]
-    total_evaluation_metrics["total_calinski_harabasz_score"] += cluster_evaluation_metrics["calinski_harabasz_score"]
-    total_evaluation_metrics["total_inertia"] += cluster_evaluation_metrics["inertia"]
-    total_evaluation_metrics["total_bcss"] += cluster_evaluation_metrics["bcss"]
-
-    return total_evaluation_metrics
+    print("Internal indices - quantify effectiveness of clustering structure")
+    for metric, metric_name in [
+        ("silhouette_score", "Silhouette Score"),
+        ("davies_bouldin_score", "Davies Bouldin Score"),
+        ("calinski_harabasz_score", "Calinski Harabasz Score"),
+        ("inertia", "Within-Cluster Sum of Squares (Inertia)"),
+        ("bcss", "Between-Cluster Sum of Squares")
+    ]:
+        print(f"Average {metric_name}: {format_metric_summary(fold_metrics_summary.loc[metric])}")
+    print()
 
-def compute_cluster_evaluation_metrics(total_evaluation_metrics, total_folds):
+def format_metric_summary(metric_summary, unit=""):
     """
-    Compute the final internal cluster indices by averaging the indices over all folds
-
-    :param total_evaluation_metrics: Hash-map containing the sum of all internal clustering indices of runs so far
-    :param total_folds: Total number of folds (runs) where a clustering model was built and evaluated
+    Format the average of a metric over all folds with its confidence interval, e.g. "0.4215 (CI: 0.3981 - 0.4452)"
+    :param metric_summary: Row of the summary of the metrics of all folds (mean, ci_low and ci_high)
+    :param unit: Unit appended to the average, e.g. " bits"
+    :return: Formatted string
     """
-    average_silhouette_score = total_evaluation_metrics["total_silhouette_score"] / total_folds
-    average_davies_bouldin_score = total_evaluation_metrics["total_davies_bouldin_score"] / total_folds
-    average_calinski_harabasz_score = total_evaluation_metrics["total_calinski_harabasz_score"] / total_folds
-    average_inertia = total_evaluation_metrics["total_inertia"] / total_folds
-    average_bcss = total_evaluation_metrics["total_bcss"] / total_folds
-
-    print("Internal indices - quantify effectiveness of clustering structure")
-    print(f"Average Silhouette Score: {average_silhouette_score:.4f}")
-    print(f"Average Davies Bouldin Score: {average_davies_bouldin_score:.4f}")
-    print(f"Average Calinski Harabasz Score: {average_calinski_harabasz_score:.4f}")
-    print(f"Average Within-Cluster Sum of Squares (Inertia): {average_inertia:.4f}")
-    print(f"Average Between-Cluster Sum of Squares: {average_bcss:.4f}")
-    print()
+    return f"{metric_summary['mean']:.4f}{unit} (CI: {metric_summary['ci_low']:.4f} - {metric_summary['ci_high']:.4f})"
 
 # Regression metrics
 
@@ -67,7 +58,8 @@ def compute_clustering_accuracy(
         actual_high_scoring_output_percentages,
         predicted_high_scoring_output_percentages,
         actual_low_scoring_output_percentage,
-        predicted_low_scoring_output_percentage
+        predicted_low_scoring_output_percentage,
+        confidence_intervals=None
     ):
     """
     Compute regression metrics by comparing the actual again the predicted number of high scoring outputs of the university
@@ -77,49 +69,125 @@ def compute_clustering_accuracy(
     :param predicted_high_scoring_output_percentages: Array of the predicted number of high scoring outputs of the university used as test-set
     :param actual_low_scoring_output_percentage: Array of the actual number of low scoring outputs of the university used as test-set
     :param predicted_low_scoring_output_percentage: Array of the predicted number of low scoring outputs of the university used as test-set
+    :param confidence_intervals: Bootstrap confidence intervals of the metrics printed with them (see
+    bootstrap_accuracy_metrics), None to only print the metrics
+    :return: Hash-map containing the regression metrics: mae, rmse, mape and r2
+    """
+    regression_metrics = get_regression_metrics(
+        np.column_stack([actual_high_scoring_output_percentages, actual_low_scoring_output_percentage]),
+        np.column_stack([predicted_high_scoring_output_percentages, predicted_low_scoring_output_percentage])
+    )
+
+    def format_regression_metric(metric):
+        if confidence_intervals is None:
+            return f"{regression_metrics[metric]:.4f}"
+        return f"{regression_metrics[metric]:.4f} (CI: {confidence_intervals.loc[metric, 'ci_low']:.4f} - {confidence_intervals.loc[metric, 'ci_high']:.4f})"
+
+    print("Regression Scores - compare percentage of predicted and actual high scoring outputs")
+    # Lower is better
+    print(f"Mean Absolute Error: {format_regression_metric('mae')}")
+    print(f"Root Mean Squared Error: {format_regression_metric('rmse')}")
+    print(f"Mean Absolute Percentage Error: {format_regression_metric('mape')}")
+
+    # [-inf, 1] => 1 means Perfect predictions.
+    # 0 means no relation at all between predicted and actual values
+    # Higher is better
+    print(f"R^2 score: {format_regression_metric('r2')}")
+    print()
+
+    return regression_metrics
+
+def get_accuracy_metrics(actual_percentages, predicted_percentages):
+    """
+    Compute the accuracy metrics of the cross-validation: the regression metrics of the percentages of high scoring
+    outputs, and the divergence metrics averaged over the folds. Used as the statistics of the bootstrap
+    :param actual_percentages: Array of shape (..., n_folds, 2) of the actual percentages of high and low scoring outputs
+    :param predicted_percentages: Array of the same shape of the predicted percentages of high and low scoring outputs
+    :return: Hash-map of metric name (mae, rmse, mape, r2, kl_divergence, js_divergence, tvd) to array of shape (...)
+    """
+    accuracy_metrics = get_regression_metrics(actual_percentages, predicted_percentages)
+
+    divergence_metrics = get_batch_divergence_metrics(
+        np.asarray(predicted_percentages, dtype=float) / 100, np.asarray(actual_percentages, dtype=float) / 100
+    )
+    for metric, values in divergence_metrics.items():
+        accuracy_metrics[metric] = np.mean(values, axis=-1)
+
+    return accuracy_metrics
+
+def bootstrap_accuracy_metrics(
+        actual_percentages, predicted_percentages, n_resamples=10000, confidence=0.95, random_state=42, n_jobs=1
+):
+    """
+    Bootstrap confidence intervals of the accuracy metrics of the cross-validation, resampling the institutions (folds)
+    with replacement: every metric printed by compute_clustering_accuracy and compute_divergence_metrics is computed on
+    every resample at once, from (n_resamples, n_folds, 2) arrays of resampled percentages
+    :param actual_percentages: Array of shape (n_folds, 2) of the actual percentages of high and low scoring outputs
+    :param predicted_percentages: Array of shape (n_folds, 2) of the predicted percentages of high and low scoring outputs
+    :param n_resamples: Number of resamples of the institutions
+    :param confidence: Confidence level of the intervals
+    :param random_state: Random seed of the resamples
+    :param n_jobs: Number of processes the resamples are split across
+    :return: DataFrame indexed by metric, with columns estimate, std (bootstrap standard error), ci_low and ci_high
+    """
+    actual_percentages = np.asarray(actual_percentages, dtype=float)
+    predicted_percentages = np.asarray(predicted_percentages, dtype=float)
+
+    bootstrap_values = bootstrap(
+        get_accuracy_metrics, [actual_percentages, predicted_percentages], n_resamples, random_state, n_jobs
+    )
+    return get_confidence_intervals(
+        get_accuracy_metrics(actual_percentages, predicted_percentages), bootstrap_values, confidence
+    )
+
+def get_regression_metrics(actual_percentages, predicted_percentages):
     """
+    Compute the regression metrics comparing the actual and predicted percentages of high scoring outputs over all folds,
+    for any number of runs at once (e.g. the runs of a sweep of features or seeds)
 
-    actual_high = np.array(actual_high_scoring_output_percentages)
-    predicted_high = np.array(predicted_high_scoring_output_percentages)
+    :param actual_percentages: Array of shape (..., n_folds, 2) of the actual percentages of high and low scoring outputs
+    of every fold's test university
+    :param predicted_percentages: Array of the same shape of the predicted percentages of high and low scoring outputs
+    :return: Hash-map of the regression metrics (mae, rmse, mape, r2), each an array of shape (...) - a float for one run
+    """
+    actual_percentages = np.asarray(actual_percentages, dtype=float)
+    predicted_percentages = np.asarray(predicted_percentages, dtype=float)
+    actual_high, actual_low = actual_percentages[..., 0], actual_percentages[..., 1]
+    predicted_high, predicted_low = predicted_percentages[..., 0], predicted_percentages[..., 1]
+
+    errors = actual_high - predicted_high
 
     # Mean Absolute Error
-    mae = np.mean(np.abs(actual_high - predicted_high))
+    mae = np.mean(np.abs(errors), axis=-1)
 
     # Root Mean Squared Error
-    rmse = np.sqrt(np.mean((actual_high - predicted_high) ** 2))
+    rmse = np.sqrt(np.mean(errors ** 2, axis=-1))
 
     # Mean Absolute Percentage Error
-    # In cases where the actual number of high scoring outputs is zero, compare using low scoring outputs instead
-    mape_values = []
-
-    predictions = len(predicted_high_scoring_output_percentages)
-    for prediction in range(predictions):
-        # To avoid dividing by 0, if the actual high scoring percentage is 0, use the low scoring percentages instead.
-        if actual_high_scoring_output_percentages[prediction] == 0:
-            mape_values.append(
-                abs((actual_low_scoring_output_percentage[prediction] - predicted_low_scoring_output_percentage[prediction]) / actual_low_scoring_output_percentage[prediction]) * 100
-            )
-        else:
-            mape_values.append(
-                abs((actual_high_scoring_output_percentages[prediction] - predicted_high_scoring_output_percentages[prediction]) / actual_high_scoring_output_percentages[prediction]) * 100
-            )
-
-    mape = np.mean(mape_values)
+    # To avoid dividing by 0, if the actual high scoring percentage is 0, use the low scoring percentages instead.
+    is_actual_high_zero = actual_high == 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        percentage_errors = np.where(
+            is_actual_high_zero,
+            np.abs((actual_low - predicted_low) / actual_low),
+            np.abs(errors / actual_high)
+        ) * 100
+    mape = np.mean(percentage_errors, axis=-1)
 
     # R^2 Score (Coefficient of Determination) - quantify how well the predictions fit the actual values
-    r2 = r2_score(actual_high_scoring_output_percentages, predicted_high_scoring_output_percentages)
+    # As in Scikit-learn's r2_score: when the actual values are constant, R^2 is 1 for perfect predictions and 0 otherwise
+    residual_sum_of_squares = np.sum(errors ** 2, axis=-1)
+    total_sum_of_squares = np.sum((actual_high - np.mean(actual_high, axis=-1, keepdims=True)) ** 2, axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r2 = np.where(
+            total_sum_of_squares != 0,
+            1 - residual_sum_of_squares / total_sum_of_squares,
+            np.where(residual_sum_of_squares == 0, 1.0, 0.0)
+        )
 
-    print("Regression Scores - compare percentage of predicted and actual high scoring outputs")
-    # Lower is better
-    print(f"Mean Absolute Error: {mae:.4f}")
-    print(f"Root Mean Squared Error: {rmse:.4f}")
-    print(f"Mean Absolute Percentage Error: {mape:.4f}")
-
-    # [-inf, 1] => 1 means Perfect predictions.
-    # 0 means no relation at all between predicted and actual values
-    # Higher is better
-    print(f"R^2 score: {r2:.4f}")
-    print()
+    regression_metrics = {"mae": mae, "rmse": rmse, "mape": mape, "r2": r2}
+    # A single run returns floats
+    return {metric: value.item() if np.ndim(value) == 0 else value for metric, value in regression_metrics.items()}
 
 # Divergence metrics:
 
@@ -138,38 +206,37 @@ def get_divergence_metrics(predicted_distribution, actual_distribution):
 
     return divergence_metrics
 
-def update_total_divergence_metrics(total_divergence_metrics, divergence_metrics):
+def compute_divergence_metrics(fold_metrics_summary):
     """
-    Update the hash-map storing the sum of all divergence of all runs so far by adding the values of the divergence metrics
-    the current run (fold)
+    Compute and print the overall divergence metrics between the probability distributions of
+    the actual and the predicted high- and low-scoring output counts by averaging the metrics over all folds, with the
+    bootstrap confidence interval of the average
 
-    :param total_divergence_metrics: Hash-map containing the sum of all divergence metrics of runs so far
-    :param divergence_metrics: Hash-map containing the divergence metrics of the current run (fold)
-    :return:  Updated hash-map containing the sum of all divergence metrics (with current run's divergence metrics added)
+    :param fold_metrics_summary: Summary of the metrics of all folds (runs), see FoldMetrics.summarise in fold_metrics.py
+    :return: Hash-map containing the divergence metrics averaged over all folds
     """
-    total_divergence_metrics["total_kl_divergence"] += divergence_metrics["kl_divergence"]
-    total_divergence_metrics["total_js_divergence"] += divergence_metrics["js_divergence"]
-    total_divergence_metrics["total_tvd"] += divergence_metrics["tvd"]
+    print("Divergence Scores: quantify how the predicted high/low probability distribution differs from the actual distribution")
+    print(f"Average Kullback-Leibler Divergence of the predicted scores from actual scores: {format_metric_summary(fold_metrics_summary.loc['kl_divergence'], ' bits')}")
+    print(f"Average Jensen-Shannon Divergence between the predicted scores from actual scores: {format_metric_summary(fold_metrics_summary.loc['js_divergence'], ' bits')}")
+    print(f"Average Total Variation Distance: {format_metric_summary(fold_metrics_summary.loc['tvd'])}")
+    print()
 
-    return total_divergence_metrics
+    return {
+        metric: fold_metrics_summary.loc[metric, "mean"] for metric in ["kl_divergence", "js_divergence", "tvd"]
+    }
 
-def compute_divergence_metrics(total_divergence_metrics, total_folds):
+def get_batch_divergence_metrics(predicted_distributions, actual_distributions):
     """
-    Compute and print the overall divergence metrics between the probability distributions of
-    the actual and the predicted high- and low-scoring output counts by averaging the metrics over all folds
-
-    :param total_divergence_metrics: Hash-map containing the sum of all divergence metrics of runs so far
-    :param total_folds: Total number of folds (runs) where a clustering model was built and evaluated
+    Compute the divergence metrics of all folds (of any number of runs) at once
+    :param predicted_distributions: Array of shape (..., n_folds, n_outcomes) of the predicted distributions
+    :param actual_distributions: Array of the same shape of the actual distributions
+    :return: Hash-map of the divergence metrics (kl_divergence, js_divergence, tvd), each an array of shape (..., n_folds)
     """
-    average_kl_divergence = total_divergence_metrics["total_kl_divergence"] / total_folds
-    average_js_divergence = total_divergence_metrics["total_js_divergence"] / total_folds
-    average_tvd = total_divergence_metrics["total_tvd"] / total_folds
-
-    print("Divergence Scores: quantify how the predicted high/low probability distribution differs from the actual distribution")
-    print(f"Average Kullback-Leibler Divergence of the predicted scores from actual scores: {average_kl_divergence:.4f} bits")
-    print(f"Average Jensen-Shannon Divergence between the predicted scores from actual scores: {average_js_divergence:.4f} bits")
-    print(f"Average Total Variation Distance: {average_tvd:.4f}")
-    print()
+    return {
+        "kl_divergence": batch_kl_divergence(predicted_distributions, actual_distributions),
+        "js_divergence": batch_js_divergence(predicted_distributions, actual_distributions),
+        "tvd": batch_total_variation_distance(predicted_distributions, actual_distributions)
+    }
 
 def kl_divergence(prob_distribution_a, prob_distribution_b):
     """
@@ -185,19 +252,25 @@ def kl_divergence(prob_distribution_a, prob_distribution_b):
 
     Divergence of the predicted from actual: A || B
     """
-    possible_outcomes = len(prob_distribution_a)
+    return float(batch_kl_divergence(prob_distribution_a, prob_distribution_b))
+
+def batch_kl_divergence(prob_distributions_a, prob_distributions_b):
+    """
+    Compute the Kullback-Leibler (KL) Divergence of every pair of probability distributions at once, see kl_divergence
+    :param prob_distributions_a: Array of shape (..., n_outcomes) of probability distributions (predicted)
+    :param prob_distributions_b: Array of the same shape of probability distributions (actual)
+    :return: Array of shape (...) of the Kullback-Leibler Divergences
+    """
+    prob_distributions_a = np.asarray(prob_distributions_a, dtype=float)
+    prob_distributions_b = np.asarray(prob_distributions_b, dtype=float)
 
     # Add small epsilon to avoid division by zero or ln(0)
     epsilon = 1e-8 # 10 ^ -8 = 0.00000001
 
-    total_kl_divergence = 0
-    for i in range(possible_outcomes):
-        total_kl_divergence += prob_distribution_a[i] * log2(
-            prob_distribution_a[i] / (prob_distribution_b[i] + epsilon) + epsilon
-        )
     # first e to prevent division by 0, second one prevents case where numerator is 0 and we get ln(0) which is undefined
-
-    return total_kl_divergence
+    return np.sum(
+        prob_distributions_a * np.log2(prob_distributions_a / (prob_distributions_b + epsilon) + epsilon), axis=-1
+    )
 
 # calculate the js divergence - symmetric
 def js_divergence(prob_distribution_a, prob_distribution_b):
@@ -207,10 +280,19 @@ def js_divergence(prob_distribution_a, prob_distribution_b):
     :param prob_distribution_b: Another probability distribution (actual) - includes probability of a document being high-scoring and low-scoring
     :return: Jensen-Shannon Divergence between the two probability distributions
     """
-    prob_distribution_a = np.array(prob_distribution_a)
-    prob_distribution_b = np.array(prob_distribution_b)
-    m = 0.5 * (prob_distribution_a + prob_distribution_b)
-    return 0.5 * kl_divergence(prob_distribution_a, m) + 0.5 * kl_divergence(prob_distribution_b, m)
+    return float(batch_js_divergence(prob_distribution_a, prob_distribution_b))
+
+def batch_js_divergence(prob_distributions_a, prob_distributions_b):
+    """
+    Compute the Jensen-Shannon (JS) Divergence of every pair of probability distributions at once, see js_divergence
+    :param prob_distributions_a: Array of shape (..., n_outcomes) of probability distributions (predicted)
+    :param prob_distributions_b: Array of the same shape of probability distributions (actual)
+    :return: Array of shape (...) of the Jensen-Shannon Divergences
+    """
+    prob_distributions_a = np.asarray(prob_distributions_a, dtype=float)
+    prob_distributions_b = np.asarray(prob_distributions_b, dtype=float)
+    m = 0.5 * (prob_distributions_a + prob_distributions_b)
+    return 0.5 * batch_kl_divergence(prob_distributions_a, m) + 0.5 * batch_kl_divergence(prob_distributions_b, m)
 
 def total_variation_distance(prob_distribution_a, prob_distribution_b):
     """
@@ -220,6 +302,15 @@ def total_variation_distance(prob_distribution_a, prob_distribution_b):
     :param prob_distribution_b: Another probability distribution (actual) - includes probability of a document being high-scoring and low-scoring
     :return: Total Variation Distance between the two probability distributions
     """
-    prob_distribution_a = np.array(prob_distribution_a)
-    prob_distribution_b = np.array(prob_distribution_b)
-    return 0.5 * np.sum(np.abs(prob_distribution_a - prob_distribution_b))
+    return float(batch_total_variation_distance(prob_distribution_a, prob_distribution_b))
+
+def batch_total_variation_distance(prob_distributions_a, prob_distributions_b):
+    """
+    Compute the total variation distance of every pair of probability distributions at once, see total_variation_distance
+    :param prob_distributions_a: Array of shape (..., n_outcomes) of probability distributions (predicted)
+    :param prob_distributions_b: Array of the same shape of probability distributions (actual)
+    :return: Array of shape (...) of the total variation distances
+    """
+    prob_distributions_a = np.asarray(prob_distributions_a, dtype=float)
+    prob_distributions_b = np.asarray(prob_distributions_b, dtype=float)
+    return 0.5 * np.sum(np.abs(prob_distributions_a - prob_distributions_b), axis=-1)
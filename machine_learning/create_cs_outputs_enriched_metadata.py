@@ -1,32 +1,49 @@
 import os
+import numpy as np
 import pandas as pd
 
-from utils.constants import DATASETS_DIR, PROCESSED_DIR, CS_OUTPUTS_METADATA, REFINED_DIR, \
-    CS_JOURNAL_METRICS, CS_OUTPUT_METRICS, CS_CITATION_METRICS, MACHINE_LEARNING_DIR, CS_OUTPUTS_COMPLETE_METADATA
-
-def main():
+from utils.REF2021_Outputs import get_outputs_metadata
+from utils.constants import DATASETS_DIR, REFINED_DIR, \
+    CS_JOURNAL_METRICS, CS_OUTPUT_METRICS, CS_CITATION_METRICS, MACHINE_LEARNING_DIR, CS_OUTPUTS_COMPLETE_METADATA, \
+    CS_UOA, OUTPUTS_COMPLETE_METADATA_BY_UOA, OUTPUTS_COMPLETE_METADATA_VERSIONS
+from utils.partitions import write_uoa_partition, get_uoa_partition_path, uoa_partition_exists
+from utils.issn import to_issn_keys, normalise_issn
+from utils.instrumentation import span, increment_counter, log_instrumentation_summary
+from utils.versioned_dataset import get_key_hashes, get_changed_keys, get_changed_rows, read_version, \
+    read_key_hashes, write_version
+from utils.join import factorise_keys, get_join_positions, compose_join_positions, take_join, left_join_many_to_one
+
+# Number of latest versions of the enriched metadata whose data is kept, older versions only keep their delta
+VERSIONS_KEPT = 5
+
+def main(uoas=(CS_UOA,), full_rebuild=False):
     """
     ETL to create dataframe of CS outputs with complete metadata: (Include all available features - that are sensible)
     Metadata includes Journal metrics, citation counts, and field-normalised output performance metrics.
 
     This file contains all possible metadata about a given output.
     It can be read to create different variations of parameters to feed the ML model =>  feature engineering file.
+    :param uoas: Units of assessment to create the enriched metadata of, each written to its own partition (uoa=<number>)
+    :param full_rebuild: Recompute the enriched metadata of all outputs, rather than only the outputs whose journal,
+    citation or output metrics changed since the previous version
     """
-    cs_outputs_enriched_metadata = create_cs_outputs_enriched_metadata()
-    write_cs_outputs_enriched_metadata(cs_outputs_enriched_metadata)
+    outputs_enriched_metadata_path = get_outputs_enriched_metadata_path()
 
+    for uoa in uoas:
+        outputs_enriched_metadata, manifest = update_outputs_enriched_metadata(uoa, full_rebuild)
 
-def get_cs_outputs_metadata():
-    """
-    Load a file containing metadata of outputs submitted to the CS UoA into a DataFrame
-    :return: DataFraming containing metadata of outputs submitted to the CS UoA
-    """
-    cs_outputs_metadata_path = os.path.join(
-        os.path.dirname(__file__), "..", DATASETS_DIR, PROCESSED_DIR, CS_OUTPUTS_METADATA
-    )
+        # The latest enriched metadata is only rewritten when a new version was built
+        if manifest is None and uoa_partition_exists(outputs_enriched_metadata_path, uoa):
+            continue
+
+        with span("write_outputs_enriched_metadata", uoa=uoa, rows_out=len(outputs_enriched_metadata)):
+            write_outputs_enriched_metadata(outputs_enriched_metadata, uoa)
+
+            if uoa == CS_UOA:
+                write_cs_outputs_enriched_metadata(outputs_enriched_metadata)
+
+    log_instrumentation_summary()
 
-    cs_outputs_metadata = pd.read_csv(cs_outputs_metadata_path)
-    return cs_outputs_metadata
 
 def filter_cs_metadata_fields(cs_outputs_metadata):
     """
@@ -104,47 +121,93 @@ def enrich_metadata_with_journal_metrics(cs_outputs_metadata):
 
     cs_journal_metrics_df = load_cs_journal_metrics_df()
 
-    cs_outputs_metadata_journal_metrics = cs_outputs_metadata.merge(
+    # Join on the canonical ISSN (NNNN-NNNC) of both sides, as a categorical key sharing the same categories
+    outputs_issn_key, journal_metrics_issn_key = to_issn_keys(cs_outputs_metadata["ISSN"], cs_journal_metrics_df["ISSN"])
+
+    # A journal can be listed under several spellings of its ISSN (e.g. 0004-3702 and 00043702): keep one record per
+    # canonical ISSN, so the join does not duplicate outputs
+    cs_journal_metrics_df = deduplicate_journal_metrics(cs_journal_metrics_df.assign(ISSN=journal_metrics_issn_key))
+
+    # The categorical ISSN keys are joined on their codes: each ISSN is listed once in the journal metrics (m:1 join)
+    cs_outputs_metadata_journal_metrics = left_join_many_to_one(
+        cs_outputs_metadata.assign(ISSN=outputs_issn_key),
         cs_journal_metrics_df,
-        on="ISSN",  # Join on ISSN column
-        how="left"  # Keep all rows from cs_outputs_metadata i.e. all outputs
+        on="ISSN",  # Join on ISSN column, keep all rows from cs_outputs_metadata i.e. all outputs
+        right_name="journal metrics"
     )
+    # Back to plain ISSN strings, so the written metadata keeps its schema
+    cs_outputs_metadata_journal_metrics["ISSN"] = cs_outputs_metadata_journal_metrics["ISSN"].astype(object)
 
     return cs_outputs_metadata_journal_metrics
 
+def deduplicate_journal_metrics(cs_journal_metrics_df):
+    """
+    Keep one record of journal metrics per canonical ISSN. The records of an ISSN are merged, keeping the first non-null
+    value of every metric, so a spelling of the ISSN missing a metric does not hide the value of another spelling. The
+    ISSNs whose records disagree (different non-null values of a metric) are logged and counted, and the value of
+    their first record is kept
+    :param cs_journal_metrics_df: DataFrame of journal metrics, with canonical ISSNs
+    :return: DataFrame of journal metrics with one record per ISSN, in the order the ISSNs first appear
+    """
+    metric_columns = [column for column in cs_journal_metrics_df.columns if column != "ISSN"]
+    grouped = cs_journal_metrics_df.groupby("ISSN", sort=False, observed=True, dropna=False)
+
+    distinct_values = grouped[metric_columns].nunique()
+    conflicting_values = distinct_values[(distinct_values > 1).any(axis=1)]
+    if not conflicting_values.empty:
+        conflicting_metrics = {
+            str(issn): [column for column in metric_columns if n_values[column] > 1]
+            for issn, n_values in conflicting_values.iterrows()
+        }
+        print(f"Journal metrics disagree between the records of {len(conflicting_metrics)} ISSNs, the first record's "
+              f"values are kept: {conflicting_metrics}")
+        increment_counter("journal_metrics_conflicts", len(conflicting_metrics))
+
+    return grouped[metric_columns].first().reset_index()[cs_journal_metrics_df.columns]
+
 def enrich_metadata_with_output_metrics(cs_outputs_metadata):
     """
     Enrich CS outputs by adding new columns to store output metrics - citation counts and field-normalised performance metrics
     :param cs_outputs_metadata: CS outputs DataFrame without output metrics
     :return: CS outputs DataFrame with new columns for output metrics
     """
-    cs_citation_metadata_df = load_cs_citation_metadata_df()  # merge using DOI, and get scopus ID
+    cs_citation_metadata_df = load_cs_citation_metadata_df()  # join using DOI, and get scopus ID
+    cs_output_metrics_df = load_cs_output_metrics_df()  # join using scopus ID
 
-    cs_outputs_metadata_citation_metrics_df = cs_outputs_metadata.merge(
-        cs_citation_metadata_df,
-        on="DOI",  # Join on DOI column
-        how="left" # Keep all rows from cs_outputs_metadata i.e. all outputs
+    # Position of the citation metrics of every output (DOI is listed once in the citation metrics: m:1 join)
+    citation_positions = get_join_positions(
+        *factorise_keys(cs_outputs_metadata["DOI"], cs_citation_metadata_df["DOI"]), "citation metrics"
     )
 
-    cs_output_metrics_df = load_cs_output_metrics_df()
+    # Position of the output metrics of every citation metrics row. The Scopus ID is resolved once on the citation
+    # metrics, and chained with the citation positions, rather than hashed again for every output
+    citation_output_metrics_positions = get_join_positions(
+        *factorise_keys(cs_citation_metadata_df["scopus_id"], cs_output_metrics_df["scopus_id"]), "output metrics"
+    )
+    output_metrics_positions = compose_join_positions(citation_positions, citation_output_metrics_positions)
 
-    cs_outputs_metadata_citation_output_metrics_df = cs_outputs_metadata_citation_metrics_df.merge( # merge using scopus id
-        cs_output_metrics_df,
-        on="scopus_id", # Join on Scopus ID
-        how="left"      # Keep all rows from cs_outputs_metadata_citation_metrics_df i.e. all outputs (with citation metrics)
+    # Keep all rows from cs_outputs_metadata i.e. all outputs
+    cs_outputs_metadata_citation_metrics_df = take_join(
+        cs_outputs_metadata, cs_citation_metadata_df, citation_positions, on="DOI", right_name="citation metrics"
+    )
+    cs_outputs_metadata_citation_output_metrics_df = take_join(
+        cs_outputs_metadata_citation_metrics_df, cs_output_metrics_df, output_metrics_positions, on="scopus_id",
+        right_name="output metrics"
     )
 
     return cs_outputs_metadata_citation_output_metrics_df
 
 
-def create_cs_outputs_enriched_metadata():
+def create_cs_outputs_enriched_metadata(uoa=CS_UOA):
     """
     Create the CS outputs enrich metadata parquet file by enhancing the CS outputs metadata file.
     Drop all unnecessary columns, and add new columns for journal and citation metrics
+    :param uoa: Unit of assessment whose outputs are enriched (CS by default). The journal and output metrics files
+    are shared by all UoAs (keyed by ISSN, DOI and Scopus ID)
     :return: DataFrame with enriched output metadata that includes journal and output metrics
     """
-    # Load all CS outputs
-    cs_outputs_metadata = get_cs_outputs_metadata()
+    # Load all outputs of the UoA
+    cs_outputs_metadata = get_outputs_metadata(uoa)
 
     # Drop all unnecessary columns
     cs_outputs_metadata = filter_cs_metadata_fields(cs_outputs_metadata)
@@ -168,6 +231,140 @@ def write_cs_outputs_enriched_metadata(cs_outputs_enriched_metadata):
         engine='fastparquet'
     )
 
+def get_outputs_enriched_metadata_path():
+    """
+    Obtain the path of the enriched metadata of outputs, partitioned by UoA
+    :return: Path of the partitioned dataset's directory
+    """
+    return os.path.join(
+        os.path.dirname(__file__), "..", DATASETS_DIR, MACHINE_LEARNING_DIR, OUTPUTS_COMPLETE_METADATA_BY_UOA
+    )
+
+def write_outputs_enriched_metadata(outputs_enriched_metadata, uoa):
+    """
+    Persist the DataFrame containing the enriched metadata of outputs submitted to a UoA in its partition
+    :param outputs_enriched_metadata: DataFrame containing the enriched metadata of outputs submitted to the UoA
+    :param uoa: Unit of assessment number
+    """
+    write_uoa_partition(outputs_enriched_metadata, get_outputs_enriched_metadata_path(), uoa)
+
+def get_outputs_enriched_metadata_versions_path(uoa):
+    """
+    Obtain the path of the versioned dataset holding every version of the enriched metadata of a UoA's outputs
+    :param uoa: Unit of assessment number
+    :return: Path of the versioned dataset's directory, e.g. <...>/outputs_complete_metadata_versions/uoa=11
+    """
+    versions_path = os.path.join(
+        os.path.dirname(__file__), "..", DATASETS_DIR, MACHINE_LEARNING_DIR, OUTPUTS_COMPLETE_METADATA_VERSIONS
+    )
+    return get_uoa_partition_path(versions_path, uoa)
+
+def get_enrichment_key_hashes(outputs_metadata):
+    """
+    Hash every record the enriched metadata is built from: the outputs (keyed by their row), the journal metrics
+    (keyed by canonical ISSN), the citation metrics (keyed by DOI) and the output metrics (keyed by Scopus ID)
+    :param outputs_metadata: DataFrame of the outputs' metadata fields, with a range index
+    :return: Key hashes DataFrame (source, key, hash)
+    """
+    # As in the journal metrics join, the records of every canonical ISSN are merged
+    cs_journal_metrics_df = load_cs_journal_metrics_df()
+    cs_journal_metrics_df = deduplicate_journal_metrics(
+        cs_journal_metrics_df.assign(ISSN=normalise_issn(cs_journal_metrics_df["ISSN"]))
+    )
+
+    return pd.concat([
+        get_key_hashes(outputs_metadata.rename_axis("output_row").reset_index(), "output_row"),
+        get_key_hashes(cs_journal_metrics_df, "ISSN"),
+        get_key_hashes(load_cs_citation_metadata_df(), "DOI"),
+        get_key_hashes(load_cs_output_metrics_df(), "scopus_id")
+    ], ignore_index=True)
+
+def get_affected_outputs(outputs_metadata, previous_outputs_enriched_metadata, changed_keys):
+    """
+    Find the outputs whose enriched metadata must be recomputed: the changed outputs, and the outputs whose journal
+    (ISSN), citation metrics (DOI) or output metrics (Scopus ID of the previous version) changed
+    :param outputs_metadata: DataFrame of the outputs' metadata fields, with a range index
+    :param previous_outputs_enriched_metadata: Previous version of the enriched metadata (same outputs, same order)
+    :param changed_keys: Dictionary of source name to the set of its changed keys, from get_changed_keys
+    :return: NumPy boolean array, True for the affected outputs
+    """
+    is_affected = (
+        outputs_metadata.index.astype(str).isin(changed_keys.get("output_row", set())) |
+        normalise_issn(outputs_metadata["ISSN"]).isin(changed_keys.get("ISSN", set())) |
+        outputs_metadata["DOI"].isin(changed_keys.get("DOI", set())) |
+        previous_outputs_enriched_metadata["scopus_id"].isin(changed_keys.get("scopus_id", set()))
+    )
+    return np.asarray(is_affected, dtype=bool)
+
+def update_outputs_enriched_metadata(uoa=CS_UOA, full_rebuild=False):
+    """
+    Incrementally rebuild the enriched metadata of a UoA's outputs (change data capture). The records of the outputs
+    and of the journal, citation and output metrics are hashed and compared with the hashes of the previous version:
+    only the outputs affected by a changed record are enriched again, and the other outputs are kept from the previous
+    version. A new version is written with its manifest, and a delta file of the rows that changed (with their row
+    number in the output_row column). The enriched metadata is built in full the first time, when outputs were added
+    or removed, or when its columns changed
+    :param uoa: Unit of assessment number
+    :param full_rebuild: Recompute the enriched metadata of all outputs
+    :return: Tuple of the enriched metadata of the UoA's outputs, and the manifest of the new version (None if nothing
+    changed since the previous version, which is returned)
+    """
+    versions_path = get_outputs_enriched_metadata_versions_path(uoa)
+    outputs_metadata = filter_cs_metadata_fields(get_outputs_metadata(uoa)).reset_index(drop=True)
+
+    with span("detect_changed_records", uoa=uoa):
+        key_hashes = get_enrichment_key_hashes(outputs_metadata)
+        changed_keys = get_changed_keys(read_key_hashes(versions_path), key_hashes)
+    n_changed_keys = {source: len(keys) for source, keys in changed_keys.items()}
+    print(f"Changed records since the previous version of UoA {uoa}: {n_changed_keys}")
+
+    previous_outputs_enriched_metadata = read_version(versions_path)
+
+    full_rebuild = full_rebuild or previous_outputs_enriched_metadata is None or \
+        len(previous_outputs_enriched_metadata) != len(outputs_metadata)
+
+    if full_rebuild:
+        with span("enrich_outputs", uoa=uoa, rows_in=len(outputs_metadata)):
+            outputs_enriched_metadata = enrich_cs_outputs_metadata(outputs_metadata)
+        is_affected = np.ones(len(outputs_metadata), dtype=bool)
+    else:
+        if not any(n_changed_keys.values()):
+            print(f"Enriched metadata of UoA {uoa} is up to date")
+            return previous_outputs_enriched_metadata, None
+
+        is_affected = get_affected_outputs(outputs_metadata, previous_outputs_enriched_metadata, changed_keys)
+        with span("enrich_outputs", uoa=uoa, rows_in=int(is_affected.sum())):
+            affected_outputs_enriched_metadata = enrich_cs_outputs_metadata(outputs_metadata[is_affected]) \
+                .set_axis(np.flatnonzero(is_affected))
+
+        if affected_outputs_enriched_metadata.columns.tolist() != previous_outputs_enriched_metadata.columns.tolist():
+            # A metrics file gained or lost columns: every output must be enriched again
+            return update_outputs_enriched_metadata(uoa, full_rebuild=True)
+
+        outputs_enriched_metadata = pd.concat([
+            previous_outputs_enriched_metadata[~is_affected], affected_outputs_enriched_metadata
+        ]).sort_index()
+
+    # The delta lists the rows whose enriched metadata changed (all rows of a full rebuild with other outputs)
+    is_changed = is_affected.copy()
+    if previous_outputs_enriched_metadata is not None and \
+            previous_outputs_enriched_metadata.columns.tolist() == outputs_enriched_metadata.columns.tolist() and \
+            len(previous_outputs_enriched_metadata) == len(outputs_enriched_metadata):
+        is_changed[is_affected] = get_changed_rows(
+            previous_outputs_enriched_metadata[is_affected], outputs_enriched_metadata[is_affected]
+        )
+    delta_df = outputs_enriched_metadata[is_changed].rename_axis("output_row").reset_index()
+
+    with span("write_version", uoa=uoa, rows_out=len(delta_df)):
+        manifest = write_version(
+            versions_path, outputs_enriched_metadata, delta_df, key_hashes, keep_versions=VERSIONS_KEPT,
+            full_rebuild=bool(full_rebuild), affected_rows=int(is_affected.sum()), changed_keys=n_changed_keys
+        )
+    print(f"Wrote version {manifest['version']} of the enriched metadata of UoA {uoa}: "
+          f"{manifest['affected_rows']} outputs enriched, {manifest['changed_rows']} changed")
+
+    return outputs_enriched_metadata, manifest
+
 
 if __name__ == "__main__":
     main()
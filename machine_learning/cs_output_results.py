@@ -3,7 +3,8 @@ import pandas as pd
 import matplotlib.pyplot as plt
 
 from utils.constants import DATASETS_DIR, RAW_DIR, CS_RESULTS, MACHINE_LEARNING_DIR, CS_OUTPUTS_COMPLETE_METADATA, \
-    FIGURES_DIR
+    FIGURES_DIR, CS_UOA, REF_RESULTS, OUTPUTS_COMPLETE_METADATA_BY_UOA
+from utils.partitions import uoa_partition_exists, read_uoa_partition
 
 
 def main():
@@ -24,16 +25,21 @@ def main():
 
     log_high_low_scoring_universities(enhanced_results_df)
 
-def get_ref_results():
+def get_ref_results(uoa=CS_UOA):
     """
     Load the REF CS Results file into a DataFrame
+    :param uoa: Unit of assessment whose results are loaded. The CS results are read from the CS Results file, the
+    results of other UoAs are filtered from the REF Results file of all UoAs
     :return: DataFrame of REF CS Results for all universities
     """
-    results_dataset_path = os.path.join(os.path.dirname(__file__), "..", DATASETS_DIR, RAW_DIR, CS_RESULTS)
+    results_file = CS_RESULTS if uoa == CS_UOA else REF_RESULTS
+    results_dataset_path = os.path.join(os.path.dirname(__file__), "..", DATASETS_DIR, RAW_DIR, results_file)
 
     try:
         # Load the Excel file, skipping the first 6 lines -> The 7th line will be used as the header
         df = pd.read_excel(results_dataset_path, skiprows=6)
+        if uoa != CS_UOA:
+            df = df[df['Unit of assessment number'] == uoa]
         return df
 
     except FileNotFoundError:
@@ -41,12 +47,13 @@ def get_ref_results():
     except Exception as e:
         print("An error occurred while reading the file:", str(e))
 
-def get_cs_output_results():
+def get_cs_output_results(uoa=CS_UOA):
     """
     Load the REF CS Results file into a DataFrame and obtain the REF CS Output Quality results DataFrame
+    :param uoa: Unit of assessment whose results are loaded (CS by default)
     :return: DataFrame of REF CS Output Quality Results for all universities.
     """
-    cs_results_df = get_ref_results()
+    cs_results_df = get_ref_results(uoa)
 
     cs_output_results_df = filter_ref_results_for_output_quality(cs_results_df)
     return cs_output_results_df
@@ -73,16 +80,26 @@ def log_university_count(cs_output_results_df): # Institution code (UKPRN)
     print(f"The total number of universities who have submitted CS outputs to REF2021: {university_count}")
     assert university_count == cs_output_results_df.shape[0]
 
-def get_cs_outputs_enriched_metadata():
+def get_cs_outputs_enriched_metadata(uoa=CS_UOA):
     """
     Load the file containing the enriched metadata of CS outputs including journal and output metrics into a DataFrame
+    :param uoa: Unit of assessment whose outputs are loaded, from its partition of the enriched metadata. The CS file
+    is read for the CS UoA if its partition has not been written
     :return: DataFrame containing the enriched metadata of CS outputs including journal and output metrics
     """
+    outputs_enriched_metadata_path = os.path.join(
+        os.path.dirname(__file__), "..", DATASETS_DIR, MACHINE_LEARNING_DIR, OUTPUTS_COMPLETE_METADATA_BY_UOA
+    )
     cs_outputs_enriched_metadata_path = os.path.join(
         os.path.dirname(__file__), "..", DATASETS_DIR, MACHINE_LEARNING_DIR, CS_OUTPUTS_COMPLETE_METADATA
     )
 
     try:
+        if uoa_partition_exists(outputs_enriched_metadata_path, uoa):
+            return read_uoa_partition(outputs_enriched_metadata_path, uoa)
+        if uoa != CS_UOA:
+            raise FileNotFoundError(f"Enriched metadata of unit of assessment {uoa} not found")
+
         cs_outputs_enriched_metadata = pd.read_parquet(cs_outputs_enriched_metadata_path, engine='fastparquet')
         return cs_outputs_enriched_metadata
 
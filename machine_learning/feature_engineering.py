@@ -5,7 +5,7 @@ import matplotlib.pyplot as plt
 from scipy.stats import skew
 
 from machine_learning.cs_output_results import get_cs_outputs_enriched_metadata
-from utils.constants import FIGURES_DIR
+from utils.constants import FIGURES_DIR, CS_UOA
 
 
 def main():
@@ -116,13 +116,14 @@ def log_transform_author_count(cs_outputs_enriched_metadata):
     df['log_transformed_authors'] = np.log1p(df['Number of additional authors'].fillna(0))
     return df
 
-def get_cs_outputs_df(features):
+def get_cs_outputs_df(features, uoa=CS_UOA):
     """
     Return the CS outputs enriched metadata with features engineered
     :param features: Features used to train the clustering models
+    :param uoa: Unit of assessment whose outputs are returned (CS by default)
     :return: CS outputs enriched metadata with features engineered
     """
-    cs_outputs_enriched_metadata = get_cs_outputs_enriched_metadata()
+    cs_outputs_enriched_metadata = get_cs_outputs_enriched_metadata(uoa)
 
     if "normalised_citations" in features:
         # Log transform, Year normalise
@@ -0,0 +1,243 @@
+import numpy as np
+import pandas as pd
+from scipy.stats import chi2, mannwhitneyu
+
+# Features compared between the high- and low-scoring clusters
+from machine_learning.high_low_output_comparison import CONTINUOUS_FEATURES, CATEGORICAL_FEATURES, BLANK_AS_NO_FEATURES
+
+# Number of label permutations drawn at a time: a chunk's matrix of permuted labels is (chunk size, n_outputs)
+PERMUTATION_CHUNK_SIZE = 250
+
+# Columns of the table of feature significance, one row per feature
+SIGNIFICANCE_COLUMNS = [
+    "feature", "feature_type", "n_high", "n_low", "high_mean", "low_mean", "test", "statistic", "p_value",
+    "permutation_p_value", "effect_size", "effect_size_measure"
+]
+
+
+def get_significance_features(outputs_df):
+    """
+    Encode the features compared between the clusters once per run, so every fold only selects its training outputs:
+    the continuous features as a matrix of values (missing values are NaN, and omitted from the tests), and the
+    categorical features as a matrix of indicators, one column per value of a feature (missing values have no
+    indicator). The values are the ones of the outputs, before the missing values of the clustering features are imputed
+    :param outputs_df: DataFrame of the outputs with the features (e.g. the enriched metadata of the CS outputs)
+    :return: Hash-map containing:
+        1. continuous_values: Array of shape (n_outputs, n_continuous_features)
+        2. indicators: Array of shape (n_outputs, n_values) of the values of the categorical features, grouped by feature
+        3. value_features: Array of the position in CATEGORICAL_FEATURES of the feature of every indicator column
+    """
+    indicators = []
+    value_features = []
+    for feature_position, feature in enumerate(CATEGORICAL_FEATURES):
+        values = outputs_df[feature]
+        if feature in BLANK_AS_NO_FEATURES:
+            values = values.astype(object).fillna('No')
+
+        # Missing values are coded -1, and are not indicated
+        codes, unique_values = pd.factorize(values, sort=False)
+        indicators.append(codes[:, None] == np.arange(len(unique_values)))
+        value_features.extend([feature_position] * len(unique_values))
+
+    return {
+        "continuous_values": outputs_df[CONTINUOUS_FEATURES].to_numpy(dtype=float),
+        "indicators": np.hstack(indicators).astype(float),
+        "value_features": np.array(value_features, dtype=int),
+    }
+
+def get_permuted_labels(is_high, n_permutations, rng):
+    """
+    Permute the cluster labels of the outputs, breaking any association between the features and the clusters
+    :param is_high: Boolean array, True for the outputs in the high-scoring cluster
+    :param n_permutations: Number of permutations
+    :param rng: NumPy random generator
+    :return: Array of shape (n_permutations, n_outputs), 1 for the outputs in the high-scoring cluster of a permutation
+    """
+    return rng.permuted(np.tile(is_high.astype(float), (n_permutations, 1)), axis=1)
+
+def get_mean_differences(values, is_high):
+    """
+    Compute the difference between the means of the high- and low-scoring outputs of every continuous feature, for one
+    or many labellings of the outputs at once (matrix multiplications of the labels with the values)
+    :param values: Array of shape (n_outputs, n_features), missing values are NaN
+    :param is_high: Array of shape (n_outputs,) or (n_labellings, n_outputs), 1 for the high-scoring outputs
+    :return: Array of shape (n_features,) or (n_labellings, n_features)
+    """
+    is_present = ~np.isnan(values)
+    present_values = np.where(is_present, values, 0)
+
+    high_sums = is_high @ present_values
+    high_counts = is_high @ is_present
+    low_sums = present_values.sum(axis=0) - high_sums
+    low_counts = is_present.sum(axis=0) - high_counts
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return high_sums / high_counts - low_sums / low_counts
+
+def get_chi_square_statistics(indicators, value_features, is_high):
+    """
+    Compute the chi-square statistic of the contingency table (values x clusters) of every categorical feature, for one
+    or many labellings of the outputs at once. Values that no output has do not contribute, and the statistic of a
+    feature without any value (e.g. a column left blank in the UoA) is NaN
+    :param indicators: Array of shape (n_outputs, n_values) of the values of the categorical features (see
+    get_significance_features)
+    :param value_features: Array of the position in CATEGORICAL_FEATURES of the feature of every indicator column
+    :param is_high: Array of shape (n_outputs,) or (n_labellings, n_outputs), 1 for the high-scoring outputs
+    :return: Array of shape (n_features,) or (n_labellings, n_features), one column per feature of
+    CATEGORICAL_FEATURES
+    """
+    # Matrix of shape (n_values, n_features) summing the columns of the values of every feature, so every feature of
+    # CATEGORICAL_FEATURES has a sum, including the features without indicator columns
+    feature_membership = (value_features[:, None] == np.arange(len(CATEGORICAL_FEATURES))).astype(float)
+
+    value_counts = indicators.sum(axis=0)
+    high_counts = is_high @ indicators
+    low_counts = value_counts - high_counts
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Outputs with a value of the feature, and the ones in the high-scoring cluster
+        feature_counts = value_counts @ feature_membership
+        feature_high_counts = high_counts @ feature_membership
+        feature_high_shares = (feature_high_counts / feature_counts)[..., value_features]
+
+        expected_high_counts = value_counts * feature_high_shares
+        expected_low_counts = value_counts * (1 - feature_high_shares)
+
+        contributions = (
+            np.where(expected_high_counts > 0, (high_counts - expected_high_counts) ** 2 / expected_high_counts, 0) +
+            np.where(expected_low_counts > 0, (low_counts - expected_low_counts) ** 2 / expected_low_counts, 0)
+        )
+    return np.where(feature_counts > 0, contributions @ feature_membership, np.nan)
+
+def get_permutation_p_values(exceedances, n_permutations, statistics):
+    """
+    Compute the p-values of permutation tests, counting the observed labelling as one of the permutations
+    :param exceedances: Number of permutations whose statistic is at least as extreme as the observed one, per feature
+    :param n_permutations: Number of permutations
+    :param statistics: Observed statistics, NaN when a feature cannot be tested (e.g. no values in a cluster)
+    :return: Array of p-values, NaN for the features that cannot be tested
+    """
+    return np.where(np.isnan(statistics), np.nan, (exceedances + 1) / (n_permutations + 1))
+
+def get_feature_significance(significance_features, positions, is_high, n_permutations=1000, random_state=42):
+    """
+    Test whether every feature differs between the outputs of the high- and low-scoring clusters of a fold: the
+    continuous features with the Mann-Whitney U test (effect size: rank-biserial correlation, positive when the
+    high-scoring outputs have larger values) and the categorical features with the chi-square test of independence
+    (effect size: Cramer's V). Every feature is also tested with a permutation test, of the difference of means or of
+    the chi-square statistic. The same matrix of permuted labels is used for all features
+    :param significance_features: Encoded features of the outputs (see get_significance_features)
+    :param positions: Positions of the fold's training outputs
+    :param is_high: Boolean array, True for the training outputs in the high-scoring cluster
+    :param n_permutations: Number of permutations of the labels
+    :param random_state: Random seed of the permutations
+    :return: DataFrame with one row per feature, with columns SIGNIFICANCE_COLUMNS
+    """
+    continuous_values = significance_features["continuous_values"][positions]
+    indicators = significance_features["indicators"][positions]
+    value_features = significance_features["value_features"]
+    is_high = np.asarray(is_high, dtype=bool)
+
+    # Observed statistics
+    mean_differences = get_mean_differences(continuous_values, is_high.astype(float))
+    chi_square_statistics = get_chi_square_statistics(indicators, value_features, is_high.astype(float))
+
+    # Permutation tests: count the permutations whose statistic is at least as extreme as the observed one
+    continuous_exceedances = np.zeros(len(CONTINUOUS_FEATURES))
+    categorical_exceedances = np.zeros(len(CATEGORICAL_FEATURES))
+    rng = np.random.default_rng(random_state)
+    for chunk_start in range(0, n_permutations, PERMUTATION_CHUNK_SIZE):
+        permuted_labels = get_permuted_labels(
+            is_high, min(PERMUTATION_CHUNK_SIZE, n_permutations - chunk_start), rng
+        )
+        continuous_exceedances += np.sum(
+            np.abs(get_mean_differences(continuous_values, permuted_labels)) >= np.abs(mean_differences) * (1 - 1e-12),
+            axis=0
+        )
+        categorical_exceedances += np.sum(
+            get_chi_square_statistics(indicators, value_features, permuted_labels) >= chi_square_statistics * (1 - 1e-12),
+            axis=0
+        )
+
+    # Continuous features: Mann-Whitney U test, omitting the missing values
+    high_values = continuous_values[is_high]
+    low_values = continuous_values[~is_high]
+    n_high = np.sum(~np.isnan(high_values), axis=0)
+    n_low = np.sum(~np.isnan(low_values), axis=0)
+    u_statistics, mann_whitney_p_values = mannwhitneyu(high_values, low_values, axis=0, nan_policy='omit')
+
+    continuous_df = pd.DataFrame({
+        "feature": CONTINUOUS_FEATURES,
+        "feature_type": "continuous",
+        "n_high": n_high,
+        "n_low": n_low,
+        "high_mean": np.nanmean(high_values, axis=0),
+        "low_mean": np.nanmean(low_values, axis=0),
+        "test": "mann_whitney_u",
+        "statistic": u_statistics,
+        "p_value": mann_whitney_p_values,
+        "permutation_p_value": get_permutation_p_values(continuous_exceedances, n_permutations, mean_differences),
+        "effect_size": 2 * u_statistics / (n_high * n_low) - 1,
+        "effect_size_measure": "rank_biserial",
+    })
+
+    # Categorical features: chi-square test of independence of the feature's values (present in the fold) and clusters
+    is_value_present = indicators.sum(axis=0) > 0
+    degrees_of_freedom = np.bincount(value_features[is_value_present], minlength=len(CATEGORICAL_FEATURES)) - 1
+    has_value = indicators @ (value_features[:, None] == np.arange(len(CATEGORICAL_FEATURES))) > 0
+    n_categorical_high = has_value[is_high].sum(axis=0)
+    n_categorical_low = has_value[~is_high].sum(axis=0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        chi_square_p_values = np.where(
+            degrees_of_freedom > 0, chi2.sf(chi_square_statistics, np.maximum(degrees_of_freedom, 1)), np.nan
+        )
+        cramers_v = np.sqrt(chi_square_statistics / (n_categorical_high + n_categorical_low))
+
+    categorical_df = pd.DataFrame({
+        "feature": CATEGORICAL_FEATURES,
+        "feature_type": "categorical",
+        "n_high": n_categorical_high,
+        "n_low": n_categorical_low,
+        "high_mean": np.nan,
+        "low_mean": np.nan,
+        "test": "chi_square",
+        "statistic": chi_square_statistics,
+        "p_value": chi_square_p_values,
+        "permutation_p_value": get_permutation_p_values(categorical_exceedances, n_permutations, chi_square_statistics),
+        "effect_size": cramers_v,
+        "effect_size_measure": "cramers_v",
+    })
+
+    return pd.concat([continuous_df, categorical_df], ignore_index=True)[SIGNIFICANCE_COLUMNS]
+
+def summarise_feature_significance(feature_significance_df, alpha=0.05):
+    """
+    Summarise the significance of every feature across the folds
+    :param feature_significance_df: DataFrame of the feature significance of every fold (see get_feature_significance),
+    with a fold column
+    :param alpha: Significance level
+    :return: DataFrame indexed by feature, with the number of folds, the median effect size, and the share of folds in
+    which the feature differs significantly between the clusters (by the test, and by the permutation test)
+    """
+    grouped = feature_significance_df.assign(
+        is_significant=feature_significance_df["p_value"] < alpha,
+        is_permutation_significant=feature_significance_df["permutation_p_value"] < alpha
+    ).groupby(["feature", "feature_type", "effect_size_measure"], sort=False)
+
+    return grouped.agg(
+        n_folds=("fold", "nunique"),
+        median_effect_size=("effect_size", "median"),
+        median_p_value=("p_value", "median"),
+        significant_share=("is_significant", "mean"),
+        permutation_significant_share=("is_permutation_significant", "mean"),
+    ).reset_index(["feature_type", "effect_size_measure"]).sort_values("median_effect_size", key=np.abs, ascending=False)
+
+def log_feature_significance_summary(feature_significance_summary, alpha=0.05):
+    """
+    Log the summary of the significance of every feature across the folds
+    :param feature_significance_summary: DataFrame returned by summarise_feature_significance
+    :param alpha: Significance level
+    """
+    print(f"Features distinguishing the high- from the low-scoring clusters across folds (share of folds with p < {alpha}):")
+    print(f"{feature_significance_summary.to_string(float_format=lambda value: f'{value:.4f}')}\n")
@@ -0,0 +1,183 @@
+import numpy as np
+import pandas as pd
+
+from machine_learning.bootstrap import bootstrap
+
+# Columns identifying a fold of the cross-validation
+FOLD_COLUMNS = ["fold", "ukprn"]
+# Statistics of every metric across the folds, in the order of the summary's columns
+SUMMARY_STATISTICS = ["n_folds", "mean", "median", "std", "ci_low", "ci_high"]
+
+
+class FoldMetrics:
+    """
+    Accumulator of the metrics of every fold of a cross-validation, one row per fold: the fold number, the UKPRN of the
+    test university, the configuration of the run (e.g. UoA, features, warm start), the metrics (e.g. silhouette score,
+    KL divergence) and the timings (e.g. fit time). Rows are appended as Python dictionaries and converted to a
+    DataFrame once, when the metrics are summarised or persisted. Accumulators of runs in parallel workers are combined
+    with merge, keeping one row per fold of every run
+    """
+
+    def __init__(self, **config):
+        """
+        :param config: Configuration of the run, repeated in every row (e.g. uoa=11, warm_start=False). Lists (e.g. the
+        features) are stored as comma-separated strings
+        """
+        self.config = {
+            name: ",".join(value) if isinstance(value, (list, tuple)) else value for name, value in config.items()
+        }
+        self.rows = []
+        self.df = None
+
+    def __len__(self):
+        return len(self.rows) if self.df is None else len(self.df)
+
+    def add_fold(self, fold, ukprn, *metrics, **timings):
+        """
+        Record the metrics of a fold
+        :param fold: Number of the fold
+        :param ukprn: UKPRN code of the fold's test university
+        :param metrics: Hash-maps of metrics of the fold (e.g. the cluster evaluation and the divergence metrics)
+        :param timings: Timings and other values of the fold (e.g. fit_time=1.2)
+        """
+        row = {"fold": fold, "ukprn": ukprn, **self.config}
+        for fold_metrics in metrics:
+            row.update(fold_metrics)
+        row.update(timings)
+
+        if self.df is not None:
+            # Rows added after the DataFrame was built (e.g. after loading) are appended to it
+            self.rows = self.df.to_dict("records")
+            self.df = None
+        self.rows.append(row)
+
+    def to_dataframe(self):
+        """
+        Obtain the metrics of every fold
+        :return: DataFrame with one row per fold
+        """
+        if self.df is None:
+            self.df = pd.DataFrame(self.rows)
+            self.rows = []
+        return self.df
+
+    def get_metric_names(self):
+        """
+        Obtain the names of the metrics: the floating point columns (counts such as n_iter, and the configuration, are
+        not summarised)
+        :return: List of metric names
+        """
+        df = self.to_dataframe()
+        return [column for column in df.columns if column not in FOLD_COLUMNS and pd.api.types.is_float_dtype(df[column])]
+
+    def summarise(self, metrics=None, by=None, n_bootstrap=1000, confidence=0.95, random_state=42):
+        """
+        Summarise every metric across the folds: mean, median, standard deviation and percentile bootstrap confidence
+        interval of the mean
+        :param metrics: Names of the metrics to summarise (default: every metric, see get_metric_names)
+        :param by: Configuration column(s) the folds are grouped by (e.g. "uoa" for merged runs), None for all folds
+        :param n_bootstrap: Number of bootstrap resamples of the folds
+        :param confidence: Confidence level of the intervals
+        :param random_state: Random seed of the bootstrap resamples
+        :return: DataFrame indexed by metric (or by group and metric), with columns SUMMARY_STATISTICS
+        """
+        df = self.to_dataframe()
+        metrics = self.get_metric_names() if metrics is None else metrics
+
+        if by is None:
+            return summarise_metric_values(df[metrics], n_bootstrap, confidence, random_state)
+
+        return pd.concat({
+            group: summarise_metric_values(group_df[metrics], n_bootstrap, confidence, random_state)
+            for group, group_df in df.groupby(by, sort=False)
+        }, names=[by] if isinstance(by, str) else by)
+
+    def save(self, path):
+        """
+        Persist the metrics of every fold as a Parquet file
+        :param path: Path of the Parquet file
+        """
+        self.to_dataframe().to_parquet(path, engine='fastparquet', index=False)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load the metrics persisted by save
+        :param path: Path of the Parquet file
+        :return: FoldMetrics
+        """
+        return cls.from_dataframe(pd.read_parquet(path, engine='fastparquet'))
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """
+        Create an accumulator from the metrics of every fold
+        :param df: DataFrame with one row per fold, e.g. obtained from to_dataframe in another process
+        :return: FoldMetrics
+        """
+        fold_metrics = cls()
+        fold_metrics.df = df.reset_index(drop=True)
+        return fold_metrics
+
+    @classmethod
+    def merge(cls, fold_metrics_list):
+        """
+        Merge the accumulators of several runs (e.g. the cross-validations of several UoAs in parallel workers)
+        :param fold_metrics_list: List of FoldMetrics, or of DataFrames obtained from to_dataframe
+        :return: FoldMetrics with the rows of every run, in order
+        """
+        dfs = [
+            fold_metrics if isinstance(fold_metrics, pd.DataFrame) else fold_metrics.to_dataframe()
+            for fold_metrics in fold_metrics_list
+        ]
+        return cls.from_dataframe(pd.concat(dfs, ignore_index=True))
+
+
+def get_resample_means(resampled_values):
+    """
+    Average every metric over the folds of every resample
+    :param resampled_values: Array of shape (n_resamples, n_folds, n_metrics)
+    :return: Hash-map with the array of shape (n_resamples, n_metrics) of the means
+    """
+    return {"mean": np.nanmean(resampled_values, axis=1)}
+
+def summarise_metric_values(values_df, n_bootstrap=1000, confidence=0.95, random_state=42):
+    """
+    Summarise the values of metrics across folds, computing the bootstrap means of all metrics at once: the folds are
+    resampled with replacement as index matrices of row positions shared by all metrics (see bootstrap.py), so with the
+    same random state the intervals match the ones of bootstrap_accuracy_metrics
+    :param values_df: DataFrame with one row per fold and one column per metric
+    :param n_bootstrap: Number of bootstrap resamples of the folds
+    :param confidence: Confidence level of the intervals
+    :param random_state: Random seed of the bootstrap resamples
+    :return: DataFrame indexed by metric, with columns SUMMARY_STATISTICS
+    """
+    values = values_df.to_numpy(dtype=float)
+    n_folds = np.sum(~np.isnan(values), axis=0)
+
+    summary_df = pd.DataFrame({
+        "n_folds": n_folds,
+        "mean": np.nanmean(values, axis=0),
+        "median": np.nanmedian(values, axis=0),
+        "std": np.nanstd(values, axis=0, ddof=1),
+        "ci_low": np.nan,
+        "ci_high": np.nan,
+    }, index=pd.Index(values_df.columns, name="metric"))
+
+    if len(values) > 1 and n_bootstrap > 0:
+        bootstrap_means = bootstrap(get_resample_means, [values], n_bootstrap, random_state)["mean"]
+
+        alpha = (1 - confidence) / 2
+        summary_df["ci_low"], summary_df["ci_high"] = np.nanquantile(bootstrap_means, [alpha, 1 - alpha], axis=0)
+
+    return summary_df[SUMMARY_STATISTICS]
+
+def log_fold_metrics_summary(fold_metrics_summary, confidence=0.95):
+    """
+    Log the summary of the metrics across the folds
+    :param fold_metrics_summary: DataFrame returned by FoldMetrics.summarise
+    :param confidence: Confidence level of the intervals
+    """
+    print(f"Metrics across folds (mean, median, standard deviation, {confidence:.0%} bootstrap confidence interval of "
+          f"the mean):")
+    print(f"{fold_metrics_summary.to_string(float_format=lambda value: f'{value:.4f}')}\n")
@@ -1,7 +1,43 @@
-from utils.constants import output_type
+import numpy as np
+import pandas as pd
 
+from utils.constants import output_type
 
-def analyse_clusters(train, cluster_label_mapping):
+# Features compared between the high- and low-scoring outputs, in the order they are analysed, with their type:
+# continuous features are summarised (count, mean, standard deviation, quartiles), and the distribution of the values of
+# categorical features is computed
+FEATURE_TYPES = {
+    'top_citation_percentile': 'categorical',
+    'total_citations': 'continuous',
+    'Output type': 'categorical',
+    'Number of additional authors': 'continuous',
+    'Interdisciplinary': 'categorical',
+    'Forensic science': 'categorical',
+    'Criminology': 'categorical',
+    'Open access status': 'categorical',
+    'Cross-referral requested': 'categorical',
+    'Incl factual info about significance': 'categorical',
+    'SNIP': 'continuous',
+    'SJR': 'continuous',
+    'Cite_Score': 'continuous',
+    'field_weighted_citation_impact': 'continuous',
+    'field_weighted_views_impact': 'continuous',
+}
+CONTINUOUS_FEATURES = [feature for feature, feature_type in FEATURE_TYPES.items() if feature_type == 'continuous']
+CATEGORICAL_FEATURES = [feature for feature, feature_type in FEATURE_TYPES.items() if feature_type == 'categorical']
+
+# Features left blank when they do not apply to the output, their blanks are replaced with "No":
+# - Interdisciplinary, Forensic science, Criminology: Yes if the output is interdisciplinary (embodies research in
+#   forensic science, criminology)
+# - Cross-referral requested: the UOA to which the output was cross-referred to for advice
+BLANK_AS_NO_FEATURES = ['Interdisciplinary', 'Forensic science', 'Criminology', 'Cross-referral requested']
+
+# Columns of the comparison table: a row per statistic of a continuous feature, or per statistic of a value of a
+# categorical feature, with the statistic in the high- and low-scoring clusters
+COMPARISON_COLUMNS = ["feature", "feature_type", "value", "statistic", "high_scoring_outputs", "low_scoring_outputs"]
+
+
+def analyse_clusters(train, cluster_label_mapping, comparison_path=None):
     """
     The trained clusters are examined when Wrexham University's outputs (UKPRN=10007833) are used as the test set (fold),
     as it has only 9 outputs, the least among all universities.
@@ -14,260 +50,121 @@ def analyse_clusters(train, cluster_label_mapping):
     :param train: Datapoints (outputs) used to train the clustering model, with cluster assignments
     :param cluster_label_mapping: Hash-map mapping each cluster to its label i.e. does it represent high- or low-scoring
     outputs
+    :param comparison_path: Path of the Parquet file the comparison table is saved to (None: not saved)
+    :return: Comparison table of the features of the high- and low-scoring outputs (see compare_clusters)
     """
     print(train.head().to_string())
     print(cluster_label_mapping)
 
-    # Using the inferred clustering label mapping, figure out which cluster (0, 1) represents high and low scoring outputs
-    for cluster_num, cluster_label in cluster_label_mapping.items():
-        # Obtain the cluster number of high scoring outputs
-        if cluster_label == 'high_scoring_outputs':
-            high_scoring_cluster_number = cluster_num
-        # Obtain the cluster number of low scoing outputs
-        elif cluster_label == 'low_scoring_outputs':
-            low_scoring_cluster_number = cluster_num
-
-    # Split the dataframe into two based on the cluster label
-    high_scoring_outputs_df = train[train['cluster'] == high_scoring_cluster_number]
-    low_scoring_outputs_df = train[train['cluster'] == low_scoring_cluster_number]
-
     # Analyse features for High vs Low Scoring Output Patterns
+    comparison_df = compare_clusters(train, train['cluster'], cluster_label_mapping)
+    log_feature_comparison(comparison_df)
 
-    # 1. Analyse Top Citation percentile:
-    analyse_top_citation_percentiles(high_scoring_outputs_df, low_scoring_outputs_df)
-
-    # 2. Analyse Citation counts:
-    analyse_citation_counts(high_scoring_outputs_df, low_scoring_outputs_df)
-
-    # 3. Analyse Output Types
-    analyse_output_types(
-        train, high_scoring_outputs_df, low_scoring_outputs_df, high_scoring_cluster_number, low_scoring_cluster_number
-    )
-
-    # 4. Analyse Number of additional authors
-    analyse_author_counts(high_scoring_outputs_df, low_scoring_outputs_df)
-
-    # 5. Analyse Interdisciplinary research
-    analyse_interdisciplinary_research(high_scoring_outputs_df, low_scoring_outputs_df)
-
-    # 6. Analyse Forensic science outputs
-    analyse_forensic_science_outputs(high_scoring_outputs_df, low_scoring_outputs_df)
-
-    # 7. Analyse Criminology outputs
-    analyse_criminology_outputs(high_scoring_outputs_df, low_scoring_outputs_df)
-
-    # 8. Analyse Open access status
-    analyse_open_access_status_outputs(high_scoring_outputs_df, low_scoring_outputs_df)
-
-    # 9. Analyse Cross-referral requested
-    analyse_cross_referral_requested_outputs(high_scoring_outputs_df, low_scoring_outputs_df)
-
-    # 10. Incl factual info about significance
-    analyse_significance_factual_info_outputs(high_scoring_outputs_df, low_scoring_outputs_df)
-
-    # 11. Analyse SNIP
-    analyse_snip(high_scoring_outputs_df, low_scoring_outputs_df)
-
-    # 12. Analyse SJR
-    analyse_sjr(high_scoring_outputs_df, low_scoring_outputs_df)
-
-    # 13. Analyse Cite Score
-    analyse_cite_score(high_scoring_outputs_df, low_scoring_outputs_df)
-
-    # 14. Analyse Field Weighted Citation Impact
-    analyse_field_weighted_citation_impact(high_scoring_outputs_df, low_scoring_outputs_df)
-
-    # 15. Analyse Field Weighted Views Impact
-    analyse_field_weighted_views_impact(high_scoring_outputs_df, low_scoring_outputs_df)
-
-    print()
-
-
-
-def analyse_top_citation_percentiles(high_scoring_outputs_df, low_scoring_outputs_df):
-    log_counts_and_distribution_for_high_low_scoring_outputs(
-        high_scoring_outputs_df, low_scoring_outputs_df, 'top_citation_percentile'
-    )
-
-def analyse_citation_counts(high_scoring_outputs_df, low_scoring_outputs_df):
-    log_continuous_feature_for_high_low_scoring_outputs(
-        high_scoring_outputs_df, low_scoring_outputs_df, 'total_citations'
-    )
-
-
-def analyse_output_types(
-    train, high_scoring_outputs_df, low_scoring_outputs_df, high_scoring_cluster_number, low_scoring_cluster_number
-):
-    log_counts_and_distribution_for_high_low_scoring_outputs(
-        high_scoring_outputs_df, low_scoring_outputs_df, 'Output type'
-    )
-
-    # For each output type, log what percentage os such outputs were high- and low-scoring:
-    output_types = train['Output type'].unique()
-
-    print("For each output type, percentage in high vs low scoring clusters:")
-    for curr_output_type in output_types:
-        current_output_type_df = train[train['Output type'] == curr_output_type]
-        current_output_type_count = len(current_output_type_df)
-
-        curr_type_high_count = len(current_output_type_df[current_output_type_df['cluster'] == high_scoring_cluster_number])
-        curr_type_low_count = len(current_output_type_df[current_output_type_df['cluster'] == low_scoring_cluster_number])
-
-        curr_output_type_high_percent = (curr_type_high_count / current_output_type_count * 100)
-        curr_output_type_low_percent = (curr_type_low_count / current_output_type_count * 100)
-
-        print(f"\nOutput Type: {output_type[curr_output_type]}")
-        print(f"Total count: {current_output_type_count}")
-        print(f"High scoring: {curr_type_high_count} ({curr_output_type_high_percent}%)")
-        print(f"Low scoring: {curr_type_low_count} ({curr_output_type_low_percent}%)")
-
+    if comparison_path is not None:
+        save_feature_comparison(comparison_df, comparison_path)
 
-def analyse_author_counts(high_scoring_outputs_df, low_scoring_outputs_df):
-    log_continuous_feature_for_high_low_scoring_outputs(
-        high_scoring_outputs_df, low_scoring_outputs_df, 'Number of additional authors'
-    )
-
-
-def analyse_interdisciplinary_research(high_scoring_outputs_df, low_scoring_outputs_df):
-    # The value of this field is Yes if the output is interdisciplinary, if not, the field is left blank
-
-    # Replace Nulls with No
-    high_scoring_outputs_df = replace_feature_nulls_with_no(high_scoring_outputs_df, 'Interdisciplinary')
-    low_scoring_outputs_df = replace_feature_nulls_with_no(low_scoring_outputs_df, 'Interdisciplinary')
-
-    log_counts_and_distribution_for_high_low_scoring_outputs(
-        high_scoring_outputs_df, low_scoring_outputs_df, 'Interdisciplinary'
-    )
-
-def analyse_forensic_science_outputs(high_scoring_outputs_df, low_scoring_outputs_df):
-    # The value of this field is Yes if the output embodies research in forensic science, if not, the field is left blank
-
-    # Replace Nulls with No
-    high_scoring_outputs_df = replace_feature_nulls_with_no(high_scoring_outputs_df, 'Forensic science')
-    low_scoring_outputs_df = replace_feature_nulls_with_no(low_scoring_outputs_df, 'Forensic science')
-
-    log_counts_and_distribution_for_high_low_scoring_outputs(
-        high_scoring_outputs_df, low_scoring_outputs_df, 'Forensic science'
-    )
-
-def analyse_criminology_outputs(high_scoring_outputs_df, low_scoring_outputs_df):
-    # The value of this field is Yes if the output embodies research in criminology, if not, the field is left blank
-
-    # Replace Nulls with No
-    high_scoring_outputs_df = replace_feature_nulls_with_no(high_scoring_outputs_df, 'Criminology')
-    low_scoring_outputs_df = replace_feature_nulls_with_no(low_scoring_outputs_df, 'Criminology')
-
-    log_counts_and_distribution_for_high_low_scoring_outputs(
-        high_scoring_outputs_df, low_scoring_outputs_df, 'Criminology'
-    )
-
-def analyse_open_access_status_outputs(high_scoring_outputs_df, low_scoring_outputs_df):
-    log_counts_and_distribution_for_high_low_scoring_outputs(
-        high_scoring_outputs_df, low_scoring_outputs_df, 'Open access status'
-    )
-
-def analyse_cross_referral_requested_outputs(high_scoring_outputs_df, low_scoring_outputs_df):
-    # If cross referral is requested, the value is the UOA to which the output was cross-referred to for advice
-    # Is cross referral was not request, the field is left blank
-
-    # Replace Nulls with No
-    high_scoring_outputs_df = replace_feature_nulls_with_no(high_scoring_outputs_df, 'Cross-referral requested')
-    low_scoring_outputs_df = replace_feature_nulls_with_no(low_scoring_outputs_df, 'Cross-referral requested')
+    return comparison_df
 
-    # Cannot call the log_counts_and_distribution_for_high_low_scoring_outputs() because sort_index()
-    # doesn't work with numbers (UOA) and strings("No"
-    high_scoring_outputs_feature_value_counts = high_scoring_outputs_df['Cross-referral requested'].value_counts()
-    low_scoring_outputs_feature_value_counts = low_scoring_outputs_df['Cross-referral requested'].value_counts()
-
-    print(f"High Scoring Outputs - Cross-referral requested counts:")
-    print(high_scoring_outputs_feature_value_counts)
-    print(f"\nLow Scoring Outputs - Cross-referral requested counts:")
-    print(low_scoring_outputs_feature_value_counts)
-
-    print(f"\nHigh Scoring Outputs - Cross-referral requested distribution (%):")
-    print((high_scoring_outputs_feature_value_counts / high_scoring_outputs_feature_value_counts.sum() * 100))
-    print(f"\nLow Scoring Outputs - Cross-referral requested distribution (%):")
-    print((low_scoring_outputs_feature_value_counts / low_scoring_outputs_feature_value_counts.sum() * 100))
-
-def analyse_significance_factual_info_outputs(high_scoring_outputs_df, low_scoring_outputs_df):
-    log_counts_and_distribution_for_high_low_scoring_outputs(
-        high_scoring_outputs_df, low_scoring_outputs_df, 'Incl factual info about significance'
-    )
-
-def analyse_snip(high_scoring_outputs_df, low_scoring_outputs_df):
-    log_continuous_feature_for_high_low_scoring_outputs(
-        high_scoring_outputs_df, low_scoring_outputs_df, 'SNIP'
-    )
-
-def analyse_sjr(high_scoring_outputs_df, low_scoring_outputs_df):
-    log_continuous_feature_for_high_low_scoring_outputs(
-        high_scoring_outputs_df, low_scoring_outputs_df, 'SJR'
-    )
-
-def analyse_cite_score(high_scoring_outputs_df, low_scoring_outputs_df):
-    log_continuous_feature_for_high_low_scoring_outputs(
-        high_scoring_outputs_df, low_scoring_outputs_df, 'Cite_Score'
-    )
-
-def analyse_field_weighted_citation_impact(high_scoring_outputs_df, low_scoring_outputs_df):
-    log_continuous_feature_for_high_low_scoring_outputs(
-        high_scoring_outputs_df, low_scoring_outputs_df, 'field_weighted_citation_impact'
+def compare_clusters(outputs_df, clusters, cluster_label_mapping):
+    """
+    Compare the features of the high- and low-scoring outputs, driven by FEATURE_TYPES: the summaries of all continuous
+    features are computed in one groupby of the clusters, and the value counts of all categorical features in another
+    one, after stacking the categorical features into (feature, value) pairs
+    :param outputs_df: DataFrame of the outputs with the features in FEATURE_TYPES
+    :param clusters: Cluster of every output (array or Series aligned with the rows of outputs_df)
+    :param cluster_label_mapping: Hash-map mapping each cluster to its label (high_scoring_outputs or low_scoring_outputs)
+    :return: Comparison table, with columns COMPARISON_COLUMNS:
+        1. Continuous features: one row per statistic of describe() (count, mean, std, min, 25%, 50%, 75%, max)
+        2. Categorical features: three rows per value - its count, its percentage among the outputs of the cluster
+        (distribution), and the percentage of the outputs with the value that are in the cluster
+    """
+    # Label the clusters with the type of outputs they represent
+    cluster_labels = pd.Series(np.asarray(clusters)).map(cluster_label_mapping).to_numpy()
+    cluster_label_columns = ['high_scoring_outputs', 'low_scoring_outputs']
+
+    # 1. Continuous features: describe every feature in every cluster at once
+    continuous_df = (
+        outputs_df[CONTINUOUS_FEATURES].groupby(cluster_labels).describe()
+        .T.reindex(columns=cluster_label_columns)
+        .rename_axis(["feature", "statistic"]).reset_index()
     )
-
-def analyse_field_weighted_views_impact(high_scoring_outputs_df, low_scoring_outputs_df):
-    log_continuous_feature_for_high_low_scoring_outputs(
-        high_scoring_outputs_df, low_scoring_outputs_df, 'field_weighted_views_impact'
+    continuous_df["feature_type"] = "continuous"
+    continuous_df["value"] = None
+
+    # 2. Categorical features: count the outputs of every (feature, value) in every cluster at once
+    categorical_outputs_df = outputs_df[CATEGORICAL_FEATURES].astype(object)
+    categorical_outputs_df[BLANK_AS_NO_FEATURES] = categorical_outputs_df[BLANK_AS_NO_FEATURES].fillna('No')
+    categorical_outputs_df['cluster_label'] = cluster_labels
+
+    value_counts = (
+        categorical_outputs_df.melt(id_vars='cluster_label', var_name='feature', value_name='value')
+        .dropna(subset='value') # Missing values of the other features are not counted
+        .astype({'value': str})
+        .groupby(['feature', 'value', 'cluster_label'], sort=False).size()
+        .unstack('cluster_label', fill_value=0).reindex(columns=cluster_label_columns, fill_value=0)
     )
-
-def log_counts_and_distribution_for_high_low_scoring_outputs(
-    high_scoring_outputs_df, low_scoring_outputs_df, feature
-):
+    # Percentage of the outputs of a cluster having the value (distribution of the feature's values in the cluster)
+    cluster_percentages = value_counts / value_counts.groupby(level='feature').transform('sum') * 100
+    # Percentage of the outputs having the value that are in the cluster
+    value_percentages = value_counts.div(value_counts.sum(axis=1), axis=0) * 100
+
+    categorical_df = pd.concat(
+        {'count': value_counts, 'percentage': cluster_percentages, 'value_percentage': value_percentages},
+        names=['statistic']
+    ).reset_index()
+    categorical_df["feature_type"] = "categorical"
+
+    comparison_df = pd.concat([continuous_df, categorical_df], ignore_index=True)[COMPARISON_COLUMNS]
+    comparison_df[cluster_label_columns] = comparison_df[cluster_label_columns].astype(float)
+
+    # Order the features as analysed, and the values of every feature (numbers, e.g. the UOAs cross-referred to, by value)
+    feature_order = {feature: position for position, feature in enumerate(FEATURE_TYPES)}
+    sort_keys = pd.DataFrame({
+        'feature_position': comparison_df['feature'].map(feature_order),
+        'numeric_value': pd.to_numeric(comparison_df['value'], errors='coerce'),
+        'value': comparison_df['value']
+    })
+    order = sort_keys.sort_values(list(sort_keys.columns), na_position='last', kind='stable').index
+    return comparison_df.loc[order].reset_index(drop=True)
+
+def log_feature_comparison(comparison_df):
     """
-    Log the distribution of the values of a categorical feature in both the outputs that are high- and low-scoring
-    :param high_scoring_outputs_df: DataFrame of outputs that were scored high-quality
-    :param low_scoring_outputs_df: DataFrame of outputs that were scored high-quality
-    :param feature: Categorical Feature in DataFrame
+    Log the comparison table of the features of the high- and low-scoring outputs: the summaries of the continuous
+    features, then the distribution of the values of the categorical features
+    :param comparison_df: Comparison table returned by compare_clusters
     """
-    # Count occurrences of each of the feature's values in both dataframes:
-    high_scoring_outputs_feature_value_counts = high_scoring_outputs_df[feature].value_counts().sort_index()
-    low_scoring_outputs_feature_value_counts = low_scoring_outputs_df[feature].value_counts().sort_index()
+    continuous_df = comparison_df[comparison_df['feature_type'] == 'continuous']
+    categorical_df = comparison_df[comparison_df['feature_type'] == 'categorical'].copy()
 
-    # Log counts and percentage distribution of the values of the feature in both high- and low-scoring outputs
-    print(f"High Scoring Outputs - {feature} counts:")
-    print(high_scoring_outputs_feature_value_counts)
-    print(f"\nLow Scoring Outputs - {feature} counts:")
-    print(low_scoring_outputs_feature_value_counts)
+    # Name the output types (e.g. D: Journal article)
+    is_output_type = categorical_df['feature'] == 'Output type'
+    categorical_df.loc[is_output_type, 'value'] = categorical_df.loc[is_output_type, 'value'].map(
+        lambda value: output_type.get(value, value)
+    )
 
-    print(f"\nHigh Scoring Outputs - {feature} distribution (%):")
-    print((high_scoring_outputs_feature_value_counts / high_scoring_outputs_feature_value_counts.sum() * 100))
-    print(f"\nLow Scoring Outputs - {feature} distribution (%):")
-    print((low_scoring_outputs_feature_value_counts / low_scoring_outputs_feature_value_counts.sum() * 100))
+    print("High vs Low Scoring Outputs - continuous features:")
+    print(continuous_df.set_index(['feature', 'statistic'])[['high_scoring_outputs', 'low_scoring_outputs']]
+          .to_string(float_format=lambda value: f'{value:.4f}'))
+    print("\nHigh vs Low Scoring Outputs - categorical features (count, distribution in the cluster (%), and percentage "
+          "of the outputs with the value in the cluster):")
+    feature_values = pd.MultiIndex.from_frame(categorical_df[['feature', 'value']].drop_duplicates())
+    print(categorical_df.set_index(['feature', 'value', 'statistic'])[['high_scoring_outputs', 'low_scoring_outputs']]
+          .unstack('statistic').reindex(feature_values)
+          .to_string(float_format=lambda value: f'{value:.2f}'))
+    print()
 
-def log_continuous_feature_for_high_low_scoring_outputs(
-    high_scoring_outputs_df, low_scoring_outputs_df, feature
-):
+def save_feature_comparison(comparison_df, path):
     """
-    Log the distribution of a continuous feature in both the outputs that are high- and low-scoring
-    :param high_scoring_outputs_df: DataFrame of outputs that were scored high-quality
-    :param low_scoring_outputs_df: DataFrame of outputs that were low high-quality
-    :param feature: Continuous Feature in DataFrame
+    Persist a comparison table (or the comparison tables of several folds) as a Parquet file
+    :param comparison_df: Comparison table returned by compare_clusters
+    :param path: Path of the Parquet file
     """
-    print(f"\nHigh Scoring Outputs - {feature}:")
-    print(high_scoring_outputs_df[feature].describe())
-    print(f"\nLow Scoring Outputs - {feature}:")
-    print(low_scoring_outputs_df[feature].describe())
+    comparison_df.to_parquet(path, engine='fastparquet', index=False)
 
-def replace_feature_nulls_with_no(df, feature):
+def read_feature_comparison(path):
     """
-    Replace all the null values in a feature with "No"
-    :param df: Dataframe with a field containing null values
-    :param feature: Feature whose null values should be replaced with a No
-    :return: Updated DataFrame with null values in feature, replaced with 'No'
+    Read a comparison table persisted by save_feature_comparison
+    :param path: Path of the Parquet file
+    :return: Comparison table
     """
-    # Create a copy of the dataframe to avoid the SettingWithCopyWarning which occurs when modifying a copy of the slice
-    # from a DataFrame.
-    df = df.copy()
-
-    # Replace the missing values of the feature with No
-    df[feature] = df[feature].fillna('No')
-    return df
+    return pd.read_parquet(path, engine='fastparquet')
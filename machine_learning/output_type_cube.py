@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+
+from utils.constants import output_type
+
+# Clusters of the cube, in the order of its cluster axis
+CLUSTER_LABELS = ["high_scoring_outputs", "low_scoring_outputs"]
+# Label of the outputs with a missing value (e.g. no output type), the last label of an axis
+MISSING_LABEL = "Missing"
+
+
+class OutputTypeCube:
+    """
+    Counts of outputs by output type, cluster (high- or low-scoring) and institution, as an integer array of shape
+    (n_output_types, 2, n_institutions). Built once per fold from the codes of the training outputs, and sliced by
+    output type, cluster or institution for the summaries, plots and statistical tests. The cubes of all folds of a run
+    share the same axes (the output types and institutions of all outputs), so they can be stacked and compared
+    """
+
+    def __init__(self, counts, output_types, ukprns):
+        """
+        :param counts: Integer array of shape (n_output_types, 2, n_institutions)
+        :param output_types: Output type codes (e.g. D: Journal article) of the first axis
+        :param ukprns: UKPRN codes of the institutions of the last axis
+        """
+        self.counts = counts
+        self.output_types = np.asarray(output_types, dtype=str)
+        self.ukprns = np.asarray(ukprns)
+
+    @classmethod
+    def from_codes(cls, output_type_codes, is_high, institution_codes, output_types, ukprns):
+        """
+        Count the outputs in one pass over their codes (positions in the axes), e.g. the training outputs of a fold
+        :param output_type_codes: Position in output_types of the output type of every output
+        :param is_high: Boolean array, True for the outputs in the high-scoring cluster
+        :param institution_codes: Position in ukprns of the institution of every output
+        :param output_types: Output type codes of the first axis
+        :param ukprns: UKPRN codes of the institutions of the last axis
+        :return: OutputTypeCube
+        """
+        shape = (len(output_types), len(CLUSTER_LABELS), len(ukprns))
+        # The high-scoring cluster is the first position of the cluster axis
+        cluster_codes = np.where(is_high, 0, 1)
+        cell_codes = np.ravel_multi_index((output_type_codes, cluster_codes, institution_codes), shape)
+        counts = np.bincount(cell_codes, minlength=np.prod(shape)).reshape(shape).astype(np.int32)
+        return cls(counts, output_types, ukprns)
+
+    @classmethod
+    def from_outputs(cls, outputs_df, is_high, output_types=None, ukprns=None):
+        """
+        Count outputs with their output type and institution columns
+        :param outputs_df: DataFrame of outputs with columns Output type and Institution UKPRN code
+        :param is_high: Boolean array, True for the outputs in the high-scoring cluster
+        :param output_types: Output type codes of the first axis (default: the ones of the outputs, sorted)
+        :param ukprns: UKPRN codes of the institutions of the last axis (default: the ones of the outputs, sorted)
+        :return: OutputTypeCube
+        """
+        output_types, output_type_codes = get_axis_codes(outputs_df['Output type'], output_types)
+        ukprns, institution_codes = get_axis_codes(outputs_df['Institution UKPRN code'], ukprns)
+        return cls.from_codes(output_type_codes, is_high, institution_codes, output_types, ukprns)
+
+    def select(self, output_type=None, cluster=None, ukprn=None):
+        """
+        Slice the counts by output type, cluster and/or institution. Axes selected with a single label are dropped, and
+        kept when selected with a list of labels
+        :param output_type: Output type code(s), None for all
+        :param cluster: Cluster label(s) (high_scoring_outputs, low_scoring_outputs), None for all
+        :param ukprn: UKPRN code(s) of the institution(s), None for all
+        :return: Integer array (or count) of the selected outputs
+        """
+        axis_positions = [
+            get_axis_positions(self.output_types, output_type),
+            get_axis_positions(np.asarray(CLUSTER_LABELS), cluster),
+            get_axis_positions(self.ukprns, ukprn)
+        ]
+        # Slice one axis at a time (indexing several axes with lists at once would pair their positions), from the last
+        # axis so the dropped axes do not shift the ones left to slice
+        counts = self.counts
+        for axis, positions in reversed(list(enumerate(axis_positions))):
+            counts = counts[(slice(None),) * axis + (positions,)]
+        return counts
+
+    def get_contingency_table(self, ukprn=None):
+        """
+        Obtain the contingency table of output types and clusters (e.g. for a chi-square test), summed over the
+        institutions
+        :param ukprn: UKPRN code(s) of the institution(s) whose outputs are counted, None for all
+        :return: DataFrame indexed by output type, with a column per cluster
+        """
+        counts = self.counts if ukprn is None else self.counts[..., get_axis_positions(self.ukprns, np.atleast_1d(ukprn))]
+        return pd.DataFrame(
+            counts.sum(axis=-1), index=pd.Index(self.output_types, name="output_type"), columns=CLUSTER_LABELS
+        )
+
+    def to_dataframe(self):
+        """
+        Obtain the non-zero counts as a tidy DataFrame (e.g. for plots)
+        :return: DataFrame with columns output_type, cluster, ukprn and count
+        """
+        output_type_positions, cluster_positions, institution_positions = np.nonzero(self.counts)
+        return pd.DataFrame({
+            "output_type": self.output_types[output_type_positions],
+            "cluster": np.asarray(CLUSTER_LABELS)[cluster_positions],
+            "ukprn": self.ukprns[institution_positions],
+            "count": self.counts[output_type_positions, cluster_positions, institution_positions],
+        })
+
+    def save(self, path):
+        """
+        Persist the counts and their axes as a compressed NumPy archive
+        :param path: Path of the .npz file
+        """
+        np.savez_compressed(path, counts=self.counts, output_types=self.output_types, ukprns=self.ukprns)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a cube persisted by save
+        :param path: Path of the .npz file
+        :return: OutputTypeCube
+        """
+        with np.load(path) as arrays:
+            return cls(arrays["counts"], arrays["output_types"], arrays["ukprns"])
+
+
+def get_axis_codes(values, labels=None):
+    """
+    Code values by their position in the labels of an axis. Missing values are labelled MISSING_LABEL
+    :param values: Series of values (e.g. output types)
+    :param labels: Labels of the axis, None to use the sorted unique values (followed by MISSING_LABEL if values are
+    missing)
+    :return: The labels, and the array of the position of every value in them
+    """
+    is_missing = values.isna().to_numpy()
+    if labels is None:
+        # Missing values are left out of the sort, as they cannot be compared with the values
+        labels = np.sort(values[~is_missing].unique())
+        if is_missing.any():
+            labels = np.append(labels.astype(object), MISSING_LABEL)
+
+    labelled_values = values.astype(object).where(~is_missing, MISSING_LABEL)
+    codes = pd.Index(labels).get_indexer(labelled_values)
+    if (codes < 0).any():
+        raise ValueError(f"Values missing from the labels of the axis: {labelled_values[codes < 0].unique().tolist()}")
+    return np.asarray(labels), codes
+
+def get_axis_positions(labels, selection):
+    """
+    Obtain the positions of the selected labels of an axis
+    :param labels: Labels of the axis
+    :param selection: Label, list of labels, or None to select the whole axis
+    :return: Position, array of positions, or slice of the whole axis
+    """
+    if selection is None:
+        return slice(None)
+    positions = pd.Index(labels).get_indexer(np.atleast_1d(selection))
+    if (positions < 0).any():
+        raise ValueError(f"Labels missing from the axis: {np.atleast_1d(selection)[positions < 0].tolist()}")
+    return positions if np.ndim(selection) else positions[0]
+
+def log_output_type_clusters(cube):
+    """
+    For each output type, log what percentage of such outputs were high- and low-scoring
+    :param cube: OutputTypeCube of the outputs
+    """
+    contingency_table = cube.get_contingency_table()
+    total_counts = contingency_table.sum(axis=1)
+
+    print("For each output type, percentage in high vs low scoring clusters:")
+    for curr_output_type, (high_count, low_count) in contingency_table[total_counts > 0].iterrows():
+        total_count = high_count + low_count
+        print(f"\nOutput Type: {output_type.get(curr_output_type, curr_output_type)}")
+        print(f"Total count: {total_count}")
+        print(f"High scoring: {high_count} ({high_count / total_count * 100}%)")
+        print(f"Low scoring: {low_count} ({low_count / total_count * 100}%)")
+    print()
@@ -0,0 +1,117 @@
+import numpy as np
+
+
+def random_centers(X, distribution, rng):
+    """
+    Pick k data points uniformly at random as the initial cluster centers (the original seeding of the deterministic
+    annealing)
+    :param X: Data points, shape (n_samples, n_features)
+    :param distribution: Target distribution of data points across the k clusters
+    :param rng: NumPy random generator
+    :return: Initial cluster centers, shape (n_clusters, n_features)
+    """
+    selective_centers = rng.choice(range(X.shape[0]), size=len(distribution), replace=False)
+    return X[selective_centers]
+
+def kmeans_plusplus_centers(X, distribution, rng):
+    """
+    k-means++ seeding: pick the first center uniformly at random, and every next center with probability proportional
+    to the squared distance of the data point to its closest center picked so far. Centers are spread out, so two
+    nearby data points are rarely picked together
+    :param X: Data points, shape (n_samples, n_features)
+    :param distribution: Target distribution of data points across the k clusters
+    :param rng: NumPy random generator
+    :return: Initial cluster centers, shape (n_clusters, n_features)
+    """
+    n_samples = X.shape[0]
+    n_clusters = len(distribution)
+
+    center_indices = [rng.integers(n_samples)]
+    closest_squared_distances = np.sum((X - X[center_indices[0]]) ** 2, axis=1)
+    for _ in range(1, n_clusters):
+        total_squared_distance = np.sum(closest_squared_distances)
+        if total_squared_distance > 0:
+            center_index = rng.choice(n_samples, p=closest_squared_distances / total_squared_distance)
+        else:
+            # All data points coincide with a center already picked
+            center_index = rng.integers(n_samples)
+        center_indices.append(center_index)
+        closest_squared_distances = np.minimum(closest_squared_distances, np.sum((X - X[center_index]) ** 2, axis=1))
+
+    return X[center_indices]
+
+def pca_split_centers(X, distribution, rng=None):
+    """
+    Principal direction split (k=2 only): project the data points onto their first principal component and split them
+    at the mean of the projections. The initial centers are the centroids of the two halves, which already lie on
+    either side of the direction of largest variance
+    :param X: Data points, shape (n_samples, n_features)
+    :param distribution: Target distribution of data points across the 2 clusters
+    :param rng: Unused, the split is deterministic
+    :return: Initial cluster centers, shape (2, n_features)
+    """
+    if len(distribution) != 2:
+        raise ValueError("The PCA split seeding only supports 2 clusters")
+
+    projections = get_principal_component_projections(X)
+    is_upper_half = projections > 0 # Projections of the centred data points have mean 0
+    if np.all(is_upper_half) or not np.any(is_upper_half):
+        # All data points project onto the same value
+        return X[:2].astype(float)
+
+    return np.vstack([X[~is_upper_half].mean(axis=0), X[is_upper_half].mean(axis=0)])
+
+def quantile_centers(X, distribution, rng=None):
+    """
+    Centroids of the target quantiles: order the data points along their first principal component and cut them into k
+    consecutive groups, sized by the distribution. Cluster j's initial center is the centroid of the j-th group, so the
+    initial clusters already respect the target ratios
+    :param X: Data points, shape (n_samples, n_features)
+    :param distribution: Target distribution of data points across the k clusters
+    :param rng: Unused, the split is deterministic
+    :return: Initial cluster centers, shape (n_clusters, n_features)
+    """
+    n_samples = X.shape[0]
+
+    order = np.argsort(get_principal_component_projections(X), kind="stable")
+    # Boundaries between the groups, at the cumulative target proportions (every group has at least one data point)
+    boundaries = np.round(np.cumsum(distribution)[:-1] * n_samples).astype(int)
+    boundaries = np.clip(boundaries, np.arange(1, len(distribution)), n_samples - np.arange(len(distribution) - 1, 0, -1))
+
+    return np.vstack([X[group].mean(axis=0) for group in np.split(order, boundaries)])
+
+def get_principal_component_projections(X):
+    """
+    Project the centred data points onto their first principal component
+    :param X: Data points, shape (n_samples, n_features)
+    :return: Projections, shape (n_samples,)
+    """
+    X_centred = X - X.mean(axis=0)
+    # The first right singular vector is the direction of largest variance
+    _, _, right_singular_vectors = np.linalg.svd(X_centred, full_matrices=False)
+    return X_centred.dot(right_singular_vectors[0])
+
+
+# Seeding strategies that can be selected by name in DeterministicAnnealing(init=...)
+SEEDING_STRATEGIES = {
+    "random": random_centers,
+    "k-means++": kmeans_plusplus_centers,
+    "pca": pca_split_centers,
+    "quantile": quantile_centers,
+}
+
+def get_seeding_strategy(init):
+    """
+    Resolve the seeding strategy of a clustering model
+    :param init: A callable init(X, distribution, rng) returning the initial centers, or the name of a seeding
+    strategy: "random", "k-means++", "pca" (2 clusters only), or "quantile"
+    :return: Callable seeding strategy
+    """
+    if isinstance(init, str):
+        if init not in SEEDING_STRATEGIES:
+            raise ValueError(f"Unknown seeding strategy: {init}. Options are: {list(SEEDING_STRATEGIES.keys())}")
+        return SEEDING_STRATEGIES[init]
+
+    if not callable(init):
+        raise Exception("Seeding strategy is not callable")
+    return init
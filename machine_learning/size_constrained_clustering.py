@@ -5,13 +5,22 @@ To see changes made by Jaden Pinto, search for the comments containing "Jaden Pi
 """
 
 import collections
+import copy
 import logging
 import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
+from scipy import sparse
+from scipy.optimize import linprog
+from scipy.special import logsumexp
 from scipy.spatial.distance import cdist
 
+from machine_learning.distance_backends import get_distance_backend
+from machine_learning.seeding import get_seeding_strategy
+
 path = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(path)
 
@@ -25,12 +34,34 @@ class DeterministicAnnealing:
         distance_func=cdist,
         np_seed=None,
         T=None,
+        tol=None,
+        cooling_rate=0.999,
+        n_init=1,
+        n_jobs=None,
+        select_by="inertia",
+        init="random",
+        profiler=None,
     ):
         """
         Args:
             n_clusters (int): number of clusters
             distribution (list): a list of ratio distribution for each cluster
+            distance_func (callable or str): distance_func(X, centers) returning the n_samples x n_clusters distance
+                matrix, or the name of a distance backend. Backends with a prepare(X) method have it called once per fit
             T (list): inverse choice of beta coefficients
+            tol (float): stop annealing at a temperature once no center coordinate moves by more than tol between
+                iterations. None (default) always runs max_iters iterations unless the size constraints are satisfied
+            cooling_rate (float): factor the temperature is multiplied by after every iteration. 1.0 holds the
+                temperature fixed, which is used when warm-starting from an already annealed solution
+            n_init (int): number of restarts from different random initial centers, run concurrently. The restart with
+                the lowest select_by criterion is kept
+            n_jobs (int): number of threads running the restarts, defaults to min(n_init, number of CPUs)
+            select_by (str): criterion used to pick the best restart: "inertia" or "free_energy"
+            init (callable or str): seeding strategy of the initial centers at every temperature tried, init(X,
+                distribution, rng), or the name of a strategy: "random", "k-means++", "pca" or "quantile", see seeding.py
+            profiler (object): hook with an on_iteration method called at the end of every annealing iteration with the
+                seconds spent in each phase, e.g. an AnnealingTrace (see annealing_trace.py). None (default) disables
+                the timing of the phases
         """
 
         assert isinstance(n_clusters, int)
@@ -39,14 +70,32 @@ class DeterministicAnnealing:
         assert max_iters >= 1
         self.n_clusters = n_clusters
         self.max_iters = max_iters
-        if distance_func is not None and not callable(distance_func):
-            raise Exception("Distance function is not callable")
-        self.distance_func = distance_func
+        # Change made by Jaden Pinto: the distance function can also be the name of a distance backend
+        # ("sqeuclidean", "euclidean" or "mahalanobis"), see distance_backends.py
+        self.distance_func = get_distance_backend(distance_func)
 
         self.lamb = distribution
         assert round(np.sum(distribution), 10) == 1
         assert len(distribution) == n_clusters
         assert isinstance(T, list) or T is None
+        # Change made by Jaden Pinto: convergence tolerance and cooling rate, needed to warm-start the annealing
+        assert tol is None or tol > 0
+        assert 0 < cooling_rate <= 1
+        self.tol = tol
+        self.cooling_rate = cooling_rate
+        # Change made by Jaden Pinto: seeded restarts, so one random seed does not decide the result
+        assert isinstance(n_init, int)
+        assert n_init >= 1
+        assert n_jobs is None or (isinstance(n_jobs, int) and n_jobs >= 1)
+        assert select_by in ["inertia", "free_energy"]
+        self.n_init = n_init
+        self.n_jobs = n_jobs
+        self.select_by = select_by
+        # Change made by Jaden Pinto: the initial centers are picked by a seeding strategy
+        self.init = get_seeding_strategy(init)
+        # Change made by Jaden Pinto: optional profiling hook of the annealing iterations
+        assert profiler is None or callable(getattr(profiler, "on_iteration", None))
+        self.profiler = profiler
 
         self.beta = None
         self.T = T
@@ -69,8 +118,131 @@ class DeterministicAnnealing:
         # Within-Cluster Sum of Squares:
         # Sum of the squared distances between each data point and the centroid of the cluster it belongs to
         self.inertia_ = None
+        # Change made by Jaden Pinto
+        # Total number of annealing iterations run by the last call to fit (summed over all temperatures tried)
+        self.n_iter_ = None
+        # Change made by Jaden Pinto
+        # Hash-map of arrays with one value per restart: inertia, n_iter and fit_time (wall-clock seconds), and
+        # free_energy when the restarts are selected by it. The spread of the values shows how much the result depends
+        # on the random initial centers
+        self.restarts_ = None
+        # Index of the restart that was kept
+        self.best_restart_ = None
+
+    def fit(
+        self, X, demands_prob=None, enforce_cluster_distribution=False, init_centers=None, init_eta=None, start_T=None
+    ):
+        """
+        Args:
+            X (array): data points, shape (n_samples, n_features)
+            demands_prob (array): weight of each data point, defaults to uniform weights
+            enforce_cluster_distribution (bool or str): move points between clusters so the cluster sizes match the
+                distribution. Either True (greedy method) or the method name, see enforce_cluster_distribution
+            init_centers (array): warm-start centers, shape (n_clusters, n_features). Defaults to random data points
+            init_eta (array): warm-start eta (size constraint multipliers), shape (n_clusters,). Defaults to distribution
+            start_T (float): temperature to start annealing from. Only temperatures of the ladder below it are tried next
+        """
+        # Change made by Jaden Pinto
+        # Run n_init restarts, each on a copy of the model with its own random generator spawned from the model's one
+        # (so the restarts are reproducible given np_seed). NumPy releases the GIL in its heavy kernels, so the
+        # restarts run concurrently on a thread pool
+        fit_args = (X, demands_prob, enforce_cluster_distribution, init_centers, init_eta, start_T)
+
+        if self.n_init == 1:
+            # A single run uses the model's own random generator, giving the same result as before restarts were added
+            restart_models = [self]
+            fit_times = [self._timed_fit(self, fit_args)]
+        else:
+            restart_models = []
+            for restart_rng in self.rng.spawn(self.n_init):
+                restart_model = copy.deepcopy(self)
+                restart_model.rng = restart_rng
+                restart_models.append(restart_model)
+
+            n_jobs = self.n_jobs if self.n_jobs is not None else min(self.n_init, os.cpu_count() or 1)
+            with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+                fit_times = list(executor.map(lambda model: self._timed_fit(model, fit_args), restart_models))
+
+        self.restarts_ = {
+            "inertia": np.array([model.inertia_ for model in restart_models]),
+            "n_iter": np.array([model.n_iter_ for model in restart_models]),
+            "fit_time": np.array(fit_times),
+        }
+        # The free energy costs a pass over the data points, so it is only computed when it picks the best restart
+        if self.select_by == "free_energy" and self.n_init > 1:
+            self.restarts_["free_energy"] = np.array([model.free_energy(X) for model in restart_models])
+
+        if self.n_init == 1:
+            self.best_restart_ = 0
+        else:
+            # np.argmin returns the first NaN, which would silently keep a failed restart
+            restart_scores = self.restarts_[self.select_by]
+            if not np.all(np.isfinite(restart_scores)):
+                failed_restarts = np.flatnonzero(~np.isfinite(restart_scores)).tolist()
+                raise ValueError(f"Restarts with a non-finite {self.select_by}: {failed_restarts}")
+            self.best_restart_ = int(np.argmin(restart_scores))
+
+        # Keep the fitted state of the best restart, but not its random generator
+        if restart_models[self.best_restart_] is not self:
+            fitted_state = vars(restart_models[self.best_restart_]).copy()
+            del fitted_state["rng"]
+            del fitted_state["restarts_"]
+            del fitted_state["best_restart_"]
+            # Every restart profiles into its own copy of the profiler: the caller's profiler keeps the best one's trace
+            del fitted_state["profiler"]
+            vars(self).update(fitted_state)
+            if self.profiler is not None:
+                vars(self.profiler).update(vars(restart_models[self.best_restart_].profiler))
+
+    @staticmethod
+    def _timed_fit(model, fit_args):
+        """
+        Function added by Jaden Pinto
+        Fit one restart, returning the wall-clock seconds it took
+        """
+        start_time = time.perf_counter()
+        model._fit_single(*fit_args)
+        return time.perf_counter() - start_time
+
+    def free_energy(self, X, demands_prob=None):
+        """
+        Function added by Jaden Pinto
+        Free energy of the fitted model on the data points at the final temperature, the objective minimised by the
+        annealing: F = -T * sum_i p_i * log(sum_j eta_j * exp(-d_ij / T))
+        Args:
+            X (array): data points, shape (n_samples, n_features)
+            demands_prob (array): weight of each data point, defaults to the weights the model was fit with
+        """
+        demands_prob = self._get_free_energy_weights(X, demands_prob)
+        return -np.sum(demands_prob * self._log_partition(X)) / self.beta
 
-    def fit(self, X, demands_prob=None, enforce_cluster_distribution=False):
+    def _get_free_energy_weights(self, X, demands_prob):
+        """
+        Function added by Jaden Pinto
+        Normalised weights of the data points in the free energy: the given ones, else the ones the model was fit with,
+        else uniform weights
+        """
+        if demands_prob is None:
+            demands_prob = self._demands_prob
+        if demands_prob is None:
+            demands_prob = np.ones(X.shape[0])
+        demands_prob = np.asarray(demands_prob, dtype=float).reshape(-1)
+        assert demands_prob.shape[0] == X.shape[0]
+        return demands_prob / np.sum(demands_prob)
+
+    def _log_partition(self, X):
+        """
+        Function added by Jaden Pinto
+        Log of the partition function of every data point: log(sum_j eta_j * exp(-d_ij / T))
+        """
+        distance_matrix = self.distance_func(X, self.cluster_centers_)
+        eta = np.maximum(np.asarray(self._eta, dtype=float), 1e-300)
+        return logsumexp(-self.beta * distance_matrix, b=eta.reshape(1, -1), axis=1)
+
+    def _fit_single(self, X, demands_prob, enforce_cluster_distribution, init_centers, init_eta, start_T):
+        """
+        Change made by Jaden Pinto: a single annealing run, called by fit once per restart (arguments as in fit)
+        """
         # setting T, loop
         T = [1, 0.1, 1e-2, 1e-3, 1e-4, 1e-5, 1e-6, 1e-7, 1e-8]
         solutions = []
@@ -78,6 +250,25 @@ class DeterministicAnnealing:
         is_early_terminated = False
 
         n_samples, n_features = X.shape
+
+        # Change made by Jaden Pinto
+        # Warm start: resume the annealing from a previous solution (e.g. a model fit on almost the same data) instead
+        # of random centers at the top of the temperature ladder
+        if start_T is not None:
+            assert start_T > 0
+            T = [start_T] + [t for t in T if t < start_T]
+        if init_centers is not None:
+            init_centers = np.asarray(init_centers, dtype=float)
+            assert init_centers.shape == (self.n_clusters, n_features)
+        if init_eta is not None:
+            init_eta = np.asarray(init_eta, dtype=float)
+            assert init_eta.shape == (self.n_clusters,)
+        self.n_iter_ = 0
+
+        # Change made by Jaden Pinto: let the distance backend cache what does not change between iterations
+        if hasattr(self.distance_func, "prepare"):
+            self.distance_func.prepare(X)
+
         self.capacity = [n_samples * d for d in self.lamb]
         if demands_prob is None:
             demands_prob = np.ones((n_samples, 1))
@@ -85,23 +276,68 @@ class DeterministicAnnealing:
             demands_prob = np.asarray(demands_prob).reshape((-1, 1))
             assert demands_prob.shape[0] == X.shape[0]
         demands_prob = demands_prob / sum(demands_prob)
-        for t in T:
-            self.T = t
-            centers = self.initial_centers(X)
 
-            eta = self.lamb
+        # Change made by Jaden Pinto: clock timing the phases of the annealing iterations for the profiler
+        clock = time.perf_counter if self.profiler is not None else _stopped_clock
+
+        for t_index, t in enumerate(T):
+            self.T = t
+            # Change made by Jaden Pinto: the warm-start values only seed the first temperature tried
+            if t_index == 0 and init_centers is not None:
+                centers = init_centers.copy()
+            else:
+                centers = self.initial_centers(X)
+
+            if t_index == 0 and init_eta is not None:
+                eta = init_eta.copy()
+            else:
+                eta = self.lamb
             labels = None
             for _ in range(self.max_iters):
+                # Change made by Jaden Pinto: when profiled, the phases of the iteration are timed. Without a
+                # profiler, the clock is a constant, so the loop only pays for a few function calls
+                phase_start = clock()
                 self.beta = 1.0 / self.T
                 distance_matrix = self.distance_func(X, centers)
+                distance_end = clock()
                 eta = self.update_eta(eta, demands_prob, distance_matrix)
+                eta_end = clock()
                 gibbs = self.update_gibbs(eta, distance_matrix)
+                gibbs_end = clock()
+                previous_centers = centers
                 centers = self.update_centers(demands_prob, gibbs, X)
-                self.T *= 0.999
+                centers_end = clock()
+                temperature = self.T
+                self.T *= self.cooling_rate
+                self.n_iter_ += 1
 
+                previous_labels = labels
                 labels = np.argmax(gibbs, axis=1)
+                is_satisfied = self._is_satisfied(labels)
+
+                if self.profiler is not None:
+                    self.profiler.on_iteration(
+                        t_index,
+                        temperature,
+                        (
+                            distance_end - phase_start,
+                            eta_end - distance_end,
+                            gibbs_end - eta_end,
+                            centers_end - gibbs_end,
+                            clock() - centers_end
+                        ),
+                        distance_matrix,
+                        eta,
+                        demands_prob,
+                        labels,
+                        previous_labels
+                    )
 
-                if self._is_satisfied(labels):
+                if is_satisfied:
+                    break
+
+                # Change made by Jaden Pinto: stop once the centers have converged at this temperature
+                if self.tol is not None and np.max(np.abs(centers - previous_centers)) <= self.tol:
                     break
 
             solutions.append([labels, centers])
@@ -124,7 +360,11 @@ class DeterministicAnnealing:
         self._demands_prob = demands_prob
 
         if enforce_cluster_distribution:
-            self.enforce_cluster_distribution(X)
+            # Change made by Jaden Pinto: the enforcement method ("greedy" or "exact") can be passed instead of True
+            if isinstance(enforce_cluster_distribution, str):
+                self.enforce_cluster_distribution(X, method=enforce_cluster_distribution)
+            else:
+                self.enforce_cluster_distribution(X)
 
         # Changes made by Jaden Pinto
         # Added as a metric to evaluate cluster performance
@@ -133,20 +373,61 @@ class DeterministicAnnealing:
         squared_distances = np.sum((X - cluster_centers) ** 2, axis=1)
         self.inertia_ = np.sum(squared_distances)
 
-    def predict(self, X): # Fix shape issue
-        distance_matrix = self.distance_func(X, self.cluster_centers_)
+    def predict(self, X, distribution=None, return_proba=False): # Fix shape issue
+        """
+        Args:
+            X (array): data points, shape (n_samples, n_features)
+            distribution (list): if given, the data points are assigned to clusters such that the cluster sizes match
+                this distribution, with the minimum total distance to the cluster centers (change made by Jaden Pinto)
+            return_proba (bool): also return the Gibbs probabilities of each data point belonging to each cluster
+        Returns:
+            labels, or (labels, gibbs) if return_proba
+        """
         # Change made by Jaden Pinto
-        # Create a new demands_prob array with the correct shape for prediction data
-        # GenAI: Claude was used to generate the following two lines of code
-        new_demands_prob = np.ones((X.shape[0], 1))
-        new_demands_prob = new_demands_prob / np.sum(new_demands_prob)
-
-        # Use the stored eta values but with the new demands_prob
-        eta = self.update_eta(self._eta, new_demands_prob, distance_matrix)
-        gibbs = self.update_gibbs(eta, distance_matrix)
-        labels = np.argmax(gibbs, axis=1)
+        # The distance matrix is computed once, and reused for the Gibbs probabilities and the size-constrained assignment
+        distance_matrix, gibbs = self._predict_gibbs(X)
+
+        if distribution is None:
+            labels = np.argmax(gibbs, axis=1)
+        else:
+            assert round(np.sum(distribution), 10) == 1
+            assert len(distribution) == self.n_clusters
+            # Given the cluster sizes, minimising the total distance also maximises the total log Gibbs probability, as
+            # -log(gibbs) = beta * distance - log(eta) + (a constant per data point)
+            labels = size_constrained_assignment(distance_matrix, get_cluster_allocation(distribution, X.shape[0]))
+
+        if return_proba:
+            return labels, gibbs
         return labels
 
+    # Function added by Jaden Pinto
+    def predict_proba(self, X):
+        """
+        Obtain the Gibbs probabilities of new data points belonging to each cluster, shape (n_samples, n_clusters)
+        """
+        _, gibbs = self._predict_gibbs(X)
+        return gibbs
+
+    # Function added by Jaden Pinto
+    def _predict_gibbs(self, X):
+        """
+        Update eta once using the new data points (each with the same weight), and compute the Gibbs probabilities of
+        the new data points. Equivalent to update_eta followed by update_gibbs, computing the exponential term once.
+        :return: distance matrix and Gibbs probabilities, both of shape (n_samples, n_clusters)
+        """
+        distance_matrix = self.distance_func(X, self.cluster_centers_)
+        exp_term = np.exp(-self.beta * distance_matrix)
+        epsilon = 1e-8 # 10 ^ -8 = 0.00000001
+
+        # Use the stored eta values but with uniform demands_prob for the prediction data
+        sum_term = np.maximum(exp_term.dot(np.asarray(self._eta)), epsilon).reshape((-1, 1))
+        denominator_term = np.maximum(np.mean(exp_term / sum_term, axis=0), epsilon)
+        eta = np.divide(np.asarray(self.lamb), denominator_term)
+
+        factor = exp_term * eta
+        gibbs = factor / np.maximum(np.sum(factor, axis=1).reshape((-1, 1)), epsilon)
+        return distance_matrix, gibbs
+
     def modify(self, labels, centers, distance_matrix):
         centers_distance = self.distance_func(centers, centers)
         adjacent_centers = {
@@ -180,11 +461,8 @@ class DeterministicAnnealing:
         return labels
 
     def initial_centers(self, X):
-        # selective_centers = random.sample(range(X.shape[0]), self.n_clusters)
-        selective_centers = self.rng.choice(
-            range(X.shape[0]), size=self.n_clusters, replace=False
-        )
-        centers = X[selective_centers]
+        # Change made by Jaden Pinto: delegate to the seeding strategy ("random" picks k data points, as before)
+        centers = self.init(X, self.lamb, self.rng)
         return centers
 
     def _is_satisfied(self, labels):
@@ -248,7 +526,7 @@ class DeterministicAnnealing:
         centers = np.divide(divide_up, p_y_repmat)
         return centers
 
-    def enforce_cluster_distribution(self, X):
+    def enforce_cluster_distribution(self, X, method="greedy"):
         """
         This function enforces the distribution of labels in the clusters.
         It does so by moving the datapoints from the clusters with too many datapoints
@@ -261,6 +539,11 @@ class DeterministicAnnealing:
             The distribution of labels in the data.
         model : DeterministicAnnealing
             The fitted clustering model.
+        method : str
+            "greedy" moves the point furthest from an oversized cluster's center, one point at a time.
+            "exact" (change made by Jaden Pinto) assigns all points at once with the minimum total distance to
+            their centers (measured by the model's distance function), given the cluster sizes, see
+            size_constrained_assignment.
         """
 
         n_samples = len(X)
@@ -269,7 +552,17 @@ class DeterministicAnnealing:
         distribution = self.lamb
 
         # Obtain the expected number of labels in each cluster as integer
-        expected_allocation = (np.array(distribution) * n_samples).round().astype(int)
+        expected_allocation = get_cluster_allocation(distribution, n_samples)
+
+        # Change made by Jaden Pinto
+        if method == "exact":
+            # The distances are measured as in the annealing (e.g. squared Euclidean or Mahalanobis backends)
+            labels = size_constrained_assignment(self.distance_func(X, centers), expected_allocation)
+            self.labels_ = labels
+            return labels, np.bincount(labels, minlength=len(expected_allocation))
+        elif method != "greedy":
+            raise ValueError(f"Unknown cluster distribution enforcement method: {method}")
+
         resulting_allocation = np.bincount(labels, minlength=len(expected_allocation))
 
         while not np.array_equal(expected_allocation, resulting_allocation):
@@ -356,6 +649,385 @@ class DeterministicAnnealing:
 
         return total
 
+def _stopped_clock():
+    """
+    Function added by Jaden Pinto
+    Clock of the annealing iterations when they are not profiled
+    """
+    return 0.0
+
+# Function added by Jaden Pinto
+def get_cluster_allocation(distribution, n_samples):
+    """
+    Obtain the number of data points expected in each cluster, as integers that sum up to the number of data points.
+    Each cluster's share is rounded; if the rounded shares do not sum up to n_samples, the difference is made up by
+    the clusters with the largest (or smallest) remainders.
+
+    :param distribution: Ratio of data points in each cluster
+    :param n_samples: Number of data points
+    :return: Array of the number of data points in each cluster
+    """
+    shares = np.asarray(distribution, dtype=float) * n_samples
+    allocation = shares.round().astype(int)
+
+    difference = n_samples - np.sum(allocation)
+    if difference > 0:
+        allocation[np.argsort(allocation - shares)[:difference]] += 1
+    elif difference < 0:
+        allocation[np.argsort(shares - allocation)[:-difference]] -= 1
+
+    return allocation
+
+# Function added by Jaden Pinto
+def size_constrained_assignment(cost_matrix, allocation):
+    """
+    Assign every data point to a cluster such that each cluster has exactly the specified number of data points, and
+    the total cost (e.g. distance of each data point to its cluster's center) is minimal.
+
+    Two clusters: a data point moved from cluster 1 to cluster 0 changes the total cost by cost[:, 0] - cost[:, 1], so
+    sorting the data points on this difference, and assigning the first allocation[0] of them to cluster 0, is optimal
+    (any other assignment can be improved by swapping a pair of points that is out of order). O(n log n).
+
+    More clusters: the assignment is a transportation problem, solved as a linear program with the HiGHS dual simplex.
+    Its constraint matrix is totally unimodular, so the optimal (vertex) solution is integral.
+
+    :param cost_matrix: Cost of assigning each data point to each cluster, shape (n_samples, n_clusters)
+    :param allocation: Number of data points in each cluster, summing up to n_samples
+    :return: Array of the cluster assigned to each data point
+    """
+    cost_matrix = np.asarray(cost_matrix, dtype=float)
+    n_samples, n_clusters = cost_matrix.shape
+    allocation = np.asarray(allocation, dtype=int)
+    assert allocation.shape == (n_clusters,)
+    assert np.sum(allocation) == n_samples
+
+    if n_clusters == 1:
+        return np.zeros(n_samples, dtype=int)
+
+    if n_clusters == 2:
+        labels = np.ones(n_samples, dtype=int)
+        order = np.argsort(cost_matrix[:, 0] - cost_matrix[:, 1], kind="stable")
+        labels[order[:allocation[0]]] = 0
+        return labels
+
+    # Variable x[i, j] (flattened to i * n_clusters + j) is 1 if data point i is assigned to cluster j
+    point_constraints = sparse.kron(sparse.identity(n_samples), np.ones((1, n_clusters)))  # one cluster per point
+    cluster_constraints = sparse.kron(np.ones((1, n_samples)), sparse.identity(n_clusters))  # cluster sizes
+    result = linprog(
+        cost_matrix.ravel(),
+        A_eq=sparse.vstack([point_constraints, cluster_constraints]).tocsr(),
+        b_eq=np.concatenate([np.ones(n_samples), allocation]),
+        bounds=(0, 1),
+        method="highs-ds",
+    )
+    if not result.success:
+        raise ValueError(f"Size constrained assignment failed: {result.message}")
+
+    return np.argmax(result.x.reshape(n_samples, n_clusters), axis=1)
+
+
+# Class added by Jaden Pinto
+class MiniBatchDeterministicAnnealing(DeterministicAnnealing):
+    """
+    Mini-batch variant of the deterministic annealing size-constrained clustering for datasets too large to hold the
+    n_samples x n_clusters distance and Gibbs matrices in memory (e.g. all units of assessment, or several REF cycles).
+
+    Every iteration draws a batch of data points: with uniform weights, the batches are consecutive slices of a
+    shuffled pass over the data (without replacement), otherwise they are drawn with probability proportional to the
+    weights. The eta (size constraint multipliers) computed on the batch is blended into a running estimate with a
+    decaying step size: step = (1 + iteration) ^ -step_size_power. Every center moves towards the (Gibbs weighted) mean of
+    the batch's points with its own learning rate: the mass of the batch in the cluster over the mass the cluster has
+    received so far at this temperature, as in mini-batch k-means. Both rates are floored at batch_size / n_samples, so
+    the running estimates keep tracking the annealing. With uniform weights and batch_size = n_samples, every batch holds
+    all the data points and every rate is 1, so the full-batch algorithm is recovered.
+    As in the full-batch algorithm, the annealing at a temperature stops once the labels of the batch satisfy the size
+    constraints (scaled to the batch), and the size constraints defined by the distribution are enforced through eta.
+    The labels are obtained by a final labelling pass over all data points, one batch at a time, so memory is bounded by
+    the batch size.
+    Prediction (labels and Gibbs probabilities), the free energy and the inertia are also computed one batch at a time.
+    The greedy enforcement of the cluster distribution computes one distance per data point for every point it moves,
+    never the n_samples x n_clusters matrix.
+    Two paths are not memory-bounded, as they solve a single assignment problem over all data points: the "exact"
+    enforcement of the cluster distribution, and predict with a distribution. Both build the n_samples x n_clusters
+    distance matrix and a linear program of that size (see size_constrained_assignment).
+    """
+    def __init__(
+        self,
+        n_clusters,
+        distribution,
+        batch_size=1024,
+        max_iters=1000,
+        distance_func=cdist,
+        np_seed=None,
+        T=None,
+        tol=None,
+        cooling_rate=0.999,
+        step_size_power=0.6,
+        n_init=1,
+        n_jobs=None,
+        select_by="inertia",
+        init="random",
+    ):
+        """
+        Args:
+            batch_size (int): number of data points drawn every iteration, and processed at a time when labelling
+            step_size_power (float): decay of the step size of eta, in (0.5, 1] so the running estimate converges
+            Remaining arguments are the same as DeterministicAnnealing
+        """
+        super().__init__(
+            n_clusters,
+            distribution,
+            max_iters=max_iters,
+            distance_func=distance_func,
+            np_seed=np_seed,
+            T=T,
+            tol=tol,
+            cooling_rate=cooling_rate,
+            n_init=n_init,
+            n_jobs=n_jobs,
+            select_by=select_by,
+            init=init,
+        )
+        assert isinstance(batch_size, int)
+        assert batch_size >= 1
+        assert 0.5 < step_size_power <= 1
+        self.batch_size = batch_size
+        self.step_size_power = step_size_power
+
+    def _fit_single(self, X, demands_prob, enforce_cluster_distribution, init_centers, init_eta, start_T):
+        """
+        Mini-batch annealing run, called by DeterministicAnnealing.fit once per restart
+        Args:
+            X (array): data points, shape (n_samples, n_features)
+            demands_prob (array): weight of each data point, defaults to uniform weights. Batches are drawn without
+                replacement given uniform weights, and with probability proportional to the weights otherwise
+            Remaining arguments are the same as DeterministicAnnealing.fit
+        """
+        T = [1, 0.1, 1e-2, 1e-3, 1e-4, 1e-5, 1e-6, 1e-7, 1e-8]
+        solutions = []
+        diff_list = []
+        is_early_terminated = False
+
+        n_samples, n_features = X.shape
+        self.capacity = [n_samples * d for d in self.lamb]
+        batch_size = min(self.batch_size, n_samples)
+
+        # Cumulative weights: a weighted batch is drawn by binary searching uniform random numbers, rather than
+        # rng.choice with probabilities, which costs O(n_samples) per call
+        cumulative_demands = None
+        if demands_prob is None:
+            demands_prob = np.full((n_samples, 1), 1.0 / n_samples)
+        else:
+            demands_prob = np.asarray(demands_prob, dtype=float).reshape((-1, 1))
+            assert demands_prob.shape[0] == n_samples
+            # Normalised as in the full-batch algorithm, so the weights stored for the free energy sum up to 1
+            demands_prob = demands_prob / np.sum(demands_prob)
+            cumulative_demands = np.cumsum(demands_prob)
+            cumulative_demands /= cumulative_demands[-1]
+
+        # Pass over the data the uniform batches are sliced from, shuffled when the batches are smaller than the data (a
+        # batch of all data points needs no shuffling, so it draws the same random numbers as the full-batch algorithm)
+        permutation = np.arange(n_samples)
+        batch_position = n_samples if batch_size < n_samples else 0
+
+        if start_T is not None:
+            assert start_T > 0
+            T = [start_T] + [t for t in T if t < start_T]
+        if init_centers is not None:
+            init_centers = np.asarray(init_centers, dtype=float)
+            assert init_centers.shape == (self.n_clusters, n_features)
+        if init_eta is not None:
+            init_eta = np.asarray(init_eta, dtype=float)
+            assert init_eta.shape == (self.n_clusters,)
+        self.n_iter_ = 0
+
+        # Batches are new arrays, so only state computed from all data points (e.g. the Mahalanobis covariance) is reused.
+        # For float64 data the squared Euclidean backend keeps a reference to X, not a copy
+        if hasattr(self.distance_func, "prepare"):
+            self.distance_func.prepare(X)
+
+        # Every point of a batch has the same weight
+        batch_demands_prob = np.full((batch_size, 1), 1.0 / batch_size)
+        # Size of every cluster allowed by the size constraints in a batch
+        batch_capacity = np.asarray(self.lamb) * batch_size
+
+        for t_index, t in enumerate(T):
+            self.T = t
+            if t_index == 0 and init_centers is not None:
+                centers = init_centers.copy()
+            else:
+                centers = self.initial_centers(X)
+
+            if t_index == 0 and init_eta is not None:
+                eta = init_eta.copy()
+            else:
+                eta = np.asarray(self.lamb, dtype=float)
+
+            # Mass (number of data points, weighted by the Gibbs probabilities) every cluster received at this temperature
+            cluster_masses = np.zeros(self.n_clusters)
+            # Lowest learning rate, so the running estimates keep tracking the annealing
+            min_step_size = batch_size / n_samples
+            epsilon = 1e-8 # 10 ^ -8 = 0.00000001
+
+            for iteration in range(self.max_iters):
+                self.beta = 1.0 / self.T
+                if cumulative_demands is None:
+                    # Next slice of the shuffled pass, reshuffling once the pass is exhausted
+                    if batch_position + batch_size > n_samples:
+                        if batch_size < n_samples:
+                            permutation = self.rng.permutation(n_samples)
+                        batch_position = 0
+                    batch_index = permutation[batch_position:batch_position + batch_size]
+                    batch_position += batch_size
+                else:
+                    batch_index = np.searchsorted(cumulative_demands, self.rng.random(batch_size), side="right")
+                    batch_index = np.minimum(batch_index, n_samples - 1)
+                X_batch = X[batch_index]
+
+                # Decaying step size of eta, floored at the fraction of the data seen per batch
+                step_size = max((1.0 + iteration) ** -self.step_size_power, min_step_size)
+
+                distance_matrix = self.distance_func(X_batch, centers)
+                batch_eta = self.update_eta(eta, batch_demands_prob, distance_matrix)
+                eta = (1 - step_size) * eta + step_size * batch_eta
+                gibbs = self.update_gibbs(eta, distance_matrix)
+
+                # Every center moves towards the mean of the batch's points in its cluster, with a learning rate of the
+                # batch's mass in the cluster over the cluster's mass so far
+                batch_masses = np.sum(gibbs, axis=0)
+                cluster_masses += batch_masses
+                batch_means = gibbs.T.dot(X_batch) / np.maximum(batch_masses, epsilon).reshape(-1, 1)
+                learning_rates = np.maximum(batch_masses / np.maximum(cluster_masses, epsilon), min_step_size)
+                # A cluster the batch has no point in keeps its center
+                learning_rates[batch_masses < epsilon] = 0
+
+                previous_centers = centers
+                centers = centers + learning_rates.reshape(-1, 1) * (batch_means - centers)
+                self.T *= self.cooling_rate
+                self.n_iter_ += 1
+
+                # Stop once the labels of the batch satisfy the size constraints (scaled to the batch), as the
+                # full-batch algorithm does on all data points
+                batch_counts = np.bincount(np.argmax(gibbs, axis=1), minlength=self.n_clusters)
+                if np.all(batch_counts > 0) and np.all(batch_counts <= batch_capacity):
+                    break
+
+                if self.tol is not None and np.max(np.abs(centers - previous_centers)) <= self.tol:
+                    break
+
+            # Final labelling pass over all data points, with the centers the last Gibbs probabilities were computed
+            # with, as the full-batch algorithm labels the data points
+            labels = self._label_in_batches(X, previous_centers, eta)
+
+            solutions.append([labels, centers, eta])
+            resultant_clusters = len(np.unique(labels))
+
+            diff_list.append(abs(resultant_clusters - self.n_clusters))
+            if resultant_clusters == self.n_clusters:
+                is_early_terminated = True
+                break
+
+        if not is_early_terminated:
+            best_index = np.argmin(diff_list)
+            labels, centers, eta = solutions[best_index]
+
+        self.cluster_centers_ = centers
+        self.labels_ = labels
+        self._eta = eta
+        self._demands_prob = demands_prob
+
+        if enforce_cluster_distribution:
+            # The enforcement method ("greedy" or "exact") can be passed instead of True, as in the full-batch algorithm
+            if isinstance(enforce_cluster_distribution, str):
+                self.enforce_cluster_distribution(X, method=enforce_cluster_distribution)
+            else:
+                self.enforce_cluster_distribution(X)
+
+        # Within-Cluster Sum of Squares, accumulated one batch at a time
+        self.inertia_ = 0.0
+        for batch_start in range(0, n_samples, self.batch_size):
+            batch_end = batch_start + self.batch_size
+            cluster_centers = self.cluster_centers_[self.labels_[batch_start:batch_end]]
+            self.inertia_ += np.sum((X[batch_start:batch_end] - cluster_centers) ** 2)
+
+    def predict(self, X, distribution=None, return_proba=False):
+        """
+        Predict the clusters of new data points, one batch at a time. As in DeterministicAnnealing.predict, eta is
+        updated once using the new data points (with uniform weights) before assigning them to clusters.
+        A size-constrained assignment (given a distribution) solves a linear program over all data points, so it is
+        computed by DeterministicAnnealing.predict and is not memory-bounded.
+        """
+        if distribution is not None:
+            return super().predict(X, distribution=distribution, return_proba=return_proba)
+
+        eta = self._predict_eta(X)
+        if not return_proba:
+            return self._label_in_batches(X, self.cluster_centers_, eta)
+
+        gibbs = self._gibbs_in_batches(X, self.cluster_centers_, eta)
+        return np.argmax(gibbs, axis=1), gibbs
+
+    def predict_proba(self, X):
+        """
+        Gibbs probabilities of new data points belonging to each cluster, shape (n_samples, n_clusters), computed one
+        batch at a time (see DeterministicAnnealing.predict_proba)
+        """
+        return self._gibbs_in_batches(X, self.cluster_centers_, self._predict_eta(X))
+
+    def _predict_eta(self, X):
+        """
+        Update eta once using the new data points (each with the same weight), one batch at a time, as
+        DeterministicAnnealing._predict_gibbs does on all data points
+        """
+        n_samples = X.shape[0]
+        demands_prob = np.full((n_samples, 1), 1.0 / n_samples)
+
+        # The eta update sums the (normalised) Gibbs factors over all points, which is accumulated batch by batch
+        denominator_term = np.zeros(self.n_clusters)
+        for batch_start in range(0, n_samples, self.batch_size):
+            batch_end = batch_start + self.batch_size
+            distance_matrix = self.distance_func(X[batch_start:batch_end], self.cluster_centers_)
+            exp_term = np.exp(-self.beta * distance_matrix)
+            sum_term = np.maximum(np.sum(exp_term * np.asarray(self._eta), axis=1).reshape((-1, 1)), 1e-8)
+            denominator_term += np.sum(exp_term / sum_term * demands_prob[batch_start:batch_end], axis=0)
+        return np.divide(np.asarray(self.lamb), np.maximum(denominator_term, 1e-8))
+
+    def free_energy(self, X, demands_prob=None):
+        """
+        Free energy of the fitted model (see DeterministicAnnealing.free_energy), accumulated one batch at a time so
+        memory is bounded by the batch size
+        """
+        demands_prob = self._get_free_energy_weights(X, demands_prob)
+        weighted_log_partition = 0.0
+        for batch_start in range(0, X.shape[0], self.batch_size):
+            batch_end = batch_start + self.batch_size
+            batch_log_partition = self._log_partition(X[batch_start:batch_end])
+            weighted_log_partition += np.sum(demands_prob[batch_start:batch_end] * batch_log_partition)
+        return -weighted_log_partition / self.beta
+
+    def _label_in_batches(self, X, centers, eta):
+        """
+        Assign every data point to the cluster with the highest Gibbs probability, processing one batch at a time
+        """
+        labels = np.empty(X.shape[0], dtype=int)
+        for batch_start in range(0, X.shape[0], self.batch_size):
+            batch_end = batch_start + self.batch_size
+            distance_matrix = self.distance_func(X[batch_start:batch_end], centers)
+            gibbs = self.update_gibbs(eta, distance_matrix)
+            labels[batch_start:batch_end] = np.argmax(gibbs, axis=1)
+        return labels
+
+    def _gibbs_in_batches(self, X, centers, eta):
+        """
+        Gibbs probabilities of every data point, shape (n_samples, n_clusters), processing one batch at a time
+        """
+        gibbs = np.empty((X.shape[0], self.n_clusters))
+        for batch_start in range(0, X.shape[0], self.batch_size):
+            batch_end = batch_start + self.batch_size
+            distance_matrix = self.distance_func(X[batch_start:batch_end], centers)
+            gibbs[batch_start:batch_end] = self.update_gibbs(eta, distance_matrix)
+        return gibbs
+
 """
 Adding epsilon prevents this warning: RuntimeWarning: invalid value encountered in divide
 """
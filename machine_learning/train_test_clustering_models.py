@@ -1,16 +1,31 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from sklearn import config_context
 from sklearn.preprocessing import StandardScaler, MinMaxScaler
 from scipy.spatial.distance import cdist
 
 from machine_learning.cluster_performance_evaluation import get_cluster_evaluation_metrics, \
-    update_total_evaluation_metrics, compute_cluster_evaluation_metrics, compute_clustering_accuracy, \
-    update_total_divergence_metrics, get_divergence_metrics, compute_divergence_metrics
+    compute_cluster_evaluation_metrics, compute_clustering_accuracy, get_divergence_metrics, compute_divergence_metrics, \
+    bootstrap_accuracy_metrics, CLUSTER_EVALUATION_METRICS
 
 from machine_learning.cs_output_results import enhance_score_distribution, get_cs_output_results, \
     get_high_scoring_universities
 from machine_learning.feature_engineering import get_cs_outputs_df
-from machine_learning.high_low_output_comparison import analyse_clusters
-
+from machine_learning.feature_significance import get_significance_features, get_feature_significance, \
+    summarise_feature_significance, log_feature_significance_summary
+from machine_learning.fold_metrics import FoldMetrics, log_fold_metrics_summary
+from machine_learning.output_type_cube import OutputTypeCube, get_axis_codes, log_output_type_clusters
+from machine_learning.high_low_output_comparison import analyse_clusters, compare_clusters, save_feature_comparison, \
+    FEATURE_TYPES, CATEGORICAL_FEATURES
+
+from machine_learning.annealing_trace import AnnealingTrace
 from machine_learning.size_constrained_clustering import DeterministicAnnealing
+from utils.constants import CS_UOA
+from utils.instrumentation import span, log_instrumentation_summary, get_rss, get_peak_rss, observe_rss
 
 
 def main():
@@ -33,31 +48,43 @@ def main():
 
     Leave_one_out_cross_validation(features)
 
-def cluster_journal_metrics(
-        train_df, predict_df, features, n_clusters, distribution, random_state=42,
-        scale="Standard", handle_missing_data="Median"
-):
-    """
-    Using training-data, train a clustering model that is constrained by size defined by the specified distribution.
-    Use the trained cluster, to predict the cluster assignments of all data-points in the test-set
-    Apply pre-processing like handling missing values and scaling data
+    # Keep only the features of the outputs in memory, and bound the memory of the silhouette score (same results)
+    # Leave_one_out_cross_validation(features, lean=True)
 
-    :param train_df: Data-points used to train the cluster models
-    :param predict_df: Data-points used to test the cluster models
+    # Where time went across the folds of the cross-validation(s)
+    log_instrumentation_summary()
+
+    # Cross-validate several units of assessment in parallel (their enriched metadata must be partitioned by UoA)
+    # cross_validate_uoas(features, uoas=[11, 12])
+
+    # Compare the cost and accuracy of cold-started folds against folds warm-started from fits excluding their outputs
+    # compare_warm_start(features)
+
+# Convergence tolerance of warm-started folds: stop once no cluster center coordinate moves by more than this amount
+WARM_START_TOL = 1e-6
+
+# Number of blocks of universities the warm-started folds are split into. Every block's folds are seeded from a
+# reference fit on the outputs of all other universities, so no fold is seeded from its own testing outputs
+WARM_START_BLOCKS = 5
+
+# Memory (MB) Scikit-learn may use at a time for the pairwise distances of the silhouette score in the lean mode of the
+# cross-validation. By default, the n_train x n_train distance matrix is computed at once (~400 MB for CS)
+LEAN_WORKING_MEMORY = 64
+
+# Number of bootstrap resamples of the institutions (folds) behind the confidence intervals of the accuracy metrics
+N_BOOTSTRAP_RESAMPLES = 10000
+
+# Number of permutations of the cluster labels behind the permutation tests of the features distinguishing the clusters
+FEATURE_SIGNIFICANCE_PERMUTATIONS = 1000
+
+def impute_missing_values(train, features, handle_missing_data):
+    """
+    Replace the missing values of each feature in the training data with a statistic of the training data
+    :param train: Data-points used to train the cluster models (modified in place)
     :param features: List of features used to train the clustering models
-    :param n_clusters: Number of clusters (2 - high- and low-scoring outputs)
-    :param distribution: Distribution of training data for high- and low-scoring outputs
-    :param random_state: Random seed
-    :param scale: Scaling technique applied in pre-processing. Values are "Standard" or "Normal"
     :param handle_missing_data: Statistic for replacing missing values: "Mean", "Median", or "Mode"
-    :return:
-        1. train: Data-points used to train model with cluster assignments
-        2. predicted: Data-points used to test model with clustering assignments
-        3. cluster_evaluation_metrics: Metrics used to assess the clusters created using the training data
+    :return: Hashmap mapping each feature to the statistic used to replace its missing values
     """
-    # Make a copy of the input dataframes
-    train = train_df.copy()
-
     # Hashmap mapping each feature to the statistic used to replace missing values - mean, median, or mode.
     # The statistics are obtained from the training data to avoid leaking information while testing models
     imputation_values = {}
@@ -82,14 +109,144 @@ def cluster_journal_metrics(
             imputation_values[feature] = mode_value.iloc[0] if not mode_value.empty else None
             train[feature] = train[feature].fillna(imputation_values[feature])
 
+    return imputation_values
+
+def get_scaler(scale):
+    """
+    Obtain an (unfitted) scaler for the specified scaling technique
+    :param scale: Scaling technique applied in pre-processing. Values are "Standard" or "Normal"
+    :return: Scikit-learn scaler
+    """
+    if scale == "Standard":
+        return StandardScaler()
+    elif scale == "Normal":
+        return MinMaxScaler()
+
+def fit_warm_start_reference(
+        cs_outputs_df, features, n_clusters, distribution, random_state=42, scale="Standard", handle_missing_data="Median"
+):
+    """
+    Fit a single clustering model on the outputs of a set of universities. LOOCV folds differ only by a few
+    universities' outputs, so the annealed solution of this model is a good starting point for the folds whose testing
+    university is not among them.
+
+    :param cs_outputs_df: Data-points (outputs) of the universities the reference is fit on
+    :param features: List of features used to train the clustering models
+    :param n_clusters: Number of clusters (2 - high- and low-scoring outputs)
+    :param distribution: Distribution of high- and low-scoring outputs across these universities
+    :param random_state: Random seed
+    :param scale: Scaling technique applied in pre-processing. Values are "Standard" or "Normal"
+    :param handle_missing_data: Statistic for replacing missing values: "Mean", "Median", or "Mode"
+    :return: Hashmap with the annealed solution used to warm-start folds:
+        1. centers: Cluster centers in the original (unscaled) feature space, as each fold fits its own scaler
+        2. eta: Size constraint multipliers of the clusters
+        3. T: Temperature the annealing stopped at
+        4. n_iter: Number of annealing iterations the reference fit took
+        5. fit_time: Wall-clock seconds the reference fit took
+    """
+    reference = cs_outputs_df.copy()
+    impute_missing_values(reference, features, handle_missing_data)
+
+    scaler = get_scaler(scale)
+    X_reference_scaled = scaler.fit_transform(reference[features].values)
+
+    model = DeterministicAnnealing(
+        n_clusters=n_clusters,
+        distribution=distribution,
+        max_iters=3000,
+        distance_func=cdist,
+        np_seed=random_state,
+        T=None
+    )
+
+    fit_start_time = time.perf_counter()
+    model.fit(X_reference_scaled)
+    fit_time = time.perf_counter() - fit_start_time
+
+    return {
+        "centers": scaler.inverse_transform(model.cluster_centers_),
+        "eta": model._eta,
+        "T": model.T,
+        "n_iter": model.n_iter_,
+        "fit_time": fit_time
+    }
+
+def fit_warm_start_references(cs_outputs_df, cs_output_results_df, features, n_blocks=WARM_START_BLOCKS):
+    """
+    Split the universities into blocks, and fit one warm-start reference per block on the outputs of all universities
+    outside the block, so that the reference seeding a fold has never seen the fold's testing outputs
+    :param cs_outputs_df: Data-points (outputs) of all universities
+    :param cs_output_results_df: Counts of the high- and low-scoring outputs of every university
+    :param features: List of features used to train the clustering models
+    :param n_blocks: Number of blocks (reference fits), at most one per university
+    :return: Hashmap of the UKPRN code of every university to the reference seeding its fold
+    """
+    ukprns = cs_output_results_df['Institution code (UKPRN)'].to_numpy()
+
+    references = {}
+    for block_ukprns in np.array_split(ukprns, min(n_blocks, len(ukprns))):
+        is_block_result = cs_output_results_df['Institution code (UKPRN)'].isin(block_ukprns)
+        is_block_output = cs_outputs_df['Institution UKPRN code'].isin(block_ukprns)
+
+        # Distribution of high- and low-scoring outputs of the universities outside the block
+        high_scoring_output_count = cs_output_results_df.loc[~is_block_result, 'high_scoring_outputs'].sum()
+        low_scoring_output_count = cs_output_results_df.loc[~is_block_result, 'low_scoring_outputs'].sum()
+        output_count = high_scoring_output_count + low_scoring_output_count
+
+        reference = fit_warm_start_reference(
+            cs_outputs_df[~is_block_output],
+            features=features,
+            n_clusters=2,
+            distribution=[high_scoring_output_count / output_count, low_scoring_output_count / output_count],
+            scale="Standard",
+            handle_missing_data="Median"
+        )
+        for ukprn in block_ukprns:
+            references[ukprn] = reference
+
+    return references
+
+def cluster_journal_metrics(
+        train_df, predict_df, features, n_clusters, distribution, random_state=42,
+        scale="Standard", handle_missing_data="Median", warm_start=None, n_init=1, init="random", profiler=None
+):
+    """
+    Using training-data, train a clustering model that is constrained by size defined by the specified distribution.
+    Use the trained cluster, to predict the cluster assignments of all data-points in the test-set
+    Apply pre-processing like handling missing values and scaling data
+
+    :param train_df: Data-points used to train the cluster models
+    :param predict_df: Data-points used to test the cluster models
+    :param features: List of features used to train the clustering models
+    :param n_clusters: Number of clusters (2 - high- and low-scoring outputs)
+    :param distribution: Distribution of training data for high- and low-scoring outputs
+    :param random_state: Random seed
+    :param scale: Scaling technique applied in pre-processing. Values are "Standard" or "Normal"
+    :param handle_missing_data: Statistic for replacing missing values: "Mean", "Median", or "Mode"
+    :param warm_start: Annealed solution returned by fit_warm_start_reference used to seed the model. If None, the
+    model is annealed from random centers over the full temperature ladder
+    :param n_init: Number of restarts from different random centers, the restart with the lowest inertia is kept.
+    Only used for cold starts, as the restarts of a warm start would all begin from the same centers
+    :param init: Seeding strategy of the initial cluster centers: "random", "k-means++", "pca", or "quantile".
+    Only used for cold starts
+    :param profiler: Hook recording every annealing iteration of the fit, e.g. an AnnealingTrace (None: not profiled)
+    :return:
+        1. train: Data-points used to train model with cluster assignments
+        2. predicted: Data-points used to test model with clustering assignments
+        3. cluster_evaluation_metrics: Metrics used to assess the clusters created using the training data, along with
+           the number of annealing iterations and wall-clock seconds the fit took, and the inertia of every restart
+    """
+    # Make a copy of the input dataframes
+    train = train_df.copy()
+
+    # Replace missing values using statistics of the training data only
+    imputation_values = impute_missing_values(train, features, handle_missing_data)
+
     # Extract features for clustering
     X_train = train[features].values
 
     # Standardize the features
-    if scale == "Standard":
-        scaler = StandardScaler()
-    elif scale == "Normal":
-        scaler = MinMaxScaler()
+    scaler = get_scaler(scale)
 
     # Scalar must be fit on the training data only, if fit on the entire dataset, it would leak information from test set
 
@@ -104,22 +261,55 @@ def cluster_journal_metrics(
     # Using the imported Deterministic Annealing size-constrained clustering algorithm, obtain the model and fit the model
     # on the scaled training data i.e. use the clustering model to make predictions about which cluster each data-point in
     # the training set belongs to
-    model = DeterministicAnnealing(
-        n_clusters=n_clusters,
-        distribution=distribution,
-        max_iters=3000,
-        distance_func=cdist,
-        np_seed=random_state,
-        T=None
-    )
+    fit_start_time = time.perf_counter()
+
+    if warm_start is None:
+        model = DeterministicAnnealing(
+            n_clusters=n_clusters,
+            distribution=distribution,
+            max_iters=3000,
+            distance_func=cdist,
+            np_seed=random_state,
+            T=None,
+            n_init=n_init,
+            init=init,
+            profiler=profiler
+        )
 
-    model.fit(X_train_scaled)
+        model.fit(X_train_scaled)
+    else:
+        # Resume from the reference solution: hold the temperature at which the reference annealing stopped, and
+        # iterate only until the centers converge on this fold's training data
+        model = DeterministicAnnealing(
+            n_clusters=n_clusters,
+            distribution=distribution,
+            max_iters=3000,
+            distance_func=cdist,
+            np_seed=random_state,
+            T=None,
+            tol=WARM_START_TOL,
+            cooling_rate=1.0,
+            profiler=profiler
+        )
+
+        model.fit(
+            X_train_scaled,
+            # The reference centers are unscaled, bring them into this fold's scaled feature space
+            init_centers=scaler.transform(warm_start["centers"]),
+            init_eta=warm_start["eta"],
+            start_T=warm_start["T"]
+        )
+
+    fit_time = time.perf_counter() - fit_start_time
 
     # Get cluster labels for training data
     train_labels = model.labels_
 
     # Obtain the metrics evaluating clustering performance of the clusters created using the training data
     cluster_evaluation_metrics = get_cluster_evaluation_metrics(model, X_train_scaled, train_labels)
+    cluster_evaluation_metrics["n_iter"] = model.n_iter_
+    cluster_evaluation_metrics["fit_time"] = fit_time
+    cluster_evaluation_metrics["restart_inertias"] = model.restarts_["inertia"]
 
     # Add cluster labels to the training dataframe
     train['cluster'] = train_labels
@@ -156,16 +346,20 @@ def infer_cluster_labels(cluster_training_df, cs_output_results_enhanced_df):
     high_scoring_universities = get_high_scoring_universities(cs_output_results_enhanced_df)
 
     # Filter all CS outputs for outputs published by universities whose outputs were all rated high-scoring
-    high_scoring_cs_outputs_df = cluster_training_df[
-        cluster_training_df["Institution UKPRN code"].isin(high_scoring_universities["Institution code (UKPRN)"])
-    ]
+    is_high_scoring_cs_output = cluster_training_df["Institution UKPRN code"].isin(
+        high_scoring_universities["Institution code (UKPRN)"]
+    )
 
-    # Count occurrences of the high-scoring CS outputs in each cluster
-    cluster_counts = high_scoring_cs_outputs_df["cluster"].value_counts()
+    return get_cluster_label_mapping(cluster_training_df["cluster"].to_numpy()[is_high_scoring_cs_output.to_numpy()])
 
-    # Determine which cluster has more of the high-scoring CS outputs
-    data_points_in_cluster_0 = cluster_counts.get(0, 0)
-    data_points_in_cluster_1 = cluster_counts.get(1, 0)
+def get_cluster_label_mapping(high_scoring_output_clusters):
+    """
+    Label the clusters given the clusters the outputs of the high-scoring universities were assigned to
+    :param high_scoring_output_clusters: Array of the cluster (0 or 1) of every output of a high-scoring university
+    :return: Hash-map mapping the cluster number (0 and 1) to the cluster it represents (high or low scoring outputs)
+    """
+    # Count occurrences of the high-scoring CS outputs in each cluster
+    data_points_in_cluster_0, data_points_in_cluster_1 = np.bincount(high_scoring_output_clusters, minlength=2)[:2]
 
     # The cluster which has a greater amount of the high-scoring CS outputs is said to represent the high-scoring outptus
     # while the other cluster represents the low-scoring outputs
@@ -180,6 +374,44 @@ def infer_cluster_labels(cluster_training_df, cs_output_results_enhanced_df):
             1: 'high_scoring_outputs'
         }
 
+def index_high_scoring_outputs(cs_outputs_df, cs_output_results_enhanced_df):
+    """
+    Index, once per cross-validation, the outputs of the universities whose outputs were all rated high-scoring, so the
+    clusters of every fold are labelled by looking up the clusters of these outputs only
+    :param cs_outputs_df: DataFrame of the outputs of all universities, in the order the folds are sliced from
+    :param cs_output_results_enhanced_df: DataFrame of CS output results
+    :return: Hash-map indexing the outputs:
+        1. positions: Sorted positions (row numbers) of the outputs of high-scoring universities
+        2. ukprns: UKPRN code of the university of each of these outputs
+        3. positions_by_ukprn: Hash-map mapping every UKPRN code to the sorted positions of its outputs
+    """
+    high_scoring_universities = get_high_scoring_universities(cs_output_results_enhanced_df)
+    output_ukprns = cs_outputs_df["Institution UKPRN code"].to_numpy()
+
+    positions = np.flatnonzero(np.isin(output_ukprns, high_scoring_universities["Institution code (UKPRN)"].to_numpy()))
+
+    return {
+        "positions": positions,
+        "ukprns": output_ukprns[positions],
+        "positions_by_ukprn": pd.Series(output_ukprns).groupby(output_ukprns).indices
+    }
+
+def get_fold_high_scoring_positions(high_scoring_output_index, ukprn):
+    """
+    Obtain the positions of the outputs of high-scoring universities in the training set of a fold: all outputs but
+    the ones of the fold's university, in their original order. Takes O(m log t) time, for m outputs of high-scoring
+    universities and t outputs of the fold's university
+    :param high_scoring_output_index: Index of the outputs of high-scoring universities (see index_high_scoring_outputs)
+    :param ukprn: UKPRN code of the fold's (test) university
+    :return: Array of positions in the fold's training set
+    """
+    positions = high_scoring_output_index["positions"]
+    positions = positions[high_scoring_output_index["ukprns"] != ukprn]
+
+    # Every output of the test university before an output shifts its position in the training set by one
+    test_positions = high_scoring_output_index["positions_by_ukprn"].get(ukprn, np.empty(0, dtype=np.int64))
+    return positions - np.searchsorted(test_positions, positions)
+
 
 def get_actual_output_score_percentages(high_scoring_output_count, low_scoring_output_count):
     """
@@ -253,11 +485,86 @@ def get_predicted_output_score_percentages(predicted, cluster_label_mapping):
     )
 
 # Leave-one-out cross-validation - creates a total of 90 models
-def Leave_one_out_cross_validation(cluster_features):
+def get_lean_outputs_df(cs_outputs_enriched_metadata, cluster_features):
+    """
+    Keep only the columns of the outputs the cross-validation needs: the UKPRN codes, the features, and a row id (the
+    output's position in the full DataFrame), used to join the descriptive columns back when the clusters are analysed
+    :param cs_outputs_enriched_metadata: Feature-engineered DataFrame of the outputs, with all their columns
+    :param cluster_features: List of features used to train the clustering models
+    :return: DataFrame with columns Institution UKPRN code, the features, and row_id
+    """
+    lean_outputs_df = cs_outputs_enriched_metadata[['Institution UKPRN code'] + cluster_features].reset_index(drop=True)
+    lean_outputs_df['row_id'] = np.arange(len(lean_outputs_df))
+    return lean_outputs_df
+
+def join_descriptive_columns(train, cluster_features, uoa=CS_UOA):
+    """
+    Join the descriptive columns of the outputs (e.g. titles, output types, journal metrics) back to the lean training
+    outputs of a fold, reloading the full DataFrame of outputs
+    :param train: Lean data-points used to train the model with cluster assignments (see get_lean_outputs_df)
+    :param cluster_features: List of features used to train the clustering models
+    :param uoa: Unit of assessment whose outputs are reloaded (CS by default)
+    :return: Data-points used to train the model with all their columns and cluster assignments, as in the default mode
+    """
+    cs_outputs_enriched_metadata = get_cs_outputs_df(cluster_features, uoa)
+
+    descriptive_train = cs_outputs_enriched_metadata.iloc[train['row_id'].to_numpy()].copy()
+    # The features of the training data-points are the ones the model was fit on, with their missing values replaced
+    descriptive_train[cluster_features] = train[cluster_features].to_numpy()
+    descriptive_train['cluster'] = train['cluster'].to_numpy()
+    return descriptive_train
+
+def log_memory_usage(start_rss, peak_rss):
+    """
+    Log the memory held by the process at the start of the cross-validation, and at its peak
+    :param start_rss: Resident set size in bytes when the cross-validation started
+    :param peak_rss: Peak resident set size in bytes of the process at the end of the cross-validation
+    """
+    print("Memory usage:")
+    print(f"Resident set size at start: {start_rss / 2 ** 20:.1f} MB")
+    print(f"Peak resident set size: {peak_rss / 2 ** 20:.1f} MB (+{(peak_rss - start_rss) / 2 ** 20:.1f} MB)")
+    print()
+
+def Leave_one_out_cross_validation(
+        cluster_features, warm_start=False, n_init=1, init="random", uoa=CS_UOA, lean=False, fold_metrics_path=None,
+        bootstrap_n_jobs=1, feature_comparison_path=None
+):
     """
     Train and evaluate the size-constrained cluster models, passing in a list of features to train on
     :param cluster_features: List of features used to train the clustering models
+    :param warm_start: If True, split the universities into WARM_START_BLOCKS blocks, fit one model per block on the
+    outputs of all other universities, and seed the model of every fold of the block from it, instead of annealing each
+    fold from random centers. No fold is seeded from a model fit on its testing outputs
+    :param n_init: Number of seeded restarts of every cold-started fold's model, run concurrently
+    :param init: Seeding strategy of the initial cluster centers of every cold-started fold's model
+    :param uoa: Unit of assessment whose outputs and results are cross-validated (CS by default)
+    :param lean: If True, only the UKPRN codes, the features and a row id of the outputs are kept (and copied by every
+    fold), their descriptive columns are joined back only when the clusters are analysed, and the silhouette score is
+    computed in chunks of LEAN_WORKING_MEMORY MB. The results are the same. The exception are the features compared
+    between the clusters of every fold (FEATURE_TYPES): they are kept, as their values before the missing values are
+    imputed, with the categorical features stored as pandas categoricals (on CS, 0.5 MB rather than 2 MB)
+    :param fold_metrics_path: Path of the Parquet file the metrics of every fold are saved to (None: not saved)
+    :param bootstrap_n_jobs: Number of processes the bootstrap resamples of the accuracy metrics are split across
+    :param feature_comparison_path: Path of the Parquet file the comparison tables of the features of the high- and
+    low-scoring clusters of every fold are saved to (None: not saved)
+    :return: Hashmap summarising the run:
+        1. total_iterations: Annealing iterations summed over all folds (including the reference fits if warm-started)
+        2. total_fit_time: Wall-clock seconds spent fitting models (including the reference fits if warm-started)
+        3. divergence_metrics: Divergence metrics averaged over all folds
+        4. regression_metrics: MAE, RMSE, MAPE and R^2 of the predicted percentages of high-scoring outputs
+        5. peak_rss: Peak resident set size in bytes of the process
+        6. fold_metrics: DataFrame of the metrics of every fold (see FoldMetrics)
+        7. accuracy_confidence_intervals: DataFrame of the bootstrap confidence intervals of the regression and
+        divergence metrics (see bootstrap_accuracy_metrics)
+        8. feature_significance: DataFrame of the significance and effect size of the features distinguishing the
+        high- from the low-scoring cluster, one row per fold and feature (see get_feature_significance)
+        9. feature_comparison: DataFrame of the comparison tables of the features of the high- and low-scoring
+        clusters of every fold (see compare_clusters)
+        10. output_type_cubes: List of the counts of the training outputs of every fold by output type, cluster and
+        institution (see OutputTypeCube)
     """
+    start_rss = get_rss()
+
     # Percentages of outputs of the current university (fold / test-set) that are high-scoring:
     actual_high_scoring_output_percentages = []
     predicted_high_scoring_output_percentages = []
@@ -266,154 +573,386 @@ def Leave_one_out_cross_validation(cluster_features):
     actual_low_scoring_output_percentages = []
     predicted_low_scoring_output_percentages = []
 
-    # Obtained the feature-engineered DataFrame of enhanced CS outputs metrics
-    cs_outputs_enriched_metadata = get_cs_outputs_df(cluster_features)
-
-    # Obtain the DataFrame of enhanced REF CS Output Quality results containing number of high- and low-scoring outputs
-    # for each university
-    cs_output_results_df = get_cs_output_results()
-    cs_output_results_enhanced_df = enhance_score_distribution(cs_output_results_df, cs_outputs_enriched_metadata)
+    with span("load_cross_validation_data", uoa=uoa):
+        # Obtained the feature-engineered DataFrame of enhanced CS outputs metrics
+        cs_outputs_enriched_metadata = get_cs_outputs_df(cluster_features, uoa)
+
+        # Obtain the DataFrame of enhanced REF CS Output Quality results containing number of high- and low-scoring
+        # outputs for each university
+        cs_output_results_df = get_cs_output_results(uoa)
+        cs_output_results_enhanced_df = enhance_score_distribution(cs_output_results_df, cs_outputs_enriched_metadata)
+
+        # Encode the features compared between the clusters of every fold, before the descriptive columns are dropped
+        significance_features = get_significance_features(cs_outputs_enriched_metadata)
+        comparison_outputs_df = cs_outputs_enriched_metadata[list(FEATURE_TYPES)].reset_index(drop=True)
+        # Code the output types and institutions of the outputs once, the axes of every fold's output type cube
+        output_types, output_type_codes = get_axis_codes(cs_outputs_enriched_metadata['Output type'])
+        ukprns, institution_codes = get_axis_codes(cs_outputs_enriched_metadata['Institution UKPRN code'])
+
+        if lean:
+            # Drop the descriptive columns, the full DataFrame is released
+            cs_outputs_enriched_metadata = get_lean_outputs_df(cs_outputs_enriched_metadata, cluster_features)
+            # The compared features are kept, with their values before imputation: the categorical ones as codes
+            comparison_outputs_df = comparison_outputs_df.astype(
+                {feature: 'category' for feature in CATEGORICAL_FEATURES}
+            )
+
+    # Index the outputs of the universities whose outputs were all rated high-scoring, used to label every fold's clusters
+    high_scoring_output_index = index_high_scoring_outputs(cs_outputs_enriched_metadata, cs_output_results_enhanced_df)
 
     # Obtain the total count of high- and low-scoring outputs across all universities
     total_high_scoring_output_count = cs_output_results_enhanced_df['high_scoring_outputs'].sum()
     total_low_scoring_output_count = cs_output_results_enhanced_df['low_scoring_outputs'].sum()
 
-    # Cluster Evaluation Metrics:
-    total_folds = 0
-    # Internal cluster indices to assess cluster quality
-    total_evaluation_metrics = {
-        "total_silhouette_score": 0,
-        "total_davies_bouldin_score": 0,
-        "total_calinski_harabasz_score": 0,
-        "total_inertia": 0,
-        "total_bcss": 0
-    }
-    # Divergence metrics to assess cluster accuracy
-    total_divergence_metrics = {
-        "total_kl_divergence": 0,
-        "total_js_divergence": 0,
-        "total_tvd": 0
-    }
+    # Metrics of every fold, with the configuration of the run: internal cluster indices to assess cluster quality,
+    # divergence metrics to assess cluster accuracy, and the cost of fitting the fold's model
+    fold_metrics = FoldMetrics(
+        uoa=uoa, features=cluster_features, warm_start=warm_start, n_init=n_init, init=init, lean=lean
+    )
+    # Significance of the features distinguishing the clusters of every fold
+    fold_feature_significances = []
+    # Comparison tables of the features of the clusters of every fold
+    fold_feature_comparisons = []
+    # Counts of the training outputs of every fold by output type, cluster and institution
+    output_type_cubes = []
+    # Cost of fitting the models: annealing iterations and wall-clock seconds (including the reference fits)
+    total_iterations = 0
+    total_fit_time = 0
+
+    # Reference fits seeding the warm-started folds, by the UKPRN code of every fold's university
+    warm_start_references = {}
+    if warm_start:
+        warm_start_references = fit_warm_start_references(
+            cs_outputs_enriched_metadata, cs_output_results_enhanced_df, cluster_features
+        )
+        # Every reference is shared by the folds of its block, but fit (and counted) once
+        for reference in {id(reference): reference for reference in warm_start_references.values()}.values():
+            total_iterations += reference["n_iter"]
+            total_fit_time += reference["fit_time"]
 
     # University-Based Leave-One-Out Cross-Validation for Clustering
     # Use the outputs from oen university at a time as the testing set (fold) and all other outputs as the training set
-    for ukprn in cs_output_results_enhanced_df['Institution code (UKPRN)']:
-
-        # The current university will be used to test the cluster created by training on all other university metadata
-        is_curr_university_result = cs_output_results_enhanced_df['Institution code (UKPRN)'] == ukprn
-        # Obtain the REF CS output quality results of the testing university
-        curr_university_cs_output_result_df = cs_output_results_enhanced_df[is_curr_university_result]
-
-        # Obtain the test university's counts of high- and low-scoring outputs
-        curr_uni_high_scoring_output_count = curr_university_cs_output_result_df['high_scoring_outputs'].item()
-        curr_uni_low_scoring_output_count = curr_university_cs_output_result_df['low_scoring_outputs'].item()
-
-        # Using counts, compute the actual percentages of high- and low-scoring outputs for the current (test) university
-        actual_high_scoring_output_percentage, actual_low_scoring_output_percentage = get_actual_output_score_percentages(
-            curr_uni_high_scoring_output_count,
-            curr_uni_low_scoring_output_count
-        )
-        actual_high_scoring_output_percentages.append(actual_high_scoring_output_percentage)
-        actual_low_scoring_output_percentages.append(actual_low_scoring_output_percentage)
-
-        is_curr_university_output = cs_outputs_enriched_metadata['Institution UKPRN code'] == ukprn
-        # Use the CS outputs from all universities (excluding current) to create the two clusters i.e. train the model
-        training_outputs_df = cs_outputs_enriched_metadata[~is_curr_university_output]
-        # Use current university's CS outputs to evaluate the effectiveness of clustering
-        testing_output_df = cs_outputs_enriched_metadata[is_curr_university_output]
-
-        # Obtain the number of high- and low-scoring outputs in the training dataset
-        # Add the counts of the high (or low) scoring outputs from all universities but the one used for testing
-        high_scoring_cluster_output_count = total_high_scoring_output_count - curr_uni_high_scoring_output_count
-        low_scoring_cluster_output_count = total_low_scoring_output_count - curr_uni_low_scoring_output_count
-
-        # Using counts, compute the target distribution of high- and low-scoring outputs in the clusters
-        # This defines the size constrains for the DA clustering
-        cluster_output_count = high_scoring_cluster_output_count + low_scoring_cluster_output_count
-
-        high_scoring_output_cluster_distribution =  (high_scoring_cluster_output_count / cluster_output_count)
-        low_scoring_output_cluster_distribution = (low_scoring_cluster_output_count / cluster_output_count)
-
-        cluster_distribution = [high_scoring_output_cluster_distribution, low_scoring_output_cluster_distribution]
-
-        # Using the DA clustering algorithm, build the model using the training set, and on the test set, make
-        # cluster assignments for all data-points. Also obtain the evaluation metrics of the cluster created
-
-        train, predicted, cluster_evaluation_metrics = cluster_journal_metrics(
-            training_outputs_df, # All data points (outputs) excluding ones belonging to current university
-            testing_output_df,   # Data points (outputs) of current university (fold / test-set)
-            features=cluster_features,   # Features using which clusters are created
-            n_clusters=2,        # Clusters: High scoring outputs & Low scoring outputs
-            distribution=cluster_distribution, # Target distribution of the training data's data points across 2 clusters
-            scale = "Standard", # Feature Scaling Technique: "Standard" or "Normal"
-            handle_missing_data = "Median" # Statistic for replacing missing values: "Mean", "Median", or "Mode"
-        )
-
-        # Update the cluster evaluation metrics using the cluster obtained from the DA clustering algorithm
-        total_evaluation_metrics = update_total_evaluation_metrics(total_evaluation_metrics, cluster_evaluation_metrics)
-
-        # Infer the labels of clusters to something more meaningful than 0 and 1
-        # Returns a dictionary mapping each cluster to the output type (high/low scoring) it represents
-        cluster_label_mapping = infer_cluster_labels(train, cs_output_results_enhanced_df)
-
-        # Verify cluster distribution for training data
-        # log_training_data_cluster_distribution(train, cluster_label_mapping, cluster_distribution)
-
-        # Show prediction cluster distribution
-        # log_testing_data_cluster_distribution(predicted, cluster_label_mapping)
-
-        # For the test-set which now has data-points assigned to a cluster, compute the distribution of predicted
-        # high- and low-scoring outputs
-        (
-            predicted_high_scoring_output_percentage,
-            predicted_low_scoring_output_percentage
-        ) = get_predicted_output_score_percentages(predicted, cluster_label_mapping)
-
-        predicted_high_scoring_output_percentages.append(predicted_high_scoring_output_percentage)
-        predicted_low_scoring_output_percentages.append(predicted_low_scoring_output_percentage)
-
-        predicted_distribution = [predicted_high_scoring_output_percentage/100, predicted_low_scoring_output_percentage/100]
-        actual_distribution = [actual_high_scoring_output_percentage/100, actual_low_scoring_output_percentage/100]
-
-        # Using the predicted and actual distribution of high- and low-scoring outputs, compute divergence metrics
-        # to quantify close closely the two distributions match
-        divergence_metrics = get_divergence_metrics(predicted_distribution, actual_distribution)
-        total_divergence_metrics = update_total_divergence_metrics(total_divergence_metrics, divergence_metrics)
-
-        total_folds += 1
-
-        # Analyse the trained clusters to identify which features are strong indicators of clustering quality
-        if ukprn == 10007833:
-            # Instead of analysing of every training set (90 in total), only do it once when the testing set is Wrexham Uni
-            # This is because this university has the least number of outputs (9) meaning this fold results in the highest
-            # number of outputs in the training set compared to all other folds
-            analyse_clusters(train, cluster_label_mapping)
-
+    for fold, ukprn in enumerate(cs_output_results_enhanced_df['Institution code (UKPRN)']):
+        # Every fold is timed, as a span with the fold's university and the sizes of its training and testing sets
+        with span("fold", uoa=uoa, ukprn=ukprn) as fold_attributes:
+            fold_start_time = time.perf_counter()
+
+            # The current university will be used to test the cluster created by training on all other university metadata
+            is_curr_university_result = cs_output_results_enhanced_df['Institution code (UKPRN)'] == ukprn
+            # Obtain the REF CS output quality results of the testing university
+            curr_university_cs_output_result_df = cs_output_results_enhanced_df[is_curr_university_result]
+
+            # Obtain the test university's counts of high- and low-scoring outputs
+            curr_uni_high_scoring_output_count = curr_university_cs_output_result_df['high_scoring_outputs'].item()
+            curr_uni_low_scoring_output_count = curr_university_cs_output_result_df['low_scoring_outputs'].item()
+
+            # Using counts, compute the actual percentages of high- and low-scoring outputs for the current (test) university
+            actual_high_scoring_output_percentage, actual_low_scoring_output_percentage = get_actual_output_score_percentages(
+                curr_uni_high_scoring_output_count,
+                curr_uni_low_scoring_output_count
+            )
+            actual_high_scoring_output_percentages.append(actual_high_scoring_output_percentage)
+            actual_low_scoring_output_percentages.append(actual_low_scoring_output_percentage)
+
+            is_curr_university_output = cs_outputs_enriched_metadata['Institution UKPRN code'] == ukprn
+            # Use the CS outputs from all universities (excluding current) to create the two clusters i.e. train the model
+            training_outputs_df = cs_outputs_enriched_metadata[~is_curr_university_output]
+            # Use current university's CS outputs to evaluate the effectiveness of clustering
+            testing_output_df = cs_outputs_enriched_metadata[is_curr_university_output]
+            fold_attributes.update(n_train=len(training_outputs_df), n_test=len(testing_output_df))
+
+            # Obtain the number of high- and low-scoring outputs in the training dataset
+            # Add the counts of the high (or low) scoring outputs from all universities but the one used for testing
+            high_scoring_cluster_output_count = total_high_scoring_output_count - curr_uni_high_scoring_output_count
+            low_scoring_cluster_output_count = total_low_scoring_output_count - curr_uni_low_scoring_output_count
+
+            # Using counts, compute the target distribution of high- and low-scoring outputs in the clusters
+            # This defines the size constrains for the DA clustering
+            cluster_output_count = high_scoring_cluster_output_count + low_scoring_cluster_output_count
+
+            high_scoring_output_cluster_distribution =  (high_scoring_cluster_output_count / cluster_output_count)
+            low_scoring_output_cluster_distribution = (low_scoring_cluster_output_count / cluster_output_count)
+
+            cluster_distribution = [high_scoring_output_cluster_distribution, low_scoring_output_cluster_distribution]
+
+            # Using the DA clustering algorithm, build the model using the training set, and on the test set, make
+            # cluster assignments for all data-points. Also obtain the evaluation metrics of the cluster created
+
+            # In the lean mode, the silhouette score's pairwise distances are computed in chunks (same score)
+            with span("fit", uoa=uoa, ukprn=ukprn), config_context(working_memory=LEAN_WORKING_MEMORY if lean else None):
+                train, predicted, cluster_evaluation_metrics = cluster_journal_metrics(
+                    training_outputs_df, # All data points (outputs) excluding ones belonging to current university
+                    testing_output_df,   # Data points (outputs) of current university (fold / test-set)
+                    features=cluster_features,   # Features using which clusters are created
+                    n_clusters=2,        # Clusters: High scoring outputs & Low scoring outputs
+                    distribution=cluster_distribution, # Target distribution of the training data's data points across 2 clusters
+                    scale = "Standard", # Feature Scaling Technique: "Standard" or "Normal"
+                    handle_missing_data = "Median", # Statistic for replacing missing values: "Mean", "Median", or "Mode"
+                    warm_start = warm_start_references.get(ukprn), # Seed from the fit excluding the fold (None: cold)
+                    n_init = n_init, # Restarts from different random centers, keeping the one with the lowest inertia
+                    init = init # Seeding strategy: "random", "k-means++", "pca", or "quantile"
+                )
+
+            total_iterations += cluster_evaluation_metrics["n_iter"]
+            total_fit_time += cluster_evaluation_metrics["fit_time"]
+
+            # Infer the labels of clusters to something more meaningful than 0 and 1
+            # Returns a dictionary mapping each cluster to the output type (high/low scoring) it represents
+            # The clusters of the high-scoring universities' outputs are looked up using the index built once per run
+            cluster_label_mapping = get_cluster_label_mapping(
+                train['cluster'].to_numpy()[get_fold_high_scoring_positions(high_scoring_output_index, ukprn)]
+            )
+
+            # Verify cluster distribution for training data
+            # log_training_data_cluster_distribution(train, cluster_label_mapping, cluster_distribution)
+
+            # Show prediction cluster distribution
+            # log_testing_data_cluster_distribution(predicted, cluster_label_mapping)
+
+            # For the test-set which now has data-points assigned to a cluster, compute the distribution of predicted
+            # high- and low-scoring outputs
+            (
+                predicted_high_scoring_output_percentage,
+                predicted_low_scoring_output_percentage
+            ) = get_predicted_output_score_percentages(predicted, cluster_label_mapping)
+
+            predicted_high_scoring_output_percentages.append(predicted_high_scoring_output_percentage)
+            predicted_low_scoring_output_percentages.append(predicted_low_scoring_output_percentage)
+
+            predicted_distribution = [predicted_high_scoring_output_percentage/100, predicted_low_scoring_output_percentage/100]
+            actual_distribution = [actual_high_scoring_output_percentage/100, actual_low_scoring_output_percentage/100]
+
+            # Using the predicted and actual distribution of high- and low-scoring outputs, compute divergence metrics
+            # to quantify close closely the two distributions match
+            divergence_metrics = get_divergence_metrics(predicted_distribution, actual_distribution)
+
+            # Record the fold's metrics using the cluster obtained from the DA clustering algorithm
+            fold_metrics.add_fold(
+                fold,
+                ukprn,
+                {metric: cluster_evaluation_metrics[metric] for metric in CLUSTER_EVALUATION_METRICS},
+                divergence_metrics,
+                actual_high_scoring_output_percentage=actual_high_scoring_output_percentage,
+                predicted_high_scoring_output_percentage=float(predicted_high_scoring_output_percentage),
+                n_train=len(training_outputs_df),
+                n_test=len(testing_output_df),
+                n_iter=cluster_evaluation_metrics["n_iter"],
+                fit_time=cluster_evaluation_metrics["fit_time"],
+                # Spread (standard deviation) of the inertia across the restarts of the fold's model
+                restart_inertia_std=float(np.std(cluster_evaluation_metrics["restart_inertias"])),
+                fold_time=time.perf_counter() - fold_start_time
+            )
+
+            # Test which features distinguish the fold's high-scoring cluster from its low-scoring cluster
+            high_scoring_cluster = next(
+                cluster for cluster, label in cluster_label_mapping.items() if label == "high_scoring_outputs"
+            )
+            training_positions = np.flatnonzero(~is_curr_university_output.to_numpy())
+            is_high_scoring = train['cluster'].to_numpy() == high_scoring_cluster
+            with span("feature_significance", uoa=uoa, ukprn=ukprn):
+                fold_feature_significance = get_feature_significance(
+                    significance_features,
+                    training_positions,
+                    is_high_scoring,
+                    n_permutations=FEATURE_SIGNIFICANCE_PERMUTATIONS
+                )
+            fold_feature_significance.insert(0, "fold", fold)
+            fold_feature_significance.insert(1, "ukprn", ukprn)
+            fold_feature_significances.append(fold_feature_significance)
+
+            # Compare the features of the fold's high- and low-scoring clusters (summaries and value distributions)
+            with span("feature_comparison", uoa=uoa, ukprn=ukprn):
+                fold_feature_comparison = compare_clusters(
+                    comparison_outputs_df.iloc[training_positions], train['cluster'].to_numpy(), cluster_label_mapping
+                )
+            fold_feature_comparison.insert(0, "fold", fold)
+            fold_feature_comparison.insert(1, "ukprn", ukprn)
+            fold_feature_comparisons.append(fold_feature_comparison)
+
+            # Count the training outputs by output type, cluster and institution
+            output_type_cube = OutputTypeCube.from_codes(
+                output_type_codes[training_positions],
+                is_high_scoring,
+                institution_codes[training_positions],
+                output_types,
+                ukprns
+            )
+            output_type_cubes.append(output_type_cube)
+
+            # Analyse the trained clusters to identify which features are strong indicators of clustering quality
+            if uoa == CS_UOA and ukprn == 10007833:
+                # Instead of analysing of every training set (90 in total), only do it once when the testing set is Wrexham Uni
+                # This is because this university has the least number of outputs (9) meaning this fold results in the highest
+                # number of outputs in the training set compared to all other folds
+                if lean:
+                    train = join_descriptive_columns(train, cluster_features, uoa)
+                analyse_clusters(train, cluster_label_mapping)
+                log_output_type_clusters(output_type_cube)
+
+            observe_rss(uoa=uoa, ukprn=ukprn)
+
+    print(f"Unit of Assessment: {uoa}")
     print(f"Features Used to Train Model: {cluster_features}\n")
 
     # After cross-validation where every university was the test-set (fold) once, and the cluster evaluation metrics were
     # computed for every test-set, compute the cluster metrics evaluation metrics - average across all folds:
 
+    # Bootstrap the institutions to obtain the confidence intervals of the accuracy metrics
+    with span("bootstrap", uoa=uoa, n_resamples=N_BOOTSTRAP_RESAMPLES):
+        accuracy_confidence_intervals = bootstrap_accuracy_metrics(
+            np.column_stack([actual_high_scoring_output_percentages, actual_low_scoring_output_percentages]),
+            np.column_stack([predicted_high_scoring_output_percentages, predicted_low_scoring_output_percentages]),
+            n_resamples=N_BOOTSTRAP_RESAMPLES,
+            n_jobs=bootstrap_n_jobs
+        )
+
     # Compute regression metrics to assess cluster accuracy
-    compute_clustering_accuracy(
+    regression_metrics = compute_clustering_accuracy(
         actual_high_scoring_output_percentages,
         predicted_high_scoring_output_percentages,
         actual_low_scoring_output_percentages,
-        predicted_low_scoring_output_percentages
+        predicted_low_scoring_output_percentages,
+        accuracy_confidence_intervals
     )
 
+    # Mean, median, standard deviation and bootstrap confidence interval of every metric across the folds (the same
+    # resamples as the accuracy metrics, so the divergence metrics' intervals match)
+    fold_metrics_summary = fold_metrics.summarise(n_bootstrap=N_BOOTSTRAP_RESAMPLES)
+
     # Compute divergence metrics to assess cluster accuracy
-    compute_divergence_metrics(
-        total_divergence_metrics,
-        total_folds
-    )
+    average_divergence_metrics = compute_divergence_metrics(fold_metrics_summary)
 
     # Compute internal cluster indices to assess cluster quality
-    compute_cluster_evaluation_metrics(
-        total_evaluation_metrics,
-        total_folds
+    compute_cluster_evaluation_metrics(fold_metrics_summary)
+
+    # Features distinguishing the high- from the low-scoring clusters across all folds
+    feature_significance_df = pd.concat(fold_feature_significances, ignore_index=True)
+    log_feature_significance_summary(summarise_feature_significance(feature_significance_df))
+
+    print(f"Annealing cost ({'warm' if warm_start else 'cold'} start):")
+    print(f"Total annealing iterations: {total_iterations}")
+    print(f"Total fit time: {total_fit_time:.2f}s")
+    if n_init > 1:
+        print(f"Restarts per fold: {n_init}, average spread (std) of the restarts' inertia: {fold_metrics_summary.loc['restart_inertia_std', 'mean']:.4f}")
+    print()
+
+    if fold_metrics_path is not None:
+        fold_metrics.save(fold_metrics_path)
+
+    feature_comparison_df = pd.concat(fold_feature_comparisons, ignore_index=True)
+    if feature_comparison_path is not None:
+        save_feature_comparison(feature_comparison_df, feature_comparison_path)
+
+    peak_rss = get_peak_rss()
+    log_memory_usage(start_rss, peak_rss)
+
+    return {
+        "total_iterations": total_iterations,
+        "total_fit_time": total_fit_time,
+        "divergence_metrics": average_divergence_metrics,
+        "regression_metrics": regression_metrics,
+        "peak_rss": peak_rss,
+        "fold_metrics": fold_metrics.to_dataframe(),
+        "accuracy_confidence_intervals": accuracy_confidence_intervals,
+        "feature_significance": feature_significance_df,
+        "feature_comparison": feature_comparison_df,
+        "output_type_cubes": output_type_cubes
+    }
+
+def profile_fold(cluster_features, ukprn, uoa=CS_UOA, n_init=1, init="random"):
+    """
+    Fit the model of one fold of the University-Based Leave-One-Out Cross-Validation (cold start), recording where the
+    annealing spends its time and how it converges
+    :param cluster_features: List of features used to train the clustering model
+    :param ukprn: UKPRN of the university used as the fold's test set
+    :param uoa: Unit of assessment whose outputs and results are cross-validated (CS by default)
+    :param n_init: Number of seeded restarts of the fold's model (the trace is the one of the restart kept)
+    :param init: Seeding strategy of the initial cluster centers
+    :return: AnnealingTrace of the fold's fit
+    """
+    cs_outputs_enriched_metadata = get_cs_outputs_df(cluster_features, uoa)
+    cs_output_results_df = get_cs_output_results(uoa)
+    cs_output_results_enhanced_df = enhance_score_distribution(cs_output_results_df, cs_outputs_enriched_metadata)
+
+    # Target distribution of high- and low-scoring outputs of the training set: all universities but the fold's one
+    is_curr_university_result = cs_output_results_enhanced_df['Institution code (UKPRN)'] == ukprn
+    if not is_curr_university_result.any():
+        raise ValueError(f"No REF results for UKPRN {ukprn} in UoA {uoa}")
+    training_results_df = cs_output_results_enhanced_df[~is_curr_university_result]
+    high_scoring_cluster_output_count = training_results_df['high_scoring_outputs'].sum()
+    low_scoring_cluster_output_count = training_results_df['low_scoring_outputs'].sum()
+    cluster_output_count = high_scoring_cluster_output_count + low_scoring_cluster_output_count
+
+    is_curr_university_output = cs_outputs_enriched_metadata['Institution UKPRN code'] == ukprn
+    trace = AnnealingTrace()
+    cluster_journal_metrics(
+        cs_outputs_enriched_metadata[~is_curr_university_output],
+        cs_outputs_enriched_metadata[is_curr_university_output],
+        features=cluster_features,
+        n_clusters=2,
+        distribution=[
+            high_scoring_cluster_output_count / cluster_output_count,
+            low_scoring_cluster_output_count / cluster_output_count
+        ],
+        scale="Standard",
+        handle_missing_data="Median",
+        n_init=n_init,
+        init=init,
+        profiler=trace
     )
+    return trace
 
+def cross_validate_uoas(cluster_features, uoas, max_workers=None, fold_metrics_path=None, **cross_validation_args):
+    """
+    Run the University-Based Leave-One-Out Cross-Validation of several units of assessment in parallel, one process
+    per UoA (the UoAs share no data, so their cross-validations are independent)
+    :param cluster_features: List of features used to train the clustering models
+    :param uoas: Units of assessment to cross-validate, whose enriched metadata has been written to its partition
+    :param max_workers: Maximum number of processes, defaults to the number of CPUs
+    :param fold_metrics_path: Path of the Parquet file the metrics of every fold of every UoA are saved to (None: not
+    saved)
+    :param cross_validation_args: Other arguments of Leave_one_out_cross_validation, e.g. warm_start
+    :return: Hashmap mapping every UoA to the summary of its cross-validation
+    """
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        cross_validations = {
+            uoa: executor.submit(Leave_one_out_cross_validation, cluster_features, uoa=uoa, **cross_validation_args)
+            for uoa in uoas
+        }
+        summaries = {uoa: cross_validation.result() for uoa, cross_validation in cross_validations.items()}
+
+    # The metrics of the folds of every worker are merged, and summarised per UoA
+    fold_metrics = FoldMetrics.merge([summary["fold_metrics"] for summary in summaries.values()])
+    log_fold_metrics_summary(fold_metrics.summarise(by="uoa"))
+
+    if fold_metrics_path is not None:
+        fold_metrics.save(fold_metrics_path)
+
+    return summaries
+
+def compare_warm_start(cluster_features):
+    """
+    Run the cross-validation twice, annealing every fold from scratch and then warm-starting every fold from a fit
+    excluding its block of universities (WARM_START_BLOCKS), and log the iterations and wall-clock time saved (net of
+    the reference fits), and the change in the divergence metrics
+    :param cluster_features: List of features used to train the clustering models
+    """
+    cold_start_summary = Leave_one_out_cross_validation(cluster_features, warm_start=False)
+    warm_start_summary = Leave_one_out_cross_validation(cluster_features, warm_start=True)
+
+    saved_iterations = cold_start_summary["total_iterations"] - warm_start_summary["total_iterations"]
+    saved_fit_time = cold_start_summary["total_fit_time"] - warm_start_summary["total_fit_time"]
+
+    print(f"Warm start savings ({WARM_START_BLOCKS} reference fits, each excluding the testing universities it seeds):")
+    print(f"Annealing iterations saved: {saved_iterations} "
+          f"({saved_iterations / cold_start_summary['total_iterations']:.1%})")
+    print(f"Fit time saved: {saved_fit_time:.2f}s ({saved_fit_time / cold_start_summary['total_fit_time']:.1%})")
+
+    print("Change in average divergence metrics (warm - cold):")
+    for metric, cold_value in cold_start_summary["divergence_metrics"].items():
+        warm_value = warm_start_summary["divergence_metrics"][metric]
+        print(f"{metric}: {cold_value:.4f} -> {warm_value:.4f} ({warm_value - cold_value:+.4f})")
+    print()
 
 
 if __name__ == "__main__":
@@ -5,6 +5,8 @@ import sys
 from pathlib import Path
 from unittest.mock import patch
 
+from utils.issn_index import ISSNMetricsIndex
+
 # Path to project root
 project_root = Path(__file__).resolve().parent.parent.parent
 # Path to script containing functions to test
@@ -19,31 +21,22 @@ sys.modules[module_name] = module
 spec.loader.exec_module(module)
 
 # Access functions
-handle_null_sjr = module.handle_null_sjr
-handle_null_snip = module.handle_null_snip
 handle_missing_journal_metrics = module.handle_missing_journal_metrics
 ensure_uniform_data_types = module.ensure_uniform_data_types
+load_issn_metrics_index = module.load_issn_metrics_index
 
 
-def test_handle_null_sjr():
+def test_handle_missing_journal_metrics():
     """
-    Function to test how null SJRs are handled
+    Function to test how missing journal metrics are handled: SJR, SNIP, and Cite Score are filled in from their
+    reference datasets in a single pass, keeping the order of the records
     """
-    # Dataframe containing various journal metrics, some of which have their SJR set to None
+    # Dataframe containing various journal metrics, some of which have their SJR, SNIP, or Cite Score set to None
     journal_metrics_df = pd.DataFrame([
         {'ISSN': '2168-2305', 'Scopus_ID': None, 'SNIP': 1.596, 'SJR': None, 'Cite_Score': None},
         {'ISSN': '1234-5678', 'Scopus_ID': '12345', 'SNIP': 2.123, 'SJR': 3.123, 'Cite_Score': 4.001},
-        {'ISSN': '0000-0001', 'Scopus_ID': '67890', 'SNIP': 3.001, 'SJR': None, 'Cite_Score': 5.002}
-    ])
-
-    # Split journal_metrics into two dataframes, based on if sjr field is None
-    null_sjr_df = pd.DataFrame([
-        {'ISSN': '2168-2305', 'Scopus_ID': None, 'SNIP': 1.596, 'SJR': None, 'Cite_Score': None},
-        {'ISSN': '0000-0001', 'Scopus_ID': '67890', 'SNIP': 3.001, 'SJR': None, 'Cite_Score': 5.002}
-    ])
-
-    not_null_sjr_df = pd.DataFrame([
-        {'ISSN': '1234-5678', 'Scopus_ID': '12345', 'SNIP': 2.123, 'SJR': 3.123, 'Cite_Score': 4.001}
+        {'ISSN': '0000-0001', 'Scopus_ID': '67890', 'SNIP': None, 'SJR': None, 'Cite_Score': None},
+        {'ISSN': '2190-572X', 'Scopus_ID': '67891', 'SNIP': None, 'SJR': 1.234, 'Cite_Score': 5.001}
     ])
 
     # Dataframe containing SJR metrics
@@ -54,110 +47,88 @@ def test_handle_null_sjr():
         'SJR': [56.204, 53.204]
     })
 
-    # Note how the record with ISSN = 0000-0001, with initial null SJR value, now has sjr=56.204, obtained from the sjr_df
-    expected_journal_metrics_handled_null_sjr_df = pd.DataFrame([
-        {'ISSN': '2168-2305', 'Scopus_ID': None, 'SNIP': 1.596, 'SJR': None, 'Cite_Score': None},
-        {'ISSN': '0000-0001', 'Scopus_ID': '67890', 'SNIP': 3.001, 'SJR': 56.204, 'Cite_Score': 5.002},
-        {'ISSN': '1234-5678', 'Scopus_ID': '12345', 'SNIP': 2.123, 'SJR': 3.123, 'Cite_Score': 4.001}
-    ])
-
-    with patch.object(module, "split_df_on_null_field", return_value=(null_sjr_df, not_null_sjr_df)) as mock_split_df_on_null_field:
-        with patch.object(module, "load_sjr_df", return_value=sjr_df) as mock_load_sjr_df:
-            actual_journal_metrics_handled_null_sjr_df = handle_null_sjr(journal_metrics_df)
-
-            # Assert all functions in the ETL were called, with the correct parameters
-            mock_split_df_on_null_field.assert_called_once_with(journal_metrics_df, 'SJR')
-            mock_load_sjr_df.assert_called_once()
-
-            pd.testing.assert_frame_equal(
-                actual_journal_metrics_handled_null_sjr_df.reset_index(drop=True),
-                expected_journal_metrics_handled_null_sjr_df.reset_index(drop=True)
-            )
-
-
-def test_handle_null_snip():
-    """
-    Function to test how null SJRs are handled
-    """
-    # Dataframe containing various journal metrics, some of which have their SNIPs set to None
-    journal_metrics_df = pd.DataFrame([
-        {'ISSN': '2168-2305', 'Scopus_ID': None, 'SNIP': None, 'SJR': 2.999, 'Cite_Score': 3.456},
-        {'ISSN': '1234-5678', 'Scopus_ID': '12345', 'SNIP': 2.123, 'SJR': 3.456, 'Cite_Score': 4.001},
-        {'ISSN': '2190-572X', 'Scopus_ID': '67890', 'SNIP': None, 'SJR': 1.234, 'Cite_Score': 5.001}
-    ])
-
-    # Split journal_metrics into two dataframes, based on if SNIP field is None
-    null_snip_df = pd.DataFrame([
-        {'ISSN': '2168-2305', 'Scopus_ID': None, 'SNIP': None, 'SJR': 2.999, 'Cite_Score': 3.456},
-        {'ISSN': '2190-572X', 'Scopus_ID': '67890', 'SNIP': None, 'SJR': 1.234, 'Cite_Score': 5.001}
-    ])
-
-    not_null_snip_df = pd.DataFrame([
-        {'ISSN': '1234-5678', 'Scopus_ID': '12345', 'SNIP': 2.123, 'SJR': 3.456, 'Cite_Score': 4.001}
-    ])
-
     # Dataframe containing SNIP metrics
     snip_df = pd.DataFrame([
         {'SNIP': 0.854926629627807, 'ISSN': '2190-572X'},
         {'SNIP': 1.01023499, 'ISSN': '9999-9991'}
     ])
 
-    # Note how the record with ISSN = 2190-572X, with initial null SNIP value, now has SNIP=0.854926629627807 (from snip_df)
-    expected_journal_metrics_handled_null_snip_df = pd.DataFrame([
-        {'ISSN': '2168-2305', 'Scopus_ID': None, 'SNIP': None, 'SJR': 2.999, 'Cite_Score': 3.456},
-        {'ISSN': '2190-572X', 'Scopus_ID': '67890', 'SNIP': 0.854926629627807, 'SJR': 1.234, 'Cite_Score': 5.001},
-        {'ISSN': '1234-5678', 'Scopus_ID': '12345', 'SNIP': 2.123, 'SJR': 3.456, 'Cite_Score': 4.001}
+    # Dataframe containing Cite Scores (ISSN without a hyphen)
+    citescore_df = pd.DataFrame({'ISSN': ['00000001'], 'Cite_Score': [12.5]})
+
+    # The SJR and Cite Score of ISSN 0000-0001, and the SNIP of ISSN 2190-572X are filled in
+    # The records keep their order
+    expected_journal_metrics_handled_missing_fields_df = pd.DataFrame([
+        {'ISSN': '2168-2305', 'Scopus_ID': None, 'SNIP': 1.596, 'SJR': None, 'Cite_Score': None},
+        {'ISSN': '1234-5678', 'Scopus_ID': '12345', 'SNIP': 2.123, 'SJR': 3.123, 'Cite_Score': 4.001},
+        {'ISSN': '0000-0001', 'Scopus_ID': '67890', 'SNIP': None, 'SJR': 56.204, 'Cite_Score': 12.5},
+        {'ISSN': '2190-572X', 'Scopus_ID': '67891', 'SNIP': 0.854926629627807, 'SJR': 1.234, 'Cite_Score': 5.001}
     ])
 
-    with patch.object(module, "split_df_on_null_field",
-                      return_value=(null_snip_df, not_null_snip_df)) as mock_split_df_on_null_field:
-        with patch.object(module, "load_processed_snip_df", return_value=snip_df) as mock_load_processed_snip_df:
+    issn_metrics_index = ISSNMetricsIndex.build(sjr_df, snip_df)
 
-            actual_journal_metrics_handled_null_snip_df = handle_null_snip(journal_metrics_df)
+    with patch.object(module, "load_issn_metrics_index", return_value=issn_metrics_index) as mock_load_issn_metrics_index, \
+            patch.object(module, "load_citescore_df", return_value=citescore_df) as mock_load_citescore_df:
+        actual_journal_metrics_handled_missing_fields_df, fill_sources_df = handle_missing_journal_metrics(journal_metrics_df)
 
-            # Assert all functions in the ETL were called, with the correct parameters
-            mock_split_df_on_null_field.assert_called_once_with(journal_metrics_df, 'SNIP')
-            mock_load_processed_snip_df.assert_called_once()
+        # Assert the reference datasets were loaded once
+        mock_load_issn_metrics_index.assert_called_once()
+        mock_load_citescore_df.assert_called_once()
 
-            pd.testing.assert_frame_equal(
-                actual_journal_metrics_handled_null_snip_df.reset_index(drop=True),
-                expected_journal_metrics_handled_null_snip_df.reset_index(drop=True)
-            )
+    pd.testing.assert_frame_equal(
+        actual_journal_metrics_handled_missing_fields_df, expected_journal_metrics_handled_missing_fields_df
+    )
 
+    # The source of every filled in value is recorded
+    assert fill_sources_df.columns.tolist() == ['SJR', 'SNIP', 'Cite_Score']
+    assert fill_sources_df['SJR'].tolist() == [None, None, 'SCImago', None]
+    assert fill_sources_df['SNIP'].tolist() == [None, None, None, 'CWTS']
+    assert fill_sources_df['Cite_Score'].tolist() == [None, None, 'CiteScore', None]
 
-def test_handle_missing_journal_metrics():
+
+def test_handle_missing_journal_metrics_without_citescore():
     """
-    Function to test how missing journal metrics are handled - checks to see if the ETL calls the required functions
+    Function to test the Cite Scores are left missing when there is no CiteScore reference dataset
     """
-    # Original journal metrics with missing SNIP and SJR
     journal_metrics_df = pd.DataFrame([
-        {'ISSN': '0000-0001', 'Scopus_ID': '00000', 'SNIP': None, 'SJR': None, 'Cite_Score': 3.009}
+        {'ISSN': '0000-0001', 'Scopus_ID': '67890', 'SNIP': None, 'SJR': None, 'Cite_Score': None}
     ])
+    issn_metrics_index = ISSNMetricsIndex.build(
+        pd.DataFrame({'Rank': [1], 'Title': ['Cell'], 'Issn': ['0000-0001'], 'SJR': [53.204]}),
+        pd.DataFrame({'SNIP': [0.855], 'ISSN': ['0000-0001']})
+    )
 
-    # Updated journal metrics with missing SJR handled
-    journal_metrics_df_transformed_sjr = pd.DataFrame([
-        {'ISSN': '0000-0001', 'Scopus_ID': '00000', 'SNIP': None, 'SJR': 3.999, 'Cite_Score': 3.009}
-    ])
+    with patch.object(module, "load_issn_metrics_index", return_value=issn_metrics_index), \
+            patch.object(module, "load_citescore_df", return_value=None):
+        actual_journal_metrics_handled_missing_fields_df, _ = handle_missing_journal_metrics(journal_metrics_df)
 
-    # Final journal metrics with missing SJR and SNIP handled
-    expected_journal_metrics_df_transformed_sjr_snip = pd.DataFrame([
-        {'ISSN': '0000-0001', 'Scopus_ID': '00000', 'SNIP': 3.001, 'SJR': 3.999, 'Cite_Score': 3.009}
-    ])
+    assert actual_journal_metrics_handled_missing_fields_df.loc[0, 'SJR'] == 53.204
+    assert actual_journal_metrics_handled_missing_fields_df.loc[0, 'SNIP'] == 0.855
+    assert pd.isna(actual_journal_metrics_handled_missing_fields_df.loc[0, 'Cite_Score'])
+
+
+def test_load_issn_metrics_index(tmp_path):
+    """
+    Function to test the ISSN metrics index is built from the SJR and SNIP datasets on first use, and then loaded
+    """
+    sjr_df = pd.DataFrame({'Rank': [1], 'Title': ['Cell'], 'Issn': ['1542-4863'], 'SJR': [53.204]})
+    snip_df = pd.DataFrame({'SNIP': [0.855], 'ISSN': ['2190-572X']})
 
-    with patch.object(module, "handle_null_sjr", return_value=journal_metrics_df_transformed_sjr) as mock_handle_sjr:
-        with patch.object(module, "handle_null_snip", return_value=expected_journal_metrics_df_transformed_sjr_snip) as mock_handle_snip:
+    with patch.object(module, "get_issn_metrics_index_path", return_value=str(tmp_path / "index")), \
+            patch.object(module, "is_issn_metrics_index_stale", side_effect=[True, False]), \
+            patch.object(module, "load_sjr_df", return_value=sjr_df) as mock_load_sjr_df, \
+            patch.object(module, "load_processed_snip_df", return_value=snip_df) as mock_load_processed_snip_df:
 
-            actual_journal_metrics_df_transformed_sjr_snip = handle_missing_journal_metrics(journal_metrics_df)
+        built_issn_metrics_index = load_issn_metrics_index()
+        loaded_issn_metrics_index = load_issn_metrics_index()
 
-            # First, the handle missing SJR is called on the original dataframe
-            mock_handle_sjr.assert_called_once_with(journal_metrics_df)
-            # Next, the handle missing SNIP on the dataframe with the transformed SJR
-            mock_handle_snip.assert_called_once_with(journal_metrics_df_transformed_sjr)
+        # The datasets are only read to build the index
+        mock_load_sjr_df.assert_called_once()
+        mock_load_processed_snip_df.assert_called_once()
 
-            pd.testing.assert_frame_equal(
-                actual_journal_metrics_df_transformed_sjr_snip.reset_index(drop=True),
-                expected_journal_metrics_df_transformed_sjr_snip.reset_index(drop=True)
-            )
+    for issn_metrics_index in [built_issn_metrics_index, loaded_issn_metrics_index]:
+        assert issn_metrics_index.lookup(pd.Series(['1542-4863', '2190-572X']), 'SJR').tolist()[0] == 53.204
+        assert issn_metrics_index.lookup(pd.Series(['2190572X']), 'SNIP').tolist() == [0.855]
 
 
 def test_ensure_uniform_data_types():
@@ -1,5 +1,6 @@
 from unittest.mock import patch, Mock, MagicMock
 import pandas as pd
+import requests
 import importlib.util
 import sys
 from pathlib import Path
@@ -116,3 +117,99 @@ def test_get_serial_metadata():
     assert result == sample_response_data
     assert "serial-metadata-response" in result
     assert "entry" in result["serial-metadata-response"]
+
+
+def test_refresh_journal_metrics(tmp_path):
+    store_path = str(tmp_path / "store.parquet")
+    sample_issn_df = pd.DataFrame({
+        'ISSN': ['1741-6485', '2190-572X']
+    })
+
+    sample_metadata_response = {
+        'Scopus_ID': '12813', 'SNIP': '1.684', 'SJR': '0.761', 'Cite_Score': '6.9'
+    }
+
+    with patch.object(module, "get_journal_metrics_store_path", return_value=store_path), \
+         patch.object(module, "get_cs_journal_metrics_df_path", return_value=str(tmp_path / "metrics.parquet")), \
+         patch.object(module, "get_cs_journal_issns_df", return_value=sample_issn_df), \
+         patch.object(module, "get_serial_metadata", return_value=sample_metadata_response) as mock_get_serial_metadata, \
+         patch.object(module, "extract_journal_metrics", side_effect=lambda x: dict(x)), \
+         patch.object(module, "write_cs_journal_metrics_df") as mock_write_cs_journal_metrics_df, \
+         patch.object(module, "sleep"):
+
+        # First refresh: both journals are missing from the store, so both are fetched
+        module.refresh_journal_metrics()
+        assert mock_get_serial_metadata.call_count == 2
+
+        # A new journal is added: only this journal is fetched, the others were fetched within the TTL
+        sample_issn_df.loc[2] = ['0000-0001']
+        store_df = module.refresh_journal_metrics()
+        assert mock_get_serial_metadata.call_count == 3
+        mock_get_serial_metadata.assert_called_with('0000-0001')
+
+        # With a TTL of 0, every journal is fetched again, but the unchanged journals keep their version
+        store_df = module.refresh_journal_metrics(ttl=pd.Timedelta(0))
+        assert mock_get_serial_metadata.call_count == 6
+
+    assert len(store_df) == 3
+    assert store_df['version'].tolist() == [1, 1, 1]
+    assert store_df['SNIP_source'].unique().tolist() == ['Scopus API']
+
+    # The current journal metrics are written to the CS journal metrics file
+    written_journal_metrics_df = mock_write_cs_journal_metrics_df.call_args[0][0]
+    assert written_journal_metrics_df.columns.tolist() == ['ISSN', 'Scopus_ID', 'SNIP', 'SJR', 'Cite_Score']
+    assert written_journal_metrics_df['ISSN'].tolist() == ['0000-0001', '1741-6485', '2190-572X']
+    assert written_journal_metrics_df['SNIP'].tolist() == [1.684, 1.684, 1.684]
+
+
+def test_refresh_journal_metrics_failed_request(tmp_path):
+    sample_issn_df = pd.DataFrame({
+        'ISSN': ['1741-6485', '2190-572X']
+    })
+    sample_metadata_response = {
+        'Scopus_ID': '12813', 'SNIP': '1.684', 'SJR': '0.761', 'Cite_Score': '6.9'
+    }
+
+    ok_response = MagicMock()
+    ok_response.status_code = 200
+    ok_response.json.return_value = sample_metadata_response
+
+    # 429 Too Many Requests: raise_for_status raises an HTTPError
+    rate_limited_response = MagicMock()
+    rate_limited_response.status_code = 429
+    rate_limited_response.raise_for_status.side_effect = requests.exceptions.HTTPError("429 Client Error: Too Many Requests")
+
+    def get(url, params, timeout):
+        if url.endswith('2190-572X') and get.is_rate_limited:
+            return rate_limited_response
+        return ok_response
+    get.is_rate_limited = True
+
+    with patch.object(module, "get_journal_metrics_store_path", return_value=str(tmp_path / "store.parquet")), \
+         patch.object(module, "get_cs_journal_metrics_df_path", return_value=str(tmp_path / "metrics.parquet")), \
+         patch.object(module, "get_cs_journal_issns_df", return_value=sample_issn_df), \
+         patch.object(module, "extract_journal_metrics", side_effect=lambda x: dict(x)), \
+         patch.object(module, "write_cs_journal_metrics_df"), \
+         patch.object(module, "sleep"), \
+         patch("requests.get", side_effect=get) as mock_get:
+
+        # The rate limited journal is not upserted with null journal metrics
+        store_df = module.refresh_journal_metrics()
+        assert store_df['ISSN'].tolist() == ['1741-6485']
+
+        # So it is fetched again on the next refresh, although the TTL has not passed
+        get.is_rate_limited = False
+        store_df = module.refresh_journal_metrics()
+        assert mock_get.call_count == 3
+        assert mock_get.call_args[0][0].endswith('2190-572X')
+
+    assert store_df['ISSN'].tolist() == ['1741-6485', '2190-572X']
+    assert store_df['SNIP'].tolist() == [1.684, 1.684]
+
+    # Without the store, the journals whose request failed are kept with null journal metrics
+    with patch.object(module, "get_cs_journal_issns_df", return_value=sample_issn_df), \
+         patch.object(module, "get_serial_metadata", return_value=module.FETCH_FAILED), \
+         patch.object(module, "sleep"):
+        result_df = module.process_journal_metrics()
+    assert result_df.columns.tolist() == ['ISSN', 'Scopus_ID', 'SNIP', 'SJR', 'Cite_Score']
+    assert result_df['SNIP'].isna().all()
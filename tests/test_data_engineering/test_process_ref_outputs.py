@@ -0,0 +1,62 @@
+import os
+import openpyxl
+import pandas as pd
+from unittest.mock import patch
+
+from data_engineering.process_REF2021_Outputs import filter_uoa_outputs, filter_cs_outputs, stream_uoa_outputs
+from utils.partitions import read_uoa_partition, write_uoa_partition
+
+def test_filter_uoa_outputs():
+    ref_outputs_df = pd.DataFrame({
+        "Unit of assessment number": [11, 12, 11, 34],
+        "Unit of assessment name": [
+            "Computer Science and Informatics", "Engineering", "Computer Science and Informatics",
+            "Communication, Cultural and Media Studies, Library and Information Management"
+        ],
+        "DOI": ["10.1/a", "10.1/b", "10.1/c", "10.1/d"]
+    })
+
+    engineering_outputs = filter_uoa_outputs(ref_outputs_df, 12)
+    assert engineering_outputs.columns.tolist() == ["DOI"]
+    assert engineering_outputs["DOI"].tolist() == ["10.1/b"]
+
+    # The CS filter is the UoA filter for UoA 11
+    assert filter_cs_outputs(ref_outputs_df)["DOI"].tolist() == ["10.1/a", "10.1/c"]
+
+def test_stream_uoa_outputs(tmp_path):
+    # Outputs workbook: 4 title lines, the header on the 5th row, then the outputs of 3 UoAs
+    outputs_dataset_path = str(tmp_path / "outputs.xlsx")
+    workbook = openpyxl.Workbook()
+    worksheet = workbook.active
+    for line in ["REF2021 outputs", None, None, None]:
+        worksheet.append([line])
+    worksheet.append(["Institution UKPRN code", "Unit of assessment number", "Unit of assessment name", "ISSN",
+                      "Citation count"])
+    for row in range(7):
+        uoa = [11, 12, 34][row % 3]
+        worksheet.append([10007790 + row, uoa, f"UoA {uoa}", "1234-5678" if row % 2 else None, row if row > 3 else None])
+    workbook.save(outputs_dataset_path)
+
+    outputs_metadata_path = str(tmp_path / "outputs_metadata")
+    with patch("data_engineering.process_REF2021_Outputs.write_cs_outputs") as mock_write_cs_outputs:
+        statistics = stream_uoa_outputs([11, 12, 99], chunk_size=2, outputs_dataset_path=outputs_dataset_path,
+                                        outputs_metadata_path=outputs_metadata_path)
+
+    assert statistics["rows"] == 7
+    assert statistics["uoa_outputs"] == {11: 3, 12: 2, 99: 0}
+    # A UoA without outputs in the workbook has no partition
+    assert not os.path.exists(os.path.join(outputs_metadata_path, "uoa=99"))
+    assert statistics["rows_per_second"] > 0
+
+    # Each UoA's partition holds the same outputs as the partition written from the whole workbook loaded in memory
+    in_memory_outputs_metadata_path = str(tmp_path / "in_memory_outputs_metadata")
+    ref_outputs_df = pd.read_excel(outputs_dataset_path, skiprows=4)
+    for uoa in [11, 12]:
+        write_uoa_partition(filter_uoa_outputs(ref_outputs_df, uoa), in_memory_outputs_metadata_path, uoa)
+        pd.testing.assert_frame_equal(
+            read_uoa_partition(outputs_metadata_path, uoa),
+            read_uoa_partition(in_memory_outputs_metadata_path, uoa)
+        )
+
+    # The CS outputs are also written to the CS outputs metadata file
+    assert mock_write_cs_outputs.call_args[0][0]["Institution UKPRN code"].tolist() == [10007790, 10007793, 10007796]
@@ -0,0 +1,50 @@
+import numpy as np
+
+from machine_learning.annealing_trace import AnnealingTrace, PHASES
+from machine_learning.size_constrained_clustering import DeterministicAnnealing
+
+def get_data_points():
+    rng = np.random.default_rng(0)
+    return np.vstack([rng.normal(0, 1, size=(60, 2)), rng.normal(2, 1, size=(40, 2))])
+
+def test_annealing_trace():
+    """
+    Test that every annealing iteration is recorded, without changing the fitted model
+    """
+    X = get_data_points()
+    trace = AnnealingTrace(capacity=4) # Grown while annealing
+    model = DeterministicAnnealing(2, [0.6, 0.4], max_iters=50, np_seed=1, profiler=trace)
+    model.fit(X)
+
+    unprofiled_model = DeterministicAnnealing(2, [0.6, 0.4], max_iters=50, np_seed=1)
+    unprofiled_model.fit(X)
+    assert np.array_equal(model.labels_, unprofiled_model.labels_)
+
+    assert len(trace) == model.n_iter_
+    assert trace.get_iterations_per_temperature().sum() == model.n_iter_
+    assert trace.get_phase_totals().index.tolist() == PHASES and (trace.get_phase_totals() > 0).all()
+    assert np.isfinite(trace.free_energy[:len(trace)]).all()
+    # Every data point is labelled at the first iteration of a temperature
+    trace_df = trace.to_dataframe()
+    first_iterations = trace_df.groupby("temperature_index").head(1)
+    assert (first_iterations["label_changes"] == len(X)).all()
+
+    # With restarts, the trace is the one of the restart kept
+    restarts_trace = AnnealingTrace()
+    restarts_model = DeterministicAnnealing(2, [0.6, 0.4], max_iters=50, np_seed=1, n_init=3, profiler=restarts_trace)
+    restarts_model.fit(X)
+    assert len(restarts_trace) == restarts_model.restarts_["n_iter"][restarts_model.best_restart_]
+
+def test_annealing_trace_save(tmp_path):
+    """
+    Test that a saved trace is loaded with the same iterations
+    """
+    trace = AnnealingTrace()
+    DeterministicAnnealing(2, [0.6, 0.4], max_iters=20, np_seed=1, profiler=trace).fit(get_data_points())
+
+    trace_path = str(tmp_path / "trace.npz")
+    trace.save(trace_path)
+    loaded_trace = AnnealingTrace.load(trace_path)
+
+    assert len(loaded_trace) == len(trace)
+    assert loaded_trace.to_dataframe().equals(trace.to_dataframe())
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from machine_learning.bootstrap import bootstrap
+from machine_learning.cluster_performance_evaluation import bootstrap_accuracy_metrics, get_accuracy_metrics
+from machine_learning.fold_metrics import FoldMetrics
+
+def get_percentages():
+    """
+    Set-up the actual and predicted percentages of high and low scoring outputs of 30 institutions
+    """
+    rng = np.random.default_rng(0)
+    actual_high = rng.uniform(0, 60, size=30)
+    predicted_high = np.clip(actual_high + rng.normal(0, 10, size=30), 0, 100)
+    return np.column_stack([actual_high, 100 - actual_high]), np.column_stack([predicted_high, 100 - predicted_high])
+
+def get_sample_means(samples):
+    return {"mean": samples.mean(axis=1)}
+
+def test_bootstrap():
+    """
+    Test that the resamples are reproducible, and do not depend on the number of processes
+    """
+    samples = np.arange(20, dtype=float)
+    bootstrap_values = bootstrap(get_sample_means, [samples], n_resamples=2500, random_state=1)
+
+    assert bootstrap_values["mean"].shape == (2500,)
+    assert np.array_equal(bootstrap_values["mean"], bootstrap(get_sample_means, [samples], 2500, 1)["mean"])
+    assert np.array_equal(bootstrap_values["mean"], bootstrap(get_sample_means, [samples], 2500, 1, n_jobs=2)["mean"])
+    assert np.isclose(bootstrap_values["mean"].mean(), samples.mean(), atol=0.2)
+
+def test_bootstrap_no_resamples():
+    """
+    Test that a number of resamples below 1 is rejected
+    """
+    with pytest.raises(ValueError):
+        bootstrap(get_sample_means, [np.arange(20, dtype=float)], n_resamples=0)
+
+def test_bootstrap_accuracy_metrics():
+    """
+    Test that every accuracy metric has a confidence interval around its estimate, matching the fold metrics' intervals
+    """
+    actual_percentages, predicted_percentages = get_percentages()
+    confidence_intervals = bootstrap_accuracy_metrics(actual_percentages, predicted_percentages, n_resamples=2000)
+
+    assert confidence_intervals.index.tolist() == ["mae", "rmse", "mape", "r2", "kl_divergence", "js_divergence", "tvd"]
+    assert (confidence_intervals["ci_low"] <= confidence_intervals["estimate"]).all()
+    assert (confidence_intervals["estimate"] <= confidence_intervals["ci_high"]).all()
+    assert (confidence_intervals["std"] > 0).all()
+
+    # The estimates are the metrics of the institutions
+    accuracy_metrics = get_accuracy_metrics(actual_percentages, predicted_percentages)
+    assert np.allclose(confidence_intervals["estimate"], pd.Series(accuracy_metrics)[confidence_intervals.index])
+
+    # With the same random state, the folds are resampled as in the summary of the fold metrics
+    fold_metrics = FoldMetrics(uoa=11)
+    kl_divergences = get_accuracy_metrics(actual_percentages[:, None], predicted_percentages[:, None])["kl_divergence"]
+    for fold, kl_divergence in enumerate(kl_divergences):
+        fold_metrics.add_fold(fold, 10000000 + fold, {"kl_divergence": kl_divergence})
+    summary = fold_metrics.summarise(n_bootstrap=2000)
+    assert np.allclose(
+        summary.loc["kl_divergence", ["ci_low", "ci_high"]].astype(float),
+        confidence_intervals.loc["kl_divergence", ["ci_low", "ci_high"]].astype(float)
+    )
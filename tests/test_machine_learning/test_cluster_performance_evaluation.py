@@ -0,0 +1,57 @@
+import numpy as np
+from math import log2
+from sklearn.metrics import r2_score
+
+from machine_learning.cluster_performance_evaluation import get_batch_divergence_metrics, get_regression_metrics, \
+    kl_divergence, js_divergence, total_variation_distance
+
+def test_get_batch_divergence_metrics():
+    """
+    Test that the divergence metrics of all folds are the ones computed fold by fold, including the folds where a
+    university has no high-scoring (or no low-scoring) outputs
+    """
+    predicted_distributions = np.array([[0.4, 0.6], [0.0, 1.0], [0.9, 0.1], [0.5, 0.5]])
+    actual_distributions = np.array([[0.5, 0.5], [0.2, 0.8], [1.0, 0.0], [0.5, 0.5]])
+
+    divergence_metrics = get_batch_divergence_metrics(predicted_distributions, actual_distributions)
+
+    for fold, (predicted, actual) in enumerate(zip(predicted_distributions, actual_distributions)):
+        # KL divergence with the epsilon added to the denominator, and to the ratio
+        expected_kl_divergence = sum(p * log2(p / (q + 1e-8) + 1e-8) for p, q in zip(predicted, actual))
+        assert np.isclose(divergence_metrics["kl_divergence"][fold], expected_kl_divergence, rtol=0, atol=1e-12)
+        assert divergence_metrics["kl_divergence"][fold] == kl_divergence(predicted, actual)
+        assert divergence_metrics["js_divergence"][fold] == js_divergence(predicted, actual)
+        assert divergence_metrics["tvd"][fold] == total_variation_distance(predicted, actual)
+
+    assert np.allclose(divergence_metrics["tvd"], [0.1, 0.2, 0.1, 0.0])
+
+    # Several runs at once
+    runs_divergence_metrics = get_batch_divergence_metrics(
+        np.stack([predicted_distributions, actual_distributions]), np.stack([actual_distributions, actual_distributions])
+    )
+    assert runs_divergence_metrics["js_divergence"].shape == (2, 4)
+    assert np.array_equal(runs_divergence_metrics["js_divergence"][0], divergence_metrics["js_divergence"])
+
+def test_get_regression_metrics():
+    """
+    Test that the regression metrics match Scikit-learn's, and that the MAPE of a university without high-scoring
+    outputs is computed on its low-scoring outputs
+    """
+    actual_high = np.array([50.0, 0.0, 80.0, 25.0])
+    predicted_high = np.array([40.0, 10.0, 80.0, 50.0])
+    actual_percentages = np.column_stack([actual_high, 100 - actual_high])
+    predicted_percentages = np.column_stack([predicted_high, 100 - predicted_high])
+
+    regression_metrics = get_regression_metrics(actual_percentages, predicted_percentages)
+
+    assert regression_metrics["mae"] == 11.25
+    assert np.isclose(regression_metrics["rmse"], np.sqrt((100 + 100 + 0 + 625) / 4))
+    # 10/50, 10/100 (low-scoring outputs), 0/80, 25/25
+    assert np.isclose(regression_metrics["mape"], (20 + 10 + 0 + 100) / 4)
+    assert np.isclose(regression_metrics["r2"], r2_score(actual_high, predicted_high))
+
+    # Constant actual percentages, as in Scikit-learn: 1 for perfect predictions, 0 otherwise
+    runs_regression_metrics = get_regression_metrics(
+        [[[50, 50], [50, 50]], [[50, 50], [50, 50]]], [[[50, 50], [50, 50]], [[40, 60], [50, 50]]]
+    )
+    assert runs_regression_metrics["r2"].tolist() == [1.0, 0.0]
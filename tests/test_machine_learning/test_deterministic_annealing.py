@@ -1,5 +1,6 @@
 import pytest
 import collections
+import itertools
 import random
 import numpy as np
 
@@ -57,3 +58,256 @@ class Test_Deterministic_Annealing:
         # Assert the specified distribution of cluster assignments matches the actual distribution of data points
         # Include a very small error margin - 1e-6
         assert np.sum(np.array(label_dist) - np.array(distribution)) <= 1e-6
+
+    def test_size_constrained_clustering_warm_start(self):
+        # Two blobs of data points, whose sizes do not match the specified distribution, so the size constraints are
+        # never strictly satisfied and the reference model anneals for all of its iterations
+        rng = np.random.default_rng(0)
+        X = np.vstack([rng.normal(0, 0.5, size=(60, 2)), rng.normal(3, 0.5, size=(40, 2))])
+        distribution = [0.7, 0.3]
+
+        # Reference model annealed from random centers
+        reference_model = size_constrained_clustering.DeterministicAnnealing(2, distribution, max_iters=500, np_seed=1)
+        reference_model.fit(X)
+        assert reference_model.n_iter_ == 500
+
+        # Warm-start a model on almost the same data (one data point removed) from the reference solution, holding the
+        # temperature fixed and stopping once the centers converge
+        warm_model = size_constrained_clustering.DeterministicAnnealing(
+            2, distribution, max_iters=500, np_seed=1, tol=1e-6, cooling_rate=1.0
+        )
+        warm_model.fit(
+            X[1:],
+            init_centers=reference_model.cluster_centers_,
+            init_eta=reference_model._eta,
+            start_T=reference_model.T
+        )
+
+        # Converges in far fewer iterations, to (almost) the same centers and the same cluster assignments
+        assert warm_model.n_iter_ < reference_model.n_iter_
+        assert np.allclose(warm_model.cluster_centers_, reference_model.cluster_centers_, atol=0.05)
+        assert np.array_equal(warm_model.labels_, reference_model.labels_[1:])
+
+    def test_size_constrained_clustering_warm_start_input_validation(self):
+        X = np.random.default_rng(0).random((20, 2))
+        model = size_constrained_clustering.DeterministicAnnealing(2, [0.5, 0.5], max_iters=10)
+
+        # Throw error if the warm-start centers do not have one row per cluster and one column per feature
+        with pytest.raises(AssertionError):
+            model.fit(X, init_centers=np.zeros((3, 2)))
+
+        # Throw error if the warm-start eta does not have one value per cluster
+        with pytest.raises(AssertionError):
+            model.fit(X, init_eta=[1.0])
+
+    def test_mini_batch_size_constrained_clustering_results(self):
+        # Two well separated blobs of data points, matching the specified distribution
+        rng = np.random.default_rng(0)
+        X = np.vstack([rng.normal(0, 0.1, size=(600, 2)), rng.normal(3, 0.1, size=(400, 2))])
+        distribution = [0.6, 0.4]
+
+        # Batches are much smaller than the data
+        model = size_constrained_clustering.DeterministicAnnealing(2, distribution, max_iters=300, np_seed=2)
+        model.fit(X)
+        mini_batch_model = size_constrained_clustering.MiniBatchDeterministicAnnealing(
+            2, distribution, batch_size=64, max_iters=300, np_seed=2
+        )
+        mini_batch_model.fit(X)
+
+        # The centers are the blobs' centers, and the inertia is close to the full-batch algorithm's
+        assert np.allclose(np.sort(mini_batch_model.cluster_centers_, axis=0), [[0, 0], [3, 3]], atol=0.05)
+        assert np.allclose(np.sort(mini_batch_model.cluster_centers_, axis=0), np.sort(model.cluster_centers_, axis=0), atol=0.1)
+        assert mini_batch_model.inertia_ <= 1.1 * model.inertia_
+
+        # Each blob is assigned to its own cluster, so the cluster sizes match the distribution (within 1%)
+        label_dist = np.sort(np.bincount(mini_batch_model.labels_, minlength=2) / len(X))
+        assert np.allclose(label_dist, np.sort(distribution), atol=0.01)
+
+        # Predictions are made one batch at a time, and a point is assigned to the cluster of its blob
+        predicted_labels = mini_batch_model.predict(np.array([[0.0, 0.0], [3.0, 3.0]]))
+        assert predicted_labels[0] == mini_batch_model.labels_[0]
+        assert predicted_labels[1] == mini_batch_model.labels_[-1]
+
+        # The Gibbs probabilities, computed one batch at a time, equal those computed on all data points at once
+        full_gibbs = size_constrained_clustering.DeterministicAnnealing.predict_proba(mini_batch_model, X)
+        assert np.allclose(mini_batch_model.predict_proba(X), full_gibbs)
+        predicted_labels, gibbs = mini_batch_model.predict(X, return_proba=True)
+        assert np.allclose(gibbs, full_gibbs)
+        assert np.array_equal(predicted_labels, mini_batch_model.predict(X))
+
+        # The enforcement method is passed through: the exact assignment reaches the specified cluster sizes
+        mini_batch_model.fit(X, demands_prob=np.full(len(X), 2.0), enforce_cluster_distribution="exact")
+        assert sorted(np.bincount(mini_batch_model.labels_).tolist()) == [400, 600]
+        # And the weights are normalised, as in the full-batch algorithm
+        assert np.isclose(np.sum(mini_batch_model._demands_prob), 1)
+
+    def test_mini_batch_size_constrained_clustering_full_batch(self):
+        # When a batch holds all the data points (without replacement), every step size is 1 and the full-batch
+        # algorithm is recovered
+        rng = np.random.default_rng(0)
+        X = np.vstack([rng.normal(0, 0.5, size=(60, 2)), rng.normal(3, 0.5, size=(40, 2))])
+
+        model = size_constrained_clustering.DeterministicAnnealing(2, [0.7, 0.3], max_iters=200, np_seed=1)
+        model.fit(X)
+        mini_batch_model = size_constrained_clustering.MiniBatchDeterministicAnnealing(
+            2, [0.7, 0.3], batch_size=len(X), max_iters=200, np_seed=1
+        )
+        mini_batch_model.fit(X)
+
+        assert np.allclose(model.cluster_centers_, mini_batch_model.cluster_centers_)
+        assert np.isclose(model.inertia_, mini_batch_model.inertia_)
+        assert np.array_equal(model.labels_, mini_batch_model.labels_)
+        assert model.n_iter_ == mini_batch_model.n_iter_
+
+    def test_get_cluster_allocation(self):
+        # Rounded shares already sum up to the number of data points
+        assert size_constrained_clustering.get_cluster_allocation([0.78, 0.22], 100).tolist() == [78, 22]
+        # Rounded shares (2, 2, 3) exceed 6 data points: the cluster rounded up the most gives up a data point
+        assert np.sum(size_constrained_clustering.get_cluster_allocation([0.25, 0.25, 0.5], 6)) == 6
+        # Rounded shares (2, 2) fall short of 5 data points
+        assert np.sum(size_constrained_clustering.get_cluster_allocation([0.5, 0.5], 5)) == 5
+
+    @pytest.mark.parametrize("n_clusters, allocation", [(2, [3, 4]), (3, [2, 2, 3])])
+    def test_size_constrained_assignment_is_optimal(self, n_clusters, allocation):
+        rng = np.random.default_rng(n_clusters)
+        cost_matrix = rng.random((7, n_clusters))
+
+        labels = size_constrained_clustering.size_constrained_assignment(cost_matrix, allocation)
+
+        # The assignment has exactly the specified cluster sizes
+        assert np.bincount(labels, minlength=n_clusters).tolist() == allocation
+
+        # And no other assignment with these cluster sizes has a lower total cost (brute force every assignment)
+        best_cost = min(
+            cost_matrix[np.arange(7), assignment].sum()
+            for assignment in itertools.product(range(n_clusters), repeat=7)
+            if np.bincount(assignment, minlength=n_clusters).tolist() == allocation
+        )
+        assert np.isclose(cost_matrix[np.arange(7), labels].sum(), best_cost)
+
+    def test_enforce_cluster_distribution_exact(self):
+        rng = np.random.default_rng(0)
+        X = np.vstack([rng.normal(0, 0.5, size=(60, 2)), rng.normal(3, 0.5, size=(40, 2))])
+
+        greedy_model = size_constrained_clustering.DeterministicAnnealing(2, [0.7, 0.3], max_iters=100, np_seed=1)
+        greedy_model.fit(X, enforce_cluster_distribution=True)
+        exact_model = size_constrained_clustering.DeterministicAnnealing(2, [0.7, 0.3], max_iters=100, np_seed=1)
+        exact_model.fit(X, enforce_cluster_distribution="exact")
+
+        # Both methods reach the specified cluster sizes
+        assert sorted(np.bincount(greedy_model.labels_).tolist()) == [30, 70]
+        assert sorted(np.bincount(exact_model.labels_).tolist()) == [30, 70]
+
+        # Given the same centers, the exact assignment is at least as close to the centers as the greedy one
+        def total_distance(model):
+            return np.linalg.norm(X - model.cluster_centers_[model.labels_], axis=1).sum()
+
+        assert np.allclose(greedy_model.cluster_centers_, exact_model.cluster_centers_)
+        assert total_distance(exact_model) <= total_distance(greedy_model) + 1e-9
+
+        with pytest.raises(ValueError):
+            exact_model.enforce_cluster_distribution(X, method="unknown")
+
+        # The exact assignment measures the distances with the model's distance function
+        sqeuclidean_model = size_constrained_clustering.DeterministicAnnealing(
+            2, [0.7, 0.3], max_iters=100, np_seed=1, distance_func="sqeuclidean"
+        )
+        sqeuclidean_model.fit(X, enforce_cluster_distribution="exact")
+        expected_labels = size_constrained_clustering.size_constrained_assignment(
+            sqeuclidean_model.distance_func(X, sqeuclidean_model.cluster_centers_), [70, 30]
+        )
+        assert np.array_equal(sqeuclidean_model.labels_, expected_labels)
+
+    def test_size_constrained_clustering_predict(self):
+        rng = np.random.default_rng(0)
+        X = np.vstack([rng.normal(0, 0.5, size=(60, 2)), rng.normal(3, 0.5, size=(40, 2))])
+        model = size_constrained_clustering.DeterministicAnnealing(2, [0.6, 0.4], max_iters=100, np_seed=1)
+        model.fit(X)
+
+        # Held-out data points, mostly near the first blob
+        X_test = np.vstack([rng.normal(0, 0.5, size=(16, 2)), rng.normal(3, 0.5, size=(4, 2))])
+
+        # The Gibbs probabilities of each data point sum up to 1, and the labels are the most probable clusters
+        labels, gibbs = model.predict(X_test, return_proba=True)
+        assert gibbs.shape == (20, 2)
+        assert np.allclose(np.sum(gibbs, axis=1), 1)
+        assert np.array_equal(labels, np.argmax(gibbs, axis=1))
+        assert np.array_equal(model.predict_proba(X_test), gibbs)
+        assert np.array_equal(model.predict(X_test), labels)
+
+        # Size-constrained prediction: the cluster sizes of the held-out data points match the specified distribution
+        first_blob_cluster = model.labels_[0]
+        constrained_labels = model.predict(X_test, distribution=[0.5, 0.5])
+        assert np.bincount(constrained_labels, minlength=2).tolist() == [10, 10]
+        # The data points of the second blob stay in their cluster, points of the first blob closest to it are moved
+        assert np.all(constrained_labels[16:] != first_blob_cluster)
+
+    def test_size_constrained_clustering_restarts(self):
+        rng = np.random.default_rng(0)
+        X = np.vstack([rng.normal(0, 1, size=(60, 2)), rng.normal(2, 1, size=(40, 2))])
+
+        def fit(n_init, select_by="inertia", np_seed=1):
+            model = size_constrained_clustering.DeterministicAnnealing(
+                2, [0.6, 0.4], max_iters=50, np_seed=np_seed, n_init=n_init, n_jobs=2, select_by=select_by
+            )
+            model.fit(X)
+            return model
+
+        # A single run is unchanged by the restart machinery, and records its own statistics
+        single_model = fit(n_init=1)
+        assert single_model.best_restart_ == 0
+        assert single_model.restarts_["inertia"].tolist() == [single_model.inertia_]
+
+        # The best restart (lowest inertia) is kept, and its fitted state is copied to the model
+        model = fit(n_init=4)
+        for statistic in ["inertia", "n_iter", "fit_time"]:
+            assert model.restarts_[statistic].shape == (4,)
+        # The free energy is only computed when the restarts are selected by it
+        assert "free_energy" not in model.restarts_
+        assert model.best_restart_ == np.argmin(model.restarts_["inertia"])
+        assert model.inertia_ == model.restarts_["inertia"].min()
+        assert np.array_equal(model.predict(X[:10]), fit(n_init=4).predict(X[:10])) # Reproducible given the seed
+
+        # Select the restart by free energy instead
+        free_energy_model = fit(n_init=4, select_by="free_energy")
+        assert free_energy_model.restarts_["free_energy"].shape == (4,)
+        assert free_energy_model.best_restart_ == np.argmin(free_energy_model.restarts_["free_energy"])
+        assert np.isclose(
+            free_energy_model.free_energy(X), free_energy_model.restarts_["free_energy"][free_energy_model.best_restart_]
+        )
+        assert "free_energy" not in fit(n_init=1, select_by="free_energy").restarts_
+
+    def test_size_constrained_clustering_restarts_non_finite(self, monkeypatch):
+        X = np.random.default_rng(0).normal(0, 1, size=(50, 2))
+        model = size_constrained_clustering.DeterministicAnnealing(
+            2, [0.5, 0.5], max_iters=10, np_seed=1, n_init=2, select_by="free_energy"
+        )
+
+        # A restart with a NaN score is an error, rather than the first restart being silently kept
+        monkeypatch.setattr(size_constrained_clustering.DeterministicAnnealing, "free_energy", lambda self, X: np.nan)
+        with pytest.raises(ValueError):
+            model.fit(X)
+
+    def test_mini_batch_size_constrained_clustering_free_energy(self):
+        rng = np.random.default_rng(0)
+        X = np.vstack([rng.normal(0, 0.5, size=(60, 2)), rng.normal(3, 0.5, size=(40, 2))])
+        weights = rng.uniform(1, 2, size=len(X))
+
+        model = size_constrained_clustering.MiniBatchDeterministicAnnealing(
+            2, [0.6, 0.4], batch_size=16, max_iters=50, np_seed=1, n_init=3, select_by="free_energy"
+        )
+        model.fit(X, demands_prob=weights)
+
+        # The free energy of every restart is finite, and the best restart has the lowest one
+        assert np.all(np.isfinite(model.restarts_["free_energy"]))
+        assert model.best_restart_ == np.argmin(model.restarts_["free_energy"])
+
+        # Accumulated one batch at a time, with the normalised weights, it equals the free energy of all data points
+        full_free_energy = size_constrained_clustering.DeterministicAnnealing.free_energy(model, X, weights / 7)
+        assert np.isclose(model.free_energy(X), full_free_energy)
+        assert np.isclose(model.free_energy(X), model.restarts_["free_energy"][model.best_restart_])
+
+        with pytest.raises(AssertionError):
+            size_constrained_clustering.DeterministicAnnealing(2, [0.6, 0.4], n_init=0)
+        with pytest.raises(AssertionError):
+            size_constrained_clustering.DeterministicAnnealing(2, [0.6, 0.4], select_by="silhouette")
@@ -0,0 +1,74 @@
+import pytest
+import numpy as np
+from scipy.spatial.distance import cdist
+
+from machine_learning import distance_backends, size_constrained_clustering
+
+class Test_Distance_Backends:
+
+    def test_distance_backends_match_cdist(self):
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(50, 3))
+        centers = rng.normal(size=(4, 3))
+
+        # Same distances with and without the cached norms of the prepared data points
+        for prepare in [False, True]:
+            squared_euclidean = distance_backends.SquaredEuclideanDistance()
+            euclidean = distance_backends.EuclideanDistance()
+            if prepare:
+                squared_euclidean.prepare(X)
+                euclidean.prepare(X)
+            assert np.allclose(squared_euclidean(X, centers), cdist(X, centers, "sqeuclidean"))
+            assert np.allclose(euclidean(X, centers), cdist(X, centers))
+
+        # float32 mode
+        squared_euclidean_32 = distance_backends.SquaredEuclideanDistance(dtype=np.float32)
+        squared_euclidean_32.prepare(X)
+        distance_matrix = squared_euclidean_32(X, centers)
+        assert distance_matrix.dtype == np.float32
+        assert np.allclose(distance_matrix, cdist(X, centers, "sqeuclidean"), rtol=1e-4)
+
+        # Mahalanobis distance, with the inverse covariance matrix given or estimated from the data points
+        VI = np.linalg.inv(np.cov(X, rowvar=False))
+        assert np.allclose(distance_backends.MahalanobisDistance(VI=VI)(X, centers), cdist(X, centers, "mahalanobis", VI=VI))
+        mahalanobis = distance_backends.MahalanobisDistance(squared=True)
+        mahalanobis.prepare(X)
+        assert np.allclose(mahalanobis(X, centers), cdist(X, centers, "mahalanobis", VI=VI) ** 2)
+
+        # The inverse covariance matrix is needed before computing distances
+        with pytest.raises(ValueError):
+            distance_backends.MahalanobisDistance()(X, centers)
+
+    def test_get_distance_backend(self):
+        assert isinstance(distance_backends.get_distance_backend("sqeuclidean"), distance_backends.SquaredEuclideanDistance)
+        assert isinstance(distance_backends.get_distance_backend("mahalanobis"), distance_backends.MahalanobisDistance)
+        assert distance_backends.get_distance_backend(cdist) is cdist
+
+        with pytest.raises(ValueError):
+            distance_backends.get_distance_backend("manhattan")
+        with pytest.raises(Exception):
+            distance_backends.get_distance_backend(42)
+
+    def test_size_constrained_clustering_distance_backends(self):
+        rng = np.random.default_rng(0)
+        X = np.vstack([rng.normal(0, 0.5, size=(60, 2)), rng.normal(3, 0.5, size=(40, 2))])
+
+        def fit(distance_func):
+            model = size_constrained_clustering.DeterministicAnnealing(
+                2, [0.6, 0.4], max_iters=100, distance_func=distance_func, np_seed=1
+            )
+            model.fit(X)
+            return model
+
+        # The Euclidean backend gives the same clustering as the default distance function (cdist)
+        cdist_model = fit(cdist)
+        euclidean_model = fit("euclidean")
+        assert np.array_equal(cdist_model.labels_, euclidean_model.labels_)
+        assert np.allclose(cdist_model.cluster_centers_, euclidean_model.cluster_centers_)
+
+        # The other backends (mostly) separate the two blobs as well
+        for distance_func in ["sqeuclidean", "mahalanobis"]:
+            labels = fit(distance_func).labels_
+            first_blob_cluster = np.argmax(np.bincount(labels[:60], minlength=2))
+            assert np.mean(labels[:60] == first_blob_cluster) >= 0.9
+            assert np.mean(labels[60:] != first_blob_cluster) >= 0.9
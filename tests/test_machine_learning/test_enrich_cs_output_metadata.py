@@ -2,7 +2,9 @@ import pytest
 import pandas as pd
 from unittest.mock import patch, MagicMock
 
-from machine_learning.create_cs_outputs_enriched_metadata import filter_cs_metadata_fields, enrich_metadata_with_journal_metrics, enrich_metadata_with_output_metrics, enrich_cs_outputs_metadata
+from machine_learning.create_cs_outputs_enriched_metadata import filter_cs_metadata_fields, enrich_metadata_with_journal_metrics, enrich_metadata_with_output_metrics, enrich_cs_outputs_metadata, \
+    update_outputs_enriched_metadata, deduplicate_journal_metrics
+from utils.versioned_dataset import read_delta
 
 @pytest.fixture
 def cs_outputs_metadata():
@@ -88,6 +90,49 @@ def test_enrich_metadata_with_journal_metrics(cs_outputs_metadata):
     assert cs_outputs_metadata_journal_metrics.loc[0, "SJR"] == 0.626
     assert cs_outputs_metadata_journal_metrics.loc[0, "Cite_Score"] == 7.5
 
+def test_enrich_metadata_with_journal_metrics_issn_spellings(cs_outputs_metadata):
+    # The journal with ISSN 1383-7133 is listed twice, under different spellings of its ISSN
+    cs_journal_metrics_mock = pd.DataFrame({
+        "ISSN": ["13837133", "1383-7133", "2168-2305"],
+        "Scopus_ID": ["24175", "24175", 2417544],
+        "SNIP": [1.299, 1.299, 1.595],
+        "SJR": [0.626, 0.626, 0.622],
+        "Cite_Score": [7.5, 7.5, 7.2]
+    })
+
+    with patch("machine_learning.create_cs_outputs_enriched_metadata.load_cs_journal_metrics_df", return_value=cs_journal_metrics_mock):
+        cs_outputs_metadata_journal_metrics = enrich_metadata_with_journal_metrics(cs_outputs_metadata)
+
+    # The output is enriched once, and keeps its ISSN as a string
+    assert len(cs_outputs_metadata_journal_metrics) == 1
+    assert cs_outputs_metadata_journal_metrics["ISSN"].dtype == object
+    assert cs_outputs_metadata_journal_metrics.loc[0, "ISSN"] == "1383-7133"
+    assert cs_outputs_metadata_journal_metrics.loc[0, "SJR"] == 0.626
+
+def test_deduplicate_journal_metrics(capsys):
+    # 1383-7133 is listed under two spellings: the second one has the SJR missing from the first one
+    # 2168-2305 is listed under two spellings with different SNIPs
+    cs_journal_metrics_mock = pd.DataFrame({
+        "ISSN": ["1383-7133", "1383-7133", "2168-2305", "2168-2305"],
+        "Scopus_ID": ["24175", "24175", "2417544", "2417544"],
+        "SNIP": [1.299, 1.299, 1.595, 1.6],
+        "SJR": [None, 0.626, 0.622, 0.622],
+        "Cite_Score": [7.5, 7.5, 7.2, None]
+    })
+
+    deduplicated_df = deduplicate_journal_metrics(cs_journal_metrics_mock)
+
+    # One record per ISSN, with the first non-null value of every metric
+    assert deduplicated_df.columns.tolist() == cs_journal_metrics_mock.columns.tolist()
+    assert deduplicated_df["ISSN"].tolist() == ["1383-7133", "2168-2305"]
+    assert deduplicated_df["SJR"].tolist() == [0.626, 0.622]
+    assert deduplicated_df["SNIP"].tolist() == [1.299, 1.595]
+    assert deduplicated_df["Cite_Score"].tolist() == [7.5, 7.2]
+
+    # Only the disagreeing ISSN is logged as a conflict, with its conflicting metric
+    log = capsys.readouterr().out
+    assert "{'2168-2305': ['SNIP']}" in log and "1383-7133" not in log
+
 def test_enrich_metadata_with_output_metrics():
     # The metadata of one CS output
     cs_outputs_metadata = pd.DataFrame(
@@ -194,3 +239,46 @@ def test_enrich_cs_outputs_metadata_calls_enrichment_methods():
         # Assert that the CS output was enhanced with output metadata - citation + field normalised metrics
         mock_output_metrics.assert_called_once_with(mock_mid_result)
         assert result == mock_final_result
+
+def test_update_outputs_enriched_metadata(tmp_path):
+    """
+    Test that only the outputs affected by a changed record are enriched again, and the result is the same as a full
+    rebuild
+    """
+    metadata_fields = ['Institution UKPRN code', 'Institution name', 'Output type', 'Title', 'Volume title', 'Place',
+                       'Publisher', 'ISSN', 'DOI', 'Year', 'Number of additional authors', 'Interdisciplinary',
+                       'Forensic science', 'Criminology', 'Research group', 'Open access status',
+                       'Cross-referral requested', 'Delayed by COVID19', 'Incl sig material before 2014',
+                       'Incl reseach process', 'Incl factual info about significance']
+    outputs_metadata = pd.DataFrame({field: ["x", "y", "z"] for field in metadata_fields}).assign(
+        ISSN=["1383-7133", "2168-2305", "1383-7133"], DOI=["doi-1", "doi-2", "doi-3"]
+    )
+    cs_journal_metrics_df = pd.DataFrame({"ISSN": ["1383-7133", "2168-2305"], "SNIP": [1.299, 1.595]})
+    cs_citation_metadata_df = pd.DataFrame({"scopus_id": ["1", "2", "3"], "total_citations": [10.0, 20.0, 30.0],
+                                            "DOI": ["doi-1", "doi-2", "doi-3"]})
+    cs_output_metrics_df = pd.DataFrame({"field_weighted_citation_impact": [1.0, 2.0, 3.0],
+                                         "scopus_id": ["1", "2", "3"]})
+
+    module = "machine_learning.create_cs_outputs_enriched_metadata"
+    with patch(f"{module}.get_outputs_enriched_metadata_versions_path", return_value=str(tmp_path)), \
+         patch(f"{module}.get_outputs_metadata", return_value=outputs_metadata), \
+         patch(f"{module}.load_cs_journal_metrics_df", return_value=cs_journal_metrics_df), \
+         patch(f"{module}.load_cs_citation_metadata_df", return_value=cs_citation_metadata_df), \
+         patch(f"{module}.load_cs_output_metrics_df", side_effect=lambda: cs_output_metrics_df.copy()), \
+         patch(f"{module}.enrich_cs_outputs_metadata", side_effect=enrich_cs_outputs_metadata) as mock_enrich:
+
+        _, manifest = update_outputs_enriched_metadata()
+        assert manifest["version"] == 1 and manifest["full_rebuild"]
+
+        # Nothing changed: no new version
+        assert update_outputs_enriched_metadata()[1] is None
+
+        # The output metrics of Scopus ID 2 changed: only the second output is enriched again
+        cs_output_metrics_df.loc[1, "field_weighted_citation_impact"] = 2.5
+        outputs_enriched_metadata, manifest = update_outputs_enriched_metadata()
+        assert len(mock_enrich.call_args.args[0]) == 1
+        assert manifest["version"] == 2 and not manifest["full_rebuild"] and manifest["changed_rows"] == 1
+
+    assert outputs_enriched_metadata["field_weighted_citation_impact"].tolist() == [1.0, 2.5, 3.0]
+    assert outputs_enriched_metadata["SNIP"].tolist() == [1.299, 1.595, 1.299]
+    assert read_delta(str(tmp_path))["output_row"].tolist() == [1]
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+from scipy.stats import chi2_contingency, mannwhitneyu
+
+from machine_learning.feature_significance import get_significance_features, get_feature_significance, \
+    summarise_feature_significance, CONTINUOUS_FEATURES, CATEGORICAL_FEATURES, SIGNIFICANCE_COLUMNS
+
+def get_outputs_df(n_outputs=400):
+    """
+    Set-up outputs whose citations are larger in the high-scoring cluster (the first half), and whose other features
+    are independent of the clusters
+    """
+    rng = np.random.default_rng(0)
+    is_high = np.arange(n_outputs) < n_outputs // 2
+    outputs_df = pd.DataFrame({feature: rng.normal(size=n_outputs) for feature in CONTINUOUS_FEATURES})
+    outputs_df['total_citations'] = rng.poisson(np.where(is_high, 30, 10)).astype(float)
+    outputs_df.loc[::7, 'SNIP'] = np.nan
+
+    for feature in CATEGORICAL_FEATURES:
+        outputs_df[feature] = rng.choice(['A', 'B', 'C'], size=n_outputs)
+    outputs_df['Interdisciplinary'] = np.where(rng.random(n_outputs) < 0.2, 'Yes', None)
+    outputs_df['Open access status'] = outputs_df['Open access status'].where(rng.random(n_outputs) < 0.9)
+    return outputs_df, is_high
+
+def test_feature_significance():
+    """
+    Test that the tests of every feature match SciPy's, and that only the feature related to the clusters is significant
+    """
+    outputs_df, is_high = get_outputs_df()
+    significance_features = get_significance_features(outputs_df)
+    # The fold's training outputs: all but the last 20
+    positions = np.arange(len(outputs_df) - 20)
+    train_df = outputs_df.iloc[positions]
+
+    significance_df = get_feature_significance(significance_features, positions, is_high[positions], n_permutations=300)
+    assert significance_df.columns.tolist() == SIGNIFICANCE_COLUMNS
+    significance_df = significance_df.set_index("feature")
+
+    snip = train_df['SNIP']
+    mann_whitney = mannwhitneyu(snip[is_high[positions]].dropna(), snip[~is_high[positions]].dropna())
+    assert np.isclose(significance_df.loc['SNIP', 'p_value'], mann_whitney.pvalue)
+    assert significance_df.loc['SNIP', 'n_high'] + significance_df.loc['SNIP', 'n_low'] == snip.notna().sum()
+
+    for feature, values in [
+        ('Output type', train_df['Output type']),
+        ('Interdisciplinary', train_df['Interdisciplinary'].fillna('No')),
+        ('Open access status', train_df['Open access status'])
+    ]:
+        chi_square = chi2_contingency(pd.crosstab(values, is_high[positions]), correction=False)
+        assert np.isclose(significance_df.loc[feature, 'statistic'], chi_square.statistic)
+        assert np.isclose(significance_df.loc[feature, 'p_value'], chi_square.pvalue)
+
+    assert significance_df.loc['total_citations', 'effect_size'] > 0.5
+    assert significance_df.loc['total_citations', 'permutation_p_value'] == 1 / 301
+    assert (significance_df.drop('total_citations')['permutation_p_value'] > 0.001).all()
+
+def test_feature_significance_empty_feature():
+    """
+    Test that a categorical feature without any value is not tested, and the other features are tested as before
+    """
+    outputs_df, is_high = get_outputs_df()
+    positions = np.arange(len(outputs_df) - 20)
+    expected_df = get_feature_significance(
+        get_significance_features(outputs_df), positions, is_high[positions], n_permutations=100
+    ).set_index("feature")
+
+    outputs_df['Incl factual info about significance'] = None
+    significance_df = get_feature_significance(
+        get_significance_features(outputs_df), positions, is_high[positions], n_permutations=100
+    ).set_index("feature")
+
+    empty_feature = significance_df.loc['Incl factual info about significance']
+    assert empty_feature[['n_high', 'n_low']].tolist() == [0, 0]
+    assert np.isnan(empty_feature[['statistic', 'p_value', 'permutation_p_value', 'effect_size']].astype(float)).all()
+    pd.testing.assert_frame_equal(
+        significance_df.drop('Incl factual info about significance'),
+        expected_df.drop('Incl factual info about significance')
+    )
+
+def test_summarise_feature_significance():
+    """
+    Test that the significance of every feature is summarised across folds, the strongest effects first
+    """
+    outputs_df, is_high = get_outputs_df()
+    significance_features = get_significance_features(outputs_df)
+    feature_significance_df = pd.concat([
+        get_feature_significance(significance_features, positions, is_high[positions], n_permutations=100).assign(fold=fold)
+        # Every fold holds out a quarter of the outputs
+        for fold, positions in enumerate(
+            np.delete(np.arange(len(outputs_df)), test_positions)
+            for test_positions in np.array_split(np.arange(len(outputs_df)), 4)
+        )
+    ], ignore_index=True)
+
+    summary = summarise_feature_significance(feature_significance_df)
+    assert len(summary) == len(CONTINUOUS_FEATURES) + len(CATEGORICAL_FEATURES)
+    assert (summary["n_folds"] == 4).all()
+    assert summary.index[0] == 'total_citations' and summary.loc['total_citations', 'significant_share'] == 1
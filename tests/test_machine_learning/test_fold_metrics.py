@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from machine_learning.fold_metrics import FoldMetrics
+
+def get_fold_metrics(uoa, kl_divergences):
+    """
+    Set-up the metrics of a cross-validation, one fold per KL divergence
+    """
+    fold_metrics = FoldMetrics(uoa=uoa, features=["normalised_citations", "top_citation_percentile"], warm_start=False)
+    for fold, kl_divergence in enumerate(kl_divergences):
+        fold_metrics.add_fold(
+            fold, 10000000 + fold, {"kl_divergence": kl_divergence}, {"tvd": kl_divergence / 2}, n_iter=100,
+            fit_time=0.5
+        )
+    return fold_metrics
+
+def test_summarise():
+    """
+    Test that every fold is recorded with the configuration, and that the float columns are summarised
+    """
+    fold_metrics = get_fold_metrics(11, [0.1, 0.2, 0.3, 0.4, 1.0])
+    df = fold_metrics.to_dataframe()
+
+    assert len(fold_metrics) == 5
+    assert df.loc[0, "features"] == "normalised_citations,top_citation_percentile" and df.loc[4, "ukprn"] == 10000004
+    # Counts (n_iter) and the configuration are not summarised
+    assert fold_metrics.get_metric_names() == ["kl_divergence", "tvd", "fit_time"]
+
+    summary = fold_metrics.summarise()
+    assert summary.loc["kl_divergence", "n_folds"] == 5
+    assert np.isclose(summary.loc["kl_divergence", "mean"], 0.4)
+    assert np.isclose(summary.loc["kl_divergence", "median"], 0.3)
+    assert np.isclose(summary.loc["kl_divergence", "std"], df["kl_divergence"].std())
+    assert 0.1 <= summary.loc["kl_divergence", "ci_low"] < 0.4 < summary.loc["kl_divergence", "ci_high"] <= 1.0
+    # The metrics share the resampled folds
+    assert np.allclose(summary.loc["tvd", ["ci_low", "ci_high"]], summary.loc["kl_divergence", ["ci_low", "ci_high"]] / 2)
+    # Reproducible given the random state
+    pd.testing.assert_frame_equal(summary, fold_metrics.summarise())
+
+def test_merge(tmp_path):
+    """
+    Test that the metrics of runs in parallel workers are merged, saved, and summarised per run
+    """
+    fold_metrics = FoldMetrics.merge([
+        get_fold_metrics(11, [0.1, 0.2, 0.3]), get_fold_metrics(12, [0.5, 0.7]).to_dataframe()
+    ])
+    fold_metrics_path = str(tmp_path / "fold_metrics.parquet")
+    fold_metrics.save(fold_metrics_path)
+
+    loaded_fold_metrics = FoldMetrics.load(fold_metrics_path)
+    pd.testing.assert_frame_equal(loaded_fold_metrics.to_dataframe(), fold_metrics.to_dataframe())
+
+    summary = loaded_fold_metrics.summarise(metrics=["kl_divergence"], by="uoa")
+    assert summary.index.names == ["uoa", "metric"]
+    assert np.isclose(summary.loc[(11, "kl_divergence"), "mean"], 0.2)
+    assert np.isclose(summary.loc[(12, "kl_divergence"), "mean"], 0.6)
+
+    # Folds added after loading are appended
+    loaded_fold_metrics.add_fold(5, 10000005, {"kl_divergence": 0.9, "tvd": 0.45}, n_iter=50, fit_time=0.1)
+    assert len(loaded_fold_metrics) == 6
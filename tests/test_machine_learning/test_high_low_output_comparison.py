@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from machine_learning.high_low_output_comparison import compare_clusters, save_feature_comparison, \
+    read_feature_comparison, COMPARISON_COLUMNS, FEATURE_TYPES
+
+def get_outputs_df(n_outputs=200):
+    """
+    Set-up outputs with every compared feature
+    """
+    rng = np.random.default_rng(0)
+    outputs_df = pd.DataFrame({
+        feature: rng.normal(size=n_outputs) if feature_type == 'continuous' else rng.choice(['A', 'B', 'C'], n_outputs)
+        for feature, feature_type in FEATURE_TYPES.items()
+    })
+    outputs_df.loc[::5, 'SNIP'] = np.nan
+    outputs_df['Interdisciplinary'] = np.where(rng.random(n_outputs) < 0.2, 'Yes', None)
+    outputs_df['Cross-referral requested'] = np.where(rng.random(n_outputs) < 0.1, rng.choice([5.0, 10.0], n_outputs), np.nan)
+    return outputs_df
+
+def test_compare_clusters(tmp_path):
+    """
+    Test that the comparison table matches the summaries and value counts of every feature in the clusters
+    """
+    outputs_df = get_outputs_df()
+    clusters = np.arange(len(outputs_df)) % 3 == 0
+    cluster_label_mapping = {True: 'high_scoring_outputs', False: 'low_scoring_outputs'}
+    high_scoring_outputs_df = outputs_df[clusters]
+    low_scoring_outputs_df = outputs_df[~clusters]
+
+    comparison_df = compare_clusters(outputs_df, clusters, cluster_label_mapping)
+    assert comparison_df.columns.tolist() == COMPARISON_COLUMNS
+    # Features in the order they are analysed
+    assert comparison_df['feature'].unique().tolist() == list(FEATURE_TYPES)
+
+    snip = comparison_df[comparison_df['feature'] == 'SNIP'].set_index('statistic')
+    assert np.allclose(snip['high_scoring_outputs'], high_scoring_outputs_df['SNIP'].describe()[snip.index])
+    assert np.allclose(snip['low_scoring_outputs'], low_scoring_outputs_df['SNIP'].describe()[snip.index])
+
+    # Blanks of the features left blank when they do not apply are counted as No
+    interdisciplinary = comparison_df[comparison_df['feature'] == 'Interdisciplinary'].set_index(['value', 'statistic'])
+    high_counts = high_scoring_outputs_df['Interdisciplinary'].fillna('No').value_counts()
+    assert interdisciplinary.loc[('No', 'count'), 'high_scoring_outputs'] == high_counts['No']
+    assert np.isclose(
+        interdisciplinary.loc[('Yes', 'percentage'), 'high_scoring_outputs'], high_counts['Yes'] / high_counts.sum() * 100
+    )
+    assert np.isclose(
+        interdisciplinary.loc[('Yes', 'value_percentage'), 'high_scoring_outputs'],
+        high_counts['Yes'] / outputs_df['Interdisciplinary'].notna().sum() * 100
+    )
+
+    # Numerical values are ordered by value
+    cross_referrals = comparison_df[comparison_df['feature'] == 'Cross-referral requested']['value'].unique().tolist()
+    assert cross_referrals == ['5.0', '10.0', 'No']
+
+    comparison_path = str(tmp_path / "feature_comparison.parquet")
+    save_feature_comparison(comparison_df, comparison_path)
+    pd.testing.assert_frame_equal(read_feature_comparison(comparison_path), comparison_df)
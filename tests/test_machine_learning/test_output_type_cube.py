@@ -0,0 +1,71 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+from machine_learning.output_type_cube import OutputTypeCube, MISSING_LABEL, get_axis_codes
+
+def get_outputs_df(n_outputs=300):
+    """
+    Set-up outputs of 4 institutions with 3 output types
+    """
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'Output type': rng.choice(['A', 'D', 'E'], size=n_outputs),
+        'Institution UKPRN code': rng.choice([10007760, 10007784, 10007794, 10007855], size=n_outputs),
+    }), rng.random(n_outputs) < 0.4
+
+def test_output_type_cube(tmp_path):
+    """
+    Test that the cube counts the outputs of every output type, cluster and institution, and is sliced by any axis
+    """
+    outputs_df, is_high = get_outputs_df()
+    cube = OutputTypeCube.from_outputs(outputs_df, is_high)
+    crosstab = pd.crosstab([outputs_df['Output type'], is_high], outputs_df['Institution UKPRN code'])
+
+    assert cube.counts.shape == (3, 2, 4) and cube.counts.dtype == np.int32
+    assert cube.counts.sum() == len(outputs_df)
+    assert cube.select(output_type='D', cluster='high_scoring_outputs', ukprn=10007784) == crosstab.loc[('D', True), 10007784]
+    assert np.array_equal(cube.select(cluster='low_scoring_outputs'), crosstab.xs(False, level=1).to_numpy())
+    # Axes selected with lists are kept
+    assert cube.select(output_type=['A', 'E'], ukprn=[10007760, 10007855]).shape == (2, 2, 2)
+    assert np.array_equal(
+        cube.select(output_type=['A', 'E'], ukprn=[10007760, 10007855]),
+        cube.counts[[0, 2]][..., [0, 3]]
+    )
+
+    contingency_table = cube.get_contingency_table()
+    assert contingency_table.loc['E', 'high_scoring_outputs'] == np.sum((outputs_df['Output type'] == 'E') & is_high)
+    assert cube.get_contingency_table(ukprn=10007794).to_numpy().sum() == np.sum(
+        outputs_df['Institution UKPRN code'] == 10007794
+    )
+    assert cube.to_dataframe()['count'].sum() == len(outputs_df)
+
+    # Cubes of a fold's training outputs share the axes of all outputs
+    is_training = outputs_df['Institution UKPRN code'] != 10007760
+    fold_cube = OutputTypeCube.from_outputs(
+        outputs_df[is_training], is_high[is_training], cube.output_types, cube.ukprns
+    )
+    assert np.array_equal(fold_cube.ukprns, cube.ukprns) and fold_cube.select(ukprn=10007760).sum() == 0
+
+    cube_path = str(tmp_path / "output_type_cube.npz")
+    cube.save(cube_path)
+    loaded_cube = OutputTypeCube.load(cube_path)
+    assert np.array_equal(loaded_cube.counts, cube.counts) and np.array_equal(loaded_cube.ukprns, cube.ukprns)
+
+def test_output_type_cube_missing_values():
+    """
+    Test that outputs with a missing output type are counted under their own label, and that values or labels missing
+    from an axis raise a ValueError
+    """
+    outputs_df, is_high = get_outputs_df()
+    outputs_df.loc[:9, 'Output type'] = None
+
+    cube = OutputTypeCube.from_outputs(outputs_df, is_high)
+    assert cube.output_types.tolist() == ['A', 'D', 'E', MISSING_LABEL]
+    assert cube.select(output_type=MISSING_LABEL).sum() == 10 and cube.counts.sum() == len(outputs_df)
+
+    # Given labels without the missing label, the missing values cannot be coded
+    with pytest.raises(ValueError):
+        get_axis_codes(outputs_df['Output type'], ['A', 'D', 'E'])
+    with pytest.raises(ValueError):
+        cube.select(output_type='C')
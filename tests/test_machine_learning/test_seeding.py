@@ -0,0 +1,71 @@
+import pytest
+import numpy as np
+
+from machine_learning import seeding, size_constrained_clustering
+
+class Test_Seeding:
+
+    @pytest.fixture
+    def blobs(self):
+        rng = np.random.default_rng(0)
+        # Two blobs along the diagonal: 70 points around (0, 0), and 30 points around (4, 4)
+        return np.vstack([rng.normal(0, 0.5, size=(70, 2)), rng.normal(4, 0.5, size=(30, 2))])
+
+    def test_random_centers_are_data_points(self, blobs):
+        centers = seeding.random_centers(blobs, [0.7, 0.3], np.random.default_rng(1))
+        assert centers.shape == (2, 2)
+        assert all(any(np.array_equal(center, point) for point in blobs) for center in centers)
+
+        # Same centers as picking k data points with rng.choice (the original seeding)
+        expected_indices = np.random.default_rng(1).choice(range(100), size=2, replace=False)
+        assert np.array_equal(centers, blobs[expected_indices])
+
+    def test_kmeans_plusplus_centers(self, blobs):
+        # The k-means++ centers are data points, and (almost always) one in each blob
+        picked_both_blobs = 0
+        for seed in range(20):
+            centers = seeding.kmeans_plusplus_centers(blobs, [0.7, 0.3], np.random.default_rng(seed))
+            assert all(any(np.array_equal(center, point) for point in blobs) for center in centers)
+            picked_both_blobs += np.sum(centers.sum(axis=1) > 4) == 1
+        assert picked_both_blobs >= 18
+
+        # Identical data points: fall back to picking uniformly at random
+        identical = np.ones((5, 2))
+        assert np.array_equal(seeding.kmeans_plusplus_centers(identical, [0.5, 0.5], np.random.default_rng(0)), np.ones((2, 2)))
+
+    def test_pca_split_centers(self, blobs):
+        centers = seeding.pca_split_centers(blobs, [0.7, 0.3])
+        # The halves of the split are the two blobs (in either order)
+        assert np.allclose(sorted(centers.sum(axis=1)), [blobs[:70].sum(axis=1).mean(), blobs[70:].sum(axis=1).mean()])
+
+        with pytest.raises(ValueError):
+            seeding.pca_split_centers(blobs, [0.5, 0.3, 0.2])
+
+    def test_quantile_centers(self, blobs):
+        # Consecutive groups along the first principal component, sized by the distribution
+        centers = seeding.quantile_centers(blobs, [0.7, 0.3])
+        projections = seeding.get_principal_component_projections(blobs)
+        order = np.argsort(projections, kind="stable")
+        assert np.allclose(centers, [blobs[order[:70]].mean(axis=0), blobs[order[70:]].mean(axis=0)])
+
+        # Every group has at least one data point, even if its proportion rounds to 0
+        centers = seeding.quantile_centers(blobs, [0.998, 0.001, 0.001])
+        assert centers.shape == (3, 2)
+        assert not np.any(np.isnan(centers))
+
+    def test_get_seeding_strategy(self):
+        assert seeding.get_seeding_strategy("k-means++") is seeding.kmeans_plusplus_centers
+        assert seeding.get_seeding_strategy(seeding.quantile_centers) is seeding.quantile_centers
+
+        with pytest.raises(ValueError):
+            seeding.get_seeding_strategy("farthest-first")
+        with pytest.raises(Exception):
+            seeding.get_seeding_strategy(1)
+
+    def test_size_constrained_clustering_seeding(self, blobs):
+        # Every seeding strategy separates the two blobs
+        for init in ["random", "k-means++", "pca", "quantile"]:
+            model = size_constrained_clustering.DeterministicAnnealing(2, [0.7, 0.3], max_iters=100, np_seed=1, init=init)
+            model.fit(blobs)
+            assert len(set(model.labels_[:70])) == 1 and len(set(model.labels_[70:])) == 1
+            assert model.labels_[0] != model.labels_[-1]
@@ -2,7 +2,7 @@ import pytest
 import pandas as pd
 from unittest.mock import patch
 
-from machine_learning.train_test_clustering_models import infer_cluster_labels, get_actual_output_score_percentages, get_predicted_output_score_percentages, log_testing_data_cluster_distribution, log_training_data_cluster_distribution
+from machine_learning.train_test_clustering_models import infer_cluster_labels, get_actual_output_score_percentages, get_predicted_output_score_percentages, log_testing_data_cluster_distribution, log_training_data_cluster_distribution, get_lean_outputs_df, join_descriptive_columns, get_cluster_label_mapping, index_high_scoring_outputs, get_fold_high_scoring_positions, fit_warm_start_references
 
 @pytest.fixture
 def cluster_training_data():
@@ -46,6 +46,38 @@ def test_infer_cluster_labels(mock_get_high_scoring_universities, cluster_traini
 
     assert actual_cluster_labels_dict == expected_cluster_labels_dict
 
+def test_get_fold_high_scoring_positions(enhanced_results_df):
+    """
+    Test that the positions of the high-scoring universities' outputs in every fold's training set are the ones found
+    by filtering the training set
+    """
+    # Outputs of the high-scoring universities (10007783, 10000001) are interleaved with the ones of 10007856
+    cs_outputs_df = pd.DataFrame({
+        'Institution UKPRN code': [10007856, 10007783, 10000001, 10007856, 10007783, 10000001, 10007856],
+        'cluster': [0, 1, 1, 0, 0, 1, 1]
+    })
+    high_scoring_output_index = index_high_scoring_outputs(cs_outputs_df, enhanced_results_df)
+    assert high_scoring_output_index["positions"].tolist() == [1, 2, 4, 5]
+
+    for ukprn in enhanced_results_df['Institution code (UKPRN)']:
+        train = cs_outputs_df[cs_outputs_df['Institution UKPRN code'] != ukprn]
+        positions = get_fold_high_scoring_positions(high_scoring_output_index, ukprn)
+
+        expected_positions = [
+            position for position, train_ukprn in enumerate(train['Institution UKPRN code'])
+            if train_ukprn in (10007783, 10000001)
+        ]
+        assert positions.tolist() == expected_positions
+        assert get_cluster_label_mapping(train['cluster'].to_numpy()[positions]) == infer_cluster_labels(
+            train, enhanced_results_df
+        )
+
+def test_get_cluster_label_mapping():
+    # A tie, or no outputs of high-scoring universities, labels cluster 1 as high-scoring
+    assert get_cluster_label_mapping([0, 0, 1]) == {0: 'high_scoring_outputs', 1: 'low_scoring_outputs'}
+    assert get_cluster_label_mapping([0, 1])[1] == 'high_scoring_outputs'
+    assert get_cluster_label_mapping([])[1] == 'high_scoring_outputs'
+
 
 def test_get_actual_output_score_percentages():
     # high = 40 / (40+80) * 100
@@ -137,3 +169,63 @@ def test_log_training_data_cluster_distribution(capfd):
     assert "Provided distribution = (75.0, 25.0)" in out
     assert "Cluster low_scoring_outputs: 75.0%" in out
     assert "Cluster high_scoring_outputs: 25.0%" in out
+
+
+@patch('machine_learning.train_test_clustering_models.get_cs_outputs_df')
+def test_join_descriptive_columns(mock_get_cs_outputs_df):
+    """
+    Test that the lean outputs only keep the UKPRN codes and the features, and that the descriptive columns of the
+    training outputs are joined back with their imputed features and clusters
+    """
+    cs_outputs_df = pd.DataFrame({
+        'Institution UKPRN code': [10007783, 10007856, 10007856, 10000001],
+        'Title': ['A', 'B', 'C', 'D'],
+        'normalised_citations': [0.5, None, 1.5, 2.0]
+    })
+    mock_get_cs_outputs_df.return_value = cs_outputs_df
+
+    lean_outputs_df = get_lean_outputs_df(cs_outputs_df, ['normalised_citations'])
+    assert lean_outputs_df.columns.tolist() == ['Institution UKPRN code', 'normalised_citations', 'row_id']
+
+    # Fold whose test set is 10007783: the training outputs, with the missing feature imputed and their clusters
+    train = lean_outputs_df[lean_outputs_df['Institution UKPRN code'] != 10007783].copy()
+    train['normalised_citations'] = train['normalised_citations'].fillna(1.75)
+    train['cluster'] = [1, 0, 0]
+
+    descriptive_train = join_descriptive_columns(train, ['normalised_citations'])
+    assert descriptive_train.index.tolist() == [1, 2, 3]
+    assert descriptive_train['Title'].tolist() == ['B', 'C', 'D']
+    assert descriptive_train['normalised_citations'].tolist() == [1.75, 1.5, 2.0]
+    assert descriptive_train['cluster'].tolist() == [1, 0, 0]
+
+
+@patch('machine_learning.train_test_clustering_models.fit_warm_start_reference')
+def test_fit_warm_start_references(mock_fit_warm_start_reference, enhanced_results_df):
+    """
+    Test that the reference seeding every fold is fit without the outputs of the fold's university, on the distribution
+    of the other universities
+    """
+    mock_fit_warm_start_reference.side_effect = lambda outputs_df, **kwargs: {
+        "ukprns": set(outputs_df['Institution UKPRN code']), "distribution": kwargs["distribution"]
+    }
+    cs_outputs_df = pd.DataFrame({
+        'Institution UKPRN code': [10007783, 10007783, 10007856, 10007856, 10000001],
+        'normalised_citations': [0.5, 1.0, 1.5, 2.0, 2.5]
+    })
+
+    references = fit_warm_start_references(cs_outputs_df, enhanced_results_df, ['normalised_citations'], n_blocks=2)
+
+    # Two blocks: [10007783, 10007856] and [10000001]
+    assert mock_fit_warm_start_reference.call_count == 2
+    assert references[10007783] is references[10007856]
+    for ukprn, reference in references.items():
+        assert ukprn not in reference["ukprns"]
+    assert references[10007783]["ukprns"] == {10000001}
+    assert references[10007783]["distribution"] == [1.0, 0.0]
+    assert references[10000001]["ukprns"] == {10007783, 10007856}
+    assert references[10000001]["distribution"] == [0.6, 0.4]
+
+    # At most one block per university
+    mock_fit_warm_start_reference.reset_mock()
+    references = fit_warm_start_references(cs_outputs_df, enhanced_results_df, ['normalised_citations'], n_blocks=10)
+    assert mock_fit_warm_start_reference.call_count == 3
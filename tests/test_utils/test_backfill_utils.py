@@ -0,0 +1,36 @@
+import pandas as pd
+from utils.backfill import backfill, get_reference_lookup
+
+def test_backfill():
+    """
+    Test that the rules fill in missing values in order, keep the row order and index, and record the fill sources
+    """
+    # Duplicate index labels, as written by earlier versions of the journal metrics file
+    df = pd.DataFrame({
+        'ISSN': ['a', 'b', 'c', 'd'],
+        'SJR': [None, 1.0, None, None],
+        'SNIP': [2.0, None, None, 3.0]
+    }, index=[0, 0, 1, 1])
+
+    primary_df = pd.DataFrame({'ISSN': ['a', 'b'], 'SJR': [10.0, 99.0], 'SNIP': [None, 20.0]})
+    secondary_df = pd.DataFrame({'ISSN': ['a', 'c', 'c'], 'SJR': [50.0, 30.0, 31.0]})
+    references = {
+        'primary': get_reference_lookup(primary_df, 'ISSN'),
+        'secondary': get_reference_lookup(secondary_df, 'ISSN'),
+    }
+    rules = [('SJR', 'primary', 'ISSN'), ('SJR', 'secondary', 'ISSN'), ('SNIP', 'primary', 'ISSN')]
+
+    backfilled_df, fill_sources_df = backfill(df, rules, references)
+
+    assert backfilled_df.index.tolist() == [0, 0, 1, 1]
+    assert backfilled_df['ISSN'].tolist() == ['a', 'b', 'c', 'd']
+    # Existing values are kept, a later rule only fills what the earlier one could not, the first record of a key wins
+    assert backfilled_df['SJR'].tolist()[:3] == [10.0, 1.0, 30.0]
+    assert pd.isna(backfilled_df['SJR'].iloc[3])
+    assert backfilled_df['SNIP'].tolist()[:2] == [2.0, 20.0]
+
+    assert fill_sources_df['SJR'].tolist() == ['primary', None, 'secondary', None]
+    assert fill_sources_df['SNIP'].tolist() == [None, 'primary', None, None]
+
+    # The input DataFrame is not modified
+    assert df['SJR'].isna().sum() == 3
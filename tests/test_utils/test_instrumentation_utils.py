@@ -0,0 +1,117 @@
+import pytest
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils.instrumentation import span, increment_counter, reset_instrumentation, get_instrumentation_events, \
+    set_instrumentation_log, read_instrumentation_log, summarise_instrumentation, get_rss, get_peak_rss, observe_rss
+
+@pytest.fixture(autouse=True)
+def instrumentation():
+    """
+    Start every test without instrumentation events, and without writing them to a file
+    """
+    reset_instrumentation()
+    set_instrumentation_log(None)
+    yield
+    reset_instrumentation()
+    set_instrumentation_log(None)
+
+def test_span(tmp_path):
+    """
+    Test that spans nest, record their attributes and errors, and are written to the JSON-lines file with the metrics
+    """
+    instrumentation_log_path = str(tmp_path / "events.jsonl")
+    set_instrumentation_log(instrumentation_log_path)
+
+    with span("etl", uoa=11):
+        with span("stage") as attributes:
+            attributes["rows_out"] = 5
+        increment_counter("nulls_filled", 3, target="SJR")
+
+    with pytest.raises(ValueError):
+        with span("api_request", api="Serial Title"):
+            raise ValueError("Timeout")
+
+    events = get_instrumentation_events()
+    assert [(event["kind"], event["name"], event["span"]) for event in events] == [
+        ("span", "stage", "etl"), ("counter", "nulls_filled", "etl"), ("span", "etl", None), ("span", "api_request", None)
+    ]
+    assert events[0]["attributes"] == {"rows_out": 5, "status": "ok"}
+    assert events[3]["attributes"]["status"] == "error" and events[3]["attributes"]["error"] == "ValueError: Timeout"
+
+    # The file holds the same events, so a run can be summarised afterwards
+    assert read_instrumentation_log(instrumentation_log_path) == events
+
+def test_span_threads():
+    """
+    Test that the spans of concurrent threads are not nested in each other
+    """
+    barrier = threading.Barrier(2)
+
+    def restart(restart_index):
+        with span("restart", restart=restart_index):
+            # Both spans are open before either records its counter
+            barrier.wait()
+            increment_counter("iterations", restart=restart_index)
+            barrier.wait()
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        list(executor.map(restart, range(2)))
+
+    events = get_instrumentation_events()
+    assert [(event["name"], event["span"]) for event in events if event["kind"] == "counter"] == [
+        ("iterations", "restart"), ("iterations", "restart")
+    ]
+    assert [event["span"] for event in events if event["kind"] == "span"] == [None, None]
+
+def test_max_events(tmp_path):
+    """
+    Test that the events kept in memory are capped while they are written to the file
+    """
+    instrumentation_log_path = str(tmp_path / "events.jsonl")
+    set_instrumentation_log(instrumentation_log_path, max_events=2)
+    for chunk in range(5):
+        increment_counter("rows", chunk)
+
+    # The most recent events are kept in memory, and the file holds all of them
+    assert [event["value"] for event in get_instrumentation_events()] == [3.0, 4.0]
+    assert [event["value"] for event in read_instrumentation_log(instrumentation_log_path)] == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+    # Events are only written to the file
+    set_instrumentation_log(instrumentation_log_path, max_events=0)
+    increment_counter("rows", 5)
+    assert get_instrumentation_events() == []
+    assert len(read_instrumentation_log(instrumentation_log_path)) == 6
+
+def test_summarise_instrumentation():
+    """
+    Test that spans are aggregated by name with their share of the run's time, and metrics with their statistics
+    """
+    events = [
+        {"kind": "span", "name": "fold", "value": 3.0, "span": None, "attributes": {"status": "ok"}},
+        {"kind": "span", "name": "fit", "value": 2.0, "span": "fold", "attributes": {"status": "ok"}},
+        {"kind": "span", "name": "fold", "value": 1.0, "span": None, "attributes": {"status": "error"}},
+        {"kind": "histogram", "name": "join_hit_rate", "value": 0.5, "span": None, "attributes": {}},
+        {"kind": "histogram", "name": "join_hit_rate", "value": 1.0, "span": None, "attributes": {}},
+        {"kind": "counter", "name": "nulls_filled", "value": 3.0, "span": None, "attributes": {}},
+    ]
+    span_summary, metric_summary = summarise_instrumentation(events)
+
+    assert span_summary.index.tolist() == ["fold", "fit"]
+    assert span_summary.loc["fold", "count"] == 2 and span_summary.loc["fold", "errors"] == 1
+    assert span_summary.loc["fold", "total_s"] == 4.0 and span_summary.loc["fit", "share"] == 0.5
+
+    assert metric_summary.loc["join_hit_rate", "mean"] == 0.75 and metric_summary.loc["join_hit_rate", "kind"] == "histogram"
+    assert metric_summary.loc["nulls_filled", "sum"] == 3.0
+
+def test_peak_rss():
+    """
+    Test that the peak resident set size includes the memory released since, and that the RSS is recorded in MB
+    """
+    rss = get_rss()
+    memory = bytearray(64 * 2 ** 20)
+    memory[::4096] = b"x" * len(memory[::4096]) # Touch every page, so it is resident
+    del memory
+
+    assert get_peak_rss() >= rss + 32 * 2 ** 20
+    observe_rss(ukprn=10007833)
+    assert get_instrumentation_events()[0]["name"] == "rss_mb"
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+from utils.issn_index import encode_issn, ISSNMetricsIndex
+
+def test_encode_issn():
+    """
+    Test that every spelling of an ISSN has the same integer key, and malformed ISSNs are encoded as -1
+    """
+    issn_keys = encode_issn(pd.Series(['2190-572X', '2190572x', '0007-9235', '000-0002', None]))
+
+    assert issn_keys[0] == issn_keys[1] == 2190572 * 11 + 10
+    assert issn_keys[2] == 7923 * 11 + 5
+    assert issn_keys[3:].tolist() == [-1, -1]
+
+def test_issn_metrics_index(tmp_path):
+    """
+    Test that the index answers bulk lookups of SJR, SNIP, rank and title, before and after being persisted
+    """
+    sjr_df = pd.DataFrame({
+        'Rank': [1, 1, 2, 3],
+        'Title': ['Ca-A Cancer Journal for Clinicians', 'Ca-A Cancer Journal for Clinicians', 'Cell', 'Cell Duplicate'],
+        'Issn': ['1542-4863', '0007-9235', '0092-8674', '0092-8674'],
+        'SJR': [56.204, 56.204, 26.494, 1.0]
+    })
+    snip_df = pd.DataFrame({
+        'SNIP': [0.855, 7.5, 1.0],
+        'ISSN': ['2190-572X', '0092-8674', '-']
+    })
+
+    issn_metrics_index = ISSNMetricsIndex.build(sjr_df, snip_df)
+    # Each ISSN is listed once, the placeholder '-' is dropped
+    assert len(issn_metrics_index) == 4
+
+    issn_metrics_index.save(str(tmp_path / "index"))
+    loaded_issn_metrics_index = ISSNMetricsIndex.load(str(tmp_path / "index"))
+    assert isinstance(loaded_issn_metrics_index.keys, np.memmap)
+
+    issns = pd.Series(['00928674', '2190-572x', '1542-4863', '9999-9999', None], index=[10, 11, 12, 13, 14])
+    for index in [issn_metrics_index, loaded_issn_metrics_index]:
+        sjr = index.lookup(issns, 'SJR')
+        # The lookup is aligned with the ISSNs, and an ISSN listed twice keeps its first (highest ranked) record
+        assert sjr.index.tolist() == [10, 11, 12, 13, 14]
+        assert sjr.tolist()[0] == 26.494 and sjr.tolist()[2] == 56.204
+        assert sjr.isna().tolist() == [False, True, False, True, True]
+
+        assert index.lookup(issns, 'SNIP').tolist()[:2] == [7.5, 0.855]
+        assert index.lookup(issns, 'Rank').tolist()[0] == 2
+        assert index.lookup(issns, 'Title').tolist() == ['Cell', None, 'Ca-A Cancer Journal for Clinicians', None, None]
+
+    # Filling in missing values is a single fillna with the lookup
+    journal_metrics_df = pd.DataFrame({'ISSN': ['0092-8674', '2190-572X'], 'SNIP': [None, 2.0]})
+    assert journal_metrics_df['SNIP'].fillna(issn_metrics_index.lookup(journal_metrics_df['ISSN'], 'SNIP')).tolist() == [7.5, 2.0]
@@ -0,0 +1,65 @@
+import pandas as pd
+from utils.issn import compact_issn, normalise_issn, is_valid_issn, explode_issns, stack_issn_columns, to_issn_keys
+
+def test_normalise_issn():
+    """
+    Test that ISSNs are brought into the canonical form NNNN-NNNC, and malformed values are kept rather than dropped
+    """
+    issns = pd.Series(['15424863', '0007-9235', ' 2190-572x', '000-0002', None])
+
+    assert compact_issn(issns).tolist()[:3] == ['15424863', '00079235', '2190572X']
+
+    normalised_issns = normalise_issn(issns)
+    assert normalised_issns.dtype == object
+    assert normalised_issns.tolist() == ['1542-4863', '0007-9235', '2190-572X', '000-0002', None]
+
+def test_is_valid_issn():
+    """
+    Test that ISSNs are validated on their format and check digit
+    """
+    issns = pd.Series(['1542-4863', '00079235', '2190-572X', '1542-4864', '000-0002', None], index=[5, 4, 3, 2, 1, 0])
+
+    is_valid = is_valid_issn(issns)
+    assert is_valid.index.tolist() == [5, 4, 3, 2, 1, 0]
+    assert is_valid.tolist() == [True, True, True, False, False, False]
+
+def test_explode_and_stack_issns():
+    """
+    Test that ISSN fields and columns are normalised to one ISSN per row
+    """
+    sjr_df = pd.DataFrame({
+        'Issn': ['15424863, 00079235', '14710072', '21905738;2190572X'],
+        'SJR': [86.1, 62.9, 0.5]
+    })
+    exploded_df = explode_issns(sjr_df, 'Issn')
+    assert exploded_df['Issn'].tolist() == ['15424863', '00079235', '14710072', '21905738', '2190572X']
+    assert exploded_df['SJR'].tolist() == [86.1, 86.1, 62.9, 0.5, 0.5]
+
+    snip_df = pd.DataFrame({
+        'Print ISSN': ['1542-4863', None],
+        'Electronic ISSN': ['0007-9235', '2190-572X'],
+        'SNIP': [5.0, 1.0]
+    })
+    stacked_df = stack_issn_columns(snip_df, ['Print ISSN', 'Electronic ISSN'])
+    assert stacked_df.columns.tolist() == ['SNIP', 'ISSN']
+    assert stacked_df['ISSN'].tolist() == ['1542-4863', '0007-9235', '2190-572X']
+    assert stacked_df['SNIP'].tolist() == [5.0, 5.0, 1.0]
+
+def test_to_issn_keys():
+    """
+    Test that the ISSNs of both sides of a join are converted to categorical keys with the same categories
+    """
+    outputs_issns = pd.Series(['15424863', '2190-572X', None])
+    journal_metrics_issns = pd.Series(['1542-4863', '0007-9235'])
+
+    outputs_keys, journal_metrics_keys = to_issn_keys(outputs_issns, journal_metrics_issns)
+    assert outputs_keys.dtype == journal_metrics_keys.dtype
+    assert outputs_keys.cat.categories.tolist() == ['0007-9235', '1542-4863', '2190-572X']
+    assert outputs_keys.tolist()[:2] == ['1542-4863', '2190-572X']
+    assert pd.isna(outputs_keys.iloc[2])
+
+    merged_df = pd.DataFrame({'ISSN': outputs_keys}).merge(
+        pd.DataFrame({'ISSN': journal_metrics_keys, 'SJR': [86.1, 62.9]}), on='ISSN', how='left'
+    )
+    assert merged_df['SJR'].tolist()[0] == 86.1
+    assert merged_df['SJR'].isna().tolist() == [False, True, True]
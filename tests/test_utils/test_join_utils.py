@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+from utils.join import factorise_keys, get_join_positions, compose_join_positions, take_join, left_join_many_to_one
+
+def test_left_join_many_to_one():
+    """
+    Test that the join gives the same result as a left pd.merge, and that duplicate keys on the right are rejected
+    """
+    left_df = pd.DataFrame({'DOI': ['b', None, 'a', 'c', 'b'], 'Year': [2014, 2015, 2016, 2017, 2018]},
+                           index=[5, 5, 6, 7, 8])
+    right_df = pd.DataFrame({'scopus_id': ['2', '1', '3'], 'DOI': ['a', 'b', 'z'], 'total_citations': [10, 20, 30]})
+
+    joined_df = left_join_many_to_one(left_df, right_df, on='DOI')
+    pd.testing.assert_frame_equal(joined_df, left_df.merge(right_df, on='DOI', how='left'))
+
+    # A key listed twice on the right would duplicate the left rows
+    with pytest.raises(pd.errors.MergeError):
+        left_join_many_to_one(left_df, pd.concat([right_df, right_df.iloc[[0]]]), on='DOI')
+
+def test_compose_join_positions():
+    """
+    Test that a chained join (DOI, then the Scopus ID of the matched row) is resolved on the intermediate DataFrame
+    """
+    outputs_df = pd.DataFrame({'DOI': ['a', 'b', 'c', 'd']})
+    citations_df = pd.DataFrame({'DOI': ['d', 'a', 'b'], 'scopus_id': ['1', None, '2']})
+    output_metrics_df = pd.DataFrame({'scopus_id': ['2', '1'], 'field_weighted_citation_impact': [0.5, 1.5]})
+
+    citation_positions = get_join_positions(*factorise_keys(outputs_df['DOI'], citations_df['DOI']))
+    assert citation_positions.tolist() == [1, 2, -1, 0]
+
+    # The null Scopus ID of DOI 'a' is not matched
+    output_metrics_positions = compose_join_positions(
+        citation_positions,
+        get_join_positions(*factorise_keys(citations_df['scopus_id'], output_metrics_df['scopus_id']))
+    )
+    assert output_metrics_positions.tolist() == [-1, 0, -1, 1]
+
+    joined_df = take_join(outputs_df, output_metrics_df, output_metrics_positions, on='scopus_id')
+    assert joined_df.columns.tolist() == ['DOI', 'field_weighted_citation_impact']
+    np.testing.assert_array_equal(joined_df['field_weighted_citation_impact'], [np.nan, 0.5, np.nan, 1.5])
@@ -0,0 +1,75 @@
+import pandas as pd
+from utils.journal_metrics_store import create_journal_metrics_store, read_journal_metrics_store, \
+    write_journal_metrics_store, upsert_journal_metrics, get_current_journal_metrics, get_journal_metrics_df, \
+    get_issns_to_fetch, SCOPUS_API_SOURCE, SCIMAGO_SOURCE
+
+def test_upsert_journal_metrics():
+    """
+    Test that upserts add a new version for new and changed journals only, and record the source of each value
+    """
+    first_fetch = pd.Timestamp("2025-01-01")
+    second_fetch = pd.Timestamp("2025-01-08")
+
+    store_df = upsert_journal_metrics(create_journal_metrics_store(), pd.DataFrame([
+        {'ISSN': '1741-6485', 'Scopus_ID': '12813', 'SNIP': '1.684', 'SJR': None, 'Cite_Score': '6.9'},
+        {'ISSN': '2190-572X', 'Scopus_ID': None, 'SNIP': None, 'SJR': None, 'Cite_Score': None}
+    ]), SCOPUS_API_SOURCE, fetched_at=first_fetch, updated_at=first_fetch)
+    assert len(store_df) == 2
+    assert store_df['version'].tolist() == [1, 1]
+    assert store_df.loc[0, 'SNIP'] == 1.684
+    assert store_df.loc[0, 'SNIP_source'] == SCOPUS_API_SOURCE and store_df.loc[0, 'SJR_source'] is None
+
+    # Fill in the missing SJR from SCImago (not fetched from the API)
+    store_df = upsert_journal_metrics(store_df, pd.DataFrame([{'ISSN': '1741-6485', 'SJR': 0.761}]), SCIMAGO_SOURCE)
+    current_df = get_current_journal_metrics(store_df).set_index('ISSN')
+    assert current_df.loc['1741-6485', 'version'] == 2
+    assert current_df.loc['1741-6485', 'SJR'] == 0.761 and current_df.loc['1741-6485', 'SJR_source'] == SCIMAGO_SOURCE
+    assert current_df.loc['1741-6485', 'fetched_at'] == first_fetch
+
+    # Fetch both journals again: one is unchanged, and the other one has a new SNIP
+    # The API still has no SJR for the first journal, so the value from SCImago is kept
+    store_df = upsert_journal_metrics(store_df, pd.DataFrame([
+        {'ISSN': '1741-6485', 'Scopus_ID': '12813', 'SNIP': '1.684', 'SJR': None, 'Cite_Score': '6.9'},
+        {'ISSN': '2190-572X', 'Scopus_ID': '21100', 'SNIP': '0.855', 'SJR': None, 'Cite_Score': None}
+    ]), SCOPUS_API_SOURCE, fetched_at=second_fetch, updated_at=second_fetch)
+    assert len(store_df) == 4 # All versions are kept
+    current_df = get_current_journal_metrics(store_df).set_index('ISSN')
+    assert current_df['version'].tolist() == [2, 2]
+    assert current_df['fetched_at'].tolist() == [second_fetch, second_fetch]
+    assert current_df.loc['1741-6485', 'SJR'] == 0.761
+    assert current_df.loc['1741-6485', 'updated_at'] != second_fetch
+    assert current_df.loc['2190-572X', 'SNIP'] == 0.855 and current_df.loc['2190-572X', 'updated_at'] == second_fetch
+
+    assert get_journal_metrics_df(store_df).columns.tolist() == ['ISSN', 'Scopus_ID', 'SNIP', 'SJR', 'Cite_Score']
+
+def test_get_issns_to_fetch():
+    """
+    Test that only the ISSNs missing from the store, or fetched longer ago than the TTL, are fetched
+    """
+    store_df = upsert_journal_metrics(create_journal_metrics_store(), pd.DataFrame([
+        {'ISSN': '1741-6485', 'SNIP': 1.684},
+        {'ISSN': '2190-572X', 'SNIP': 0.855}
+    ]), SCOPUS_API_SOURCE, fetched_at=pd.Timestamp("2025-01-01"))
+    store_df = upsert_journal_metrics(store_df, pd.DataFrame([{'ISSN': '2190-572X', 'SNIP': 0.9}]), SCOPUS_API_SOURCE,
+                                      fetched_at=pd.Timestamp("2025-01-06"))
+
+    issns = pd.Series(['0000-0001', '1741-6485', '2190-572X', '0000-0001'])
+    issns_to_fetch = get_issns_to_fetch(store_df, issns, ttl=pd.Timedelta(days=7), now=pd.Timestamp("2025-01-09"))
+    assert issns_to_fetch.tolist() == ['0000-0001', '1741-6485']
+
+def test_write_and_read_journal_metrics_store(tmp_path):
+    """
+    Test that the store is read back with the same data-types, and an empty store is returned if it does not exist
+    """
+    store_path = str(tmp_path / "store.parquet")
+    assert read_journal_metrics_store(store_path).empty
+
+    store_df = upsert_journal_metrics(create_journal_metrics_store(), pd.DataFrame([
+        {'ISSN': '1741-6485', 'Scopus_ID': 12813, 'SNIP': '1.684', 'SJR': None, 'Cite_Score': 6.9}
+    ]), SCOPUS_API_SOURCE, fetched_at=pd.Timestamp("2025-01-01"))
+    write_journal_metrics_store(store_df, store_path)
+
+    read_store_df = read_journal_metrics_store(store_path)
+    pd.testing.assert_frame_equal(read_store_df, store_df)
+    assert read_store_df.loc[0, 'Scopus_ID'] == '12813'
+    assert read_store_df['fetched_at'].dtype == 'datetime64[ns]'
@@ -0,0 +1,62 @@
+import os
+import pytest
+import pandas as pd
+from utils.partitions import get_uoa_partition_path, uoa_partition_exists, write_uoa_partition, write_uoa_partitions, \
+    read_uoa_partition, get_partitioned_uoas, clear_uoa_partition
+
+def test_write_and_read_uoa_partitions(tmp_path):
+    """
+    Test that a DataFrame covering several UoAs is written to one partition per UoA, and each UoA's rows are read back
+    """
+    dataset_path = str(tmp_path / "outputs")
+    outputs_df = pd.DataFrame({
+        'uoa': [11, 12, 11],
+        'DOI': ['10.1/a', '10.1/b', '10.1/c'],
+        'ISSN': ['1234-5678', None, '8765-4321']
+    })
+
+    write_uoa_partitions(outputs_df, dataset_path)
+
+    assert get_uoa_partition_path(dataset_path, 11) == os.path.join(dataset_path, "uoa=11")
+    assert uoa_partition_exists(dataset_path, 11)
+    assert not uoa_partition_exists(dataset_path, 13)
+    assert get_partitioned_uoas(dataset_path) == [11, 12]
+
+    cs_outputs_df = read_uoa_partition(dataset_path, 11)
+    assert cs_outputs_df.columns.tolist() == ['DOI', 'ISSN']
+    assert cs_outputs_df['DOI'].tolist() == ['10.1/a', '10.1/c']
+
+def test_write_uoa_partition_replaces_partition(tmp_path):
+    """
+    Test that writing a UoA's partition again replaces its rows, and leaves other UoAs untouched
+    """
+    dataset_path = str(tmp_path / "outputs")
+    write_uoa_partition(pd.DataFrame({'DOI': ['10.1/a', '10.1/b']}), dataset_path, 11)
+    write_uoa_partition(pd.DataFrame({'DOI': ['10.1/c']}), dataset_path, 12)
+    write_uoa_partition(pd.DataFrame({'DOI': ['10.1/d']}), dataset_path, 11)
+
+    assert read_uoa_partition(dataset_path, 11)['DOI'].tolist() == ['10.1/d']
+    assert read_uoa_partition(dataset_path, 12)['DOI'].tolist() == ['10.1/c']
+
+def test_get_partitioned_uoas_missing_dataset(tmp_path):
+    assert get_partitioned_uoas(str(tmp_path / "missing")) == []
+
+def test_empty_uoa_partition(tmp_path):
+    """
+    Test that an empty partition directory (e.g. left by a crashed run) is not an existing partition, and reading it
+    raises a FileNotFoundError
+    """
+    dataset_path = str(tmp_path / "outputs")
+    write_uoa_partition(pd.DataFrame({'DOI': ['10.1/a']}), dataset_path, 11)
+    os.makedirs(get_uoa_partition_path(dataset_path, 99))
+
+    assert not uoa_partition_exists(dataset_path, 99)
+    assert get_partitioned_uoas(dataset_path) == [11]
+    with pytest.raises(FileNotFoundError):
+        read_uoa_partition(dataset_path, 99)
+
+    # Clearing a partition removes its directory, which is only created again by the next part written
+    clear_uoa_partition(dataset_path, 11)
+    assert not os.path.exists(get_uoa_partition_path(dataset_path, 11))
+    clear_uoa_partition(dataset_path, 12)
+    assert not os.path.exists(get_uoa_partition_path(dataset_path, 12))
@@ -0,0 +1,80 @@
+import os
+import numpy as np
+import pandas as pd
+from utils.versioned_dataset import get_key_hashes, get_changed_keys, get_changed_rows, read_key_hashes, \
+    read_manifest, read_version, read_delta, write_version, get_version_file_name
+
+def test_get_changed_keys():
+    """
+    Test that added, removed and modified records are detected, and unchanged records are not
+    """
+    previous_df = pd.DataFrame({'DOI': ['a', 'b', 'c', None], 'total_citations': [1.0, 2.0, 3.0, 4.0]})
+    df = pd.DataFrame({'DOI': ['a', 'b', 'd', None], 'total_citations': [1.0, 5.0, 3.0, 6.0]})
+
+    changed_keys = get_changed_keys(get_key_hashes(previous_df, 'DOI'), get_key_hashes(df, 'DOI'))
+    assert changed_keys == {'DOI': {'b', 'c', 'd'}}
+
+    # Every key of the first build is changed
+    assert get_changed_keys(read_key_hashes("missing"), get_key_hashes(df, 'DOI')) == {'DOI': {'a', 'b', 'd'}}
+
+def test_write_version(tmp_path):
+    """
+    Test that every version is kept, and the manifest points to the latest one
+    """
+    dataset_path = str(tmp_path / "dataset")
+    assert read_manifest(dataset_path) is None and read_version(dataset_path) is None
+
+    df = pd.DataFrame({'DOI': ['a', 'b'], 'total_citations': [1.0, 2.0]})
+    key_hashes = get_key_hashes(df, 'DOI')
+    write_version(dataset_path, df, df, key_hashes)
+    updated_df = df.assign(total_citations=[1.0, 3.0])
+    manifest = write_version(dataset_path, updated_df, updated_df.iloc[[1]], get_key_hashes(updated_df, 'DOI'),
+                             full_rebuild=False)
+
+    assert manifest == read_manifest(dataset_path)
+    assert manifest['version'] == 2 and manifest['previous_version'] == 1 and manifest['changed_rows'] == 1
+    assert manifest['full_rebuild'] is False
+    pd.testing.assert_frame_equal(read_version(dataset_path), updated_df)
+    pd.testing.assert_frame_equal(read_version(dataset_path, version=1), df)
+    assert read_delta(dataset_path)['DOI'].tolist() == ['b']
+    pd.testing.assert_frame_equal(read_key_hashes(dataset_path), get_key_hashes(updated_df, 'DOI'))
+
+def test_get_changed_rows_round_trip(tmp_path):
+    """
+    Test that a version read back from parquet has no changed rows, although some of its data-types differ from the
+    written DataFrame's, and that changed values are still detected
+    """
+    dataset_path = str(tmp_path / "dataset")
+    df = pd.DataFrame({
+        'DOI': pd.Series(['a', None, 'c'], dtype="string"),
+        'Year': [2019, 2020, 2021],
+        'Scopus_ID': pd.Series([1, None, 3], dtype="Int64"),
+        'SNIP': [1.5, np.nan, 0.5],
+        'Interdisciplinary': pd.Categorical(['Yes', None, 'No']),
+        'fetched_at': pd.to_datetime(['2025-01-01', None, '2025-01-02'])
+    })
+    write_version(dataset_path, df, df, get_key_hashes(df, 'DOI'))
+    previous_df = read_version(dataset_path)
+
+    assert not get_changed_rows(previous_df, df).any()
+    # Integers with missing values are compared with floats by value
+    assert not get_changed_rows(df, df.astype({'Year': float, 'Scopus_ID': float})).any()
+    assert get_changed_rows(previous_df, df.assign(SNIP=[1.5, 2.0, 0.5])).tolist() == [False, True, False]
+
+def test_prune_versions(tmp_path):
+    """
+    Test that only the data of the latest versions is kept, and the deltas of all versions
+    """
+    dataset_path = str(tmp_path / "dataset")
+    df = pd.DataFrame({'DOI': ['a', 'b'], 'total_citations': [1.0, 2.0]})
+    for total_citations in [2.0, 3.0, 4.0, 5.0]:
+        df = df.assign(total_citations=[1.0, total_citations])
+        write_version(dataset_path, df, df.iloc[[1]], get_key_hashes(df, 'DOI'), keep_versions=2)
+
+    assert read_manifest(dataset_path)['version'] == 4
+    for version in [1, 2, 3, 4]:
+        assert os.path.exists(os.path.join(dataset_path, get_version_file_name(version, "delta.")))
+        for prefix in ["", "key_hashes."]:
+            assert os.path.exists(os.path.join(dataset_path, get_version_file_name(version, prefix))) == (version >= 3)
+    pd.testing.assert_frame_equal(read_version(dataset_path), df)
+    assert read_delta(dataset_path, version=1)['total_citations'].tolist() == [2.0]
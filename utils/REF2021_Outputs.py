@@ -1,7 +1,8 @@
 import os
 import pandas as pd
 
-from utils.constants import DATASETS_DIR, PROCESSED_DIR, CS_OUTPUTS_METADATA
+from utils.constants import DATASETS_DIR, PROCESSED_DIR, CS_OUTPUTS_METADATA, CS_UOA, OUTPUTS_METADATA_BY_UOA
+from utils.partitions import uoa_partition_exists, read_uoa_partition
 
 def get_cs_outputs_metadata():
     """
@@ -13,11 +14,37 @@ def get_cs_outputs_metadata():
     cs_outputs_df = pd.read_csv(cs_outputs_path)
     return cs_outputs_df
 
+def get_outputs_metadata(uoa=CS_UOA):
+    """
+    Return a dataframe of all outputs submitted to a unit of assessment in REF 2021, read from its partition of the
+    outputs metadata dataset (written by process_REF2021_Outputs). The CS outputs metadata file is read for the CS UoA
+    if its partition has not been written
+    :param uoa: Unit of assessment number
+    :return: Pandas dataframe representing metadata of the UoA's outputs submitted to REF 2021
+    """
+    outputs_metadata_path = os.path.join(os.path.dirname(__file__), "..", DATASETS_DIR, PROCESSED_DIR,
+                                         OUTPUTS_METADATA_BY_UOA)
+
+    if uoa_partition_exists(outputs_metadata_path, uoa):
+        return read_uoa_partition(outputs_metadata_path, uoa)
+    if uoa == CS_UOA:
+        return get_cs_outputs_metadata()
+
+    raise FileNotFoundError(f"Outputs of unit of assessment {uoa} not found, run process_REF2021_Outputs for this UoA")
+
 def get_cs_journal_article_metadata():
     """
     Return a dataframe of CS outputs filtered for journal articles only
     :return: Pandas dataframe representing metadata of CS journal articles submitted to REF 2021
     """
-    cs_outputs_df = get_cs_outputs_metadata()
-    cs_journal_article_metadata = cs_outputs_df[cs_outputs_df['Output type'] == "D"] # Filter for journal articles (D)
-    return cs_journal_article_metadata
+    return get_journal_article_metadata(CS_UOA)
+
+def get_journal_article_metadata(uoa=CS_UOA):
+    """
+    Return a dataframe of a unit of assessment's outputs filtered for journal articles only
+    :param uoa: Unit of assessment number
+    :return: Pandas dataframe representing metadata of the UoA's journal articles submitted to REF 2021
+    """
+    outputs_df = get_outputs_metadata(uoa)
+    journal_article_metadata = outputs_df[outputs_df['Output type'] == "D"] # Filter for journal articles (D)
+    return journal_article_metadata
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+from utils.instrumentation import increment_counter
+
+
+def get_reference_lookup(reference_df, key_column):
+    """
+    Create the lookup function of a reference dataset held in a DataFrame
+    :param reference_df: Reference DataFrame, with a key column and one column per value that can be looked up
+    :param key_column: Name of the reference DataFrame's key column
+    :return: Function lookup(keys, target) returning the target values of the keys (aligned with the keys)
+    """
+    # A key listed more than once keeps its first record
+    reference_df = reference_df.dropna(subset=[key_column]).drop_duplicates(subset=key_column).set_index(key_column)
+
+    def lookup(keys, target):
+        return keys.map(reference_df[target])
+
+    return lookup
+
+def backfill(df, rules, references):
+    """
+    Fill in the missing values of a DataFrame from reference datasets, in a single pass.
+    Every rule (target column, reference source, key column) looks up the key of the rows where the target column is
+    still null in the reference source, and fills in the target column with the index-aligned combine_first. A target
+    column can have several rules: a later rule only fills in the values the previous ones could not. The columns are
+    assigned once at the end, so the DataFrame is copied once and its row order is preserved
+
+    :param df: DataFrame with missing values
+    :param rules: List of (target column, reference source, key column) tuples, applied in order
+    :param references: Dictionary of reference source name to lookup function lookup(keys, target), returning a Pandas
+    Series of the target values aligned with the keys (null if a key is not in the reference)
+    :return: Tuple of the DataFrame with missing values filled in, and a DataFrame (same index, one column per target)
+    of the reference source each value was filled in from (None if the value was not filled in)
+    """
+    # Work on a unique (positional) index, so the alignment holds even if the DataFrame's index has duplicates
+    original_index = df.index
+    df = df.reset_index(drop=True)
+
+    filled_columns = {}
+    fill_sources = {}
+
+    for target, source, key in rules:
+        target_values = filled_columns.get(target, df[target])
+        sources = fill_sources.get(target, pd.Series(np.full(len(df), None, dtype=object), index=df.index))
+
+        # Only the keys of the rows missing the target value are looked up
+        is_missing = target_values.isna()
+        # Keys missing from the reference have no value to fill in
+        reference_values = references[source](df.loc[is_missing, key], target).dropna()
+
+        if len(reference_values) and target_values.isna().all():
+            # A column without any value has no data-type of its own (object), take the reference's
+            target_values = target_values.astype(reference_values.dtype)
+        filled_values = target_values.combine_first(reference_values) if len(reference_values) else target_values
+        is_filled = is_missing & filled_values.notna()
+        print(f"Backfill {target} from {source} on {key}: filled {is_filled.sum()} of {is_missing.sum()} missing values")
+        increment_counter("nulls_filled", is_filled.sum(), target=target, source=source)
+
+        filled_columns[target] = filled_values
+        fill_sources[target] = sources.mask(is_filled, source)
+
+    backfilled_df = df.assign(**filled_columns).set_axis(original_index)
+    return backfilled_df, pd.DataFrame(fill_sources, index=df.index).set_axis(original_index)
@@ -6,8 +6,12 @@ REFINED_DIR = "refined"
 MACHINE_LEARNING_DIR = "machine_learning"
 FIGURES_DIR = "figures"
 
+# Units of Assessment (UoA)
+CS_UOA = 11 # Computer Science and Informatics
+
 # Raw / Processed Files:
 CS_RESULTS =  "REF2021_CS_Results.xlsx"
+REF_RESULTS = "REF2021_Results.xlsx" # Results of all UoAs
 OUTPUTS_METADATA = "REF2021_Outputs_Metadata.xlsx"
 CS_OUTPUTS_METADATA = "REF2021_CS_Outputs_Metadata.csv"
 SCIMAGO_JOURNAL_RANK = "SCImago_Journal_Rank.csv"
@@ -15,15 +19,26 @@ CS_JOURNALS_ISSN = "REF2021_CS_Journals_ISSN.csv"
 SOURCE_NORMALIZED_IMPACT_PER_PAPER = "CWTS_Journal_Indicators_SNIP.xlsx"
 SJR = "SCImago_Journal_Rank.parquet"
 SNIP = "SNIP.parquet"
+CITESCORE = "CiteScore.parquet" # Optional reference of CiteScores (columns ISSN and Cite_Score), e.g. a Scopus export
+ISSN_METRICS_INDEX = "ISSN_Metrics_Index" # ISSN-keyed lookup index of SJR, SNIP, rank and title, built from SJR and SNIP
 
 # Refined Files
 CS_JOURNAL_METRICS = "CS_Journal_Metrics.parquet"
+CS_JOURNAL_METRICS_STORE = "CS_Journal_Metrics_Store.parquet" # Every version of the journal metrics, with their sources
 CS_CITATION_METRICS = "CS_Citation_Metrics.parquet"
 CS_OUTPUT_METRICS = "CS_Output_Metrics.parquet"
 
 # Machine Learning Files
 CS_OUTPUTS_COMPLETE_METADATA = "CS_outputs_complete_metadata.parquet"
 
+# Datasets partitioned by UoA: a directory with one sub-directory per UoA, e.g. REF2021_Outputs_Metadata/uoa=11/
+# The CS files above are read for the CS UoA when its partition has not been written
+UOA_PARTITION_COLUMN = "uoa"
+OUTPUTS_METADATA_BY_UOA = "REF2021_Outputs_Metadata" # Processed
+OUTPUTS_COMPLETE_METADATA_BY_UOA = "outputs_complete_metadata" # Machine Learning
+# Every version of the enriched metadata of a UoA's outputs, with a manifest and deltas (uoa=<number>/manifest.json)
+OUTPUTS_COMPLETE_METADATA_VERSIONS = "outputs_complete_metadata_versions"
+
 # Output Metadata
 output_type = {
     "A": "Authored book",
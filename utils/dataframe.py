@@ -1,3 +1,5 @@
+from utils.instrumentation import observe
+
 def log_dataframe(df):
     """
     Custom log function for a Pandas DataFrame, prints first 5 rows, shape, and columns
@@ -11,6 +13,7 @@ def log_dataframe(df):
     row_count, col_count = df.shape
     print(f"Number of rows={row_count}")
     print(f"Number of columns={col_count}\n")
+    observe("dataframe_rows", row_count, columns=col_count)
 
     # Column Names
     print(f"Column Names:")
@@ -31,7 +34,9 @@ def log_null_values(df):
     Log the number of missing values in each column of a DataFrame
     :param df: Pandas DataFrame
     """
-    print(df.isna().sum())
+    null_counts = df.isna().sum()
+    print(null_counts)
+    observe("null_values", null_counts.sum())
 
 def log_dataframe_column_types(df):
     """
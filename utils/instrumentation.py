@@ -0,0 +1,256 @@
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import psutil
+
+try:
+    # High-water mark of the resident set size on Unix
+    import resource
+except ImportError:
+    resource = None
+
+# Environment variable naming the JSON-lines file instrumentation events are appended to (one event per line), so the
+# events of every process of a run (e.g. the cross-validations of several UoAs) end up in the same file
+INSTRUMENTATION_LOG_ENV = "REF2021_INSTRUMENTATION_LOG"
+
+# Kinds of events
+SPAN = "span" # Timed stage, fold or request
+COUNTER = "counter" # Count added to a running total, e.g. nulls filled
+HISTOGRAM = "histogram" # Observed value whose distribution is summarised, e.g. rows in a chunk
+
+# Events recorded by the current process (the most recent ones when capped, see set_instrumentation_log)
+events = deque()
+# Names of the spans currently open (innermost last). Every thread (e.g. the restarts of the clustering run on a thread
+# pool) has its own stack, so its spans are not nested in the spans of the other threads
+open_spans = contextvars.ContextVar("open_spans", default=())
+instrumentation_log_path = os.getenv(INSTRUMENTATION_LOG_ENV)
+# JSON-lines file kept open while events are written to it, and the lock serialising the writes of the threads
+instrumentation_log = None
+instrumentation_log_lock = threading.Lock()
+
+
+def set_instrumentation_log(path, max_events=None):
+    """
+    Append every instrumentation event to a JSON-lines file (in addition to keeping it in memory)
+    :param path: Path of the JSON-lines file, None to stop writing events to a file
+    :param max_events: Number of most recent events kept in memory while they are written to the file, e.g. 0 for a
+    long run summarised afterwards from the file (default: all events). Without a file, all events are kept in memory
+    """
+    global instrumentation_log_path, events
+    close_instrumentation_log()
+    instrumentation_log_path = path
+    events = deque(events, maxlen=max_events if path is not None else None)
+
+    # Processes started from now on (e.g. cross-validation workers) write to the same file
+    if path is None:
+        os.environ.pop(INSTRUMENTATION_LOG_ENV, None)
+    else:
+        os.environ[INSTRUMENTATION_LOG_ENV] = path
+
+@atexit.register
+def close_instrumentation_log():
+    """
+    Close the JSON-lines file events are written to, if it is open. It is opened again by the next event
+    """
+    global instrumentation_log
+    with instrumentation_log_lock:
+        if instrumentation_log is not None:
+            instrumentation_log.close()
+            instrumentation_log = None
+
+def reset_instrumentation():
+    """
+    Forget the events recorded by the current process, e.g. before starting a new run
+    """
+    events.clear()
+    open_spans.set(())
+
+def get_instrumentation_events():
+    """
+    Obtain the events recorded by the current process
+    :return: List of events (dictionaries), in the order they were recorded
+    """
+    return list(events)
+
+def record_event(kind, name, value, attributes):
+    """
+    Record an instrumentation event, and append it to the JSON-lines file if one is set
+    :param kind: Kind of event: SPAN, COUNTER or HISTOGRAM
+    :param name: Name of the span or metric
+    :param value: Duration in seconds of a span, or value of a counter or histogram
+    :param attributes: Dictionary of attributes of the event, e.g. the UKPRN of a fold or the rows of a stage
+    """
+    global instrumentation_log
+    current_spans = open_spans.get()
+    event = {
+        "kind": kind,
+        "name": name,
+        "value": value,
+        "span": current_spans[-1] if current_spans else None, # Innermost open span (parent of a span)
+        "time": time.time(),
+        "pid": os.getpid(),
+        "attributes": attributes
+    }
+    events.append(event)
+
+    if instrumentation_log_path:
+        line = (json.dumps(event, default=str) + "\n").encode()
+        with instrumentation_log_lock:
+            # The file is kept open, unbuffered in append mode: every event is one write of a whole line, so the
+            # events of the processes appending to the same file do not interleave
+            if instrumentation_log is None:
+                instrumentation_log = open(instrumentation_log_path, "ab", buffering=0)
+            instrumentation_log.write(line)
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Time a stage, fold or request. Spans nest: a span opened inside another one records it as its parent.
+    Attributes can be added to the span inside the with block, e.g. the number of rows written by the stage
+    with span("enrich", uoa=11) as attributes:
+        ...
+        attributes["rows_out"] = len(df)
+    :param name: Name of the span
+    :param attributes: Attributes of the span
+    :return: Dictionary of the span's attributes
+    """
+    open_spans_token = open_spans.set(open_spans.get() + (name,))
+    start = time.perf_counter()
+
+    try:
+        yield attributes
+        attributes["status"] = "ok"
+    except Exception as e:
+        attributes["status"] = "error"
+        attributes["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        # Once closed, the innermost open span is the parent of this span
+        open_spans.reset(open_spans_token)
+        record_event(SPAN, name, duration, attributes)
+
+def increment_counter(name, value=1, **attributes):
+    """
+    Add to a counter, e.g. the number of nulls filled in or of failed requests
+    :param name: Name of the counter
+    :param value: Amount added to the counter
+    :param attributes: Attributes of the increment, e.g. the column filled in
+    """
+    record_event(COUNTER, name, float(value), attributes)
+
+def observe(name, value, **attributes):
+    """
+    Record a value of a histogram, e.g. the number of rows in a chunk or the hit rate of a join
+    :param name: Name of the histogram
+    :param value: Observed value
+    :param attributes: Attributes of the observation
+    """
+    record_event(HISTOGRAM, name, float(value), attributes)
+
+def get_rss():
+    """
+    Obtain the resident set size (memory held in RAM) of the current process
+    :return: Resident set size in bytes
+    """
+    return psutil.Process().memory_info().rss
+
+def get_peak_rss():
+    """
+    Obtain the peak resident set size of the current process since it started, including the peaks between samples
+    :return: Peak resident set size in bytes
+    """
+    memory_info = psutil.Process().memory_info()
+
+    if hasattr(memory_info, "peak_wset"):
+        # Windows: peak working set
+        return memory_info.peak_wset
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux, and in bytes on macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+    return memory_info.rss
+
+def observe_rss(**attributes):
+    """
+    Record the resident set size of the current process as a histogram (in MB), e.g. at the end of every fold
+    :param attributes: Attributes of the observation
+    :return: Resident set size in bytes
+    """
+    rss = get_rss()
+    observe("rss_mb", rss / 2 ** 20, **attributes)
+    return rss
+
+def read_instrumentation_log(path):
+    """
+    Read the events of a JSON-lines instrumentation file, e.g. to summarise a run afterwards
+    :param path: Path of the JSON-lines file
+    :return: List of events (dictionaries)
+    """
+    with open(path) as instrumentation_log:
+        return [json.loads(line) for line in instrumentation_log if line.strip()]
+
+def summarise_instrumentation(instrumentation_events=None):
+    """
+    Summarise where time went: the spans aggregated by name, and the counters and histograms aggregated by name
+    :param instrumentation_events: List of events (default: the events recorded by the current process)
+    :return: Tuple of two DataFrames:
+        1. Spans: count, errors, total, mean, p50, p95 and max seconds, and share of the time of the top-level spans
+        2. Metrics: kind, count, sum, mean, p50, p95, min and max of every counter and histogram
+    """
+    events_df = pd.DataFrame(
+        get_instrumentation_events() if instrumentation_events is None else instrumentation_events,
+        columns=["kind", "name", "value", "span", "time", "pid", "attributes"]
+    )
+
+    spans_df = events_df[events_df["kind"] == SPAN]
+    is_error = spans_df["attributes"].map(lambda attributes: attributes.get("status") == "error")
+    top_level_time = spans_df.loc[spans_df["span"].isna(), "value"].sum()
+
+    span_summary = spans_df.assign(is_error=is_error).groupby("name", sort=False).agg(
+        count=("value", "size"),
+        errors=("is_error", "sum"),
+        total_s=("value", "sum"),
+        mean_s=("value", "mean"),
+        p50_s=("value", "median"),
+        p95_s=("value", lambda durations: np.percentile(durations, 95)),
+        max_s=("value", "max")
+    )
+    span_summary["share"] = span_summary["total_s"] / top_level_time if top_level_time else np.nan
+
+    metrics_df = events_df[events_df["kind"] != SPAN]
+    metric_summary = metrics_df.groupby("name", sort=False).agg(
+        kind=("kind", "first"),
+        count=("value", "size"),
+        sum=("value", "sum"),
+        mean=("value", "mean"),
+        p50=("value", "median"),
+        p95=("value", lambda values: np.percentile(values, 95)),
+        min=("value", "min"),
+        max=("value", "max")
+    )
+
+    return span_summary.sort_values("total_s", ascending=False), metric_summary
+
+def log_instrumentation_summary(instrumentation_events=None):
+    """
+    Log the summary of the spans, counters and histograms of a run
+    :param instrumentation_events: List of events (default: the events recorded by the current process)
+    """
+    span_summary, metric_summary = summarise_instrumentation(instrumentation_events)
+
+    print("Where time went (spans):")
+    print(f"{span_summary.to_string(float_format=lambda value: f'{value:.4f}')}\n")
+
+    if not metric_summary.empty:
+        print("Counters and histograms:")
+        print(f"{metric_summary.to_string(float_format=lambda value: f'{value:.4f}')}\n")
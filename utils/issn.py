@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+# An ISSN is 7 digits followed by a check digit (0-9, or X representing 10), written as NNNN-NNNC
+ISSN_PATTERN = r"^\d{7}[\dX]$"
+# Weights of the first 7 digits used to compute the check digit
+ISSN_CHECK_WEIGHTS = [8, 7, 6, 5, 4, 3, 2]
+
+
+def compact_issn(issns):
+    """
+    Remove the hyphen and whitespace from ISSNs, and upper-case the X check digit
+    :param issns: Pandas Series of ISSNs, e.g. "1542-4863", " 2213-235x", "15424863"
+    :return: Pandas Series of compact ISSNs, e.g. "15424863", "2213235X", "15424863" (nulls are kept)
+    """
+    return issns.astype("string").str.replace(r"[\s\-]", "", regex=True).str.upper()
+
+def normalise_issn(issns):
+    """
+    Bring ISSNs into the canonical form NNNN-NNNC used as the key to join journals on, using vectorised string
+    operations. Values that do not consist of 8 ISSN characters are returned unchanged (stripped of whitespace), so no
+    rows are lost - use is_valid_issn to find them
+    :param issns: Pandas Series of ISSNs, with or without hyphens
+    :return: Pandas Series (object dtype) of canonical ISSNs
+    """
+    compact_issns = compact_issn(issns)
+    is_issn_format = compact_issns.str.match(ISSN_PATTERN).fillna(False).astype(bool)
+
+    canonical_issns = compact_issns.str.slice(0, 4) + "-" + compact_issns.str.slice(4)
+    stripped_issns = issns.astype("string").str.strip()
+
+    normalised_issns = canonical_issns.where(is_issn_format, stripped_issns)
+    return normalised_issns.astype(object).where(normalised_issns.notna(), None)
+
+def is_valid_issn(issns):
+    """
+    Validate ISSNs: 8 ISSN characters (ignoring the hyphen), with a check digit that matches the first 7 digits.
+    The check digit is (11 - (sum of the digits weighted 8 to 2) mod 11) mod 11, where 10 is written as X
+    :param issns: Pandas Series of ISSNs
+    :return: Boolean Pandas Series, False for invalid and null ISSNs
+    """
+    compact_issns = compact_issn(issns)
+    is_issn_format = compact_issns.str.match(ISSN_PATTERN).fillna(False).to_numpy(dtype=bool)
+
+    # Only ISSNs of the right format are checked, others are replaced by a placeholder with a valid check digit
+    well_formed_issns = compact_issns.where(is_issn_format, "00000000")
+
+    weighted_sum = np.zeros(len(issns), dtype=int)
+    for position, weight in enumerate(ISSN_CHECK_WEIGHTS):
+        weighted_sum += weight * well_formed_issns.str.slice(position, position + 1).astype(int).to_numpy()
+    expected_check_digits = (11 - weighted_sum % 11) % 11
+
+    check_digits = well_formed_issns.str.slice(7).replace("X", "10").astype(int).to_numpy()
+    return pd.Series(is_issn_format & (check_digits == expected_check_digits), index=issns.index)
+
+def get_issn_lengths(issns):
+    """
+    Obtain the number of characters of every ISSN field (a field can contain several ISSNs)
+    :param issns: Pandas Series of ISSN fields
+    :return: Pandas Series of integer lengths
+    """
+    return issns.astype(str).str.len()
+
+def explode_issns(df, issn_column, separator=r"\s*[,;]\s*"):
+    """
+    Normalise a DataFrame to 1NF: split fields containing multiple ISSNs (e.g. "15424863, 00079235") such that there is
+    one ISSN per row. The other columns are repeated for every ISSN
+    :param df: DataFrame with a column of (possibly multiple) ISSNs
+    :param issn_column: Name of the ISSN column
+    :param separator: Regular expression separating the ISSNs of a field
+    :return: DataFrame with one ISSN per row
+    """
+    return df.assign(
+        **{issn_column: df[issn_column].str.split(separator, regex=True)}
+    ).explode(issn_column)
+
+def stack_issn_columns(df, issn_columns, issn_column="ISSN"):
+    """
+    Normalise a DataFrame to 1NF where a record has several ISSN columns (e.g. print and electronic ISSN): stack the
+    columns such that every ISSN is its own record, with the other columns repeated. Null ISSNs are dropped
+    :param df: DataFrame with multiple ISSN columns
+    :param issn_columns: Names of the ISSN columns, stacked in this order
+    :param issn_column: Name of the resulting ISSN column
+    :return: DataFrame with one ISSN per row
+    """
+    value_columns = [column for column in df.columns if column not in issn_columns]
+
+    stacked_df = pd.concat(
+        [df[value_columns + [column]].rename(columns={column: issn_column}) for column in issn_columns],
+        ignore_index=True
+    )
+    return stacked_df.dropna(subset=[issn_column])
+
+def to_issn_keys(*issn_series):
+    """
+    Convert ISSN columns of the DataFrames being joined into canonical categorical keys sharing the same categories,
+    so the join compares integer codes rather than strings
+    :param issn_series: Pandas Series of ISSNs, one per DataFrame being joined
+    :return: List of categorical Pandas Series, in the same order
+    """
+    normalised_issns = [normalise_issn(issns) for issns in issn_series]
+
+    categories = pd.Index(pd.concat(normalised_issns, ignore_index=True).dropna().unique()).sort_values()
+    issn_dtype = pd.CategoricalDtype(categories=categories)
+
+    return [issns.astype(issn_dtype) for issns in normalised_issns]
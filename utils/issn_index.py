@@ -0,0 +1,171 @@
+import os
+import numpy as np
+import pandas as pd
+
+from utils.issn import compact_issn, ISSN_PATTERN
+
+# Numeric journal metrics held by the index, with the name of their array file
+INDEX_METRICS = ["SJR", "SNIP", "Rank"]
+# Arrays (.npy files) making up a persisted index
+INDEX_ARRAYS = ["keys", "title_offsets", "title_bytes"] + INDEX_METRICS
+
+
+def encode_issn(issns):
+    """
+    Encode ISSNs as integer keys: the 7 digits followed by the check digit in base 11 (X = 10), so every ISSN has a
+    unique key whatever its spelling (e.g. 2190-572X, 2190572x). Null and malformed ISSNs are encoded as -1
+    :param issns: Pandas Series of ISSNs
+    :return: NumPy int64 array of ISSN keys
+    """
+    compact_issns = compact_issn(issns)
+    is_issn_format = compact_issns.str.match(ISSN_PATTERN).fillna(False).to_numpy(dtype=bool)
+    well_formed_issns = compact_issns.where(is_issn_format, "00000000")
+
+    digits = well_formed_issns.str.slice(0, 7).astype("int64").to_numpy()
+    check_digits = well_formed_issns.str.slice(7).replace("X", "10").astype("int64").to_numpy()
+
+    return np.where(is_issn_format, digits * 11 + check_digits, -1)
+
+def get_first_occurrences(keys):
+    """
+    Obtain the positions of the first occurrence of every valid (non-negative) key, in the order of the keys
+    :param keys: NumPy array of ISSN keys
+    :return: NumPy array of positions
+    """
+    positions = np.flatnonzero(keys >= 0)
+    _, first_positions = np.unique(keys[positions], return_index=True)
+    return positions[first_positions]
+
+
+class ISSNMetricsIndex:
+    """
+    ISSN-keyed lookup index of journal metrics: SJR, rank and title (SCImago), and SNIP (CWTS).
+    The keys are the sorted integer encodings of the ISSNs, and every metric is an array aligned with the keys, so a
+    bulk lookup is a single binary search (np.searchsorted) followed by a take. The titles are stored as one byte
+    string with offsets. All arrays are .npy files, which are memory-mapped when the index is loaded
+    """
+
+    def __init__(self, keys, metrics, title_offsets, title_bytes):
+        """
+        :param keys: Sorted int64 array of ISSN keys (see encode_issn)
+        :param metrics: Dictionary of metric name to float64 array aligned with the keys (NaN where unknown)
+        :param title_offsets: int64 array of len(keys) + 1 offsets of the journal titles into title_bytes
+        :param title_bytes: uint8 array of the UTF-8 encoded journal titles, concatenated
+        """
+        self.keys = keys
+        self.metrics = metrics
+        self.title_offsets = title_offsets
+        self.title_bytes = title_bytes
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def build(cls, sjr_df, snip_df):
+        """
+        Build the index from the processed SJR and SNIP datasets. An ISSN listed more than once in a dataset keeps its
+        first record (the SJR dataset is ordered by rank)
+        :param sjr_df: Processed SJR dataframe, with columns Rank, Title, Issn, and SJR
+        :param snip_df: Processed SNIP dataframe, with columns SNIP and ISSN
+        :return: ISSNMetricsIndex
+        """
+        sjr_keys = encode_issn(sjr_df["Issn"])
+        snip_keys = encode_issn(snip_df["ISSN"])
+
+        sjr_positions = get_first_occurrences(sjr_keys)
+        snip_positions = get_first_occurrences(snip_keys)
+
+        # Union of the ISSNs of both datasets (sorted)
+        keys = np.union1d(sjr_keys[sjr_positions], snip_keys[snip_positions])
+
+        def align(source_keys, source_positions, values):
+            # Metric values of the source dataset placed at the position of their ISSN key in the index
+            aligned_values = np.full(len(keys), np.nan)
+            aligned_values[np.searchsorted(keys, source_keys[source_positions])] = values[source_positions]
+            return aligned_values
+
+        metrics = {
+            "SJR": align(sjr_keys, sjr_positions, sjr_df["SJR"].to_numpy(dtype=float)),
+            "Rank": align(sjr_keys, sjr_positions, sjr_df["Rank"].to_numpy(dtype=float)),
+            "SNIP": align(snip_keys, snip_positions, snip_df["SNIP"].to_numpy(dtype=float)),
+        }
+
+        # Titles of the ISSNs only listed in the SNIP dataset are empty
+        titles = np.full(len(keys), "", dtype=object)
+        titles[np.searchsorted(keys, sjr_keys[sjr_positions])] = sjr_df["Title"].fillna("").to_numpy()[sjr_positions]
+        encoded_titles = [title.encode("utf-8") for title in titles]
+
+        title_offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        title_offsets[1:] = np.cumsum([len(encoded_title) for encoded_title in encoded_titles])
+        title_bytes = np.frombuffer(b"".join(encoded_titles), dtype=np.uint8)
+
+        return cls(keys, metrics, title_offsets, title_bytes)
+
+    def save(self, index_path):
+        """
+        Persist the index as a directory of .npy files
+        :param index_path: Path of the index's directory
+        """
+        os.makedirs(index_path, exist_ok=True)
+
+        arrays = {"keys": self.keys, "title_offsets": self.title_offsets, "title_bytes": self.title_bytes}
+        arrays.update(self.metrics)
+        for array_name, array in arrays.items():
+            np.save(os.path.join(index_path, f"{array_name}.npy"), array)
+
+    @classmethod
+    def load(cls, index_path, mmap_mode="r"):
+        """
+        Load a persisted index, memory-mapping its arrays (only the pages touched by lookups are read from disk)
+        :param index_path: Path of the index's directory
+        :param mmap_mode: Memory-map mode passed to np.load, None to read the arrays into memory
+        :return: ISSNMetricsIndex
+        """
+        arrays = {
+            array_name: np.load(os.path.join(index_path, f"{array_name}.npy"), mmap_mode=mmap_mode)
+            for array_name in INDEX_ARRAYS
+        }
+        metrics = {metric: arrays[metric] for metric in INDEX_METRICS}
+        return cls(arrays["keys"], metrics, arrays["title_offsets"], arrays["title_bytes"])
+
+    def get_positions(self, issns):
+        """
+        Find the position in the index of every ISSN
+        :param issns: Pandas Series of ISSNs, in any spelling
+        :return: Tuple of the NumPy array of positions, and the boolean NumPy array of ISSNs found in the index
+        """
+        issn_keys = encode_issn(issns)
+
+        positions = np.searchsorted(self.keys, issn_keys)
+        # ISSNs greater than every key are past the end of the index
+        in_range = positions < len(self.keys)
+
+        is_found = np.zeros(len(issn_keys), dtype=bool)
+        is_found[in_range] = self.keys[positions[in_range]] == issn_keys[in_range]
+        is_found &= issn_keys >= 0
+
+        return positions, is_found
+
+    def lookup(self, issns, metric):
+        """
+        Vectorised bulk lookup of a journal metric
+        :param issns: Pandas Series of ISSNs, in any spelling
+        :param metric: "SJR", "SNIP", "Rank", or "Title"
+        :return: Pandas Series of the metric, aligned with the ISSNs (NaN/None for ISSNs not in the index)
+        """
+        positions, is_found = self.get_positions(issns)
+
+        if metric == "Title":
+            titles = np.full(len(issns), None, dtype=object)
+            # Only the titles of the ISSNs found are decoded
+            for i, position in zip(np.flatnonzero(is_found), positions[is_found]):
+                title = bytes(self.title_bytes[self.title_offsets[position]:self.title_offsets[position + 1]])
+                titles[i] = title.decode("utf-8") or None
+            return pd.Series(titles, index=issns.index, name=metric)
+
+        if metric not in self.metrics:
+            raise ValueError(f"Unknown journal metric: {metric}. Options are: {INDEX_METRICS + ['Title']}")
+
+        values = np.full(len(issns), np.nan)
+        values[is_found] = self.metrics[metric][positions[is_found]]
+        return pd.Series(values, index=issns.index, name=metric)
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+from utils.instrumentation import observe
+
+
+def factorise_keys(left_keys, right_keys):
+    """
+    Factorise the keys of both sides of a join into integer codes sharing the same key space, so the join compares
+    integers rather than strings. Each key is hashed once; keys that are already categorical with the same categories
+    (e.g. the ISSN keys of to_issn_keys) are not hashed at all. Null keys are coded -1 and never match
+    :param left_keys: Pandas Series of the keys of the left DataFrame
+    :param right_keys: Pandas Series of the keys of the right DataFrame
+    :return: Tuple of the left codes, the right codes (NumPy int64 arrays) and the number of distinct keys
+    """
+    if isinstance(left_keys.dtype, pd.CategoricalDtype) and left_keys.dtype == right_keys.dtype:
+        codes = (left_keys.cat.codes.to_numpy(dtype="int64"), right_keys.cat.codes.to_numpy(dtype="int64"))
+        return codes[0], codes[1], len(left_keys.cat.categories)
+
+    codes, uniques = pd.factorize(pd.concat([left_keys, right_keys], ignore_index=True), use_na_sentinel=True)
+    codes = codes.astype("int64")
+    return codes[:len(left_keys)], codes[len(left_keys):], len(uniques)
+
+def get_join_positions(left_codes, right_codes, n_keys, right_name="right"):
+    """
+    Obtain the position in the right DataFrame of the row matching every row of the left DataFrame, validating the
+    many-to-one contract of the join (every key is listed at most once on the right)
+    :param left_codes: NumPy array of the key codes of the left DataFrame
+    :param right_codes: NumPy array of the key codes of the right DataFrame
+    :param n_keys: Number of distinct keys (codes are in [0, n_keys), -1 for null keys)
+    :param right_name: Name of the right DataFrame, used in the validation error
+    :return: NumPy int64 array of positions in the right DataFrame (aligned with the left rows), -1 if no match
+    """
+    has_key = right_codes >= 0
+
+    key_counts = np.bincount(right_codes[has_key], minlength=n_keys)
+    if (key_counts > 1).any():
+        raise pd.errors.MergeError(
+            f"Join keys are not unique in {right_name}: {int((key_counts > 1).sum())} keys are listed more than once, "
+            f"the join is not many-to-one"
+        )
+
+    # One extra slot at the end, so the null key (-1) is looked up as 'no match'
+    positions_by_code = np.full(n_keys + 1, -1, dtype="int64")
+    positions_by_code[right_codes[has_key]] = np.flatnonzero(has_key)
+
+    return positions_by_code[left_codes]
+
+def compose_join_positions(positions, next_positions):
+    """
+    Chain two joins: the left rows are matched to the rows of an intermediate DataFrame, whose rows are matched to the
+    rows of a further DataFrame. The second join is resolved once on the intermediate DataFrame, not on every left row
+    :param positions: Positions in the intermediate DataFrame of the left rows (-1 if no match)
+    :param next_positions: Positions in the further DataFrame of the intermediate rows (-1 if no match)
+    :return: NumPy int64 array of positions in the further DataFrame of the left rows (-1 if no match)
+    """
+    return np.where(positions >= 0, next_positions[positions], -1)
+
+def take_join(left_df, right_df, positions, on, right_name="right"):
+    """
+    Left join the columns of the right DataFrame to the left DataFrame by taking the rows at the given positions,
+    and report the join's hit rate. Like a left pd.merge, the key column is kept once, unmatched rows have null values,
+    and the result has a fresh range index
+    :param left_df: Left DataFrame
+    :param right_df: Right DataFrame
+    :param positions: Positions in the right DataFrame of the left rows (-1 if no match), from get_join_positions
+    :param on: Name of the key column, not repeated from the right DataFrame
+    :param right_name: Name of the right DataFrame, used in the hit rate report
+    :return: Joined DataFrame
+    """
+    right_columns = [column for column in right_df.columns if column != on]
+    overlapping_columns = set(right_columns) & set(left_df.columns)
+    if overlapping_columns:
+        raise ValueError(f"Columns {sorted(overlapping_columns)} of {right_name} are already in the left DataFrame")
+
+    # Missing positions (-1) are filled in with the null value of each column's data-type
+    taken_df = pd.DataFrame({
+        column: right_df[column].array.take(positions, allow_fill=True)
+        for column in right_columns
+    })
+
+    n_matched = int((positions >= 0).sum())
+    hit_rate = n_matched / len(positions) if len(positions) else 0
+    print(f"Join {right_name} on {on}: matched {n_matched} of {len(positions)} rows ({hit_rate:.1%})")
+    observe("join_hit_rate", hit_rate, right=right_name, on=on)
+
+    # The left columns are not copied, only the taken right columns are new
+    left_df = left_df.set_axis(taken_df.index, copy=False)
+    return pd.concat([left_df, taken_df], axis=1, copy=False)
+
+def left_join_many_to_one(left_df, right_df, on, right_name="right"):
+    """
+    Left join a DataFrame to a lookup DataFrame listing every key at most once (validate='m:1'): the keys are
+    factorised once and the right columns are taken at the matching positions
+    :param left_df: Left DataFrame
+    :param right_df: Right (lookup) DataFrame
+    :param on: Name of the key column of both DataFrames
+    :param right_name: Name of the right DataFrame, used in the validation error and the hit rate report
+    :return: Joined DataFrame
+    """
+    left_codes, right_codes, n_keys = factorise_keys(left_df[on], right_df[on])
+    positions = get_join_positions(left_codes, right_codes, n_keys, right_name)
+    return take_join(left_df, right_df, positions, on, right_name)
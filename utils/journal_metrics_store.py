@@ -0,0 +1,173 @@
+import os
+import pandas as pd
+
+# Journal metrics held by the store, for every journal (identified by its ISSN)
+METRIC_COLUMNS = ["Scopus_ID", "SNIP", "SJR", "Cite_Score"]
+NUMERICAL_METRIC_COLUMNS = ["SNIP", "SJR", "Cite_Score"]
+# Every metric has a column recording where its value came from
+SOURCE_COLUMNS = [f"{metric}_source" for metric in METRIC_COLUMNS]
+STORE_COLUMNS = ["ISSN"] + METRIC_COLUMNS + SOURCE_COLUMNS + ["fetched_at", "updated_at", "version"]
+
+# Sources of the journal metrics
+SCOPUS_API_SOURCE = "Scopus API" # Serial Title API (02_scopus_serial_title_API.py)
+SCIMAGO_SOURCE = "SCImago" # SCImago Journal Rank dataset, used to fill in SJRs
+CWTS_SOURCE = "CWTS" # CWTS Journal Indicators dataset, used to fill in SNIPs
+CITESCORE_SOURCE = "CiteScore" # CiteScore reference dataset, used to fill in CiteScores
+LEGACY_SOURCE = "Legacy" # Values of the CS journal metrics file written before the store existed
+
+# Journal metrics fetched from the API longer ago than this are fetched again
+DEFAULT_TTL = pd.Timedelta(days=7)
+
+
+def get_utc_now():
+    """
+    Obtain the current (timezone-naive) UTC timestamp, used for the fetch and update times of the store
+    :return: Pandas Timestamp
+    """
+    return pd.Timestamp.now(tz="UTC").tz_localize(None)
+
+def create_journal_metrics_store():
+    """
+    Create an empty journal metrics store
+    :return: Empty store DataFrame with the store's columns and data-types
+    """
+    store_df = pd.DataFrame({column: pd.Series(dtype=object) for column in STORE_COLUMNS})
+    return ensure_store_data_types(store_df)
+
+def ensure_store_data_types(store_df):
+    """
+    Explicitly map each column of the store to its data-type, so the store is written to parquet consistently
+    :param store_df: Store DataFrame
+    :return: Store DataFrame with proper data-types
+    """
+    store_df = store_df.copy()
+    for numerical_column in NUMERICAL_METRIC_COLUMNS:
+        store_df[numerical_column] = pd.to_numeric(store_df[numerical_column], errors="coerce").astype(float)
+    for string_column in ["ISSN", "Scopus_ID"] + SOURCE_COLUMNS:
+        store_df[string_column] = store_df[string_column].astype(object).where(store_df[string_column].notna(), None)
+        store_df[string_column] = store_df[string_column].map(lambda value: value if value is None else str(value))
+    for timestamp_column in ["fetched_at", "updated_at"]:
+        store_df[timestamp_column] = pd.to_datetime(store_df[timestamp_column]).astype("datetime64[ns]")
+    store_df["version"] = store_df["version"].astype("int64")
+    return store_df
+
+def read_journal_metrics_store(store_path):
+    """
+    Read the journal metrics store, or create an empty store if it has not been written yet
+    :param store_path: Path of the store's parquet file
+    :return: Store DataFrame, holding every version of every journal's metrics
+    """
+    if not os.path.exists(store_path):
+        return create_journal_metrics_store()
+
+    store_df = pd.read_parquet(store_path, engine='fastparquet')
+    return ensure_store_data_types(store_df.reset_index(drop=True))
+
+def write_journal_metrics_store(store_df, store_path):
+    """
+    Persist the journal metrics store as a parquet file
+    :param store_df: Store DataFrame
+    :param store_path: Path of the store's parquet file
+    """
+    store_df.to_parquet(store_path, engine='fastparquet', index=False)
+
+def get_current_journal_metrics(store_df):
+    """
+    Obtain the latest version of every journal's metrics
+    :param store_df: Store DataFrame
+    :return: DataFrame with one row per ISSN (the row of its latest version)
+    """
+    return store_df.sort_values("version", kind="stable").drop_duplicates(subset="ISSN", keep="last") \
+        .sort_values("ISSN", kind="stable").reset_index(drop=True)
+
+def get_journal_metrics_df(store_df):
+    """
+    Obtain the current journal metrics in the layout of the CS journal metrics file: ISSN, Scopus_ID, SNIP, SJR,
+    Cite_Score
+    :param store_df: Store DataFrame
+    :return: DataFrame of the current journal metrics
+    """
+    return get_current_journal_metrics(store_df)[["ISSN"] + METRIC_COLUMNS]
+
+def get_issns_to_fetch(store_df, issns, ttl=DEFAULT_TTL, now=None):
+    """
+    Select the ISSNs whose journal metrics must be fetched from the API: the ISSNs missing from the store, or fetched
+    longer ago than the TTL
+    :param store_df: Store DataFrame
+    :param issns: Pandas Series of the ISSNs of all journals
+    :param ttl: Pandas Timedelta, the time after which fetched journal metrics are stale
+    :param now: Time of the refresh (default: current UTC time)
+    :return: Pandas Series of ISSNs to fetch (unique, in the order of the issns)
+    """
+    now = get_utc_now() if now is None else now
+    issns = issns.drop_duplicates()
+
+    fetched_at = get_current_journal_metrics(store_df).set_index("ISSN")["fetched_at"].reindex(issns)
+
+    is_missing = fetched_at.isna().to_numpy()
+    is_stale = (now - fetched_at > ttl).to_numpy()
+    print(f"Journals to fetch: {is_missing.sum()} missing, {is_stale.sum()} older than {ttl}, "
+          f"{len(issns) - is_missing.sum() - is_stale.sum()} up to date")
+
+    return issns[is_missing | is_stale]
+
+def upsert_journal_metrics(store_df, journal_metrics_df, source, fetched_at=None, updated_at=None):
+    """
+    Upsert journal metrics into the store. A journal whose metrics change (or a new journal) gets a new version;
+    the previous versions are kept. Null values in journal_metrics_df do not override values in the store, so values
+    filled in from another source survive a refresh in which the API does not return them
+    :param store_df: Store DataFrame
+    :param journal_metrics_df: DataFrame with an ISSN column and one or more metric columns
+    :param source: Source of the values in journal_metrics_df (e.g. SCOPUS_API_SOURCE)
+    :param fetched_at: Time the journal metrics were fetched from the API, None if they were not fetched
+    :param updated_at: Time of the upsert (default: current UTC time)
+    :return: Store DataFrame with the upserted journal metrics
+    """
+    updated_at = get_utc_now() if updated_at is None else updated_at
+    metric_columns = [column for column in METRIC_COLUMNS if column in journal_metrics_df.columns]
+
+    # Journal metrics to upsert, with the data-types of the store (the last record of an ISSN wins)
+    upserts_df = journal_metrics_df.drop_duplicates(subset="ISSN", keep="last").set_index("ISSN")
+    for numerical_column in set(metric_columns) & set(NUMERICAL_METRIC_COLUMNS):
+        upserts_df[numerical_column] = pd.to_numeric(upserts_df[numerical_column], errors="coerce")
+    if "Scopus_ID" in metric_columns:
+        upserts_df["Scopus_ID"] = upserts_df["Scopus_ID"].astype(object).map(
+            lambda scopus_id: None if pd.isna(scopus_id) else str(scopus_id)
+        )
+
+    current_df = get_current_journal_metrics(store_df).set_index("ISSN")
+    previous_df = current_df.reindex(upserts_df.index)
+    is_new = ~upserts_df.index.isin(current_df.index)
+
+    # New version of each upserted journal: values of journal_metrics_df, falling back to the previous version
+    upserted_df = previous_df.copy()
+    is_changed = pd.Series(is_new, index=upserts_df.index)
+    for column in metric_columns:
+        has_value = upserts_df[column].notna()
+        upserted_df[column] = upserts_df[column].where(has_value, previous_df[column])
+        upserted_df[f"{column}_source"] = previous_df[f"{column}_source"].where(~has_value, source)
+
+        is_same_value = (upserted_df[column] == previous_df[column]) | \
+                        (upserted_df[column].isna() & previous_df[column].isna())
+        is_changed |= ~is_same_value
+
+    upserted_df = upserted_df[is_changed.to_numpy()]
+    upserted_df["version"] = previous_df.loc[upserted_df.index, "version"].fillna(0).astype("int64") + 1
+    upserted_df["updated_at"] = updated_at
+    if fetched_at is not None:
+        upserted_df["fetched_at"] = fetched_at
+
+        # Journals fetched again without any change keep their version, only their fetch time is updated
+        unchanged_issns = is_changed.index[~is_changed.to_numpy()]
+        store_df = store_df.copy()
+        is_unchanged_current = store_df["ISSN"].isin(unchanged_issns) & \
+            (store_df["version"] == store_df["ISSN"].map(current_df["version"]))
+        store_df.loc[is_unchanged_current, "fetched_at"] = fetched_at
+
+    print(f"Upserted journal metrics from {source}: {int(is_new.sum())} new, "
+          f"{int(is_changed.sum() - is_new.sum())} changed, {int((~is_changed).sum())} unchanged")
+
+    upserted_df = upserted_df.reset_index()[STORE_COLUMNS]
+    if store_df.empty:
+        return ensure_store_data_types(upserted_df)
+    return ensure_store_data_types(pd.concat([store_df, upserted_df], ignore_index=True))
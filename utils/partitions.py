@@ -0,0 +1,133 @@
+import os
+import pandas as pd
+
+from utils.constants import UOA_PARTITION_COLUMN
+
+
+def get_uoa_partition_path(dataset_path, uoa):
+    """
+    Obtain the path of the directory storing the rows of a single UoA in a dataset partitioned by UoA
+    :param dataset_path: Path of the partitioned dataset's directory
+    :param uoa: Unit of assessment number
+    :return: Path of the partition's directory, e.g. <dataset_path>/uoa=11
+    """
+    return os.path.join(dataset_path, f"{UOA_PARTITION_COLUMN}={uoa}")
+
+def get_uoa_partition_files(dataset_path, uoa):
+    """
+    List the parquet files (parts) of a UoA's partition
+    :param dataset_path: Path of the partitioned dataset's directory
+    :param uoa: Unit of assessment number
+    :return: Sorted list of the file names of the parts, empty if the partition does not exist
+    """
+    partition_path = get_uoa_partition_path(dataset_path, uoa)
+    if not os.path.isdir(partition_path):
+        return []
+
+    return sorted(
+        file_name for file_name in os.listdir(partition_path)
+        if file_name.startswith("part.") and file_name.endswith(".parquet")
+    )
+
+def uoa_partition_exists(dataset_path, uoa):
+    """
+    Check whether the rows of a UoA have been written to a dataset partitioned by UoA
+    :param dataset_path: Path of the partitioned dataset's directory
+    :param uoa: Unit of assessment number
+    :return: True if the UoA's partition holds at least one part (an empty directory, e.g. left by a run that crashed,
+    does not count)
+    """
+    return len(get_uoa_partition_files(dataset_path, uoa)) > 0
+
+def write_uoa_partition(df, dataset_path, uoa):
+    """
+    Persist the rows of a single UoA as a parquet file in its partition, replacing the partition if it exists.
+    Each UoA is written to its own directory, so different UoAs can be written concurrently
+    :param df: DataFrame of the UoA's rows (without the partition column)
+    :param dataset_path: Path of the partitioned dataset's directory
+    :param uoa: Unit of assessment number
+    """
+    clear_uoa_partition(dataset_path, uoa)
+    write_uoa_partition_part(df, dataset_path, uoa, 0)
+
+def clear_uoa_partition(dataset_path, uoa):
+    """
+    Remove the parquet files of a UoA's partition, and its directory once empty. The directory is created again by
+    the first part written to the partition, so a UoA without rows is not left as an empty partition
+    :param dataset_path: Path of the partitioned dataset's directory
+    :param uoa: Unit of assessment number
+    """
+    partition_path = get_uoa_partition_path(dataset_path, uoa)
+    if not os.path.isdir(partition_path):
+        return
+
+    for file_name in os.listdir(partition_path):
+        if file_name.endswith(".parquet"):
+            os.remove(os.path.join(partition_path, file_name))
+    if not os.listdir(partition_path):
+        os.rmdir(partition_path)
+
+def write_uoa_partition_part(df, dataset_path, uoa, part):
+    """
+    Persist a chunk of a UoA's rows as one parquet file of its partition, so a partition can be written chunk by chunk
+    without holding all of its rows in memory. The parts are read back in order by read_uoa_partition
+    :param df: DataFrame of a chunk of the UoA's rows (without the partition column)
+    :param dataset_path: Path of the partitioned dataset's directory
+    :param uoa: Unit of assessment number
+    :param part: Number of the part, e.g. the number of the chunk
+    """
+    partition_path = get_uoa_partition_path(dataset_path, uoa)
+    os.makedirs(partition_path, exist_ok=True)
+
+    # Zero-padded, so the parts sort in order by name
+    df.to_parquet(os.path.join(partition_path, f"part.{part:05d}.parquet"), engine='fastparquet', index=False)
+
+def write_uoa_partitions(df, dataset_path):
+    """
+    Persist a DataFrame covering several UoAs as a dataset partitioned by UoA (one partition per value of the uoa column)
+    :param df: DataFrame with a uoa column
+    :param dataset_path: Path of the partitioned dataset's directory
+    """
+    for uoa, uoa_df in df.groupby(UOA_PARTITION_COLUMN, sort=True):
+        write_uoa_partition(uoa_df.drop(columns=[UOA_PARTITION_COLUMN]), dataset_path, uoa)
+
+def read_uoa_partition(dataset_path, uoa):
+    """
+    Load the rows of a single UoA from a dataset partitioned by UoA
+    :param dataset_path: Path of the partitioned dataset's directory
+    :param uoa: Unit of assessment number
+    :return: DataFrame of the UoA's rows
+    """
+    partition_path = get_uoa_partition_path(dataset_path, uoa)
+
+    partition_files = get_uoa_partition_files(dataset_path, uoa)
+    if not partition_files:
+        raise FileNotFoundError(f"Partition of unit of assessment {uoa} not found or empty: {partition_path}")
+    partition_df = pd.concat(
+        [pd.read_parquet(os.path.join(partition_path, file_name), engine='fastparquet') for file_name in partition_files],
+        ignore_index=True
+    )
+
+    if len(partition_files) > 1:
+        # A column that is empty in one part is stored as float, so its nulls are NaN where the other parts have None:
+        # use None for the nulls of text columns, as in a partition written in one part
+        for column in partition_df.columns[partition_df.dtypes == object]:
+            partition_df[column] = partition_df[column].where(partition_df[column].notna(), None)
+
+    return partition_df
+
+def get_partitioned_uoas(dataset_path):
+    """
+    List the UoAs that have been written to a dataset partitioned by UoA (empty partitions are left out)
+    :param dataset_path: Path of the partitioned dataset's directory
+    :return: Sorted list of unit of assessment numbers
+    """
+    if not os.path.isdir(dataset_path):
+        return []
+
+    partition_prefix = f"{UOA_PARTITION_COLUMN}="
+    uoas = [
+        int(directory[len(partition_prefix):]) for directory in os.listdir(dataset_path)
+        if directory.startswith(partition_prefix)
+    ]
+    return sorted(uoa for uoa in uoas if uoa_partition_exists(dataset_path, uoa))
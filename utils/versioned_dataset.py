@@ -0,0 +1,208 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+# A versioned dataset is a directory of immutable versions, and a manifest pointing to the current one:
+# <dataset_path>/manifest.json, v00001.parquet, delta.v00001.parquet, key_hashes.v00001.parquet, v00002.parquet, ...
+# With a retention, only the data of the latest versions is kept: the deltas of all versions are kept as the history of
+# the changes
+MANIFEST_FILE = "manifest.json"
+KEY_HASHES_COLUMNS = ["source", "key", "hash"]
+
+
+def get_version_file_name(version, prefix=""):
+    """
+    Obtain the name of a file of a version of a versioned dataset
+    :param version: Version number
+    :param prefix: Kind of file: "" for the data, "delta." for the changed rows, "key_hashes." for the source key hashes
+    :return: File name, e.g. v00003.parquet (zero-padded, so the versions sort in order by name)
+    """
+    return f"{prefix}v{version:05d}.parquet"
+
+def normalise_for_hashing(df):
+    """
+    Map the columns of a DataFrame to canonical data-types before hashing, so a DataFrame read back from parquet hashes
+    like the one that was written: numbers (integers, nullable integers, booleans, floats) become floats with NaN for
+    missing values, timestamps become datetime64[ns], and other columns (object, string, categorical) become Python
+    strings with None for missing values
+    :param df: DataFrame
+    :return: DataFrame with the same columns, in canonical data-types
+    """
+    normalised_columns = {}
+    for column, values in df.items():
+        if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+            normalised_columns[column] = values.to_numpy(dtype=float, na_value=np.nan)
+        elif pd.api.types.is_datetime64_any_dtype(values):
+            normalised_columns[column] = values.astype("datetime64[ns]").to_numpy()
+        else:
+            normalised_columns[column] = values.astype(object).map(
+                lambda value: None if pd.isna(value) else str(value)
+            ).to_numpy(dtype=object)
+    return pd.DataFrame(normalised_columns, columns=df.columns)
+
+def get_key_hashes(df, key_column, source=None):
+    """
+    Hash the values of every record of a source table, so the records that changed between two builds can be detected
+    without keeping the previous table. Records with a null key are not hashed
+    :param df: Source DataFrame, listing every key at most once
+    :param key_column: Name of the key column
+    :param source: Name of the source (default: the key column's name)
+    :return: DataFrame with columns source, key (string) and hash (uint64) - one row per key
+    """
+    df = df[df[key_column].notna()]
+    row_hashes = pd.util.hash_pandas_object(normalise_for_hashing(df.drop(columns=[key_column])), index=False)
+
+    return pd.DataFrame({
+        "source": source or key_column,
+        "key": df[key_column].astype(str).to_numpy(),
+        "hash": row_hashes.to_numpy(dtype="uint64")
+    }, columns=KEY_HASHES_COLUMNS)
+
+def get_changed_keys(previous_key_hashes, key_hashes):
+    """
+    Compare the key hashes of two builds: a key is changed if it was added, removed, or its record changed
+    :param previous_key_hashes: Key hashes DataFrame (source, key, hash) of the previous build
+    :param key_hashes: Key hashes DataFrame (source, key, hash) of the current build
+    :return: Dictionary of source name to the set of its changed keys (every source of either build is listed)
+    """
+    # A key whose (key, hash) pair is on one side only was added, removed or changed. The hashes are joined as keys, so
+    # they are compared as uint64 rather than as floats with missing values
+    merged = previous_key_hashes.merge(key_hashes, on=KEY_HASHES_COLUMNS, how="outer", indicator=True)
+
+    changed_keys = {source: set() for source in merged["source"].unique()}
+    for source, keys in merged.loc[merged["_merge"] != "both", ["source", "key"]].groupby("source")["key"]:
+        changed_keys[source] = set(keys)
+    return changed_keys
+
+def get_changed_rows(previous_df, df):
+    """
+    Find the rows of a DataFrame that differ from the same rows (by position) of its previous version. The columns are
+    normalised before hashing, so a previous version read back from parquet (e.g. strings as objects, or integers with
+    missing values as floats) is compared by value rather than by data-type
+    :param previous_df: Previous version, with the same number of rows and columns
+    :param df: Current version
+    :return: NumPy boolean array, True for the changed rows
+    """
+    previous_row_hashes = pd.util.hash_pandas_object(normalise_for_hashing(previous_df), index=False).to_numpy()
+    row_hashes = pd.util.hash_pandas_object(normalise_for_hashing(df), index=False).to_numpy()
+    return previous_row_hashes != row_hashes
+
+def read_manifest(dataset_path):
+    """
+    Read the manifest of a versioned dataset
+    :param dataset_path: Path of the versioned dataset's directory
+    :return: Dictionary describing the current version, None if no version has been written
+    """
+    manifest_path = os.path.join(dataset_path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+
+    with open(manifest_path) as manifest_file:
+        return json.load(manifest_file)
+
+def read_version(dataset_path, version=None, prefix=""):
+    """
+    Load a version of a versioned dataset. Versions are never modified once written, so a reader gets a consistent
+    snapshot even while a new version is being written
+    :param dataset_path: Path of the versioned dataset's directory
+    :param version: Version number (default: the current version of the manifest)
+    :param prefix: Kind of file: "" for the data, "delta." for the changed rows, "key_hashes." for the source key hashes
+    :return: DataFrame of the version, None if no version has been written
+    """
+    if version is None:
+        manifest = read_manifest(dataset_path)
+        if manifest is None:
+            return None
+        version = manifest["version"]
+
+    return pd.read_parquet(os.path.join(dataset_path, get_version_file_name(version, prefix)), engine='fastparquet')
+
+def read_delta(dataset_path, version=None):
+    """
+    Load the rows that changed in a version of a versioned dataset, for consumers that only need the changes
+    :param dataset_path: Path of the versioned dataset's directory
+    :param version: Version number (default: the current version of the manifest)
+    :return: DataFrame of the changed rows, None if no version has been written
+    """
+    return read_version(dataset_path, version, prefix="delta.")
+
+def read_key_hashes(dataset_path):
+    """
+    Load the source key hashes of the current version of a versioned dataset
+    :param dataset_path: Path of the versioned dataset's directory
+    :return: Key hashes DataFrame (source, key, hash) - empty if no version has been written
+    """
+    key_hashes = read_version(dataset_path, prefix="key_hashes.")
+    if key_hashes is None:
+        return pd.DataFrame({"source": pd.Series(dtype=object), "key": pd.Series(dtype=object),
+                             "hash": pd.Series(dtype="uint64")})
+    return key_hashes
+
+def write_version(dataset_path, df, delta_df, key_hashes, keep_versions=None, **manifest_fields):
+    """
+    Persist a new version of a versioned dataset: its data, its delta and its source key hashes are written first,
+    then the manifest is replaced atomically, so readers switch to the new version only once it is complete
+    :param dataset_path: Path of the versioned dataset's directory
+    :param df: DataFrame of the new version
+    :param delta_df: DataFrame of the rows that changed since the previous version
+    :param key_hashes: Key hashes DataFrame (source, key, hash) of the sources the version was built from
+    :param keep_versions: Number of latest versions whose data and key hashes are kept, older ones are pruned once
+    the manifest points to the new version (default: all versions are kept)
+    :param manifest_fields: Additional fields recorded in the manifest (e.g. the number of changed keys)
+    :return: Manifest of the new version
+    """
+    os.makedirs(dataset_path, exist_ok=True)
+
+    previous_manifest = read_manifest(dataset_path)
+    version = 1 if previous_manifest is None else previous_manifest["version"] + 1
+
+    for prefix, version_df in [("", df), ("delta.", delta_df), ("key_hashes.", key_hashes)]:
+        version_df.to_parquet(os.path.join(dataset_path, get_version_file_name(version, prefix)), engine='fastparquet',
+                              index=False)
+
+    manifest = {
+        "version": version,
+        "previous_version": None if previous_manifest is None else previous_manifest["version"],
+        "created_at": pd.Timestamp.now(tz="UTC").isoformat(),
+        "data": get_version_file_name(version),
+        "delta": get_version_file_name(version, "delta."),
+        "key_hashes": get_version_file_name(version, "key_hashes."),
+        "rows": len(df),
+        "changed_rows": len(delta_df),
+        **manifest_fields
+    }
+
+    manifest_path = os.path.join(dataset_path, MANIFEST_FILE)
+    with open(f"{manifest_path}.tmp", "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=4)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+
+    if keep_versions is not None:
+        prune_versions(dataset_path, keep_versions)
+
+    return manifest
+
+def prune_versions(dataset_path, keep_versions):
+    """
+    Delete the data and key hashes of the versions older than the latest keep_versions versions of a versioned dataset.
+    Their deltas are kept, as the history of the changed rows. A reader still loading a pruned version fails to find
+    its file, so keep_versions should cover the versions readers may hold
+    :param dataset_path: Path of the versioned dataset's directory
+    :param keep_versions: Number of latest versions to keep, at least 1
+    :return: List of the versions that were pruned
+    """
+    assert keep_versions >= 1
+    manifest = read_manifest(dataset_path)
+    if manifest is None:
+        return []
+
+    pruned_versions = []
+    for version in range(1, manifest["version"] - keep_versions + 1):
+        version_paths = [os.path.join(dataset_path, get_version_file_name(version, prefix)) for prefix in ["", "key_hashes."]]
+        existing_paths = [version_path for version_path in version_paths if os.path.exists(version_path)]
+        for version_path in existing_paths:
+            os.remove(version_path)
+        if existing_paths:
+            pruned_versions.append(version)
+    return pruned_versions